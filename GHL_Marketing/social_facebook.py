@@ -8,9 +8,10 @@ import logging
 from typing import Optional, List
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import httpx
 from supabase import create_client, Client
 
+from http_clients import get_http_client
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/social/facebook", tags=["social_facebook"])
@@ -181,50 +182,50 @@ async def get_connected_facebook_accounts(request: StartOAuthRequest):
 
         # Call GHL API to get all accounts
         # NOTE: Using token-id ONLY (no authorization header needed - verified via testing)
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://backend.leadconnectorhq.com/social-media-posting/{location_id}/accounts",
-                params={"fetchAll": "true"},
-                headers={
-                    "token-id": firebase_token,
-                    "version": "2021-07-28",
-                    "channel": "APP",
-                    "source": "WEB_USER",
-                    "accept": "application/json"
-                },
-                timeout=30.0
-            )
+        client = get_http_client('ghl')
+        response = await client.get(
+            f"https://backend.leadconnectorhq.com/social-media-posting/{location_id}/accounts",
+            params={"fetchAll": "true"},
+            headers={
+                "token-id": firebase_token,
+                "version": "2021-07-28",
+                "channel": "APP",
+                "source": "WEB_USER",
+                "accept": "application/json"
+            },
+            timeout=30.0
+        )
+
+        if not response.is_success:
+            logger.error(f"[SOCIAL FB] GHL API returned {response.status_code}: {response.text}")
+
+            # Provide more helpful error messages
+            if response.status_code == 401:
+                raise HTTPException(
+                    status_code=401,
+                    detail="GHL authentication failed. Your access tokens may be expired. Please reconnect your GHL account in Settings."
+                )
+            else:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"GHL API error: {response.text}"
+                )
 
-            if not response.is_success:
-                logger.error(f"[SOCIAL FB] GHL API returned {response.status_code}: {response.text}")
-
-                # Provide more helpful error messages
-                if response.status_code == 401:
-                    raise HTTPException(
-                        status_code=401,
-                        detail="GHL authentication failed. Your access tokens may be expired. Please reconnect your GHL account in Settings."
-                    )
-                else:
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"GHL API error: {response.text}"
-                    )
-
-            data = response.json()
-
-            # Filter for Facebook accounts only
-            facebook_accounts = []
-            if data.get('success') and data.get('results', {}).get('accounts'):
-                facebook_accounts = [
-                    acc for acc in data['results']['accounts']
-                    if acc.get('platform') == 'facebook'
-                ]
-
-            return {
-                "success": True,
-                "accounts": facebook_accounts,
-                "total_count": len(facebook_accounts)
-            }
+        data = response.json()
+
+        # Filter for Facebook accounts only
+        facebook_accounts = []
+        if data.get('success') and data.get('results', {}).get('accounts'):
+            facebook_accounts = [
+                acc for acc in data['results']['accounts']
+                if acc.get('platform') == 'facebook'
+            ]
+
+        return {
+            "success": True,
+            "accounts": facebook_accounts,
+            "total_count": len(facebook_accounts)
+        }
 
     except HTTPException:
         raise
@@ -283,48 +284,48 @@ async def get_available_facebook_pages(request: GetPagesRequest):
 
         # Call GHL API to get available pages
         # NOTE: Using token-id ONLY (no authorization header needed - verified via testing)
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://backend.leadconnectorhq.com/social-media-posting/oauth/{location_id}/facebook/accounts/{request.oauth_id}",
-                headers={
-                    "token-id": firebase_token,
-                    "version": "2021-07-28",
-                    "channel": "APP",
-                    "source": "WEB_USER",
-                    "accept": "application/json"
-                },
-                timeout=30.0
+        client = get_http_client('ghl')
+        response = await client.get(
+            f"https://backend.leadconnectorhq.com/social-media-posting/oauth/{location_id}/facebook/accounts/{request.oauth_id}",
+            headers={
+                "token-id": firebase_token,
+                "version": "2021-07-28",
+                "channel": "APP",
+                "source": "WEB_USER",
+                "accept": "application/json"
+            },
+            timeout=30.0
+        )
+
+        if not response.is_success:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"GHL API error: {response.text}"
             )
 
-            if not response.is_success:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"GHL API error: {response.text}"
-                )
+        data = response.json()
 
-            data = response.json()
+        pages = []
+        if data.get('success') and data.get('results', {}).get('pages'):
+            pages = data['results']['pages']
 
-            pages = []
-            if data.get('success') and data.get('results', {}).get('pages'):
-                pages = data['results']['pages']
+        # Save fetched pages to ghl_subaccounts table
+        try:
+            supabase.table('ghl_subaccounts').update({
+                'pages': pages,
+                'updated_at': __import__('datetime').datetime.now().isoformat()
+            }).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
+            logger.info(f"[SOCIAL FB] Saved {len(pages)} available pages to database")
+        except Exception as db_error:
+            logger.warning(f"[SOCIAL FB] Could not save pages to database: {db_error}")
+            # Don't fail the request if database save fails
 
-            # Save fetched pages to ghl_subaccounts table
-            try:
-                supabase.table('ghl_subaccounts').update({
-                    'pages': pages,
-                    'updated_at': __import__('datetime').datetime.now().isoformat()
-                }).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
-                logger.info(f"[SOCIAL FB] Saved {len(pages)} available pages to database")
-            except Exception as db_error:
-                logger.warning(f"[SOCIAL FB] Could not save pages to database: {db_error}")
-                # Don't fail the request if database save fails
-
-            return {
-                "success": True,
-                "pages": pages,
-                "total_count": len(pages),
-                "oauth_id": request.oauth_id
-            }
+        return {
+            "success": True,
+            "pages": pages,
+            "total_count": len(pages),
+            "oauth_id": request.oauth_id
+        }
 
     except HTTPException:
         raise
@@ -392,77 +393,77 @@ async def connect_facebook_page(request: ConnectPageRequest):
 
         # Call GHL API to connect the page
         # NOTE: Using token-id ONLY (no authorization header needed - verified via testing)
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"https://backend.leadconnectorhq.com/social-media-posting/oauth/{location_id}/facebook/accounts/{request.oauth_id}",
-                json=connect_body,
-                headers={
-                    "token-id": firebase_token,
-                    "version": "2021-07-28",
-                    "channel": "APP",
-                    "source": "WEB_USER",
-                    "accept": "application/json",
-                    "content-type": "application/json"
-                },
-                timeout=30.0
+        client = get_http_client('ghl')
+        response = await client.post(
+            f"https://backend.leadconnectorhq.com/social-media-posting/oauth/{location_id}/facebook/accounts/{request.oauth_id}",
+            json=connect_body,
+            headers={
+                "token-id": firebase_token,
+                "version": "2021-07-28",
+                "channel": "APP",
+                "source": "WEB_USER",
+                "accept": "application/json",
+                "content-type": "application/json"
+            },
+            timeout=30.0
+        )
+
+        if not response.is_success:
+            error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {"message": response.text}
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=error_data.get('message', f"GHL API error: {response.status_code}")
             )
 
-            if not response.is_success:
-                error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {"message": response.text}
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=error_data.get('message', f"GHL API error: {response.status_code}")
-                )
-
-            data = response.json()
+        data = response.json()
+
+        # Save connected page to ghl_subaccounts table
+        try:
+            # Get current connected_pages
+            ghl_result = supabase.table('ghl_subaccounts').select(
+                'connected_pages'
+            ).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
+
+            current_connected_pages = []
+            if ghl_result.data and ghl_result.data[0].get('connected_pages'):
+                current_connected_pages = ghl_result.data[0]['connected_pages']
+
+            # Create page data object
+            new_page = {
+                "originId": request.origin_id,
+                "name": request.name,
+                "avatar": request.avatar or "",
+                "platform": "facebook",
+                "type": "page",
+                "oauth_id": request.oauth_id,
+                "connected_at": __import__('datetime').datetime.now().isoformat()
+            }
 
-            # Save connected page to ghl_subaccounts table
-            try:
-                # Get current connected_pages
-                ghl_result = supabase.table('ghl_subaccounts').select(
-                    'connected_pages'
-                ).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
-
-                current_connected_pages = []
-                if ghl_result.data and ghl_result.data[0].get('connected_pages'):
-                    current_connected_pages = ghl_result.data[0]['connected_pages']
-
-                # Create page data object
-                new_page = {
-                    "originId": request.origin_id,
-                    "name": request.name,
-                    "avatar": request.avatar or "",
-                    "platform": "facebook",
-                    "type": "page",
-                    "oauth_id": request.oauth_id,
-                    "connected_at": __import__('datetime').datetime.now().isoformat()
-                }
-
-                # Check if page already exists (by originId)
-                page_exists = any(
-                    page.get('originId') == request.origin_id
-                    for page in current_connected_pages
-                )
+            # Check if page already exists (by originId)
+            page_exists = any(
+                page.get('originId') == request.origin_id
+                for page in current_connected_pages
+            )
 
-                if not page_exists:
-                    current_connected_pages.append(new_page)
+            if not page_exists:
+                current_connected_pages.append(new_page)
 
-                # Update database
-                supabase.table('ghl_subaccounts').update({
-                    'connected_pages': current_connected_pages,
-                    'updated_at': __import__('datetime').datetime.now().isoformat()
-                }).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
+            # Update database
+            supabase.table('ghl_subaccounts').update({
+                'connected_pages': current_connected_pages,
+                'updated_at': __import__('datetime').datetime.now().isoformat()
+            }).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
 
-                logger.info(f"[SOCIAL FB] Saved connected page {request.name} to database")
-            except Exception as db_error:
-                logger.warning(f"[SOCIAL FB] Could not save connected page to database: {db_error}")
-                # Don't fail the request if database save fails
+            logger.info(f"[SOCIAL FB] Saved connected page {request.name} to database")
+        except Exception as db_error:
+            logger.warning(f"[SOCIAL FB] Could not save connected page to database: {db_error}")
+            # Don't fail the request if database save fails
 
-            return {
-                "success": True,
-                "data": data,
-                "message": f"Successfully connected {request.name}"
-            }
+        return {
+            "success": True,
+            "data": data,
+            "message": f"Successfully connected {request.name}"
+        }
 
     except HTTPException:
         raise
@@ -8,9 +8,10 @@ import logging
 from typing import Optional, List
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import httpx
 from supabase import create_client, Client
 
+from http_clients import get_http_client
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/social/instagram", tags=["social_instagram"])
@@ -174,41 +175,41 @@ async def get_connected_instagram_accounts(request: StartOAuthRequest):
 
         # Call GHL API to get all accounts
         # NOTE: Using token-id ONLY (no authorization header needed - verified via testing)
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://backend.leadconnectorhq.com/social-media-posting/{location_id}/accounts",
-                params={"fetchAll": "true"},
-                headers={
-                    "token-id": firebase_token,
-                    "version": "2021-07-28",
-                    "channel": "APP",
-                    "source": "WEB_USER",
-                    "accept": "application/json"
-                },
-                timeout=30.0
+        client = get_http_client('ghl')
+        response = await client.get(
+            f"https://backend.leadconnectorhq.com/social-media-posting/{location_id}/accounts",
+            params={"fetchAll": "true"},
+            headers={
+                "token-id": firebase_token,
+                "version": "2021-07-28",
+                "channel": "APP",
+                "source": "WEB_USER",
+                "accept": "application/json"
+            },
+            timeout=30.0
+        )
+
+        if not response.is_success:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"GHL API error: {response.text}"
             )
 
-            if not response.is_success:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"GHL API error: {response.text}"
-                )
-
-            data = response.json()
-
-            # Filter for Instagram accounts only
-            instagram_accounts = []
-            if data.get('success') and data.get('results', {}).get('accounts'):
-                instagram_accounts = [
-                    acc for acc in data['results']['accounts']
-                    if acc.get('platform') == 'instagram'
-                ]
-
-            return {
-                "success": True,
-                "accounts": instagram_accounts,
-                "total_count": len(instagram_accounts)
-            }
+        data = response.json()
+
+        # Filter for Instagram accounts only
+        instagram_accounts = []
+        if data.get('success') and data.get('results', {}).get('accounts'):
+            instagram_accounts = [
+                acc for acc in data['results']['accounts']
+                if acc.get('platform') == 'instagram'
+            ]
+
+        return {
+            "success": True,
+            "accounts": instagram_accounts,
+            "total_count": len(instagram_accounts)
+        }
 
     except HTTPException:
         raise
@@ -267,66 +268,66 @@ async def get_available_instagram_accounts(request: GetAccountsRequest):
 
         # Call GHL API to get available accounts
         # NOTE: Using token-id ONLY (no authorization header needed - verified via testing)
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://backend.leadconnectorhq.com/social-media-posting/oauth/{location_id}/instagram/accounts/{request.oauth_id}",
-                headers={
-                    "token-id": firebase_token,
-                    "version": "2021-07-28",
-                    "channel": "APP",
-                    "source": "WEB_USER",
-                    "accept": "application/json"
-                },
-                timeout=30.0
+        client = get_http_client('ghl')
+        response = await client.get(
+            f"https://backend.leadconnectorhq.com/social-media-posting/oauth/{location_id}/instagram/accounts/{request.oauth_id}",
+            headers={
+                "token-id": firebase_token,
+                "version": "2021-07-28",
+                "channel": "APP",
+                "source": "WEB_USER",
+                "accept": "application/json"
+            },
+            timeout=30.0
+        )
+
+        if not response.is_success:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"GHL API error: {response.text}"
             )
 
-            if not response.is_success:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"GHL API error: {response.text}"
-                )
-
-            data = response.json()
-
-            accounts = []
-            if data.get('success') and data.get('results', {}).get('accounts'):
-                accounts = data['results']['accounts']
+        data = response.json()
+
+        accounts = []
+        if data.get('success') and data.get('results', {}).get('accounts'):
+            accounts = data['results']['accounts']
+
+        # Save fetched Instagram accounts to ghl_subaccounts table (pages field stores both FB pages and IG accounts)
+        try:
+            # Get current pages to merge with Instagram accounts
+            ghl_result = supabase.table('ghl_subaccounts').select(
+                'pages'
+            ).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
+
+            current_pages = []
+            if ghl_result.data and ghl_result.data[0].get('pages'):
+                current_pages = ghl_result.data[0]['pages']
+                # Filter out old Instagram accounts to avoid duplicates
+                current_pages = [p for p in current_pages if p.get('platform') != 'instagram']
+
+            # Add Instagram accounts with platform identifier
+            for account in accounts:
+                account['platform'] = 'instagram'
+
+            # Merge Facebook pages and Instagram accounts
+            all_pages = current_pages + accounts
+
+            supabase.table('ghl_subaccounts').update({
+                'pages': all_pages,
+                'updated_at': __import__('datetime').datetime.now().isoformat()
+            }).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
+            logger.info(f"[SOCIAL IG] Saved {len(accounts)} available Instagram accounts to database")
+        except Exception as db_error:
+            logger.warning(f"[SOCIAL IG] Could not save Instagram accounts to database: {db_error}")
+            # Don't fail the request if database save fails
 
-            # Save fetched Instagram accounts to ghl_subaccounts table (pages field stores both FB pages and IG accounts)
-            try:
-                # Get current pages to merge with Instagram accounts
-                ghl_result = supabase.table('ghl_subaccounts').select(
-                    'pages'
-                ).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
-
-                current_pages = []
-                if ghl_result.data and ghl_result.data[0].get('pages'):
-                    current_pages = ghl_result.data[0]['pages']
-                    # Filter out old Instagram accounts to avoid duplicates
-                    current_pages = [p for p in current_pages if p.get('platform') != 'instagram']
-
-                # Add Instagram accounts with platform identifier
-                for account in accounts:
-                    account['platform'] = 'instagram'
-
-                # Merge Facebook pages and Instagram accounts
-                all_pages = current_pages + accounts
-
-                supabase.table('ghl_subaccounts').update({
-                    'pages': all_pages,
-                    'updated_at': __import__('datetime').datetime.now().isoformat()
-                }).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
-                logger.info(f"[SOCIAL IG] Saved {len(accounts)} available Instagram accounts to database")
-            except Exception as db_error:
-                logger.warning(f"[SOCIAL IG] Could not save Instagram accounts to database: {db_error}")
-                # Don't fail the request if database save fails
-
-            return {
-                "success": True,
-                "accounts": accounts,
-                "total_count": len(accounts),
-                "oauth_id": request.oauth_id
-            }
+        return {
+            "success": True,
+            "accounts": accounts,
+            "total_count": len(accounts),
+            "oauth_id": request.oauth_id
+        }
 
     except HTTPException:
         raise
@@ -392,77 +393,77 @@ async def connect_instagram_account(request: ConnectAccountRequest):
 
         # Call GHL API to connect the account
         # NOTE: Using token-id ONLY (no authorization header needed - verified via testing)
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"https://backend.leadconnectorhq.com/social-media-posting/oauth/{location_id}/instagram/accounts/{request.oauth_id}",
-                json=connect_body,
-                headers={
-                    "token-id": firebase_token,
-                    "version": "2021-07-28",
-                    "channel": "APP",
-                    "source": "WEB_USER",
-                    "accept": "application/json",
-                    "content-type": "application/json"
-                },
-                timeout=30.0
+        client = get_http_client('ghl')
+        response = await client.post(
+            f"https://backend.leadconnectorhq.com/social-media-posting/oauth/{location_id}/instagram/accounts/{request.oauth_id}",
+            json=connect_body,
+            headers={
+                "token-id": firebase_token,
+                "version": "2021-07-28",
+                "channel": "APP",
+                "source": "WEB_USER",
+                "accept": "application/json",
+                "content-type": "application/json"
+            },
+            timeout=30.0
+        )
+
+        if not response.is_success:
+            error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {"message": response.text}
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=error_data.get('message', f"GHL API error: {response.status_code}")
             )
 
-            if not response.is_success:
-                error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {"message": response.text}
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=error_data.get('message', f"GHL API error: {response.status_code}")
-                )
+        data = response.json()
+
+        # Save connected Instagram account to ghl_subaccounts table
+        try:
+            # Get current connected_pages
+            ghl_result = supabase.table('ghl_subaccounts').select(
+                'connected_pages'
+            ).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
+
+            current_connected_pages = []
+            if ghl_result.data and ghl_result.data[0].get('connected_pages'):
+                current_connected_pages = ghl_result.data[0]['connected_pages']
+
+            # Create Instagram account data object
+            new_account = {
+                "originId": request.origin_id,
+                "name": request.name,
+                "avatar": request.avatar or "",
+                "platform": "instagram",
+                "type": "account",
+                "oauth_id": request.oauth_id,
+                "connected_at": __import__('datetime').datetime.now().isoformat()
+            }
 
-            data = response.json()
+            # Check if account already exists (by originId)
+            account_exists = any(
+                page.get('originId') == request.origin_id
+                for page in current_connected_pages
+            )
 
-            # Save connected Instagram account to ghl_subaccounts table
-            try:
-                # Get current connected_pages
-                ghl_result = supabase.table('ghl_subaccounts').select(
-                    'connected_pages'
-                ).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
-
-                current_connected_pages = []
-                if ghl_result.data and ghl_result.data[0].get('connected_pages'):
-                    current_connected_pages = ghl_result.data[0]['connected_pages']
-
-                # Create Instagram account data object
-                new_account = {
-                    "originId": request.origin_id,
-                    "name": request.name,
-                    "avatar": request.avatar or "",
-                    "platform": "instagram",
-                    "type": "account",
-                    "oauth_id": request.oauth_id,
-                    "connected_at": __import__('datetime').datetime.now().isoformat()
-                }
-
-                # Check if account already exists (by originId)
-                account_exists = any(
-                    page.get('originId') == request.origin_id
-                    for page in current_connected_pages
-                )
-
-                if not account_exists:
-                    current_connected_pages.append(new_account)
-
-                # Update database
-                supabase.table('ghl_subaccounts').update({
-                    'connected_pages': current_connected_pages,
-                    'updated_at': __import__('datetime').datetime.now().isoformat()
-                }).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
-
-                logger.info(f"[SOCIAL IG] Saved connected Instagram account {request.name} to database")
-            except Exception as db_error:
-                logger.warning(f"[SOCIAL IG] Could not save connected Instagram account to database: {db_error}")
-                # Don't fail the request if database save fails
-
-            return {
-                "success": True,
-                "data": data,
-                "message": f"Successfully connected {request.name}"
-            }
+            if not account_exists:
+                current_connected_pages.append(new_account)
+
+            # Update database
+            supabase.table('ghl_subaccounts').update({
+                'connected_pages': current_connected_pages,
+                'updated_at': __import__('datetime').datetime.now().isoformat()
+            }).eq('firm_user_id', request.firm_user_id).eq('agent_id', request.agent_id).execute()
+
+            logger.info(f"[SOCIAL IG] Saved connected Instagram account {request.name} to database")
+        except Exception as db_error:
+            logger.warning(f"[SOCIAL IG] Could not save connected Instagram account to database: {db_error}")
+            # Don't fail the request if database save fails
+
+        return {
+            "success": True,
+            "data": data,
+            "message": f"Successfully connected {request.name}"
+        }
 
     except HTTPException:
         raise
@@ -9,9 +9,10 @@ import secrets
 from typing import Optional, List
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import httpx
 from supabase import create_client, Client
 
+from http_clients import get_http_client
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/social/slack", tags=["social_slack"])
@@ -195,53 +196,53 @@ async def get_connected_slack_workspaces(request: StartOAuthRequest):
 
         # Call GHL API to get Slack integrations
         # Endpoint: https://api.leadconnectorhq.com/slack/{locationId}/integrations
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.leadconnectorhq.com/slack/{location_id}/integrations",
-                headers={
-                    "Accept": "application/json, text/plain, */*",
-                    "Authorization": f"Bearer {access_token}" if access_token else "",
-                    "token-id": firebase_token,
-                    "channel": "APP"
-                },
-                timeout=30.0
-            )
-
-            # Handle 404 - no integrations yet
-            if response.status_code == 404:
-                logger.info(f"[SLACK] No Slack integrations found for location: {location_id}")
-                return {
-                    "success": True,
-                    "integrations": [],
-                    "total_count": 0
-                }
+        client = get_http_client('ghl')
+        response = await client.get(
+            f"https://api.leadconnectorhq.com/slack/{location_id}/integrations",
+            headers={
+                "Accept": "application/json, text/plain, */*",
+                "Authorization": f"Bearer {access_token}" if access_token else "",
+                "token-id": firebase_token,
+                "channel": "APP"
+            },
+            timeout=30.0
+        )
+
+        # Handle 404 - no integrations yet
+        if response.status_code == 404:
+            logger.info(f"[SLACK] No Slack integrations found for location: {location_id}")
+            return {
+                "success": True,
+                "integrations": [],
+                "total_count": 0
+            }
 
-            if not response.is_success:
-                logger.error(f"[SLACK] GHL API returned {response.status_code}: {response.text}")
+        if not response.is_success:
+            logger.error(f"[SLACK] GHL API returned {response.status_code}: {response.text}")
 
-                if response.status_code == 401:
-                    raise HTTPException(
-                        status_code=401,
-                        detail="GHL authentication failed. Your access tokens may be expired."
-                    )
-                else:
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"GHL API error: {response.text}"
-                    )
+            if response.status_code == 401:
+                raise HTTPException(
+                    status_code=401,
+                    detail="GHL authentication failed. Your access tokens may be expired."
+                )
+            else:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"GHL API error: {response.text}"
+                )
 
-            data = response.json()
+        data = response.json()
 
-            # Extract integrations array
-            integrations = data.get('integrations', [])
+        # Extract integrations array
+        integrations = data.get('integrations', [])
 
-            logger.info(f"[SLACK] Found {len(integrations)} Slack workspace(s)")
+        logger.info(f"[SLACK] Found {len(integrations)} Slack workspace(s)")
 
-            return {
-                "success": True,
-                "integrations": integrations,
-                "total_count": len(integrations)
-            }
+        return {
+            "success": True,
+            "integrations": integrations,
+            "total_count": len(integrations)
+        }
 
     except HTTPException:
         raise
@@ -294,31 +295,31 @@ async def disconnect_slack_workspace(request: dict):
         logger.info(f"[SLACK] Disconnecting workspace {integration_id} for location: {location_id}")
 
         # Call GHL API to delete integration
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"https://api.leadconnectorhq.com/slack/{location_id}/oauth-delete/{integration_id}",
-                headers={
-                    "Accept": "application/json",
-                    "Authorization": f"Bearer {access_token}" if access_token else "",
-                    "token-id": firebase_token,
-                    "channel": "APP"
-                },
-                timeout=30.0
+        client = get_http_client('ghl')
+        response = await client.delete(
+            f"https://api.leadconnectorhq.com/slack/{location_id}/oauth-delete/{integration_id}",
+            headers={
+                "Accept": "application/json",
+                "Authorization": f"Bearer {access_token}" if access_token else "",
+                "token-id": firebase_token,
+                "channel": "APP"
+            },
+            timeout=30.0
+        )
+
+        if not response.is_success:
+            logger.error(f"[SLACK] Delete failed {response.status_code}: {response.text}")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Failed to disconnect workspace: {response.text}"
             )
 
-            if not response.is_success:
-                logger.error(f"[SLACK] Delete failed {response.status_code}: {response.text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Failed to disconnect workspace: {response.text}"
-                )
-
-            logger.info(f"[SLACK] Successfully disconnected workspace {integration_id}")
+        logger.info(f"[SLACK] Successfully disconnected workspace {integration_id}")
 
-            return {
-                "success": True,
-                "message": "Workspace disconnected successfully"
-            }
+        return {
+            "success": True,
+            "message": "Workspace disconnected successfully"
+        }
 
     except HTTPException:
         raise
@@ -0,0 +1,294 @@
+# Website/crawler.py - Async website crawler
+"""
+Breadth-first crawl of one website for /api/scrape and website analysis.
+
+Pages are fetched as soon as they are discovered (no waiting for a batch to
+finish), with at most CRAWLER_CONCURRENCY requests in flight and
+CRAWLER_PER_HOST per host, spaced at least CRAWLER_HOST_DELAY_MS apart.
+URLs are canonicalized before dedupe, pages go through the shared page
+cache (page_cache.py), only HTML responses are parsed (off the event loop),
+and the crawl stops at max_pages or when its time budget runs out,
+returning whatever was fetched by then.
+
+    results = await WebCrawler(max_depth=1, max_pages=10).crawl("https://example.com")
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+from http_clients import get_http_client
+from page_cache import PageCache, canonicalize_url, get_page_cache
+
+logger = logging.getLogger(__name__)
+
+CRAWLER_CONCURRENCY = int(os.getenv('CRAWLER_CONCURRENCY', '5'))
+CRAWLER_PER_HOST = int(os.getenv('CRAWLER_PER_HOST', '3'))
+CRAWLER_HOST_DELAY_MS = float(os.getenv('CRAWLER_HOST_DELAY_MS', '100'))
+CRAWLER_TIME_BUDGET_SECONDS = float(os.getenv('CRAWLER_TIME_BUDGET_SECONDS', '20'))
+# Larger pages are truncated (the text of a page rarely needs more)
+CRAWLER_MAX_PAGE_BYTES = int(os.getenv('CRAWLER_MAX_PAGE_BYTES', str(2 * 1024 * 1024)))
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+# Links to these are never fetched
+SKIP_EXTENSIONS = (
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.bmp', '.tif', '.tiff',
+    '.mp3', '.mp4', '.m4a', '.mov', '.avi', '.webm', '.wav', '.ogg',
+    '.zip', '.gz', '.tar', '.rar', '.7z', '.dmg', '.exe', '.apk',
+    '.css', '.js', '.json', '.xml', '.rss', '.txt', '.csv',
+    '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
+    '.woff', '.woff2', '.ttf', '.eot',
+)
+
+
+def site_of(url: str) -> str:
+    """Host without a leading www., so example.com and www.example.com are one site"""
+    host = urlsplit(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+def extract_text_content(soup: BeautifulSoup) -> str:
+    """Extract meaningful text content from HTML"""
+    # Remove non-content elements
+    for script in soup(["script", "style", "nav", "footer", "header"]):
+        script.decompose()
+
+    text_parts = []
+
+    # Get title
+    title = soup.find('title')
+    if title:
+        text_parts.append(f"TITLE: {title.get_text().strip()}")
+
+    # Get main content
+    main_content = soup.find('main') or soup.find('article') or soup.find('body')
+    if main_content:
+        # Extract headings
+        headings = main_content.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+        for heading in headings:
+            text_parts.append(f"\n{heading.name.upper()}: {heading.get_text().strip()}")
+
+        # Extract paragraphs
+        paragraphs = main_content.find_all('p')
+        for p in paragraphs:
+            text = p.get_text().strip()
+            if text:
+                text_parts.append(text)
+
+        # Extract lists
+        lists = main_content.find_all(['ul', 'ol'])
+        for lst in lists:
+            items = lst.find_all('li')
+            for item in items:
+                text = item.get_text().strip()
+                if text:
+                    text_parts.append(f"• {text}")
+
+    return '\n'.join(text_parts)
+
+
+class _HostLimit:
+    """Concurrency and request spacing for one host"""
+
+    def __init__(self, max_concurrent: int):
+        self.semaphore = asyncio.Semaphore(max(1, max_concurrent))
+        self.lock = asyncio.Lock()
+        self.next_request_at = 0.0
+
+
+class WebCrawler:
+    """
+    Breadth-first crawler for a single site (links to other sites are not
+    followed). One instance per crawl.
+
+    crawl() returns {url: {'depth', 'content', 'status'[, 'error']}} keyed
+    by canonical URL, the shape format_scrape_as_text expects.
+    """
+
+    def __init__(
+        self,
+        max_depth: int = 1,
+        max_pages: int = 10,
+        concurrency: int = CRAWLER_CONCURRENCY,
+        per_host: int = CRAWLER_PER_HOST,
+        host_delay_ms: float = CRAWLER_HOST_DELAY_MS,
+        time_budget: float = CRAWLER_TIME_BUDGET_SECONDS,
+        max_page_bytes: int = CRAWLER_MAX_PAGE_BYTES,
+        client: httpx.AsyncClient = None,
+        cache: PageCache = None
+    ):
+        self.max_depth = max_depth
+        self.max_pages = max(1, max_pages)
+        self.concurrency = max(1, concurrency)
+        self.per_host = per_host
+        self.host_delay = host_delay_ms / 1000
+        self.time_budget = time_budget
+        self.max_page_bytes = max_page_bytes
+        self.client = client or get_http_client('crawler')
+        self.cache = cache or get_page_cache()
+        self._seen: Set[str] = set()
+        self._scheduled = 0
+        self._sites: Set[str] = set()
+        self._hosts: Dict[str, _HostLimit] = {}
+        self.stats = {"fetched": 0, "cached": 0, "errors": 0, "skipped_non_html": 0, "duplicates": 0, "budget_exhausted": False}
+
+    # ------------------------------------------------------------------
+    # Frontier
+    # ------------------------------------------------------------------
+
+    def _follow(self, url: str) -> bool:
+        """Whether a discovered link should be fetched"""
+        if site_of(url) not in self._sites:
+            return False
+        if urlsplit(url).path.lower().endswith(SKIP_EXTENSIONS):
+            return False
+        if url in self._seen:
+            self.stats["duplicates"] += 1
+            return False
+        return self._scheduled < self.max_pages
+
+    async def _worker(self, queue: asyncio.Queue, results: Dict[str, Dict[str, Any]]):
+        while True:
+            url, depth = await queue.get()
+            try:
+                page = await self._fetch(url, depth)
+                if page is None:
+                    continue
+                results[url] = {
+                    'depth': depth,
+                    'content': page['content'],
+                    'status': page['status']
+                }
+                if page.get('error'):
+                    results[url]['error'] = page['error']
+
+                # Breadth-first: links join the back of the queue and start as soon as a worker is free
+                for link in page.get('links', ()):
+                    if self._follow(link):
+                        self._seen.add(link)
+                        self._scheduled += 1
+                        queue.put_nowait((link, depth + 1))
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Error crawling {url}: {e}")
+                results[url] = {'depth': depth, 'content': '', 'status': 'error', 'error': str(e)}
+            finally:
+                queue.task_done()
+
+    # ------------------------------------------------------------------
+    # Fetching
+    # ------------------------------------------------------------------
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str):
+        host = urlsplit(url).netloc
+        limit = self._hosts.get(host)
+        if limit is None:
+            limit = self._hosts[host] = _HostLimit(self.per_host)
+        async with limit.semaphore:
+            if self.host_delay > 0:
+                async with limit.lock:
+                    wait = limit.next_request_at - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    limit.next_request_at = time.monotonic() + self.host_delay
+            yield
+
+    def _parse(self, body: bytes, page_url: str, want_links: bool) -> Tuple[str, Set[str]]:
+        """Text and canonical same-site links of a page (runs in a thread)"""
+        soup = BeautifulSoup(body, 'html.parser')
+        links = set()
+        if want_links:
+            for link in soup.find_all('a', href=True):
+                url = canonicalize_url(link['href'], page_url)
+                if url:
+                    links.add(url)
+        return extract_text_content(soup), links
+
+    async def _fetch(self, url: str, depth: int) -> Optional[Dict[str, Any]]:
+        """Fetch (through the page cache) and parse one page. None if it isn't HTML."""
+        start_time = time.time()
+        # Fresh cache hits don't touch the site, so they skip the politeness limits
+        page = await self.cache.get_fresh(url)
+        if page is None:
+            async with self._host_slot(url):
+                try:
+                    page = await self.cache.fetch(
+                        url,
+                        client=self.client,
+                        max_bytes=self.max_page_bytes,
+                        content_types=HTML_CONTENT_TYPES
+                    )
+                except httpx.HTTPError as e:
+                    self.stats["errors"] += 1
+                    logger.warning(f"Error fetching {url} (depth {depth}): {e}")
+                    return {'content': '', 'status': 'error', 'error': str(e)}
+        fetch_time = time.time() - start_time
+
+        if page.status_code >= 400:
+            self.stats["errors"] += 1
+            logger.warning(f"HTTP {page.status_code} for {url} (depth {depth})")
+            return {'content': '', 'status': page.status_code, 'error': f"HTTP {page.status_code}"}
+        if page.cache_status == 'skipped':
+            self.stats["skipped_non_html"] += 1
+            logger.info(f"Skipping {url}: {page.content_type}")
+            return None
+
+        # A redirect (http -> https, example.com -> www.example.com) makes the target part of the site
+        final_url = canonicalize_url(page.url) or url
+        if depth == 0:
+            self._sites.add(site_of(final_url))
+        self._seen.add(final_url)
+
+        parse_start = time.time()
+        text_content, links = await asyncio.to_thread(self._parse, page.content, final_url, depth < self.max_depth)
+        parse_time = time.time() - parse_start
+
+        self.stats["fetched"] += 1
+        if page.cache_status in ('fresh', 'revalidated'):
+            self.stats["cached"] += 1
+        logger.info(f"Fetched {url} | Depth: {depth} | Cache: {page.cache_status} | Fetch: {fetch_time:.2f}s | Parse: {parse_time:.2f}s | Links: {len(links)}")
+        return {'content': text_content, 'status': page.status_code, 'links': links}
+
+    # ------------------------------------------------------------------
+    # Crawl
+    # ------------------------------------------------------------------
+
+    async def crawl(self, start_url: str) -> Dict[str, Dict[str, Any]]:
+        """Crawl from start_url up to max_depth / max_pages / the time budget"""
+        start = canonicalize_url(start_url)
+        if not start:
+            raise ValueError(f"Invalid URL: {start_url}")
+
+        scrape_start = time.time()
+        logger.info(f"Starting scrape of {start} | Max depth: {self.max_depth} | Max pages: {self.max_pages}")
+
+        self._sites.add(site_of(start))
+        self._seen.add(start)
+        self._scheduled = 1
+        results: Dict[str, Dict[str, Any]] = {}
+        queue: asyncio.Queue = asyncio.Queue()
+        queue.put_nowait((start, 0))
+
+        workers = [asyncio.create_task(self._worker(queue, results)) for _ in range(min(self.concurrency, self.max_pages))]
+        try:
+            await asyncio.wait_for(queue.join(), self.time_budget)
+        except asyncio.TimeoutError:
+            self.stats["budget_exhausted"] = True
+            logger.warning(f"Scrape of {start} stopped after {self.time_budget:.0f}s with {len(results)} pages")
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        total_time = time.time() - scrape_start
+        logger.info(f"Scrape complete | Pages: {len(results)} | Total time: {total_time:.2f}s | Avg per page: {total_time/max(len(results), 1):.2f}s")
+        return results
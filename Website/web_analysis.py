@@ -1,22 +1,26 @@
 # Website/web_analysis.py - Web scraping and analysis module
 
 import os
-import time
+import asyncio
 import logging
 import httpx
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urljoin
 from typing import Dict, Any, Optional, List, Set
 import re
 from collections import Counter
 
+from Website.crawler import WebCrawler
+from page_cache import canonicalize_url, get_page_cache
+
 logger = logging.getLogger(__name__)
 
 
-def extract_colors_from_website(url: str) -> List[str]:
+async def extract_colors_from_website(url: str) -> List[str]:
     """
     Extract hex color codes from a website by parsing CSS and inline styles.
+    The page and its stylesheets come through the page cache, so repeated
+    extractions only revalidate them.
     
     Args:
         url: The website URL to extract colors from
@@ -32,40 +36,32 @@ def extract_colors_from_website(url: str) -> List[str]:
         logger.info(f"Extracting colors from: {url}")
         
         # Fetch the page
-        with httpx.Client(
-            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'},
-            timeout=15.0,
-            follow_redirects=True
-        ) as client:
-            response = client.get(url)
-            
-            if response.status_code >= 400:
-                logger.warning(f"HTTP {response.status_code} when fetching {url} for color extraction")
-                return []
-                
-            html_content = response.text
-            
-            # Also try to fetch main CSS files
-            soup = BeautifulSoup(html_content, 'html.parser')
-            css_content = ""
-            
-            # Get inline styles from style tags
-            for style_tag in soup.find_all('style'):
-                if style_tag.string:
-                    css_content += style_tag.string + "\n"
+        cache = get_page_cache()
+        page = await cache.fetch(url, timeout=15.0)
+        
+        if page.status_code >= 400:
+            logger.warning(f"HTTP {page.status_code} when fetching {url} for color extraction")
+            return []
             
-            # Get external CSS files (limit to first 3 to avoid slowdown)
-            css_links = soup.find_all('link', rel='stylesheet')[:3]
-            for link in css_links:
-                href = link.get('href')
-                if href:
-                    css_url = urljoin(url, href)
-                    try:
-                        css_response = client.get(css_url)
-                        if css_response.status_code == 200:
-                            css_content += css_response.text + "\n"
-                    except Exception as css_err:
-                        logger.debug(f"Could not fetch CSS {css_url}: {css_err}")
+        html_content = page.text
+        
+        # Also try to fetch main CSS files
+        soup = BeautifulSoup(html_content, 'html.parser')
+        css_content = ""
+        
+        # Get inline styles from style tags
+        for style_tag in soup.find_all('style'):
+            if style_tag.string:
+                css_content += style_tag.string + "\n"
+        
+        # Get external CSS files (limit to first 3 to avoid slowdown)
+        css_urls = [urljoin(page.url, link.get('href')) for link in soup.find_all('link', rel='stylesheet')[:3] if link.get('href')]
+        css_pages = await asyncio.gather(*(cache.fetch(css_url, timeout=15.0) for css_url in css_urls), return_exceptions=True)
+        for css_url, css_page in zip(css_urls, css_pages):
+            if isinstance(css_page, Exception):
+                logger.debug(f"Could not fetch CSS {css_url}: {css_page}")
+            elif css_page.status_code == 200:
+                css_content += css_page.text + "\n"
         
         # Combine HTML and CSS for color extraction
         all_content = html_content + "\n" + css_content
@@ -224,202 +220,6 @@ Format your response with clear headings and paragraphs."""
         }
 
 
-class WebScraper:
-    """Web scraper for extracting content from websites"""
-
-    def __init__(self, max_depth: int = 1, delay: float = 0, max_pages: int = 10):
-        self.max_depth = max_depth
-        self.delay = delay
-        self.max_pages = max_pages
-        self.visited = set()
-        self.session = httpx.Client(
-            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'},
-            timeout=10.0
-        )
-
-    def is_valid_url(self, url: str, base_domain: str) -> bool:
-        """Check if URL is valid and belongs to the same domain"""
-        try:
-            parsed = urlparse(url)
-            base_parsed = urlparse(base_domain)
-            return (parsed.netloc == base_parsed.netloc and
-                    parsed.scheme in ['http', 'https'])
-        except:
-            return False
-
-    def extract_text_content(self, soup: BeautifulSoup) -> str:
-        """Extract meaningful text content from HTML"""
-        # Remove non-content elements
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.decompose()
-
-        text_parts = []
-
-        # Get title
-        title = soup.find('title')
-        if title:
-            text_parts.append(f"TITLE: {title.get_text().strip()}")
-
-        # Get main content
-        main_content = soup.find('main') or soup.find('article') or soup.find('body')
-        if main_content:
-            # Extract headings
-            headings = main_content.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-            for heading in headings:
-                text_parts.append(f"\n{heading.name.upper()}: {heading.get_text().strip()}")
-
-            # Extract paragraphs
-            paragraphs = main_content.find_all('p')
-            for p in paragraphs:
-                text = p.get_text().strip()
-                if text:
-                    text_parts.append(text)
-
-            # Extract lists
-            lists = main_content.find_all(['ul', 'ol'])
-            for lst in lists:
-                items = lst.find_all('li')
-                for item in items:
-                    text = item.get_text().strip()
-                    if text:
-                        text_parts.append(f"• {text}")
-
-        return '\n'.join(text_parts)
-
-    def get_links(self, soup: BeautifulSoup, base_url: str) -> set:
-        """Extract all valid links from the page"""
-        links = set()
-        for link in soup.find_all('a', href=True):
-            url = urljoin(base_url, link['href'])
-            url = url.split('#')[0]  # Remove fragment
-            if self.is_valid_url(url, base_url):
-                links.add(url)
-        return links
-
-    def fetch_page(self, url: str, depth: int) -> Dict[str, Any]:
-        """Fetch and parse a single page"""
-        start_time = time.time()
-        try:
-            if self.delay > 0:
-                time.sleep(self.delay)
-
-            fetch_start = time.time()
-            response = self.session.get(url)
-
-            # Check for 403 or other client/server errors - trigger fallback
-            if response.status_code >= 400:
-                logger.warning(f"HTTP {response.status_code} for {url} - using OpenRouter Web Search fallback")
-                return openrouter_web_search_fallback(url)
-
-            response.raise_for_status()
-            fetch_time = time.time() - fetch_start
-
-            parse_start = time.time()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            text_content = self.extract_text_content(soup)
-            links = self.get_links(soup, url) if depth < self.max_depth else set()
-            parse_time = time.time() - parse_start
-
-            total_time = time.time() - start_time
-            logger.info(f"Fetched {url} | Depth: {depth} | Fetch: {fetch_time:.2f}s | Parse: {parse_time:.2f}s | Total: {total_time:.2f}s | Links: {len(links)}")
-
-            return {
-                'url': url,
-                'depth': depth,
-                'content': text_content,
-                'status': response.status_code,
-                'links': links
-            }
-        except httpx.HTTPStatusError as e:
-            # HTTP error - only use fallback for main page (depth 0), skip subpages
-            if depth == 0:
-                logger.warning(f"HTTP error fetching {url}: {str(e)} - using OpenRouter Web Search fallback")
-                return openrouter_web_search_fallback(url)
-            else:
-                logger.warning(f"HTTP error fetching {url} (depth {depth}): {str(e)} - skipping subpage")
-                return {
-                    'url': url,
-                    'depth': depth,
-                    'content': '',
-                    'status': 'error',
-                    'error': str(e),
-                    'links': set()
-                }
-        except Exception as e:
-            # Other errors (network, timeout, etc.) - only use fallback for main page
-            if depth == 0:
-                logger.warning(f"Error fetching {url}: {str(e)} - trying OpenRouter Web Search fallback")
-                fallback_result = openrouter_web_search_fallback(url)
-                # If fallback also fails, return original error
-                if fallback_result['status'] == 'error':
-                    logger.error(f"Both scraping and fallback failed for {url}")
-                    return {
-                        'url': url,
-                        'depth': depth,
-                        'content': '',
-                        'status': 'error',
-                        'error': str(e),
-                        'links': set()
-                    }
-                return fallback_result
-            else:
-                logger.warning(f"Error fetching {url} (depth {depth}): {str(e)} - skipping subpage")
-                return {
-                    'url': url,
-                    'depth': depth,
-                    'content': '',
-                    'status': 'error',
-                    'error': str(e),
-                    'links': set()
-                }
-
-
-    def scrape(self, start_url: str) -> Dict[str, Any]:
-        """Scrape website with concurrent requests up to max_depth"""
-        scrape_start = time.time()
-        logger.info(f"Starting scrape of {start_url} | Max depth: {self.max_depth} | Max pages: {self.max_pages}")
-
-        results = {}
-        to_scrape = [(start_url, 0)]
-        self.visited.add(start_url)
-
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            while to_scrape and len(results) < self.max_pages:
-                current_batch = to_scrape[:min(5, self.max_pages - len(results))]
-                to_scrape = to_scrape[len(current_batch):]
-
-                futures = {executor.submit(self.fetch_page, url, depth): (url, depth)
-                          for url, depth in current_batch}
-
-                for future in as_completed(futures):
-                    result = future.result()
-                    url = result['url']
-                    depth = result['depth']
-
-                    results[url] = {
-                        'depth': depth,
-                        'content': result['content'],
-                        'status': result['status']
-                    }
-                    if result.get('error'):
-                        results[url]['error'] = result['error']
-
-                    # Add new links to scrape
-                    if depth < self.max_depth and len(results) < self.max_pages:
-                        for link in result.get('links', []):
-                            if link not in self.visited and len(self.visited) < self.max_pages:
-                                self.visited.add(link)
-                                to_scrape.append((link, depth + 1))
-
-        total_time = time.time() - scrape_start
-        logger.info(f"Scrape complete | Pages: {len(results)} | Total time: {total_time:.2f}s | Avg per page: {total_time/max(len(results), 1):.2f}s")
-        return results
-
-    def close(self):
-        """Close the HTTP session"""
-        self.session.close()
-
-
 def format_scrape_as_text(results: Dict[str, Any]) -> str:
     """Format scraping results as plain text for AI analysis"""
     output = []
@@ -451,9 +251,10 @@ def format_scrape_as_text(results: Dict[str, Any]) -> str:
     return '\n'.join(output)
 
 
-def analyze_website(url: str, max_depth: int = 1, max_pages: int = 10) -> Dict[str, Any]:
+async def analyze_website(url: str, max_depth: int = 1, max_pages: int = 10) -> Dict[str, Any]:
     """
-    Analyze a website by scraping its content.
+    Analyze a website by crawling its content (Website/crawler.py).
+    Falls back to OpenRouter Web Search if the first page can't be fetched.
 
     Args:
         url: The website URL to analyze
@@ -470,9 +271,20 @@ def analyze_website(url: str, max_depth: int = 1, max_pages: int = 10) -> Dict[s
 
         logger.info(f"Starting website analysis for: {url}")
 
-        scraper = WebScraper(max_depth=max_depth, max_pages=max_pages)
-        results = scraper.scrape(url)
-        scraper.close()
+        results = await WebCrawler(max_depth=max_depth, max_pages=max_pages).crawl(url)
+
+        # Main page blocked (403 etc.) or unreachable - use web search instead
+        start_url = canonicalize_url(url)
+        main_page = results.get(start_url)
+        if main_page is None or main_page.get('error'):
+            logger.warning(f"Could not fetch {url} ({main_page.get('error') if main_page else 'no response'}) - using OpenRouter Web Search fallback")
+            fallback_result = await asyncio.to_thread(openrouter_web_search_fallback, url)
+            if fallback_result['status'] != 'error':
+                results[start_url] = {
+                    'depth': 0,
+                    'content': fallback_result['content'],
+                    'status': fallback_result['status']
+                }
 
         # Format results as text
         response_text = format_scrape_as_text(results)
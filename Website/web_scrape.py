@@ -4,7 +4,6 @@ import asyncio
 import aiohttp
 from supabase import create_client, Client
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright
 import time
 import traceback
 import tempfile
@@ -15,6 +14,10 @@ from concurrent.futures import ThreadPoolExecutor
 import threading
 from datetime import datetime
 
+from browser_pool import BrowserPool, get_browser_pool
+from supabase_async import get_async_supabase
+from Website.web_analysis import extract_hex_colors
+
 load_dotenv()
 
 # Initialize Supabase client
@@ -28,12 +31,36 @@ executor = ThreadPoolExecutor(max_workers=3)
 # Create a lock for browser instances to prevent concurrent usage
 browser_lock = threading.Lock()
 
-async def capture_website_screenshot(url: str, session_id: str = None) -> dict:
+# Favicon URL as the browser tab would show it
+FIND_FAVICON_JS = """
+    () => {
+        // Try to find favicon from various sources
+        let favicon = null;
+        
+        // Look for link rel="icon"
+        let link = document.querySelector('link[rel="icon"]') || 
+                  document.querySelector('link[rel="shortcut icon"]') ||
+                  document.querySelector('link[rel="apple-touch-icon"]') ||
+                  document.querySelector('link[rel*="icon"]');
+        
+        if (link && link.href) {
+            favicon = link.href;
+        } else {
+            // Fallback to default favicon.ico
+            const url = new URL(window.location.href);
+            favicon = url.origin + '/favicon.ico';
+        }
+        
+        return favicon;
+    }
+"""
+
+async def capture_website_screenshot(url: str, session_id: str = None, *, pool: BrowserPool = None) -> dict:
     """
     Captures a screenshot of the entire website using Playwright.
-    Optimized for Heroku environment.
+    Runs on the shared browser pool (browser_pool.py) instead of launching
+    a browser per capture.
     """
-    browser = None
     tmp_path = None
     
     try:
@@ -45,49 +72,7 @@ async def capture_website_screenshot(url: str, session_id: str = None) -> dict:
         
         print(f"Attempting to capture screenshot for URL: {url}")
         
-        async with async_playwright() as p:
-            # Launch browser with optimized settings for Heroku
-            browser_args = [
-                "--no-sandbox",
-                "--disable-setuid-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-accelerated-2d-canvas",
-                "--no-first-run",
-                "--no-zygote",
-                "--single-process",
-                "--disable-gpu",
-                "--disable-background-timer-throttling",
-                "--disable-backgrounding-occluded-windows",
-                "--disable-renderer-backgrounding",
-                "--disable-features=TranslateUI",
-                "--disable-ipc-flooding-protection",
-                "--disable-background-networking",
-                "--disable-client-side-phishing-detection",
-                "--disable-default-apps",
-                "--disable-extensions",
-                "--disable-sync",
-                "--disable-translate",
-                "--hide-scrollbars",
-                "--metrics-recording-only",
-                "--mute-audio",
-                "--no-default-browser-check",
-                "--safebrowsing-disable-auto-update",
-                "--disable-features=VizDisplayCompositor"
-            ]
-            
-            # Launch browser - Playwright buildpack should handle everything
-            print("Launching Playwright browser...")
-            browser = await p.chromium.launch(
-                headless=True,
-                args=browser_args
-            )
-            
-            # Create page
-            page = await browser.new_page()
-            
-            # Set viewport size
-            await page.set_viewport_size({"width": 1920, "height": 1080})
-            
+        async with (pool or get_browser_pool()).page(viewport={"width": 1920, "height": 1080}) as page:
             print(f"Navigating to URL: {url}")
             try:
                 await page.goto(url, timeout=30000, wait_until="domcontentloaded")
@@ -104,45 +89,34 @@ async def capture_website_screenshot(url: str, session_id: str = None) -> dict:
                 quality=80,
                 full_page=True
             )
-            
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_file:
-                tmp_path = tmp_file.name
-                tmp_file.write(screenshot_bytes)
-            
-            file_content = screenshot_bytes
-            
-            storage_path = f"screenshots/{filename}"
-            
-            # Remove existing file if present
-            try:
-                supabase.storage.from_('static').remove([storage_path])
-            except:
-                pass
-            
-            response = supabase.storage.from_('static').upload(
-                storage_path,
-                file_content,
-                {
-                    "content-type": "image/jpeg",
-                    "upsert": "true"
-                }
-            )
-            
-            # Handle the response
-            if hasattr(response, 'error') and response.error:
-                if "already exists" in str(response.error):
-                    public_url = supabase.storage.from_('static').get_public_url(storage_path)
-                    return {
-                        "status": "success",
-                        "message": "Screenshot captured successfully",
-                        "path": storage_path,
-                        "public_url": public_url,
-                        "filename": filename
-                    }
-                else:
-                    raise Exception(f"Failed to upload: {response.error}")
-            else:
+        
+        # Save to temporary file
+        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_file:
+            tmp_path = tmp_file.name
+            tmp_file.write(screenshot_bytes)
+        
+        file_content = screenshot_bytes
+        
+        storage_path = f"screenshots/{filename}"
+        
+        # Remove existing file if present
+        try:
+            supabase.storage.from_('static').remove([storage_path])
+        except:
+            pass
+        
+        response = supabase.storage.from_('static').upload(
+            storage_path,
+            file_content,
+            {
+                "content-type": "image/jpeg",
+                "upsert": "true"
+            }
+        )
+        
+        # Handle the response
+        if hasattr(response, 'error') and response.error:
+            if "already exists" in str(response.error):
                 public_url = supabase.storage.from_('static').get_public_url(storage_path)
                 return {
                     "status": "success",
@@ -151,6 +125,17 @@ async def capture_website_screenshot(url: str, session_id: str = None) -> dict:
                     "public_url": public_url,
                     "filename": filename
                 }
+            else:
+                raise Exception(f"Failed to upload: {response.error}")
+        else:
+            public_url = supabase.storage.from_('static').get_public_url(storage_path)
+            return {
+                "status": "success",
+                "message": "Screenshot captured successfully",
+                "path": storage_path,
+                "public_url": public_url,
+                "filename": filename
+            }
         
     except Exception as e:
         error_traceback = traceback.format_exc()
@@ -166,24 +151,26 @@ async def capture_website_screenshot(url: str, session_id: str = None) -> dict:
     
     finally:
         # Cleanup
-        if browser:
-            try:
-                await browser.close()
-            except Exception as e:
-                print(f"Error closing browser: {e}")
-        
         if tmp_path and os.path.exists(tmp_path):
             try:
                 os.unlink(tmp_path)
             except Exception as e:
                 print(f"Error removing temp file: {e}")
 
+async def _run_with_own_pool(capture, url: str, session_id: str = None) -> dict:
+    """Run a capture on a one-off pool (the shared one belongs to the app's event loop)"""
+    pool = BrowserPool(max_pages=1, idle_seconds=0)
+    try:
+        return await capture(url, session_id, pool=pool)
+    finally:
+        await pool.close()
+
 def capture_website_screenshot_sync(url: str, session_id: str = None) -> dict:
     """Sync wrapper for capturing website screenshot"""
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
-        return loop.run_until_complete(capture_website_screenshot(url, session_id))
+        return loop.run_until_complete(_run_with_own_pool(capture_website_screenshot, url, session_id))
     finally:
         loop.close()
 
@@ -195,11 +182,11 @@ def get_website_favicon(url: str, session_id: str = None) -> dict:
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
-        return loop.run_until_complete(get_website_favicon_async(url, session_id))
+        return loop.run_until_complete(_run_with_own_pool(get_website_favicon_async, url, session_id))
     finally:
         loop.close()
 
-async def get_website_favicon_async(url: str, session_id: str = None) -> dict:
+async def get_website_favicon_async(url: str, session_id: str = None, *, pool: BrowserPool = None) -> dict:
     """
     Simple and reliable favicon capture using Playwright browser automation.
     Gets the favicon exactly as it appears in the browser tab.
@@ -213,27 +200,10 @@ async def get_website_favicon_async(url: str, session_id: str = None) -> dict:
         else:
             filename = f"logo_{int(time.time())}.jpg"
         
-        async with async_playwright() as p:
-            # Launch browser in headless mode
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-extensions',
-                    '--disable-gpu',
-                    '--no-first-run',
-                    '--no-default-browser-check',
-                    '--disable-default-apps'
-                ]
-            )
-            
-            # Create page with user agent
-            page = await browser.new_page(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            
+        # Page with user agent, on the shared browser
+        async with (pool or get_browser_pool()).page(
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        ) as page:
             try:
                 # Navigate to the website with a reasonable timeout
                 await page.goto(url, timeout=30000, wait_until='domcontentloaded')
@@ -242,111 +212,28 @@ async def get_website_favicon_async(url: str, session_id: str = None) -> dict:
                 await page.wait_for_timeout(2000)
                 
                 # Get the favicon URL using JavaScript
-                favicon_url = await page.evaluate("""
-                    () => {
-                        // Try to find favicon from various sources
-                        let favicon = null;
-                        
-                        // Look for link rel="icon"
-                        let link = document.querySelector('link[rel="icon"]') || 
-                                  document.querySelector('link[rel="shortcut icon"]') ||
-                                  document.querySelector('link[rel="apple-touch-icon"]') ||
-                                  document.querySelector('link[rel*="icon"]');
-                        
-                        if (link && link.href) {
-                            favicon = link.href;
-                        } else {
-                            // Fallback to default favicon.ico
-                            const url = new URL(window.location.href);
-                            favicon = url.origin + '/favicon.ico';
-                        }
-                        
-                        return favicon;
-                    }
-                """)
+                favicon_url = await page.evaluate(FIND_FAVICON_JS)
                 
                 print(f"Found favicon URL: {favicon_url}")
                 
-                if favicon_url:
-                    # Download the favicon using the same browser session
-                    response = await page.goto(favicon_url, timeout=10000)
-                    
-                    if response and response.status == 200:
-                        favicon_content = await response.body()
-                        
-                        # Convert to JPG using PIL
-                        img = Image.open(BytesIO(favicon_content))
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        
-                        # Save to temporary file
-                        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_file:
-                            tmp_path = tmp_file.name
-                            img.save(tmp_path, 'JPEG')
-                        
-                        # Upload to Supabase
-                        with open(tmp_path, 'rb') as f:
-                            file_content = f.read()
-                        
-                        storage_path = f"favicons/{filename}"
-                        
-                        # Remove existing file if present
-                        try:
-                            supabase.storage.from_('static').remove([storage_path])
-                        except:
-                            pass
-                        
-                        response = supabase.storage.from_('static').upload(
-                            storage_path,
-                            file_content,
-                            {
-                                "content-type": "image/jpeg",
-                                "upsert": "true"
-                            }
-                        )
-                        
-                        # Clean up
-                        os.unlink(tmp_path)
-                        
-                        # Handle the response properly
-                        if hasattr(response, 'error') and response.error:
-                            if "already exists" in str(response.error):
-                                public_url = supabase.storage.from_('static').get_public_url(storage_path)
-                                return {
-                                    "status": "success",
-                                    "message": "Favicon captured successfully from browser tab",
-                                    "path": storage_path,
-                                    "public_url": public_url,
-                                    "filename": filename
-                                }
-                            else:
-                                return {
-                                    "status": "error",
-                                    "message": f"Upload error: {response.error}",
-                                    "path": None
-                                }
-                        else:
-                            # Success case
-                            public_url = supabase.storage.from_('static').get_public_url(storage_path)
-                            return {
-                                "status": "success",
-                                "message": "Favicon captured successfully from browser tab",
-                                "path": storage_path,
-                                "public_url": public_url,
-                                "filename": filename
-                            }
-                    else:
-                        return {
-                            "status": "error",
-                            "message": f"Failed to download favicon: HTTP {response.status if response else 'No response'}",
-                            "path": None
-                        }
-                else:
+                if not favicon_url:
                     return {
                         "status": "error",
                         "message": "No favicon found on the website",
                         "path": None
                     }
+                
+                # Download the favicon using the same browser session
+                response = await page.goto(favicon_url, timeout=10000)
+                
+                if not (response and response.status == 200):
+                    return {
+                        "status": "error",
+                        "message": f"Failed to download favicon: HTTP {response.status if response else 'No response'}",
+                        "path": None
+                    }
+                
+                favicon_content = await response.body()
                     
             except Exception as e:
                 print(f"Error loading page: {e}")
@@ -355,8 +242,68 @@ async def get_website_favicon_async(url: str, session_id: str = None) -> dict:
                     "message": f"Failed to load website: {str(e)}",
                     "path": None
                 }
-            finally:
-                await browser.close()
+        
+        # Convert to JPG using PIL
+        img = Image.open(BytesIO(favicon_content))
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        
+        # Save to temporary file
+        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_file:
+            tmp_path = tmp_file.name
+            img.save(tmp_path, 'JPEG')
+        
+        # Upload to Supabase
+        with open(tmp_path, 'rb') as f:
+            file_content = f.read()
+        
+        storage_path = f"favicons/{filename}"
+        
+        # Remove existing file if present
+        try:
+            supabase.storage.from_('static').remove([storage_path])
+        except:
+            pass
+        
+        response = supabase.storage.from_('static').upload(
+            storage_path,
+            file_content,
+            {
+                "content-type": "image/jpeg",
+                "upsert": "true"
+            }
+        )
+        
+        # Clean up
+        os.unlink(tmp_path)
+        
+        # Handle the response properly
+        if hasattr(response, 'error') and response.error:
+            if "already exists" in str(response.error):
+                public_url = supabase.storage.from_('static').get_public_url(storage_path)
+                return {
+                    "status": "success",
+                    "message": "Favicon captured successfully from browser tab",
+                    "path": storage_path,
+                    "public_url": public_url,
+                    "filename": filename
+                }
+            else:
+                return {
+                    "status": "error",
+                    "message": f"Upload error: {response.error}",
+                    "path": None
+                }
+        else:
+            # Success case
+            public_url = supabase.storage.from_('static').get_public_url(storage_path)
+            return {
+                "status": "success",
+                "message": "Favicon captured successfully from browser tab",
+                "path": storage_path,
+                "public_url": public_url,
+                "filename": filename
+            }
                 
     except Exception as e:
         print(f"Error in favicon capture: {str(e)}")
@@ -366,6 +313,195 @@ async def get_website_favicon_async(url: str, session_id: str = None) -> dict:
             "path": None
         }
 
+# Colors the page actually renders with: stylesheet rules the page can read
+# (cross-origin sheets are skipped) plus the computed colors of the elements
+# that usually carry the brand
+BRAND_COLORS_JS = """
+    () => {
+        const css = [];
+        for (const sheet of Array.from(document.styleSheets)) {
+            try {
+                for (const rule of Array.from(sheet.cssRules)) css.push(rule.cssText);
+            } catch (e) {
+                // Cross-origin stylesheet
+            }
+        }
+        const computed = [];
+        const elements = document.querySelectorAll(
+            'body, header, nav, main, footer, h1, h2, h3, a, button, [class*="btn"], [class*="button"]'
+        );
+        for (const el of Array.from(elements).slice(0, 300)) {
+            const style = window.getComputedStyle(el);
+            computed.push(style.color, style.backgroundColor);
+        }
+        return css.join('\\n') + '\\n' + computed.join('\\n');
+    }
+"""
+
+
+def extract_page_text(html: str) -> str:
+    """Readable text of a page: scripts, styles and page chrome removed, one line per block"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(['script', 'style', 'nav', 'footer', 'header', 'aside']):
+        element.decompose()
+    text_content = soup.get_text(separator='\n', strip=True)
+    return '\n'.join(line.strip() for line in text_content.split('\n') if line.strip())
+
+
+async def capture_website(
+    url: str,
+    *,
+    screenshot: bool = True,
+    favicon: bool = True,
+    brand_colors: bool = True,
+    timeout_ms: int = 30000,
+    dom_text: asyncio.Future = None,
+    pool: BrowserPool = None
+) -> dict:
+    """
+    Loads the website once and captures everything the analysis needs from
+    that single page load: DOM text, brand colors, favicon and a full-page
+    screenshot (JPEG bytes, not uploaded - see upload_capture_assets).
+
+    If dom_text is given it is resolved with (http_status, text) as soon as
+    the DOM has been read, before the screenshot, so callers can start
+    analysing the content while the capture finishes (text is empty if the
+    page could not be read).
+    """
+    result = {
+        "status": "error",
+        "url": url,
+        "http_status": None,
+        "text": None,
+        "brand_colors": [],
+        "favicon_url": None,
+        "favicon": None,
+        "screenshot": None,
+        "errors": {}
+    }
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    
+    try:
+        async with (pool or get_browser_pool()).page(
+            viewport={"width": 1920, "height": 1080},
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        ) as page:
+            print(f"Navigating to URL: {url}")
+            try:
+                response = await page.goto(url, timeout=timeout_ms, wait_until="domcontentloaded")
+                result["http_status"] = response.status if response else None
+            except Exception as e:
+                # Partially loaded pages still give a usable screenshot
+                print(f"Page load timeout/error, continuing anyway: {e}")
+                result["errors"]["navigation"] = str(e)
+            
+            # Wait for page to stabilize
+            await page.wait_for_timeout(2000)
+            result["url"] = page.url
+            
+            html = await page.content()
+            # BeautifulSoup over a full rendered page: parse off the event loop
+            result["text"] = await asyncio.to_thread(extract_page_text, html)
+            if dom_text is not None and not dom_text.done():
+                dom_text.set_result((result["http_status"], result["text"]))
+            
+            if brand_colors:
+                try:
+                    rendered_css = await page.evaluate(BRAND_COLORS_JS)
+                    result["brand_colors"] = await asyncio.to_thread(extract_hex_colors, html + "\n" + rendered_css)
+                except Exception as e:
+                    result["errors"]["brand_colors"] = str(e)
+            
+            if favicon:
+                try:
+                    result["favicon_url"] = await page.evaluate(FIND_FAVICON_JS)
+                    print(f"Found favicon URL: {result['favicon_url']}")
+                    if result["favicon_url"]:
+                        # Same context (cookies), no second navigation
+                        favicon_response = await page.context.request.get(result["favicon_url"], timeout=10000)
+                        if favicon_response.ok:
+                            result["favicon"] = await favicon_response.body()
+                        else:
+                            result["errors"]["favicon"] = f"Failed to download favicon: HTTP {favicon_response.status}"
+                except Exception as e:
+                    result["errors"]["favicon"] = str(e)
+            
+            if screenshot:
+                # Late content (fonts, hero images) gets another second before the screenshot
+                await page.wait_for_timeout(1000)
+                print("Taking screenshot...")
+                try:
+                    result["screenshot"] = await page.screenshot(
+                        type="jpeg",
+                        quality=80,
+                        full_page=True
+                    )
+                except Exception as e:
+                    result["errors"]["screenshot"] = str(e)
+        
+        # Convert favicon to JPG using PIL
+        if result["favicon"]:
+            try:
+                img = Image.open(BytesIO(result["favicon"]))
+                if img.mode != 'RGB':
+                    img = img.convert('RGB')
+                buffer = BytesIO()
+                img.save(buffer, 'JPEG')
+                result["favicon"] = buffer.getvalue()
+            except Exception as e:
+                result["favicon"] = None
+                result["errors"]["favicon"] = f"Could not convert favicon: {e}"
+        
+        result["status"] = "success"
+        return result
+        
+    except Exception as e:
+        print(f"Error capturing website {url}: {e}")
+        result["errors"]["capture"] = str(e)
+        result["message"] = str(e)
+        return result
+    
+    finally:
+        if dom_text is not None and not dom_text.done():
+            dom_text.set_result((result["http_status"], result["text"] or ""))
+
+
+async def upload_capture_assets(capture: dict, session_id: str = None) -> dict:
+    """
+    Uploads the screenshot and favicon from capture_website to the 'static'
+    bucket (same paths as capture_website_screenshot / get_website_favicon_async).
+    Returns their public URLs, None for anything not captured or not uploaded.
+    """
+    if session_id:
+        screenshot_name, favicon_name = f"{session_id}_screenshot.jpg", f"{session_id}_logo.jpg"
+    else:
+        screenshot_name, favicon_name = f"screenshot_{int(time.time())}.jpg", f"logo_{int(time.time())}.jpg"
+    assets = {
+        "screenshot_url": (capture.get("screenshot"), f"screenshots/{screenshot_name}"),
+        "favicon_url": (capture.get("favicon"), f"favicons/{favicon_name}"),
+    }
+    
+    bucket = get_async_supabase().storage.from_('static')
+    urls = {}
+    for key, (content, storage_path) in assets.items():
+        urls[key] = None
+        if not content:
+            continue
+        try:
+            await bucket.upload(
+                storage_path,
+                content,
+                {
+                    "content-type": "image/jpeg",
+                    "upsert": "true"
+                }
+            )
+            urls[key] = await bucket.get_public_url(storage_path)
+        except Exception as e:
+            print(f"Failed to upload {storage_path}: {e}")
+    return urls
+
 async def get_website_favicon_async_old(url: str, session_id: str = None) -> dict:
     """
     Async function to get website favicon
@@ -10,10 +10,14 @@ import tempfile
 import os
 import re
 import base64
-from typing import Optional, Dict, Any, List
+from contextlib import aclosing
+from typing import Optional, Dict, Any, List, Iterator, AsyncIterator, Tuple
 import httpx
 from pathlib import Path
 
+from extraction_pool import get_extraction_pool
+from http_clients import get_http_client
+
 # Text extraction libraries
 try:
     import pdfplumber
@@ -34,6 +38,8 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
 class TextExtractor:
     """Handles text extraction from different file types"""
     
@@ -44,143 +50,39 @@ class TextExtractor:
         Uses pdfplumber (preferred) for better layout preservation,
         falls back to PyPDF2 if pdfplumber not available.
         """
+        text_content = []
+        for i, _, page_text in TextExtractor.iter_pdf_pages(BytesIO(file_bytes)):
+            if page_text:
+                text_content.append(f"[Page {i}]\n{page_text}")
+        return '\n'.join(text_content).strip()
+
+    @staticmethod
+    def iter_pdf_pages(pdf_source) -> Iterator[Tuple[int, int, str]]:
+        """
+        Extract a PDF one page at a time.
+
+        Args:
+            pdf_source: File path or binary file object
+
+        Yields:
+            (page_number, page_count, cleaned_text) for every page; text is ''
+            for pages without any. Each page's parsed objects are released
+            before the next one is read.
+        """
         # Try pdfplumber first (better reading order: top-left to bottom-right)
         if pdfplumber:
             try:
-                pdf_file = BytesIO(file_bytes)
-                text_content = []
-                
-                with pdfplumber.open(pdf_file) as pdf:
+                with pdfplumber.open(pdf_source) as pdf:
+                    page_count = len(pdf.pages)
                     for i, page in enumerate(pdf.pages, 1):
-                        # Extract words with positions for column-aware sorting
-                        words = page.extract_words(
-                            x_tolerance=3,
-                            y_tolerance=3,
-                            keep_blank_chars=False
-                        )
-                        
-                        if words:
-                            # Dynamic column detection based on word spacing analysis
-                            # 1. Group words by line (same y position)
-                            # 2. Calculate typical word spacing within each line
-                            # 3. Detect column gaps as spacing significantly larger than typical
-                            
-                            # Sort words by y position first, then x
-                            words_sorted = sorted(words, key=lambda w: (round(w['top']), w['x0']))
-                            
-                            # Group words into lines based on y position
-                            lines_with_words = []
-                            current_line = []
-                            last_y = None
-                            
-                            for w in words_sorted:
-                                y = round(w['top'])
-                                if last_y is None or abs(y - last_y) <= 5:
-                                    current_line.append(w)
-                                else:
-                                    if current_line:
-                                        lines_with_words.append(current_line)
-                                    current_line = [w]
-                                last_y = y
-                            if current_line:
-                                lines_with_words.append(current_line)
-                            
-                            # Analyze spacing within lines to find typical word gap vs column gap
-                            all_gaps = []
-                            for line_words in lines_with_words:
-                                if len(line_words) > 1:
-                                    # Sort by x position within line
-                                    line_words_sorted = sorted(line_words, key=lambda w: w['x0'])
-                                    for k in range(len(line_words_sorted) - 1):
-                                        gap = line_words_sorted[k + 1]['x0'] - line_words_sorted[k]['x1']
-                                        if gap > 0:
-                                            all_gaps.append(gap)
-                            
-                            # Determine if multi-column by finding outlier gaps
-                            is_multi_column = False
-                            column_boundary = None
-                            
-                            if all_gaps:
-                                # Calculate median gap (typical word spacing)
-                                sorted_gaps = sorted(all_gaps)
-                                median_gap = sorted_gaps[len(sorted_gaps) // 2]
-                                
-                                # Column gap should be significantly larger than median (3x or more)
-                                threshold = max(median_gap * 3, 20)  # At least 3x median or 20px
-                                
-                                # Find lines with large gaps (potential column separators)
-                                column_gaps = []
-                                for line_words in lines_with_words:
-                                    if len(line_words) > 1:
-                                        line_words_sorted = sorted(line_words, key=lambda w: w['x0'])
-                                        for k in range(len(line_words_sorted) - 1):
-                                            gap = line_words_sorted[k + 1]['x0'] - line_words_sorted[k]['x1']
-                                            if gap > threshold:
-                                                # Record the gap position (middle of the gap)
-                                                gap_x = (line_words_sorted[k]['x1'] + line_words_sorted[k + 1]['x0']) / 2
-                                                column_gaps.append(gap_x)
-                                
-                                # If multiple lines have large gaps at similar x positions, it's multi-column
-                                if len(column_gaps) >= 2:
-                                    # Find the most common gap position (cluster)
-                                    column_gaps_sorted = sorted(column_gaps)
-                                    # Use median of gap positions as column boundary
-                                    column_boundary = column_gaps_sorted[len(column_gaps_sorted) // 2]
-                                    is_multi_column = True
-                            
-                            if is_multi_column and column_boundary:
-                                # Split words into left and right columns
-                                left_words = [w for w in words if w['x1'] < column_boundary]
-                                right_words = [w for w in words if w['x0'] > column_boundary]
-                                
-                                # Only proceed if both columns have content
-                                if len(left_words) > 2 and len(right_words) > 2:
-                                    # Sort each column by y position (top to bottom), then x
-                                    left_words.sort(key=lambda w: (w['top'], w['x0']))
-                                    right_words.sort(key=lambda w: (w['top'], w['x0']))
-                                    
-                                    # Build text from word list
-                                    def words_to_text(word_list):
-                                        if not word_list:
-                                            return ""
-                                        lines = []
-                                        current_line = []
-                                        last_top = word_list[0]['top']
-                                        
-                                        for w in word_list:
-                                            if abs(w['top'] - last_top) > 5:
-                                                if current_line:
-                                                    lines.append(' '.join(current_line))
-                                                current_line = [w['text']]
-                                                last_top = w['top']
-                                            else:
-                                                current_line.append(w['text'])
-                                        
-                                        if current_line:
-                                            lines.append(' '.join(current_line))
-                                        
-                                        return '\n'.join(lines)
-                                    
-                                    left_text = words_to_text(left_words)
-                                    right_text = words_to_text(right_words)
-                                    page_text = left_text + '\n\n' + right_text
-                                else:
-                                    page_text = page.extract_text(x_tolerance=3, y_tolerance=3)
-                            else:
-                                # Single column - use default extraction
-                                page_text = page.extract_text(x_tolerance=3, y_tolerance=3)
-                        else:
-                            page_text = page.extract_text(x_tolerance=3, y_tolerance=3)
-                        
+                        page_text = TextExtractor._extract_pdfplumber_page_text(page)
+                        if hasattr(page, 'close'):
+                            page.close()
                         if page_text and page_text.strip():
-                            # Clean up whitespace
-                            cleaned_text = re.sub(r'[ \t]+', ' ', page_text)
-                            cleaned_text = re.sub(r'\n\s*\n+', '\n', cleaned_text)
-                            cleaned_lines = [line.rstrip() for line in cleaned_text.split('\n')]
-                            cleaned_text = '\n'.join(cleaned_lines).strip()
-                            text_content.append(f"[Page {i}]\n{cleaned_text}")
-                
-                return '\n'.join(text_content).strip()
+                            yield i, page_count, TextExtractor._clean_page_text(page_text)
+                        else:
+                            yield i, page_count, ''
+                return
             except Exception as e:
                 logger.error(f"pdfplumber extraction error: {e}")
                 raise Exception(f"Failed to extract text from PDF: {str(e)}")
@@ -188,23 +90,154 @@ class TextExtractor:
         # Fallback to PyPDF2
         if PyPDF2:
             try:
-                pdf_file = BytesIO(file_bytes)
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                
-                text_content = []
+                pdf_reader = PyPDF2.PdfReader(pdf_source)
+                page_count = len(pdf_reader.pages)
                 for i, page in enumerate(pdf_reader.pages, 1):
                     page_text = page.extract_text()
                     if page_text and page_text.strip():
-                        cleaned = re.sub(r'\n\s*\n+', '\n', page_text.strip())
-                        text_content.append(f"[Page {i}]\n{cleaned}")
-                
-                return '\n'.join(text_content).strip()
+                        yield i, page_count, re.sub(r'\n\s*\n+', '\n', page_text.strip())
+                    else:
+                        yield i, page_count, ''
+                return
             except Exception as e:
                 logger.error(f"PyPDF2 extraction error: {e}")
                 raise Exception(f"Failed to extract text from PDF: {str(e)}")
         
         raise ImportError("No PDF library installed. Install pdfplumber or PyPDF2.")
     
+    @staticmethod
+    def _extract_pdfplumber_page_text(page) -> Optional[str]:
+        """Extract one pdfplumber page with column-aware reading order"""
+        # Extract words with positions for column-aware sorting
+        words = page.extract_words(
+            x_tolerance=3,
+            y_tolerance=3,
+            keep_blank_chars=False
+        )
+        
+        if words:
+            # Dynamic column detection based on word spacing analysis
+            # 1. Group words by line (same y position)
+            # 2. Calculate typical word spacing within each line
+            # 3. Detect column gaps as spacing significantly larger than typical
+            
+            # Sort words by y position first, then x
+            words_sorted = sorted(words, key=lambda w: (round(w['top']), w['x0']))
+            
+            # Group words into lines based on y position
+            lines_with_words = []
+            current_line = []
+            last_y = None
+            
+            for w in words_sorted:
+                y = round(w['top'])
+                if last_y is None or abs(y - last_y) <= 5:
+                    current_line.append(w)
+                else:
+                    if current_line:
+                        lines_with_words.append(current_line)
+                    current_line = [w]
+                last_y = y
+            if current_line:
+                lines_with_words.append(current_line)
+            
+            # Analyze spacing within lines to find typical word gap vs column gap
+            all_gaps = []
+            for line_words in lines_with_words:
+                if len(line_words) > 1:
+                    # Sort by x position within line
+                    line_words_sorted = sorted(line_words, key=lambda w: w['x0'])
+                    for k in range(len(line_words_sorted) - 1):
+                        gap = line_words_sorted[k + 1]['x0'] - line_words_sorted[k]['x1']
+                        if gap > 0:
+                            all_gaps.append(gap)
+            
+            # Determine if multi-column by finding outlier gaps
+            is_multi_column = False
+            column_boundary = None
+            
+            if all_gaps:
+                # Calculate median gap (typical word spacing)
+                sorted_gaps = sorted(all_gaps)
+                median_gap = sorted_gaps[len(sorted_gaps) // 2]
+                
+                # Column gap should be significantly larger than median (3x or more)
+                threshold = max(median_gap * 3, 20)  # At least 3x median or 20px
+                
+                # Find lines with large gaps (potential column separators)
+                column_gaps = []
+                for line_words in lines_with_words:
+                    if len(line_words) > 1:
+                        line_words_sorted = sorted(line_words, key=lambda w: w['x0'])
+                        for k in range(len(line_words_sorted) - 1):
+                            gap = line_words_sorted[k + 1]['x0'] - line_words_sorted[k]['x1']
+                            if gap > threshold:
+                                # Record the gap position (middle of the gap)
+                                gap_x = (line_words_sorted[k]['x1'] + line_words_sorted[k + 1]['x0']) / 2
+                                column_gaps.append(gap_x)
+                
+                # If multiple lines have large gaps at similar x positions, it's multi-column
+                if len(column_gaps) >= 2:
+                    # Find the most common gap position (cluster)
+                    column_gaps_sorted = sorted(column_gaps)
+                    # Use median of gap positions as column boundary
+                    column_boundary = column_gaps_sorted[len(column_gaps_sorted) // 2]
+                    is_multi_column = True
+            
+            if is_multi_column and column_boundary:
+                # Split words into left and right columns
+                left_words = [w for w in words if w['x1'] < column_boundary]
+                right_words = [w for w in words if w['x0'] > column_boundary]
+                
+                # Only proceed if both columns have content
+                if len(left_words) > 2 and len(right_words) > 2:
+                    # Sort each column by y position (top to bottom), then x
+                    left_words.sort(key=lambda w: (w['top'], w['x0']))
+                    right_words.sort(key=lambda w: (w['top'], w['x0']))
+                    
+                    # Build text from word list
+                    def words_to_text(word_list):
+                        if not word_list:
+                            return ""
+                        lines = []
+                        current_line = []
+                        last_top = word_list[0]['top']
+                        
+                        for w in word_list:
+                            if abs(w['top'] - last_top) > 5:
+                                if current_line:
+                                    lines.append(' '.join(current_line))
+                                current_line = [w['text']]
+                                last_top = w['top']
+                            else:
+                                current_line.append(w['text'])
+                        
+                        if current_line:
+                            lines.append(' '.join(current_line))
+                        
+                        return '\n'.join(lines)
+                    
+                    left_text = words_to_text(left_words)
+                    right_text = words_to_text(right_words)
+                    page_text = left_text + '\n\n' + right_text
+                else:
+                    page_text = page.extract_text(x_tolerance=3, y_tolerance=3)
+            else:
+                # Single column - use default extraction
+                page_text = page.extract_text(x_tolerance=3, y_tolerance=3)
+        else:
+            page_text = page.extract_text(x_tolerance=3, y_tolerance=3)
+        
+        return page_text
+
+    @staticmethod
+    def _clean_page_text(page_text: str) -> str:
+        """Collapse runs of spaces/blank lines and trailing whitespace"""
+        cleaned_text = re.sub(r'[ \t]+', ' ', page_text)
+        cleaned_text = re.sub(r'\n\s*\n+', '\n', cleaned_text)
+        cleaned_lines = [line.rstrip() for line in cleaned_text.split('\n')]
+        return '\n'.join(cleaned_lines).strip()
+    
     @staticmethod
     def extract_from_txt(file_bytes: bytes) -> str:
         """Extract text from TXT bytes with multiple encoding support"""
@@ -298,45 +331,46 @@ class TextExtractor:
             mime_type = image_format_map.get(file_ext, 'image/jpeg')
 
             # Prepare the API request
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {openrouter_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "qwen/qwen2.5-vl-72b-instruct:free",
-                        "messages": [
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": "Extract all text from this image. Return only the extracted text without any additional commentary or formatting. If there is no text in the image, return 'No text found in image'."
-                                    },
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": f"data:{mime_type};base64,{base64_image}"
-                                        }
+            client = get_http_client('openrouter')
+            response = await client.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                timeout=60.0,
+                headers={
+                    "Authorization": f"Bearer {openrouter_api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": "qwen/qwen2.5-vl-72b-instruct:free",
+                    "messages": [
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": "Extract all text from this image. Return only the extracted text without any additional commentary or formatting. If there is no text in the image, return 'No text found in image'."
+                                },
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": f"data:{mime_type};base64,{base64_image}"
                                     }
-                                ]
-                            }
-                        ]
-                    }
-                )
+                                }
+                            ]
+                        }
+                    ]
+                }
+            )
 
-                response.raise_for_status()
-                result = response.json()
+            response.raise_for_status()
+            result = response.json()
 
-                # Extract the text from the response
-                extracted_text = result.get('choices', [{}])[0].get('message', {}).get('content', '')
+            # Extract the text from the response
+            extracted_text = result.get('choices', [{}])[0].get('message', {}).get('content', '')
 
-                if not extracted_text or extracted_text.strip() == '':
-                    return f"[Image file: {file_name}] - No text extracted"
+            if not extracted_text or extracted_text.strip() == '':
+                return f"[Image file: {file_name}] - No text extracted"
 
-                return extracted_text.strip()
+            return extracted_text.strip()
 
         except Exception as e:
             logger.error(f"Image text extraction error: {e}")
@@ -344,6 +378,74 @@ class TextExtractor:
             return f"[Image file: {file_name}] - Text extraction failed: {str(e)}"
 
 
+class IncrementalChunker:
+    """
+    Chunks text as it arrives (e.g. page by page) with the same boundaries
+    chunk_text would produce for the concatenated text. Only the unfinished
+    tail is buffered, never the whole document.
+    """
+
+    def __init__(self, chunk_size: int = 4000, chunk_overlap: int = 400):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.buffer = ''
+
+    def _find_break(self, segment: str) -> int:
+        chunk_size = self.chunk_size
+
+        # Try to break at paragraph boundary (double newline)
+        break_pos = segment.rfind('\n\n')
+
+        # Fallback: break at single newline
+        if break_pos == -1 or break_pos < chunk_size * 0.3:
+            break_pos = segment.rfind('\n')
+
+        # Fallback: break at sentence end (. ! ?)
+        if break_pos == -1 or break_pos < chunk_size * 0.3:
+            sentence_match = None
+            for m in re.finditer(r'[.!?]\s', segment):
+                if m.start() >= chunk_size * 0.3:
+                    sentence_match = m
+            if sentence_match:
+                break_pos = sentence_match.end()
+
+        # Fallback: break at space
+        if break_pos == -1 or break_pos < chunk_size * 0.3:
+            break_pos = segment.rfind(' ')
+
+        # Last resort: hard cut
+        if break_pos == -1 or break_pos < chunk_size * 0.3:
+            break_pos = chunk_size
+
+        return break_pos
+
+    def feed(self, text: str) -> List[str]:
+        """Add text; return every chunk that can no longer change"""
+        self.buffer += text
+        chunks = []
+        start = 0
+
+        # A chunk is final once there is text beyond its window
+        while len(self.buffer) - start > self.chunk_size:
+            break_pos = self._find_break(self.buffer[start:start + self.chunk_size])
+
+            chunk = self.buffer[start:start + break_pos].strip()
+            if chunk:
+                chunks.append(chunk)
+
+            # Move start forward, accounting for overlap
+            start = max(start + break_pos - self.chunk_overlap, 0)
+
+        self.buffer = self.buffer[start:]
+        return chunks
+
+    def finish(self) -> List[str]:
+        """Flush the remaining text as the last chunk"""
+        chunk = self.buffer.strip()
+        self.buffer = ''
+        return [chunk] if chunk else []
+
+
 class BackgroundTextProcessor:
     """Handles background processing of file text extraction"""
 
@@ -354,10 +456,10 @@ class BackgroundTextProcessor:
     async def download_file(self, file_url: str) -> bytes:
         """Download file from URL and return bytes"""
         try:
-            async with httpx.AsyncClient(timeout=60.0, follow_redirects=True) as client:
-                response = await client.get(file_url)
-                response.raise_for_status()
-                return response.content
+            client = get_http_client('downloads')
+            response = await client.get(file_url)
+            response.raise_for_status()
+            return response.content
         except httpx.TimeoutException:
             raise Exception("File download timeout")
         except httpx.HTTPStatusError as e:
@@ -365,64 +467,62 @@ class BackgroundTextProcessor:
         except Exception as e:
             raise Exception(f"File download error: {str(e)}")
     
-    @staticmethod
-    def chunk_text(text: str, chunk_size: int = 4000, chunk_overlap: int = 400) -> List[str]:
-        """Split text into chunks with overlap, breaking at sentence/paragraph boundaries."""
-        if not text or not text.strip():
-            return []
-
-        # If text fits in one chunk, return as-is
-        if len(text) <= chunk_size:
-            return [text.strip()]
-
-        chunks = []
-        start = 0
+    async def download_to_tempfile(self, file_url: str, suffix: str = '') -> str:
+        """
+        Stream a download into a temp file on disk and return its path.
+        The file is never held in memory; the caller deletes it when done.
+        """
+        fd, file_path = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                client = get_http_client('downloads')
+                async with client.stream('GET', file_url) as response:
+                    response.raise_for_status()
+                    async for data in response.aiter_bytes(DOWNLOAD_CHUNK_BYTES):
+                        temp_file.write(data)
+            return file_path
+        except BaseException as e:
+            os.unlink(file_path)
+            if isinstance(e, httpx.TimeoutException):
+                raise Exception("File download timeout")
+            if isinstance(e, httpx.HTTPStatusError):
+                raise Exception(f"Failed to download file: HTTP {e.response.status_code}")
+            if isinstance(e, Exception):
+                raise Exception(f"File download error: {str(e)}")
+            raise
+
+    async def iter_text(self, file_path: str, file_name: str) -> AsyncIterator[Tuple[str, int, int]]:
+        """
+        Extract a downloaded file incrementally.
 
-        while start < len(text):
-            end = start + chunk_size
-
-            # If this is the last chunk, take the rest
-            if end >= len(text):
-                chunk = text[start:].strip()
-                if chunk:
-                    chunks.append(chunk)
-                break
-
-            # Try to break at paragraph boundary (double newline)
-            segment = text[start:end]
-            break_pos = segment.rfind('\n\n')
-
-            # Fallback: break at single newline
-            if break_pos == -1 or break_pos < chunk_size * 0.3:
-                break_pos = segment.rfind('\n')
-
-            # Fallback: break at sentence end (. ! ?)
-            if break_pos == -1 or break_pos < chunk_size * 0.3:
-                sentence_match = None
-                for m in re.finditer(r'[.!?]\s', segment):
-                    if m.start() >= chunk_size * 0.3:
-                        sentence_match = m
-                if sentence_match:
-                    break_pos = sentence_match.end()
-
-            # Fallback: break at space
-            if break_pos == -1 or break_pos < chunk_size * 0.3:
-                break_pos = segment.rfind(' ')
-
-            # Last resort: hard cut
-            if break_pos == -1 or break_pos < chunk_size * 0.3:
-                break_pos = chunk_size
-
-            chunk = text[start:start + break_pos].strip()
-            if chunk:
-                chunks.append(chunk)
+        PDFs stream page by page from the extraction pool; other types are
+        extracted in one piece. Concatenating the yielded text gives exactly
+        what extract_text returns for the same file.
 
-            # Move start forward, accounting for overlap
-            start = start + break_pos - chunk_overlap
-            if start < 0:
-                start = 0
+        Yields:
+            (text, units_done, units_total) - units are pages for PDFs, else 1/1
+        """
+        if Path(file_name).suffix.lower() == '.pdf':
+            separator = ''
+            # Closing this generator closes the pool's too, releasing its slot and child process
+            async with aclosing(get_extraction_pool().iter_pdf_pages(file_path, file_name)) as pages:
+                async for page_number, page_count, page_text in pages:
+                    if page_text:
+                        yield f"{separator}[Page {page_number}]\n{page_text}", page_number, page_count
+                        separator = '\n'
+                    else:
+                        yield '', page_number, page_count
+            return
+
+        with open(file_path, 'rb') as f:
+            file_bytes = f.read()
+        yield await self.extract_text(file_bytes, file_name), 1, 1
 
-        return chunks
+    @staticmethod
+    def chunk_text(text: str, chunk_size: int = 4000, chunk_overlap: int = 400) -> List[str]:
+        """Split text into chunks with overlap, breaking at sentence/paragraph boundaries."""
+        chunker = IncrementalChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        return chunker.feed(text or '') + chunker.finish()
 
     async def extract_text(self, file_bytes: bytes, file_name: str) -> str:
         """Extract text based on file extension"""
@@ -432,14 +532,15 @@ class BackgroundTextProcessor:
         if file_ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp']:
             return await self.text_extractor.extract_from_image(file_bytes, file_name)
 
+        # PDF/DOCX parsing is CPU-bound - run it in the extraction pool, off the event loop
         if file_ext == '.pdf':
-            return self.text_extractor.extract_from_pdf(file_bytes)
+            return await get_extraction_pool().extract('pdf', file_bytes, file_name)
         elif file_ext in ['.txt', '.md', '.markdown']:
             return self.text_extractor.extract_from_txt(file_bytes)
         elif file_ext in ['.json']:
             return self.text_extractor.extract_from_json(file_bytes)
         elif file_ext in ['.docx', '.doc']:
-            return self.text_extractor.extract_from_docx(file_bytes)
+            return await get_extraction_pool().extract('docx', file_bytes, file_name)
         else:
             # Fallback: try to read as plain text
             try:
@@ -0,0 +1,316 @@
+"""
+Browser Pool
+One long-lived headless Chromium per worker for website screenshots and
+favicons, instead of launching a browser for every capture. Each job gets
+its own browser context (cookies, cache and storage are not shared between
+jobs), the number of open pages is capped, and the browser is replaced
+after a number of pages or when its processes grow past a memory limit.
+
+    from browser_pool import get_browser_pool
+
+    async with get_browser_pool().page(viewport={"width": 1920, "height": 1080}) as page:
+        await page.goto(url)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List
+
+try:
+    import psutil
+except ImportError:  # memory-based recycling is skipped without psutil
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Pages open at once across all jobs (each is a renderer process on a 512MB dyno)
+BROWSER_POOL_MAX_PAGES = int(os.getenv('BROWSER_POOL_MAX_PAGES', '2'))
+# Replace the browser after this many pages...
+BROWSER_POOL_PAGES_PER_BROWSER = int(os.getenv('BROWSER_POOL_PAGES_PER_BROWSER', '50'))
+# ...or when Chromium's processes use more than this much memory
+BROWSER_POOL_MAX_RSS_MB = int(os.getenv('BROWSER_POOL_MAX_RSS_MB', '300'))
+# Close an idle browser to give its memory back
+BROWSER_POOL_IDLE_SECONDS = float(os.getenv('BROWSER_POOL_IDLE_SECONDS', '300'))
+LAUNCH_TIMEOUT_MS = 30000
+
+BROWSER_ARGS = [
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-accelerated-2d-canvas",
+    "--no-first-run",
+    "--disable-gpu",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-features=TranslateUI,VizDisplayCompositor",
+    "--disable-ipc-flooding-protection",
+    "--disable-background-networking",
+    "--disable-client-side-phishing-detection",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-sync",
+    "--disable-translate",
+    "--hide-scrollbars",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-default-browser-check",
+    "--safebrowsing-disable-auto-update",
+]
+
+
+def _chromium_rss_mb() -> Optional[float]:
+    """Resident memory of this worker's Chromium processes"""
+    if psutil is None:
+        return None
+    total = 0
+    try:
+        for child in psutil.Process().children(recursive=True):
+            try:
+                name = child.name().lower()
+                if 'chrom' in name or 'headless_shell' in name:
+                    total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+    except psutil.Error:
+        return None
+    return total / (1024 * 1024)
+
+
+class _Browser:
+    """A launched browser and the pages it has served"""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages_served = 0
+        self.active = 0
+        self.retired = False
+
+
+class BrowserPool:
+    """
+    Shared Chromium for short capture jobs.
+
+    Jobs wait for one of max_pages slots (the wait is recorded in the stats),
+    then get a fresh context + page on the current browser. A browser that is
+    due for recycling stops taking jobs and is closed once its last page is
+    done; the next job launches a new one. A crashed browser is replaced the
+    same way.
+    """
+
+    def __init__(
+        self,
+        max_pages: int = BROWSER_POOL_MAX_PAGES,
+        pages_per_browser: int = BROWSER_POOL_PAGES_PER_BROWSER,
+        max_rss_mb: int = BROWSER_POOL_MAX_RSS_MB,
+        idle_seconds: float = BROWSER_POOL_IDLE_SECONDS
+    ):
+        self.max_pages = max(1, max_pages)
+        self.pages_per_browser = pages_per_browser
+        self.max_rss_mb = max_rss_mb
+        self.idle_seconds = idle_seconds
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._launch_lock: Optional[asyncio.Lock] = None
+        self._playwright = None
+        self._current: Optional[_Browser] = None
+        self._retiring: List[_Browser] = []
+        self._idle_handle: Optional[asyncio.TimerHandle] = None
+        self._waiting = 0
+        self._acquired = 0
+        self.stats = {
+            "jobs": 0, "failed_jobs": 0, "launches": 0, "recycled": 0, "idle_closes": 0, "crashes": 0,
+            "waited": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Browser lifecycle
+    # ------------------------------------------------------------------
+
+    async def _launch(self) -> _Browser:
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+        browser = await self._playwright.chromium.launch(headless=True, args=BROWSER_ARGS, timeout=LAUNCH_TIMEOUT_MS)
+        slot = _Browser(browser)
+        browser.on("disconnected", lambda _: self._on_disconnected(slot))
+        self.stats["launches"] += 1
+        logger.info(f"Browser pool launched Chromium #{self.stats['launches']}")
+        return slot
+
+    def _on_disconnected(self, slot: _Browser):
+        if not slot.retired:
+            self.stats["crashes"] += 1
+            logger.warning("Browser pool: Chromium disconnected, a new one starts with the next job")
+            self._retire(slot)
+
+    async def _get_browser(self) -> _Browser:
+        async with self._launch_lock:
+            current = self._current
+            if current is None or current.retired or not current.browser.is_connected():
+                self._current = current = await self._launch()
+            return current
+
+    def _retire(self, slot: _Browser):
+        """Stop handing out slot; it is closed when its last page is done"""
+        if slot.retired:
+            return
+        slot.retired = True
+        if self._current is slot:
+            self._current = None
+        self._retiring.append(slot)
+
+    async def _close_retired(self):
+        for slot in [s for s in self._retiring if s.active == 0]:
+            self._retiring.remove(slot)
+            try:
+                await slot.browser.close()
+            except Exception as e:
+                logger.debug(f"Error closing retired browser: {e}")
+
+    def _needs_recycle(self, slot: _Browser) -> Optional[str]:
+        if self.pages_per_browser and slot.pages_served >= self.pages_per_browser:
+            return f"{slot.pages_served} pages"
+        if self.max_rss_mb:
+            rss = _chromium_rss_mb()
+            if rss is not None and rss > self.max_rss_mb:
+                return f"{rss:.0f}MB resident"
+        return None
+
+    def _schedule_idle_close(self):
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+        if self.idle_seconds and self._current is not None:
+            loop = asyncio.get_running_loop()
+            self._idle_handle = loop.call_later(self.idle_seconds, lambda: loop.create_task(self._close_if_idle()))
+
+    async def _close_if_idle(self):
+        self._idle_handle = None
+        current = self._current
+        if current is not None and current.active == 0 and self._waiting == 0:
+            logger.info("Browser pool: closing idle Chromium")
+            self._retire(current)
+            self.stats["idle_closes"] += 1
+            await self._close_retired()
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    @asynccontextmanager
+    async def page(self, **context_options):
+        """
+        A new page in its own browser context (context_options are passed to
+        browser.new_context: viewport, user_agent, ...). Closed on exit.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pages)
+            self._launch_lock = asyncio.Lock()
+
+        started = time.monotonic()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        wait_ms = (time.monotonic() - started) * 1000
+        self._acquired += 1
+        if wait_ms >= 1:
+            self.stats["waited"] += 1
+        self.stats["wait_ms_total"] += wait_ms
+        self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], wait_ms)
+
+        slot = None
+        context = None
+        try:
+            if self._idle_handle is not None:
+                self._idle_handle.cancel()
+                self._idle_handle = None
+            slot = await self._get_browser()
+            slot.active += 1
+            self.stats["jobs"] += 1
+            context = await slot.browser.new_context(**context_options)
+            page = await context.new_page()
+            yield page
+        except BaseException:
+            self.stats["failed_jobs"] += 1
+            raise
+        finally:
+            # A cancellation while closing must not leak the page slot (the
+            # pool would hang once every slot is gone), hence the nesting
+            try:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        logger.debug(f"Error closing browser context: {e}")
+            finally:
+                try:
+                    if slot is not None:
+                        slot.active -= 1
+                        slot.pages_served += 1
+                        if not slot.retired:
+                            reason = self._needs_recycle(slot)
+                            if reason:
+                                logger.info(f"Browser pool: recycling Chromium after {reason}")
+                                self.stats["recycled"] += 1
+                                self._retire(slot)
+                        await self._close_retired()
+                finally:
+                    self._slots.release()
+                    self._schedule_idle_close()
+
+    def has_free_page(self) -> bool:
+        """Whether a page() call would start right away instead of queueing"""
+        return self._waiting == 0 and (self._slots is None or not self._slots.locked())
+
+    # ------------------------------------------------------------------
+    # Shutdown and stats
+    # ------------------------------------------------------------------
+
+    async def close(self):
+        """Close every browser and the Playwright driver (worker shutdown)"""
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+        slots = self._retiring + ([self._current] if self._current else [])
+        self._current, self._retiring = None, []
+        for slot in slots:
+            slot.retired = True
+            try:
+                await slot.browser.close()
+            except Exception as e:
+                logger.debug(f"Error closing browser: {e}")
+        if self._playwright is not None:
+            playwright, self._playwright = self._playwright, None
+            try:
+                await playwright.stop()
+            except Exception as e:
+                logger.debug(f"Error stopping Playwright: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        current = self._current
+        return {
+            **self.stats,
+            "wait_ms_total": round(self.stats["wait_ms_total"], 1),
+            "wait_ms_max": round(self.stats["wait_ms_max"], 1),
+            "wait_ms_avg": round(self.stats["wait_ms_total"] / self._acquired, 1) if self._acquired else 0.0,
+            "queued": self._waiting,
+            "active_pages": sum(s.active for s in self._retiring) + (current.active if current else 0),
+            "max_pages": self.max_pages,
+            "browser_running": current is not None,
+            "browser_pages_served": current.pages_served if current else 0,
+        }
+
+
+_browser_pool = None
+
+def get_browser_pool() -> BrowserPool:
+    """Process-wide browser pool"""
+    global _browser_pool
+    if _browser_pool is None:
+        _browser_pool = BrowserPool()
+    return _browser_pool
@@ -0,0 +1,152 @@
+"""
+Connection Manager
+Registry of this worker's open WebSockets (/ws/{user_id}/{session_id}),
+indexed by user_id and session_id so a notification reaches a user's
+sockets without scanning every connection.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Any, List, Set
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+
+logger = logging.getLogger(__name__)
+
+# A socket that can't take a message within this long is dropped, so one
+# slow client doesn't hold up delivery to the others
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv('WS_SEND_TIMEOUT_SECONDS', '5'))
+
+
+class Connection:
+    """One open WebSocket. Sends are serialized per socket."""
+
+    __slots__ = ("connection_id", "user_id", "session_id", "websocket", "_send_lock")
+
+    def __init__(self, user_id: str, session_id: str, websocket: WebSocket):
+        self.connection_id = f"{user_id}_{session_id}"
+        self.user_id = user_id
+        self.session_id = session_id
+        self.websocket = websocket
+        self._send_lock = asyncio.Lock()
+
+    async def send_text(self, text: str, timeout: float = WS_SEND_TIMEOUT_SECONDS):
+        if self.websocket.client_state != WebSocketState.CONNECTED:
+            raise ConnectionError("WebSocket is not connected")
+        async with self._send_lock:
+            await asyncio.wait_for(self.websocket.send_text(text), timeout)
+
+    async def send_json(self, message: Dict[str, Any], timeout: float = WS_SEND_TIMEOUT_SECONDS):
+        await self.send_text(json.dumps(message), timeout)
+
+
+class ConnectionManager:
+    """
+    Per-worker WebSocket registry.
+
+    connection_id ("{user_id}_{session_id}") -> Connection, plus user_id and
+    session_id indexes. Everything runs on the worker's event loop, so no
+    locking is needed around the indexes.
+    """
+
+    def __init__(self, send_timeout: float = WS_SEND_TIMEOUT_SECONDS):
+        self.send_timeout = send_timeout
+        self._connections: Dict[str, Connection] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+        self._by_session: Dict[str, Set[str]] = {}
+        self.stats = {"sent": 0, "send_failures": 0, "send_timeouts": 0, "dropped": 0}
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def __contains__(self, connection_id: str) -> bool:
+        return connection_id in self._connections
+
+    def connect(self, user_id: str, session_id: str, websocket: WebSocket) -> Connection:
+        """Register an accepted socket. A reconnect with the same ids replaces the old one."""
+        connection = Connection(user_id, session_id, websocket)
+        self._connections[connection.connection_id] = connection
+        self._by_user.setdefault(user_id, set()).add(connection.connection_id)
+        self._by_session.setdefault(session_id, set()).add(connection.connection_id)
+        return connection
+
+    def disconnect(self, connection: Connection):
+        """Unregister, unless the connection id has already been taken over by a newer socket"""
+        connection_id = connection.connection_id
+        if self._connections.get(connection_id) is not connection:
+            return
+        del self._connections[connection_id]
+        for index, key in ((self._by_user, connection.user_id), (self._by_session, connection.session_id)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(connection_id)
+                if not ids:
+                    del index[key]
+
+    def get_user_connections(self, user_id: str) -> List[Connection]:
+        return [self._connections[cid] for cid in self._by_user.get(user_id, ())]
+
+    def get_session_connections(self, session_id: str) -> List[Connection]:
+        return [self._connections[cid] for cid in self._by_session.get(session_id, ())]
+
+    async def _send(self, connection: Connection, text: str) -> bool:
+        try:
+            await connection.send_text(text, self.send_timeout)
+            self.stats["sent"] += 1
+            return True
+        except asyncio.TimeoutError:
+            self.stats["send_timeouts"] += 1
+            logger.warning(f"WebSocket send to {connection.connection_id} timed out after {self.send_timeout}s, dropping it")
+        except Exception as e:
+            self.stats["send_failures"] += 1
+            logger.warning(f"WebSocket send to {connection.connection_id} failed, dropping it: {e}")
+
+        self.stats["dropped"] += 1
+        self.disconnect(connection)
+        # The endpoint's receive loop sees the close and finishes its own cleanup
+        asyncio.create_task(self._close(connection))
+        return False
+
+    @staticmethod
+    async def _close(connection: Connection):
+        try:
+            await asyncio.wait_for(connection.websocket.close(code=1011), 5)
+        except Exception:
+            pass
+
+    async def _fan_out(self, connections: List[Connection], message: Dict[str, Any]) -> int:
+        if not connections:
+            return 0
+        text = json.dumps(message)
+        results = await asyncio.gather(*(self._send(c, text) for c in connections))
+        return sum(results)
+
+    async def send_to_user(self, user_id: str, message: Dict[str, Any]) -> int:
+        """Send to all of a user's sockets concurrently. Returns how many succeeded."""
+        return await self._fan_out(self.get_user_connections(user_id), message)
+
+    async def send_to_session(self, session_id: str, message: Dict[str, Any]) -> int:
+        """Send to all sockets of a session concurrently. Returns how many succeeded."""
+        return await self._fan_out(self.get_session_connections(session_id), message)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "connections": len(self._connections),
+            "users": len(self._by_user),
+            "sessions": len(self._by_session),
+            "send_timeout_seconds": self.send_timeout,
+        }
+
+
+_connection_manager = None
+
+def get_connection_manager() -> ConnectionManager:
+    """Process-wide WebSocket registry"""
+    global _connection_manager
+    if _connection_manager is None:
+        _connection_manager = ConnectionManager()
+    return _connection_manager
@@ -1,62 +1,234 @@
 # database.py
+import asyncio
 import os
+import time
 import asyncpg
+from contextlib import asynccontextmanager
 from typing import Optional, Dict, List, Any, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Pool sizing and behaviour (per worker process - multiply by WEB_CONCURRENCY
+# when comparing against Neon's connection cap)
+POOL_MIN_SIZE = int(os.getenv('NEON_POOL_MIN_SIZE', '1'))
+POOL_MAX_SIZE = int(os.getenv('NEON_POOL_MAX_SIZE', '5'))
+POOL_ACQUIRE_TIMEOUT = float(os.getenv('NEON_POOL_ACQUIRE_TIMEOUT', '10'))
+# Idle connections are closed after this many seconds so we don't hold
+# sockets to a Neon compute that has auto-suspended
+POOL_MAX_INACTIVE_LIFETIME = float(os.getenv('NEON_POOL_MAX_INACTIVE_LIFETIME', '300'))
+# Prepared statement cache per connection (set to 0 if the pooler endpoint
+# runs PgBouncer without prepared statement support)
+STATEMENT_CACHE_SIZE = int(os.getenv('NEON_STATEMENT_CACHE_SIZE', '100'))
+COMMAND_TIMEOUT = float(os.getenv('NEON_COMMAND_TIMEOUT', '60'))
+CONNECT_TIMEOUT = float(os.getenv('NEON_CONNECT_TIMEOUT', '30'))
+
 # Database connection pool
 pool = None
+_pool_lock = asyncio.Lock()
 
-async def get_connection():
-    """Get a connection from the pool"""
+# Acquire/health metrics exposed through get_pool_stats()
+_pool_metrics = {
+    "acquires": 0,
+    "acquire_timeouts": 0,
+    "acquire_errors": 0,
+    "stale_connections_replaced": 0,
+    "total_wait_ms": 0.0,
+    "max_wait_ms": 0.0,
+    "health_checks": 0,
+    "health_check_failures": 0,
+    "last_health_check": None,
+}
+
+
+def is_configured() -> bool:
+    """Check whether Neon credentials (or a DATABASE_URL) are available"""
+    return bool(
+        all([os.getenv('NEON_DB_HOST'), os.getenv('NEON_DB_USER'), os.getenv('NEON_DB_PASSWORD')])
+        or os.getenv('DATABASE_URL')
+    )
+
+
+def _connection_kwargs() -> Dict[str, Any]:
+    """Build asyncpg connect kwargs from NEON_DB_* vars, falling back to DATABASE_URL"""
+    neon_host = os.getenv('NEON_DB_HOST')
+    neon_user = os.getenv('NEON_DB_USER')
+    neon_password = os.getenv('NEON_DB_PASSWORD')
+
+    if all([neon_host, neon_user, neon_password]):
+        return {
+            "host": neon_host,
+            "port": int(os.getenv('NEON_DB_PORT', '5432')),
+            "user": neon_user,
+            "password": neon_password,
+            "database": os.getenv('NEON_DB_NAME', 'neondb'),
+            "ssl": "require",
+        }
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        raise ValueError("NEON_DB_HOST/NEON_DB_USER/NEON_DB_PASSWORD or DATABASE_URL must be set")
+    return {"dsn": database_url}
+
+
+async def connect_direct():
+    """
+    Open a dedicated connection outside the pool, for LISTEN, session-level
+    advisory locks and long-running statements (index builds). The caller
+    closes it.
+
+    Neon's -pooler endpoint runs PgBouncer in transaction mode, which does
+    not keep session state such as LISTEN registrations or advisory locks,
+    so this goes to the direct endpoint (NEON_DB_DIRECT_HOST, or
+    NEON_DB_HOST without "-pooler").
+    """
+    kwargs = _connection_kwargs()
+    if "host" in kwargs:
+        kwargs["host"] = os.getenv('NEON_DB_DIRECT_HOST') or kwargs["host"].replace('-pooler', '')
+    return await asyncpg.connect(timeout=CONNECT_TIMEOUT, **kwargs)
+
+
+async def init_pool():
+    """Create the connection pool (idempotent). Called from the app lifespan."""
     global pool
-    if pool is None:
-        # Initialize the connection pool
+    if pool is not None:
+        return pool
+
+    async with _pool_lock:
+        if pool is not None:
+            return pool
         try:
-            database_url = os.getenv('DATABASE_URL')
-            if not database_url:
-                raise ValueError("DATABASE_URL not set in environment variables")
-                
-            pool = await asyncpg.create_pool(database_url)
-            logger.info("Database connection pool created")
+            pool = await asyncpg.create_pool(
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=POOL_MAX_INACTIVE_LIFETIME,
+                statement_cache_size=STATEMENT_CACHE_SIZE,
+                command_timeout=COMMAND_TIMEOUT,
+                timeout=CONNECT_TIMEOUT,
+                **_connection_kwargs()
+            )
+            logger.info(
+                f"Database connection pool created (min={POOL_MIN_SIZE}, max={POOL_MAX_SIZE}, "
+                f"statement_cache={STATEMENT_CACHE_SIZE})"
+            )
         except Exception as e:
             logger.error(f"Error creating database connection pool: {e}")
             raise
-            
-    return await pool.acquire()
+
+    return pool
+
+
+async def get_pool():
+    """Return the shared pool, creating it on first use"""
+    if pool is None:
+        await init_pool()
+    return pool
+
+
+def _record_wait(started: float):
+    wait_ms = (time.perf_counter() - started) * 1000
+    _pool_metrics["acquires"] += 1
+    _pool_metrics["total_wait_ms"] += wait_ms
+    if wait_ms > _pool_metrics["max_wait_ms"]:
+        _pool_metrics["max_wait_ms"] = wait_ms
+
+
+async def get_connection(timeout: Optional[float] = None):
+    """Get a connection from the pool"""
+    current_pool = await get_pool()
+    started = time.perf_counter()
+    try:
+        connection = await current_pool.acquire(timeout=timeout or POOL_ACQUIRE_TIMEOUT)
+        # Server-side closes (Neon compute suspend, network drops) leave dead
+        # sockets in the pool - swap them for a fresh connection
+        if connection.is_closed():
+            _pool_metrics["stale_connections_replaced"] += 1
+            await current_pool.release(connection)
+            connection = await current_pool.acquire(timeout=timeout or POOL_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _pool_metrics["acquire_timeouts"] += 1
+        logger.error(
+            f"Timed out acquiring database connection after {timeout or POOL_ACQUIRE_TIMEOUT}s "
+            f"(pool size={current_pool.get_size()}, idle={current_pool.get_idle_size()})"
+        )
+        raise
+    except Exception:
+        _pool_metrics["acquire_errors"] += 1
+        raise
+
+    _record_wait(started)
+    return connection
+
 
 async def release_connection(connection):
     """Release a connection back to the pool"""
+    if connection is None or pool is None:
+        return
     await pool.release(connection)
 
+
+@asynccontextmanager
+async def acquire(timeout: Optional[float] = None):
+    """Borrow a pooled connection for the duration of an ``async with`` block"""
+    conn = await get_connection(timeout=timeout)
+    try:
+        yield conn
+    finally:
+        await release_connection(conn)
+
+
 async def fetch_one(query: str, *args) -> Optional[Dict[str, Any]]:
     """Execute a query and return a single row as a dictionary"""
-    conn = await get_connection()
-    try:
+    async with acquire() as conn:
         row = await conn.fetchrow(query, *args)
         return dict(row) if row else None
-    finally:
-        await release_connection(conn)
 
 async def fetch_all(query: str, *args) -> List[Dict[str, Any]]:
     """Execute a query and return all rows as dictionaries"""
-    conn = await get_connection()
-    try:
+    async with acquire() as conn:
         rows = await conn.fetch(query, *args)
         return [dict(row) for row in rows]
-    finally:
-        await release_connection(conn)
 
 async def execute(query: str, *args) -> str:
     """Execute a query and return the status"""
-    conn = await get_connection()
+    async with acquire() as conn:
+        return await conn.execute(query, *args)
+
+
+async def health_check(timeout: float = 5.0) -> Dict[str, Any]:
+    """Run a round trip through the pool and report latency"""
+    _pool_metrics["health_checks"] += 1
+    started = time.perf_counter()
     try:
-        status = await conn.execute(query, *args)
-        return status
-    finally:
-        await release_connection(conn)
+        async with acquire(timeout=timeout) as conn:
+            await conn.fetchval("SELECT 1", timeout=timeout)
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        _pool_metrics["last_health_check"] = {"healthy": True, "latency_ms": latency_ms, "checked_at": time.time()}
+        return {"healthy": True, "latency_ms": latency_ms}
+    except Exception as e:
+        _pool_metrics["health_check_failures"] += 1
+        _pool_metrics["last_health_check"] = {"healthy": False, "error": str(e), "checked_at": time.time()}
+        logger.warning(f"Database health check failed: {e}")
+        return {"healthy": False, "error": str(e)}
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Pool sizing plus acquire/health metrics"""
+    acquires = _pool_metrics["acquires"]
+    stats = {
+        "initialized": pool is not None,
+        "min_size": POOL_MIN_SIZE,
+        "max_size": POOL_MAX_SIZE,
+        "statement_cache_size": STATEMENT_CACHE_SIZE,
+        "acquire_timeout": POOL_ACQUIRE_TIMEOUT,
+        **_pool_metrics,
+        "avg_wait_ms": round(_pool_metrics["total_wait_ms"] / acquires, 2) if acquires else 0.0,
+    }
+    if pool is not None:
+        stats["size"] = pool.get_size()
+        stats["idle"] = pool.get_idle_size()
+    return stats
+
 
 async def close_pool():
     """Close the database connection pool"""
@@ -64,4 +236,4 @@ async def close_pool():
     if pool:
         await pool.close()
         pool = None
-        logger.info("Database connection pool closed")
\ No newline at end of file
+        logger.info("Database connection pool closed")
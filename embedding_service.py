@@ -0,0 +1,526 @@
+"""
+Embedding Service
+Batched embedding generation via the OpenRouter /embeddings endpoint
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from array import array
+from collections import OrderedDict
+from typing import Optional, List, Callable, Dict, Any
+
+import httpx
+
+import database
+from http_clients import get_http_client
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_EMBEDDINGS_URL = 'https://openrouter.ai/api/v1/embeddings'
+EMBEDDING_MODEL = 'openai/text-embedding-3-small'
+
+# Per-input character cap (same limit the single-text path always used)
+MAX_INPUT_CHARS = 8000
+# text-embedding-3-small accepts up to 2048 inputs / ~300k tokens per request;
+# stay well under both so one slow batch doesn't hold a whole document
+BATCH_MAX_INPUTS = int(os.getenv('EMBEDDING_BATCH_MAX_INPUTS', '64'))
+BATCH_MAX_TOKENS = int(os.getenv('EMBEDDING_BATCH_MAX_TOKENS', '120000'))
+BATCH_CONCURRENCY = int(os.getenv('EMBEDDING_BATCH_CONCURRENCY', '4'))
+BATCH_MAX_RETRIES = int(os.getenv('EMBEDDING_BATCH_MAX_RETRIES', '3'))
+REQUEST_TIMEOUT = 60.0
+
+# Content-hash cache: local LRU tier (float32 arrays, ~6KB per 1536-dim
+# vector) backed by the kb_embedding_cache table in Neon
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_LOCAL_MAX_ENTRIES', '1000'))
+CACHE_PERSISTENT_ENABLED = os.getenv('EMBEDDING_CACHE_PERSISTENT', 'true').lower() in ('true', '1', 'yes')
+
+# Query-embedding cache for /api/knowledge-base/search (normalized query text -> vector)
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_EMBEDDING_CACHE_MAX_ENTRIES', '500'))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv('QUERY_EMBEDDING_CACHE_TTL_SECONDS', '3600'))
+
+# Status codes worth retrying as-is
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+# Errors that may come from one bad input: the batch is split to isolate it.
+# Anything else (401/402/403: bad key, no credits) fails the whole batch at once
+INPUT_ERROR_STATUS_CODES = {400, 413, 422}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 chars per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def format_vector(embedding: List[float]) -> str:
+    """Format an embedding as a PostgreSQL vector literal: [0.1,0.2,...]"""
+    return '[' + ','.join(str(x) for x in embedding) + ']'
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of the exact text sent to the embeddings API"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (chunk hash, model).
+
+    Lookups hit the in-process LRU first, then the kb_embedding_cache table.
+    The persistent tier is best-effort: if Neon is unavailable or the table
+    hasn't been created (migrations/add_kb_embedding_cache.sql) it is skipped.
+    """
+
+    def __init__(self, max_entries: int = CACHE_LOCAL_MAX_ENTRIES, persistent: bool = CACHE_PERSISTENT_ENABLED):
+        self.max_entries = max(0, max_entries)
+        self.persistent = persistent
+        self._local: "OrderedDict[tuple, array]" = OrderedDict()
+        self.stats = {"local_hits": 0, "persistent_hits": 0, "misses": 0, "writes": 0, "persistent_errors": 0}
+
+    def _get_local(self, key: tuple) -> Optional[List[float]]:
+        vector = self._local.get(key)
+        if vector is None:
+            return None
+        self._local.move_to_end(key)
+        return vector.tolist()
+
+    def _put_local(self, key: tuple, embedding: List[float]):
+        if self.max_entries == 0:
+            return
+        self._local[key] = array('f', embedding)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    def _persistent_available(self) -> bool:
+        return self.persistent and database.is_configured()
+
+    async def get_many(self, hashes: List[str], model: str) -> Dict[str, List[float]]:
+        """Return cached embeddings for whichever hashes are known"""
+        found = {}
+        missing = []
+        for h in dict.fromkeys(hashes):
+            embedding = self._get_local((h, model))
+            if embedding is not None:
+                found[h] = embedding
+            else:
+                missing.append(h)
+        self.stats["local_hits"] += len(found)
+
+        if missing and self._persistent_available():
+            try:
+                async with database.acquire() as conn:
+                    rows = await conn.fetch(
+                        """
+                        UPDATE kb_embedding_cache
+                        SET last_used_at = NOW()
+                        WHERE model = $1 AND content_hash = ANY($2::text[])
+                        RETURNING content_hash, embedding::text AS embedding
+                        """,
+                        model,
+                        missing
+                    )
+                for row in rows:
+                    embedding = json.loads(row['embedding'])
+                    found[row['content_hash']] = embedding
+                    self._put_local((row['content_hash'], model), embedding)
+                self.stats["persistent_hits"] += len(rows)
+            except Exception as e:
+                self.stats["persistent_errors"] += 1
+                logger.warning(f"Embedding cache lookup failed (non-critical): {e}")
+
+        self.stats["misses"] += len(set(hashes)) - len(found)
+        return found
+
+    async def put_many(self, entries: Dict[str, List[float]], model: str):
+        """Store freshly generated embeddings in both tiers"""
+        if not entries:
+            return
+        for h, embedding in entries.items():
+            self._put_local((h, model), embedding)
+        self.stats["writes"] += len(entries)
+
+        if self._persistent_available():
+            try:
+                hashes = list(entries.keys())
+                async with database.acquire() as conn:
+                    await conn.execute(
+                        """
+                        INSERT INTO kb_embedding_cache (content_hash, model, embedding)
+                        SELECT cache.content_hash, $1, cache.embedding::vector
+                        FROM unnest($2::text[], $3::text[]) AS cache(content_hash, embedding)
+                        ON CONFLICT (content_hash, model) DO UPDATE SET last_used_at = NOW()
+                        """,
+                        model,
+                        hashes,
+                        [format_vector(entries[h]) for h in hashes]
+                    )
+            except Exception as e:
+                self.stats["persistent_errors"] += 1
+                logger.warning(f"Embedding cache write failed (non-critical): {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        lookups = self.stats["local_hits"] + self.stats["persistent_hits"] + self.stats["misses"]
+        hits = self.stats["local_hits"] + self.stats["persistent_hits"]
+        return {
+            **self.stats,
+            "local_entries": len(self._local),
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class EmbeddingRequestError(Exception):
+    """Raised when an /embeddings request fails"""
+
+    def __init__(self, message: str, retryable: bool, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+
+
+class BatchEmbedder:
+    """Packs many texts into each /embeddings request and runs batches concurrently"""
+
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        max_inputs: int = BATCH_MAX_INPUTS,
+        max_tokens: int = BATCH_MAX_TOKENS,
+        concurrency: int = BATCH_CONCURRENCY,
+        max_retries: int = BATCH_MAX_RETRIES,
+        cache: Optional[EmbeddingCache] = None
+    ):
+        self.model = model
+        self.cache = cache
+        self.max_inputs = max(1, max_inputs)
+        self.max_tokens = max(1, max_tokens)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+
+    def build_batches(self, texts: List[str]) -> List[List[int]]:
+        """Group input indexes into batches that respect the input and token limits"""
+        batches = []
+        current = []
+        current_tokens = 0
+
+        for idx, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if current and (len(current) >= self.max_inputs or current_tokens + tokens > self.max_tokens):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(idx)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _request(self, client: httpx.AsyncClient, api_key: str, inputs: List[str]) -> List[List[float]]:
+        """POST one batch and return embeddings in input order"""
+        try:
+            response = await client.post(
+                OPENROUTER_EMBEDDINGS_URL,
+                headers={
+                    'Authorization': f'Bearer {api_key}',
+                    'Content-Type': 'application/json'
+                },
+                json={
+                    'model': self.model,
+                    'input': inputs
+                },
+                timeout=REQUEST_TIMEOUT
+            )
+        except httpx.HTTPError as e:
+            raise EmbeddingRequestError(f"Embedding request error: {str(e)}", retryable=True)
+
+        if response.status_code != 200:
+            raise EmbeddingRequestError(
+                f"OpenRouter embedding failed ({response.status_code}): {response.text[:500]}",
+                retryable=response.status_code in RETRYABLE_STATUS_CODES,
+                status_code=response.status_code
+            )
+
+        try:
+            data = response.json().get('data') or []
+        except ValueError:
+            raise EmbeddingRequestError("OpenRouter returned invalid JSON", retryable=True)
+        if len(data) != len(inputs):
+            raise EmbeddingRequestError(
+                f"OpenRouter returned {len(data)} embeddings for {len(inputs)} inputs",
+                retryable=True
+            )
+
+        # Responses carry an explicit index - don't rely on ordering
+        ordered = [None] * len(inputs)
+        for position, item in enumerate(data):
+            item_index = item.get('index', position)
+            embedding = item.get('embedding')
+            if not embedding or not 0 <= item_index < len(inputs):
+                raise EmbeddingRequestError("OpenRouter returned an empty or out-of-range embedding", retryable=True)
+            ordered[item_index] = embedding
+        return ordered
+
+    async def _embed_batch(
+        self,
+        client: httpx.AsyncClient,
+        api_key: str,
+        texts: List[str],
+        indexes: List[int],
+        results: List[Optional[List[float]]],
+        attempt: int = 0
+    ):
+        """Embed one batch; on failure retry or bisect so only the failing part is resent"""
+        try:
+            embeddings = await self._request(client, api_key, [texts[i] for i in indexes])
+            for idx, embedding in zip(indexes, embeddings):
+                results[idx] = embedding
+            return
+        except EmbeddingRequestError as e:
+            error = e
+
+        if attempt >= self.max_retries:
+            logger.error(f"Giving up on embedding batch of {len(indexes)} inputs: {error}")
+            return
+
+        if error.status_code in INPUT_ERROR_STATUS_CODES and len(indexes) > 1:
+            # Likely one bad input - split so the good half still gets embedded
+            mid = len(indexes) // 2
+            logger.warning(f"Embedding batch of {len(indexes)} failed ({error}), splitting and retrying")
+            await asyncio.gather(
+                self._embed_batch(client, api_key, texts, indexes[:mid], results, attempt),
+                self._embed_batch(client, api_key, texts, indexes[mid:], results, attempt)
+            )
+            return
+
+        if error.status_code in INPUT_ERROR_STATUS_CODES:
+            logger.error(f"Embedding input {indexes[0]} rejected: {error}")
+            return
+
+        if not error.retryable:
+            logger.error(f"Embedding batch of {len(indexes)} inputs failed: {error}")
+            return
+
+        delay = 2 ** attempt
+        logger.warning(f"Embedding batch of {len(indexes)} failed ({error}), retrying in {delay}s")
+        await asyncio.sleep(delay)
+        await self._embed_batch(client, api_key, texts, indexes, results, attempt + 1)
+
+    async def embed(
+        self,
+        texts: List[str],
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> List[Optional[List[float]]]:
+        """
+        Embed a list of texts.
+
+        Args:
+            texts: Input texts (each truncated to MAX_INPUT_CHARS)
+            on_progress: Optional callback(done_inputs, total_inputs) fired after each batch
+
+        Returns:
+            Embeddings aligned with ``texts``; None where an input could not be embedded
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        if not texts:
+            return results
+
+        api_key = os.getenv('OPENROUTER_API_KEY')
+        if not api_key:
+            logger.warning("OPENROUTER_API_KEY not set, skipping embedding generation")
+            return results
+
+        inputs = [(text or '')[:MAX_INPUT_CHARS] for text in texts]
+        # Empty strings are rejected by the API - leave them as None
+        embeddable = [i for i, text in enumerate(inputs) if text.strip()]
+
+        # Unchanged chunks (re-uploads, repeated website saves) come from the cache
+        hashes = {i: content_hash(inputs[i]) for i in embeddable}
+        if self.cache:
+            cached = await self.cache.get_many(list(hashes.values()), self.model)
+            for i in embeddable:
+                if hashes[i] in cached:
+                    results[i] = cached[hashes[i]]
+            pending = [i for i in embeddable if results[i] is None]
+            if cached:
+                logger.info(f"Embedding cache served {len(embeddable) - len(pending)}/{len(embeddable)} inputs")
+        else:
+            pending = embeddable
+
+        batches = [[pending[i] for i in batch] for batch in self.build_batches([inputs[i] for i in pending])]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        done = len(embeddable) - len(pending)
+        if on_progress and done:
+            on_progress(done, len(embeddable))
+
+        if batches:
+            client = get_http_client('openrouter')
+            async def run(batch: List[int]):
+                nonlocal done
+                async with semaphore:
+                    await self._embed_batch(client, api_key, inputs, batch, results)
+                done += len(batch)
+                if on_progress:
+                    on_progress(done, len(embeddable))
+
+            await asyncio.gather(*(run(batch) for batch in batches))
+
+            if self.cache:
+                await self.cache.put_many(
+                    {hashes[i]: results[i] for i in pending if results[i] is not None},
+                    self.model
+                )
+
+        embedded = sum(1 for r in results if r is not None)
+        logger.info(f"Generated {embedded}/{len(texts)} embeddings in {len(batches)} batches")
+        return results
+
+
+class QueryEmbeddingCache:
+    """
+    TTL + LRU cache of normalized search query -> embedding, with single-flight
+    coalescing: concurrent requests for the same query share one upstream call.
+    """
+
+    def __init__(
+        self,
+        embedder: "BatchEmbedder",
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = QUERY_CACHE_TTL_SECONDS
+    ):
+        self.embedder = embedder
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "upstream_calls": 0}
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Collapse whitespace so trivially different queries share an entry.
+        This is also exactly the text that gets embedded, so a cached vector
+        never depends on which spelling was requested first (case is kept:
+        it can change the embedding).
+        """
+        return ' '.join((text or '')[:MAX_INPUT_CHARS].split())
+
+    def _key(self, text: str) -> tuple:
+        return (self.embedder.model, self.normalize(text))
+
+    def _lookup(self, key: tuple) -> Optional[List[float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, vector = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return vector.tolist()
+
+    def _store(self, key: tuple, embedding: List[float]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, array('f', embedding))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, text: str) -> Optional[List[float]]:
+        """Embedding for one query (None if it could not be generated)"""
+        return (await self.get_many([text]))[0]
+
+    async def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embeddings for several queries. Cache misses are sent upstream in a
+        single /embeddings request; queries already in flight are awaited.
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        keys = [self._key(text) for text in texts]
+        to_fetch: Dict[tuple, str] = {}
+        waiting: Dict[tuple, asyncio.Future] = {}
+
+        for i, key in enumerate(keys):
+            cached = self._lookup(key)
+            if cached is not None:
+                results[i] = cached
+                self.stats["hits"] += 1
+            elif key in self._inflight:
+                waiting[key] = self._inflight[key]
+                self.stats["coalesced"] += 1
+            elif key in to_fetch:
+                self.stats["coalesced"] += 1
+            else:
+                to_fetch[key] = key[1]
+                self.stats["misses"] += 1
+
+        resolved: Dict[tuple, Optional[List[float]]] = {}
+
+        if to_fetch:
+            loop = asyncio.get_running_loop()
+            owned = {key: loop.create_future() for key in to_fetch}
+            self._inflight.update(owned)
+            try:
+                self.stats["upstream_calls"] += 1
+                embeddings = await self.embedder.embed(list(to_fetch.values()))
+                for key, embedding in zip(to_fetch, embeddings):
+                    if embedding:
+                        self._store(key, embedding)
+                    resolved[key] = embedding
+                    owned[key].set_result(embedding)
+            finally:
+                # Never leave followers waiting on a request that errored or was cancelled
+                for key, future in owned.items():
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+                    if not future.done():
+                        future.set_result(None)
+
+        for key, future in waiting.items():
+            # shield: a follower disconnecting must not cancel the leader's result
+            resolved[key] = await asyncio.shield(future)
+
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                results[i] = resolved.get(key)
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+# Global instances
+_embedding_cache = None
+_batch_embedder = None
+_query_embedding_cache = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the shared content-hash embedding cache"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+def get_batch_embedder() -> BatchEmbedder:
+    """Get the shared batch embedder (backed by the embedding cache)"""
+    global _batch_embedder
+    if _batch_embedder is None:
+        _batch_embedder = BatchEmbedder(cache=get_embedding_cache())
+    return _batch_embedder
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Get the shared search-query embedding cache"""
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        # Queries skip the content-hash cache: they'd only pollute kb_embedding_cache
+        _query_embedding_cache = QueryEmbeddingCache(embedder=BatchEmbedder(cache=None))
+    return _query_embedding_cache
@@ -0,0 +1,310 @@
+"""
+Extraction Pool
+Runs CPU-heavy PDF/DOCX text extraction in separate processes so a large
+document can't block the event loop (WebSockets, SSE, other requests)
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from typing import Optional, Dict, Any, AsyncIterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Per-job limits. RLIMIT_AS caps the child's address space, so a runaway
+# document fails with MemoryError instead of pushing the dyno into R14/R15
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv('EXTRACTION_TIMEOUT_SECONDS', '120'))
+EXTRACTION_MEMORY_LIMIT_MB = int(os.getenv('EXTRACTION_MEMORY_LIMIT_MB', '512'))
+# Set to false to run extraction in a thread instead (e.g. platforms without fork)
+EXTRACTION_USE_PROCESSES = os.getenv('EXTRACTION_USE_PROCESSES', 'true').lower() in ('true', '1', 'yes')
+
+EXTRACTORS = {
+    'pdf': 'extract_from_pdf',
+    'docx': 'extract_from_docx',
+}
+
+
+class ExtractionError(Exception):
+    """Extraction failed, timed out or exceeded its memory limit"""
+
+
+def _container_memory_bytes() -> Optional[int]:
+    """Memory available to this dyno/container (cgroup v2, then v1)"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value.isdigit() and int(value) < 1 << 50:
+                return int(value)
+        except OSError:
+            continue
+    return None
+
+
+def default_max_workers() -> int:
+    """
+    Extraction processes per web worker, sized to the dyno: no more than the
+    CPUs and half the memory allow once split across WEB_CONCURRENCY workers.
+    A 512MB dyno with 2 web workers gets one extraction process each.
+    """
+    web_workers = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+    by_cpu = max(1, (os.cpu_count() or 1) // web_workers)
+    memory = _container_memory_bytes()
+    if memory is None:
+        return min(by_cpu, 2)
+    by_memory = int(memory * 0.5) // (EXTRACTION_MEMORY_LIMIT_MB * 1024 * 1024) // web_workers
+    return max(1, min(by_cpu, by_memory))
+
+
+EXTRACTION_MAX_WORKERS = int(os.getenv('EXTRACTION_MAX_WORKERS', '0')) or default_max_workers()
+
+
+def _apply_limits(memory_limit_bytes: int, cpu_limit_seconds: float):
+    import resource
+    if memory_limit_bytes > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+    if cpu_limit_seconds > 0:
+        # CPU time, not wall time - a streaming job blocked on a slow consumer isn't charged
+        cpu_seconds = int(cpu_limit_seconds) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+
+
+def _extraction_child(kind: str, file_bytes: bytes, conn, memory_limit_bytes: int, cpu_limit_seconds: float):
+    """Entry point of the extraction process: run one extractor, send back ('ok'|'error', payload)"""
+    try:
+        _apply_limits(memory_limit_bytes, cpu_limit_seconds)
+
+        from background_text_processor import TextExtractor
+        text = getattr(TextExtractor, EXTRACTORS[kind])(file_bytes)
+        conn.send(('ok', text))
+    except MemoryError:
+        conn.send(('error', f"Failed to extract text: exceeded the {memory_limit_bytes // (1024 * 1024)}MB extraction memory limit"))
+    except BaseException as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+
+def _pdf_pages_child(file_path: str, conn, memory_limit_bytes: int, cpu_limit_seconds: float):
+    """Entry point for page streaming: send ('page', (number, count, text)) per page, then ('done', None)"""
+    try:
+        _apply_limits(memory_limit_bytes, cpu_limit_seconds)
+
+        from background_text_processor import TextExtractor
+        for page in TextExtractor.iter_pdf_pages(file_path):
+            conn.send(('page', page))
+        conn.send(('done', None))
+    except MemoryError:
+        conn.send(('error', f"Failed to extract text: exceeded the {memory_limit_bytes // (1024 * 1024)}MB extraction memory limit"))
+    except BaseException as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+
+def _receive(process, conn, timeout: float):
+    """Blocking wait for the child's next message (runs in a thread)"""
+    if not conn.poll(timeout):
+        raise asyncio.TimeoutError()
+    try:
+        return conn.recv()
+    except EOFError:
+        # Died without reporting - OOM kill, CPU limit or a crash in native code
+        process.join(5)
+        return ('error', f"Failed to extract text: extraction process exited unexpectedly (exit code {process.exitcode})")
+
+
+def _reap(process, conn):
+    """Close the pipe and make sure the child is gone"""
+    conn.close()
+    process.join(1)
+    if process.is_alive():
+        process.kill()
+        process.join(5)
+
+
+class ExtractionPool:
+    """
+    Bounded set of short-lived extraction processes.
+
+    Each job gets its own process forked from a forkserver that already has
+    the extraction libraries imported, so startup is cheap and a timed-out
+    or oversized job can be killed without affecting any other job. At most
+    ``max_workers`` jobs run at once; the rest wait their turn.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = EXTRACTION_MAX_WORKERS,
+        timeout: float = EXTRACTION_TIMEOUT_SECONDS,
+        memory_limit_mb: int = EXTRACTION_MEMORY_LIMIT_MB
+    ):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.memory_limit_bytes = memory_limit_mb * 1024 * 1024
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._context = None
+        self.stats = {"running": 0, "waiting": 0, "completed": 0, "failed": 0, "timeouts": 0, "total_seconds": 0.0}
+
+    def _get_context(self):
+        if self._context is None:
+            # forkserver: children come from a clean single-threaded server, not
+            # from this worker (which has an event loop and client threads)
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._context = multiprocessing.get_context(method)
+            if method == 'forkserver':
+                self._context.set_forkserver_preload(['background_text_processor'])
+        return self._context
+
+    def _start(self, target, *args):
+        context = self._get_context()
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(
+            target=target,
+            args=(*args, child_conn, self.memory_limit_bytes, self.timeout),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    async def _run_in_process(self, kind: str, file_bytes: bytes):
+        process, conn = self._start(_extraction_child, kind, file_bytes)
+        try:
+            return await asyncio.to_thread(_receive, process, conn, self.timeout)
+        finally:
+            await asyncio.to_thread(_reap, process, conn)
+
+    async def _run_in_thread(self, kind: str, file_bytes: bytes):
+        from background_text_processor import TextExtractor
+        extractor = getattr(TextExtractor, EXTRACTORS[kind])
+        try:
+            return ('ok', await asyncio.wait_for(asyncio.to_thread(extractor, file_bytes), self.timeout))
+        except asyncio.TimeoutError:
+            raise
+        except Exception as e:
+            return ('error', str(e))
+
+    async def extract(self, kind: str, file_bytes: bytes, file_name: str = '') -> str:
+        """
+        Extract text off the event loop.
+
+        Args:
+            kind: 'pdf' or 'docx'
+            file_bytes: Raw file content
+            file_name: Used for logging only
+
+        Raises:
+            ExtractionError: On extractor failure, timeout or memory limit
+        """
+        if kind not in EXTRACTORS:
+            raise ValueError(f"No process extractor for '{kind}'")
+
+        self.stats["waiting"] += 1
+        async with self._semaphore:
+            self.stats["waiting"] -= 1
+            self.stats["running"] += 1
+            start = time.monotonic()
+            try:
+                if EXTRACTION_USE_PROCESSES:
+                    status, payload = await self._run_in_process(kind, file_bytes)
+                else:
+                    status, payload = await self._run_in_thread(kind, file_bytes)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                logger.error(f"{kind.upper()} extraction timed out after {self.timeout}s: {file_name}")
+                raise ExtractionError(f"Text extraction timed out after {self.timeout:.0f}s")
+            finally:
+                self.stats["running"] -= 1
+                self.stats["total_seconds"] += time.monotonic() - start
+
+        if status != 'ok':
+            self.stats["failed"] += 1
+            logger.error(f"{kind.upper()} extraction failed for {file_name}: {payload}")
+            raise ExtractionError(payload)
+
+        self.stats["completed"] += 1
+        return payload
+
+    async def iter_pdf_pages(self, file_path: str, file_name: str = '') -> AsyncIterator[Tuple[int, int, str]]:
+        """
+        Stream a PDF's pages from the extraction process as they are parsed.
+
+        The child reads the file from disk (no bytes copied through the pipe)
+        and blocks once the pipe is full, so a slow consumer applies
+        backpressure instead of the pages piling up in memory. The timeout
+        applies to each page; the CPU limit covers the whole job.
+
+        Yields:
+            (page_number, page_count, cleaned_text) as TextExtractor.iter_pdf_pages
+
+        Raises:
+            ExtractionError: On extractor failure, timeout or memory limit
+        """
+        self.stats["waiting"] += 1
+        async with self._semaphore:
+            self.stats["waiting"] -= 1
+            self.stats["running"] += 1
+            start = time.monotonic()
+            failed = False
+            try:
+                if not EXTRACTION_USE_PROCESSES:
+                    from background_text_processor import TextExtractor
+                    pages = await asyncio.wait_for(
+                        asyncio.to_thread(lambda: list(TextExtractor.iter_pdf_pages(file_path))),
+                        self.timeout
+                    )
+                    for page in pages:
+                        yield page
+                    return
+
+                process, conn = self._start(_pdf_pages_child, file_path)
+                try:
+                    while True:
+                        status, payload = await asyncio.to_thread(_receive, process, conn, self.timeout)
+                        if status == 'done':
+                            break
+                        if status == 'error':
+                            failed = True
+                            logger.error(f"PDF extraction failed for {file_name}: {payload}")
+                            raise ExtractionError(payload)
+                        yield payload
+                finally:
+                    await asyncio.to_thread(_reap, process, conn)
+
+            except asyncio.TimeoutError:
+                failed = True
+                self.stats["timeouts"] += 1
+                logger.error(f"PDF extraction timed out after {self.timeout}s: {file_name}")
+                raise ExtractionError(f"Text extraction timed out after {self.timeout:.0f}s")
+            except Exception:
+                failed = True
+                raise
+            finally:
+                self.stats["running"] -= 1
+                self.stats["total_seconds"] += time.monotonic() - start
+                if failed:
+                    self.stats["failed"] += 1
+                else:
+                    self.stats["completed"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "max_workers": self.max_workers,
+            "timeout_seconds": self.timeout,
+            "memory_limit_mb": self.memory_limit_bytes // (1024 * 1024),
+            "mode": "process" if EXTRACTION_USE_PROCESSES else "thread",
+        }
+
+
+_extraction_pool = None
+
+def get_extraction_pool() -> ExtractionPool:
+    """Per-worker extraction pool (created on first use, after gunicorn forks)"""
+    global _extraction_pool
+    if _extraction_pool is None:
+        _extraction_pool = ExtractionPool()
+    return _extraction_pool
@@ -9,6 +9,9 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 from supabase import Client
 
+import database
+from supabase_async import get_async_supabase
+
 logger = logging.getLogger(__name__)
 
 class FileProcessingService:
@@ -16,6 +19,11 @@ class FileProcessingService:
     
     def __init__(self, supabase_client: Client):
         self.supabase = supabase_client
+
+    @property
+    def db(self):
+        """Async client for queries made from request handlers"""
+        return get_async_supabase()
     
     def extract_storage_path_from_url(self, file_url: str) -> Optional[tuple[str, str]]:
         """
@@ -67,7 +75,7 @@ class FileProcessingService:
             bucket_name, storage_path = result
             
             # Delete from Supabase storage using the correct bucket
-            response = self.supabase.storage.from_(bucket_name).remove([storage_path])
+            response = await self.db.storage.from_(bucket_name).remove([storage_path])
             
             logger.info(f"Deleted old storage file from {bucket_name}: {storage_path}")
             return True
@@ -106,7 +114,7 @@ class FileProcessingService:
         """
         try:
             # Check if record already exists for this user and filename
-            existing_response = self.supabase.table("firm_users_knowledge_base").select("*").eq(
+            existing_response = await self.db.table("firm_users_knowledge_base").select("*").eq(
                 "firm_user_id", firm_user_id
             ).eq("file_name", file_name).execute()
             
@@ -139,7 +147,7 @@ class FileProcessingService:
                     "updated_at": datetime.utcnow().isoformat()
                 }
                 
-                response = self.supabase.table("firm_users_knowledge_base").update(update_data).eq(
+                response = await self.db.table("firm_users_knowledge_base").update(update_data).eq(
                     "firm_user_id", firm_user_id
                 ).eq("file_name", file_name).execute()
                 
@@ -154,7 +162,7 @@ class FileProcessingService:
                     }
                 else:
                     # Fetch the record after update if response data is empty
-                    updated_response = self.supabase.table("firm_users_knowledge_base").select("*").eq(
+                    updated_response = await self.db.table("firm_users_knowledge_base").select("*").eq(
                         "firm_user_id", firm_user_id
                     ).eq("file_name", file_name).execute()
                     if updated_response.data and len(updated_response.data) > 0:
@@ -182,7 +190,7 @@ class FileProcessingService:
                     "source": source
                 }
                 
-                response = self.supabase.table("firm_users_knowledge_base").insert(record_data).execute()
+                response = await self.db.table("firm_users_knowledge_base").insert(record_data).execute()
                 
                 if response.data:
                     record_id = str(response.data[0].get("id"))
@@ -230,7 +238,7 @@ class FileProcessingService:
                 "updated_at": datetime.utcnow().isoformat()
             }
             
-            response = self.supabase.table("firm_users_knowledge_base").update(update_data).eq("id", record_id).execute()
+            response = await self.db.table("firm_users_knowledge_base").update(update_data).eq("id", record_id).execute()
             
             if response.data:
                 logger.info(f"Updated neon_record_ids for {record_id}: {len(neon_record_ids)} records")
@@ -259,28 +267,11 @@ class FileProcessingService:
             if not neon_record_ids or len(neon_record_ids) == 0:
                 return True
             
-            # Import here to avoid circular imports
-            import asyncpg
-            import os
-            
-            NEON_DB_HOST = os.getenv("NEON_DB_HOST")
-            NEON_DB_USER = os.getenv("NEON_DB_USER")
-            NEON_DB_PASSWORD = os.getenv("NEON_DB_PASSWORD")
-            NEON_DB_NAME = os.getenv("NEON_DB_NAME", "neondb")
-            
-            if not all([NEON_DB_HOST, NEON_DB_USER, NEON_DB_PASSWORD]):
+            if not database.is_configured():
                 logger.warning("Neon DB credentials not configured, skipping record deletion")
                 return True
             
-            conn = await asyncpg.connect(
-                host=NEON_DB_HOST,
-                user=NEON_DB_USER,
-                password=NEON_DB_PASSWORD,
-                database=NEON_DB_NAME,
-                ssl="require"
-            )
-            
-            try:
+            async with database.acquire() as conn:
                 # Try to convert string IDs to integers (new format)
                 try:
                     int_ids = [int(id) for id in neon_record_ids]
@@ -305,8 +296,6 @@ class FileProcessingService:
                         logger.warning("Cannot delete UUID records without file_name and firm_user_id")
                 
                 return True
-            finally:
-                await conn.close()
                 
         except Exception as e:
             logger.warning(f"Failed to delete Neon records (non-critical): {str(e)}")
@@ -316,7 +305,7 @@ class FileProcessingService:
         """Get processing record by primary key 'id'"""
         try:
             logger.debug(f"Looking up record id: {record_id}")
-            response = self.supabase.table("firm_users_knowledge_base").select("*").eq("id", record_id).execute()
+            response = await self.db.table("firm_users_knowledge_base").select("*").eq("id", record_id).execute()
             
             if response.data and len(response.data) > 0:
                 logger.debug(f"Found record for {record_id}")
@@ -343,7 +332,7 @@ class FileProcessingService:
     ) -> Dict[str, Any]:
         """Get files for a user, optionally filtered by agent"""
         try:
-            query = self.supabase.table("firm_users_knowledge_base").select("*").eq("firm_user_id", firm_user_id)
+            query = self.db.table("firm_users_knowledge_base").select("*").eq("firm_user_id", firm_user_id)
             
             if agent_id:
                 query = query.eq("agent_id", agent_id)
@@ -354,7 +343,7 @@ class FileProcessingService:
             if limit:
                 query = query.limit(limit)
             
-            response = query.execute()
+            response = await query.execute()
             
             return {
                 "success": True,
@@ -0,0 +1,326 @@
+"""
+File Status Bus
+Pub/sub for file processing status (uploading -> ... -> completed/failed).
+States are kept in the Neon file_processing_status table and pushed to every
+web worker with LISTEN/NOTIFY, so an SSE client sees progress no matter which
+worker (or the job worker dyno) is doing the processing.
+A local in-process backend covers development without Neon.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Dict, Any, AsyncIterator, Set
+
+import database
+from pg_listener import get_pg_listener
+
+logger = logging.getLogger(__name__)
+
+# 'postgres' (default when Neon is configured) or 'local' (in-process, single worker)
+FILE_STATUS_BACKEND = os.getenv('FILE_STATUS_BACKEND', '').lower()
+FILE_STATUS_CHANNEL = 'file_status'
+# Last states kept in memory per worker, and for how long
+FILE_STATUS_CACHE_MAX_ENTRIES = int(os.getenv('FILE_STATUS_CACHE_MAX_ENTRIES', '1000'))
+FILE_STATUS_CACHE_TTL_SECONDS = float(os.getenv('FILE_STATUS_CACHE_TTL_SECONDS', '3600'))
+# Rows older than this are pruned from file_processing_status
+FILE_STATUS_RETENTION_HOURS = int(os.getenv('FILE_STATUS_RETENTION_HOURS', '24'))
+# SSE comment interval so proxies (Heroku router: 55s idle) keep the stream open
+FILE_STATUS_KEEPALIVE_SECONDS = float(os.getenv('FILE_STATUS_KEEPALIVE_SECONDS', '15'))
+# NOTIFY payloads are capped at 8000 bytes
+MAX_MESSAGE_LENGTH = 1000
+MAINTENANCE_INTERVAL_SECONDS = 600
+MAX_FLUSH_BACKOFF_SECONDS = 60
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class _Subscription:
+    """One SSE stream: holds only the newest state (slow readers skip stale ones)"""
+
+    __slots__ = ("state", "event")
+
+    def __init__(self):
+        self.state: Optional[Dict[str, Any]] = None
+        self.event = asyncio.Event()
+
+    def push(self, state: Dict[str, Any]):
+        self.state = state
+        self.event.set()
+
+
+class FileStatusBus:
+    """
+    Last-state cache + subscribers in this worker, fanned out across workers
+    through Postgres.
+
+    publish() is synchronous and never waits on the database: it updates the
+    local cache, wakes local subscribers and queues the state for a writer
+    task, which upserts pending states and NOTIFYs in one statement. States
+    for the same file are coalesced, so a burst of progress updates costs one
+    round trip. Other workers' states arrive on the worker's shared LISTEN
+    connection (pg_listener.py). If Neon is unreachable the bus keeps
+    working locally.
+    """
+
+    def __init__(self, backend: str = 'local'):
+        self.backend = backend
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._subscribers: Dict[str, Set[_Subscription]] = {}
+        self._outbox: Dict[str, Dict[str, Any]] = {}
+        self._outbox_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = []
+        self._listening = False
+        self._last_maintenance = 0.0
+        self.stats = {"published": 0, "flushed": 0, "flush_errors": 0, "notifications": 0}
+
+    # ------------------------------------------------------------------
+    # Local state
+    # ------------------------------------------------------------------
+
+    def _cache_get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(file_id)
+        if entry is None:
+            return None
+        stored_at, state = entry
+        if time.monotonic() - stored_at > FILE_STATUS_CACHE_TTL_SECONDS:
+            del self._cache[file_id]
+            return None
+        self._cache.move_to_end(file_id)
+        return state
+
+    def _apply(self, file_id: str, state: Dict[str, Any]):
+        """Store as the latest state and wake this worker's subscribers"""
+        self._cache[file_id] = (time.monotonic(), state)
+        self._cache.move_to_end(file_id)
+        while len(self._cache) > FILE_STATUS_CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+        for subscription in self._subscribers.get(file_id, ()):
+            subscription.push(state)
+
+    def _publish_on_loop(self, file_id: str, state: Dict[str, Any]):
+        self._apply(file_id, state)
+        if self.backend == 'postgres' and self._outbox_event is not None:
+            self._outbox[file_id] = state
+            self._outbox_event.set()
+
+    def publish(self, file_id: str, state: Dict[str, Any]):
+        """Record a new state for file_id. Safe to call from worker threads."""
+        if state.get("message") and len(state["message"]) > MAX_MESSAGE_LENGTH:
+            state = {**state, "message": state["message"][:MAX_MESSAGE_LENGTH]}
+        self.stats["published"] += 1
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is not None and running is not self._loop:
+            self._loop.call_soon_threadsafe(self._publish_on_loop, file_id, state)
+        else:
+            self._publish_on_loop(file_id, state)
+
+    async def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Latest state for file_id: local cache, then the shared table"""
+        state = self._cache_get(file_id)
+        if state is not None or self.backend != 'postgres':
+            return state
+        try:
+            async with database.acquire() as conn:
+                raw = await conn.fetchval(
+                    "SELECT state FROM file_processing_status WHERE file_id = $1",
+                    file_id
+                )
+        except Exception as e:
+            logger.warning(f"Could not read status for file {file_id}: {e}")
+            return None
+        if raw is None:
+            return None
+        state = json.loads(raw)
+        # A newer state may have arrived while we were reading
+        if self._cache_get(file_id) is None:
+            self._apply(file_id, state)
+        return self._cache_get(file_id)
+
+    async def subscribe(
+        self,
+        file_id: str,
+        keepalive: float = FILE_STATUS_KEEPALIVE_SECONDS
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield the last known state (if any), then each new state as it is
+        published. Yields None after ``keepalive`` seconds without an update.
+        Runs until the caller stops iterating.
+        """
+        subscription = _Subscription()
+        # Register before the replay so nothing published in between is missed
+        self._subscribers.setdefault(file_id, set()).add(subscription)
+        try:
+            last = await self.get(file_id)
+            if last is not None:
+                yield last
+
+            while True:
+                try:
+                    await asyncio.wait_for(subscription.event.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                subscription.event.clear()
+                if subscription.state != last:
+                    last = subscription.state
+                    yield last
+        finally:
+            subscribers = self._subscribers.get(file_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[file_id]
+
+    # ------------------------------------------------------------------
+    # Postgres fan-out
+    # ------------------------------------------------------------------
+
+    async def _flush(self):
+        pending, self._outbox = self._outbox, {}
+        try:
+            async with database.acquire() as conn:
+                await conn.execute(
+                    """
+                    WITH upserted AS (
+                        INSERT INTO file_processing_status (file_id, state, updated_at)
+                        SELECT t.file_id, t.state::jsonb, NOW()
+                        FROM unnest($1::text[], $2::text[]) AS t(file_id, state)
+                        ON CONFLICT (file_id) DO UPDATE
+                        SET state = EXCLUDED.state, updated_at = EXCLUDED.updated_at
+                        RETURNING file_id, state
+                    )
+                    SELECT pg_notify($3, json_build_object('file_id', file_id, 'state', state, 'origin', $4::text)::text)
+                    FROM upserted
+                    """,
+                    list(pending), [json.dumps(s) for s in pending.values()],
+                    FILE_STATUS_CHANNEL, self.origin
+                )
+            self.stats["flushed"] += len(pending)
+        except Exception as e:
+            self.stats["flush_errors"] += 1
+            logger.warning(f"File status flush failed ({len(pending)} states, will retry): {e}")
+            # Put them back unless a newer state was published meanwhile
+            for file_id, state in pending.items():
+                self._outbox.setdefault(file_id, state)
+            raise
+
+    async def _maintain(self):
+        async with database.acquire() as conn:
+            await conn.execute(
+                "DELETE FROM file_processing_status WHERE updated_at < NOW() - make_interval(hours => $1)",
+                FILE_STATUS_RETENTION_HOURS
+            )
+
+    async def _writer(self):
+        backoff = 1.0
+        while True:
+            await self._outbox_event.wait()
+            self._outbox_event.clear()
+            try:
+                if self._outbox:
+                    await self._flush()
+                if time.monotonic() - self._last_maintenance > MAINTENANCE_INTERVAL_SECONDS:
+                    self._last_maintenance = time.monotonic()
+                    await self._maintain()
+                backoff = 1.0
+            except Exception as e:
+                if not self._outbox:
+                    logger.warning(f"File status maintenance failed: {e}")
+                    continue
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_FLUSH_BACKOFF_SECONDS)
+                self._outbox_event.set()
+
+    def _on_notification(self, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        # Our own states were applied when published
+        if message.get("origin") == self.origin:
+            return
+        self.stats["notifications"] += 1
+        self._apply(message["file_id"], message["state"])
+
+    async def _resync(self):
+        """After a reconnect: catch up on files someone here is watching"""
+        watched = list(self._subscribers)
+        if not watched:
+            return
+        async with database.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT file_id, state FROM file_processing_status WHERE file_id = ANY($1::text[])",
+                watched
+            )
+        for row in rows:
+            state = json.loads(row["state"])
+            if self._cache_get(row["file_id"]) != state:
+                self._apply(row["file_id"], state)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self, listen: bool = True):
+        """
+        Start fan-out on the running loop. ``listen=False`` publishes only
+        (job worker dyno: nobody subscribes there).
+        """
+        self._loop = asyncio.get_running_loop()
+        if self.backend != 'postgres' or self._tasks:
+            return
+        self._outbox_event = asyncio.Event()
+        self._tasks.append(asyncio.create_task(self._writer()))
+        if listen:
+            get_pg_listener().listen(FILE_STATUS_CHANNEL, self._on_notification, on_reconnect=self._resync)
+            self._listening = True
+        logger.info(f"File status bus started ({self.backend} backend, listen={listen})")
+
+    async def stop(self):
+        # Push out anything still pending (e.g. a final 'completed')
+        if self._outbox:
+            try:
+                await self._flush()
+            except Exception:
+                pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._outbox_event = None
+        if self._listening:
+            self._listening = False
+            await get_pg_listener().unlisten(FILE_STATUS_CHANNEL)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "backend": self.backend,
+            "cached_states": len(self._cache),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "pending": len(self._outbox),
+            "listening": self._listening,
+        }
+
+
+_file_status_bus = None
+
+def get_file_status_bus() -> FileStatusBus:
+    """Process-wide bus (Postgres fan-out when Neon is configured, else local)"""
+    global _file_status_bus
+    if _file_status_bus is None:
+        backend = FILE_STATUS_BACKEND or ('postgres' if database.is_configured() else 'local')
+        _file_status_bus = FileStatusBus(backend)
+    return _file_status_bus
@@ -0,0 +1,303 @@
+"""
+GHL Subaccount Cache
+TTL cache over ghl_subaccounts for the lookups made on hot paths:
+ghl_location_id -> firm_user_id (webhooks), firm_user_id -> location ids
+(notification listing / mark-all-read) and (firm_user_id, agent_id) ->
+location id + pit_token (social posting, media).
+
+Code that writes ghl_subaccounts calls invalidate_user(); the invalidation
+is NOTIFYed to the other workers so none of them keep serving a stale token.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+
+import database
+from pg_listener import get_pg_listener
+from supabase_async import get_async_supabase
+
+logger = logging.getLogger(__name__)
+
+GHL_CACHE_TTL_SECONDS = float(os.getenv('GHL_CACHE_TTL_SECONDS', '300'))
+# Misses (no subaccount yet, token not captured yet) are re-checked sooner
+GHL_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv('GHL_CACHE_NEGATIVE_TTL_SECONDS', '30'))
+GHL_CACHE_MAX_ENTRIES = int(os.getenv('GHL_CACHE_MAX_ENTRIES', '5000'))
+GHL_CACHE_CHANNEL = 'ghl_cache_invalidate'
+
+
+class _TTLMap:
+    """LRU map whose entries expire; get() returns (found, value)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key) -> tuple:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def put(self, key, value, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def pop_where(self, predicate):
+        for key in [k for k, (_, v) in self._entries.items() if predicate(k, v)]:
+            del self._entries[key]
+
+
+class GHLSubaccountCache:
+    """
+    Per-worker cache of ghl_subaccounts lookups. Misses are queried through
+    the async Supabase client.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = GHL_CACHE_TTL_SECONDS,
+        negative_ttl_seconds: float = GHL_CACHE_NEGATIVE_TTL_SECONDS,
+        max_entries: int = GHL_CACHE_MAX_ENTRIES
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._location_user = _TTLMap(max_entries)
+        self._user_locations = _TTLMap(max_entries)
+        self._credentials = _TTLMap(max_entries)
+        # Bumped by every invalidation (and per user; _epoch by clear()), so a
+        # query in flight during one doesn't write the pre-invalidation row back
+        self._generation = 0
+        self._epoch = 0
+        self._user_generations: "OrderedDict[str, int]" = OrderedDict()
+        self._max_entries = max(1, max_entries)
+        self._listening = False
+        self.stats = {"hits": 0, "misses": 0, "queries": 0, "invalidations": 0, "remote_invalidations": 0}
+
+    def _ttl(self, value) -> float:
+        return self.ttl_seconds if value else self.negative_ttl_seconds
+
+    def _user_generation(self, firm_user_id: str) -> tuple:
+        return self._epoch, self._user_generations.get(firm_user_id, 0)
+
+    def _bump(self, firm_user_id: str):
+        self._generation += 1
+        self._user_generations[firm_user_id] = self._generation
+        self._user_generations.move_to_end(firm_user_id)
+        while len(self._user_generations) > self._max_entries:
+            self._user_generations.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    async def get_users_for_locations(self, location_ids: List[str]) -> Dict[str, Optional[str]]:
+        """ghl_location_id -> firm_user_id (None when unmapped), one query for all misses"""
+        users: Dict[str, Optional[str]] = {}
+        missing = []
+        for location_id in set(location_ids):
+            found, user_id = self._location_user.get(location_id)
+            if found:
+                users[location_id] = user_id
+                self.stats["hits"] += 1
+            else:
+                missing.append(location_id)
+                self.stats["misses"] += 1
+
+        if missing:
+            self.stats["queries"] += 1
+            generation = self._generation
+            result = await (
+                get_async_supabase().table("ghl_subaccounts")
+                .select("ghl_location_id, firm_user_id")
+                .in_("ghl_location_id", missing)
+                .execute()
+            )
+            rows: Dict[str, Optional[str]] = {}
+            for record in result.data or []:
+                rows.setdefault(record["ghl_location_id"], record.get("firm_user_id"))
+            for location_id in missing:
+                users[location_id] = rows.get(location_id)
+                if generation == self._generation:
+                    self._location_user.put(location_id, users[location_id], self._ttl(users[location_id]))
+        return users
+
+    async def get_user_for_location(self, location_id: str) -> Optional[str]:
+        return (await self.get_users_for_locations([location_id]))[location_id]
+
+    async def get_user_locations(self, firm_user_id: str) -> List[str]:
+        """All ghl_location_ids of a user"""
+        found, location_ids = self._user_locations.get(firm_user_id)
+        if found:
+            self.stats["hits"] += 1
+            return list(location_ids)
+
+        self.stats["misses"] += 1
+        self.stats["queries"] += 1
+        generation = self._user_generation(firm_user_id)
+        result = await (
+            get_async_supabase().table("ghl_subaccounts")
+            .select("ghl_location_id")
+            .eq("firm_user_id", firm_user_id)
+            .execute()
+        )
+        location_ids = [row["ghl_location_id"] for row in result.data or [] if row.get("ghl_location_id")]
+        if generation == self._user_generation(firm_user_id):
+            self._user_locations.put(firm_user_id, tuple(location_ids), self._ttl(location_ids))
+        return location_ids
+
+    async def get_credentials(self, firm_user_id: str, agent_id: str) -> Optional[Dict[str, Any]]:
+        """
+        {'location_id', 'pit_token'} for the user's subaccount of agent_id,
+        or None if there is none. Raises on query errors (not cached).
+        """
+        key = (firm_user_id, agent_id)
+        found, credentials = self._credentials.get(key)
+        if found:
+            self.stats["hits"] += 1
+            return dict(credentials) if credentials else None
+
+        self.stats["misses"] += 1
+        self.stats["queries"] += 1
+        generation = self._user_generation(firm_user_id)
+        result = await (
+            get_async_supabase().table("ghl_subaccounts")
+            .select("ghl_location_id, pit_token, automation_status")
+            .eq("firm_user_id", firm_user_id)
+            .eq("agent_id", agent_id)
+            .limit(1)
+            .execute()
+        )
+        credentials = None
+        if result.data:
+            credentials = {
+                "location_id": result.data[0].get("ghl_location_id"),
+                "pit_token": result.data[0].get("pit_token"),
+            }
+        # A row without a token yet, or whose token is being replaced by a
+        # running automation, is re-checked as soon as a miss would be
+        status = (result.data[0].get("automation_status") or "") if result.data else ""
+        running = status == "running" or status.endswith("_running")
+        complete = bool(credentials and credentials["location_id"] and credentials["pit_token"]) and not running
+        if generation == self._user_generation(firm_user_id):
+            self._credentials.put(key, credentials, self._ttl(complete))
+        return dict(credentials) if credentials else None
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def _drop_user(self, firm_user_id: str):
+        self._bump(firm_user_id)
+        _, location_ids = self._user_locations.get(firm_user_id)
+        self._user_locations.pop(firm_user_id)
+        self._credentials.pop_where(lambda key, _: key[0] == firm_user_id)
+        stale = set(location_ids or ())
+        self._location_user.pop_where(lambda location_id, user_id: user_id == firm_user_id or location_id in stale)
+
+    def invalidate_user(self, firm_user_id: str, location_id: Optional[str] = None):
+        """
+        Forget everything cached for a user (and a location being assigned
+        to them), here and on the other workers. Call after writing
+        ghl_subaccounts.
+        """
+        self.stats["invalidations"] += 1
+        self._drop_user(firm_user_id)
+        if location_id:
+            self._location_user.pop(location_id)
+
+        if self._listening:
+            try:
+                asyncio.get_running_loop().create_task(self._publish(firm_user_id, location_id))
+            except RuntimeError:
+                pass
+
+    async def _publish(self, firm_user_id: str, location_id: Optional[str]):
+        payload = json.dumps({"origin": self.origin, "firm_user_id": firm_user_id, "location_id": location_id})
+        try:
+            async with database.acquire() as conn:
+                await conn.execute("SELECT pg_notify($1, $2)", GHL_CACHE_CHANNEL, payload)
+        except Exception as e:
+            logger.warning(f"Could not broadcast GHL cache invalidation for {firm_user_id}: {e}")
+
+    def _on_notification(self, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.stats["remote_invalidations"] += 1
+        self._drop_user(message["firm_user_id"])
+        if message.get("location_id"):
+            self._location_user.pop(message["location_id"])
+
+    async def _on_reconnect(self):
+        # Invalidations may have been missed while disconnected
+        self.clear()
+
+    def clear(self):
+        self._epoch += 1
+        self._generation += 1
+        for entries in (self._location_user, self._user_locations, self._credentials):
+            entries.clear()
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Receive invalidations from other workers (when Neon is configured)"""
+        if self._listening or not database.is_configured():
+            return
+        get_pg_listener().listen(GHL_CACHE_CHANNEL, self._on_notification, on_reconnect=self._on_reconnect)
+        self._listening = True
+
+    async def stop(self):
+        if self._listening:
+            self._listening = False
+            await get_pg_listener().unlisten(GHL_CACHE_CHANNEL)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "locations": len(self._location_user),
+            "users": len(self._user_locations),
+            "credentials": len(self._credentials),
+            "listening": self._listening,
+        }
+
+
+_ghl_cache = None
+
+def get_ghl_cache() -> GHLSubaccountCache:
+    """Process-wide ghl_subaccounts cache"""
+    global _ghl_cache
+    if _ghl_cache is None:
+        _ghl_cache = GHLSubaccountCache()
+    return _ghl_cache
@@ -0,0 +1,223 @@
+"""
+HTTP Clients
+App-scoped httpx.AsyncClient per upstream, so outbound calls reuse pooled
+keep-alive connections (HTTP/2 where the upstream speaks it) instead of
+paying a TLS handshake per request. Each upstream has its own pool size,
+concurrency limit and timeouts; every client is closed at worker shutdown.
+
+    from http_clients import get_http_client
+
+    response = await get_http_client('ghl').get(url, headers=headers)
+
+Per-request options (timeout=, follow_redirects=) still override the
+upstream defaults. Pool settings can be overridden per upstream with
+HTTP_<NAME>_MAX_CONNECTIONS, HTTP_<NAME>_MAX_CONCURRENCY and
+HTTP_<NAME>_TIMEOUT_SECONDS.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, Any
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_CLIENT_HTTP2 = os.getenv('HTTP_CLIENT_HTTP2', 'true').lower() in ('true', '1', 'yes')
+
+
+@dataclass
+class Upstream:
+    """Pool and timeout settings for one upstream"""
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    # Requests in flight at once; further requests wait for a slot
+    max_concurrency: int = 20
+    timeout: Optional[float] = 30.0
+    connect_timeout: float = 10.0
+    http2: bool = False
+    follow_redirects: bool = False
+
+
+UPSTREAMS: Dict[str, Upstream] = {
+    # services.leadconnectorhq.com (social posts, media, locations, users)
+    'ghl': Upstream(http2=True),
+    # Supabase REST/storage/realtime broadcast (supabase_async.py)
+    'supabase': Upstream(http2=True, follow_redirects=True),
+    # Embeddings and chat completions
+    'openrouter': Upstream(http2=True, max_concurrency=10, timeout=120.0),
+    'templated': Upstream(max_connections=10, max_concurrency=10, timeout=60.0),
+    'posthog': Upstream(max_connections=10, max_concurrency=10),
+    # BackgroundAutomationUser1 runs Playwright flows that take minutes
+    'automation': Upstream(max_connections=10, max_keepalive_connections=5, max_concurrency=10, timeout=300.0),
+    # Uploaded files (Supabase storage public URLs, user-supplied links)
+    'downloads': Upstream(max_concurrency=10, timeout=60.0, follow_redirects=True),
+    # Website crawling (Website/crawler.py): arbitrary sites, per-host limits live in the crawler
+    'crawler': Upstream(max_connections=20, max_keepalive_connections=5, max_concurrency=20, timeout=10.0, follow_redirects=True),
+    'default': Upstream(),
+}
+
+
+def _settings(name: str) -> Upstream:
+    upstream = UPSTREAMS.get(name, UPSTREAMS['default'])
+    prefix = f"HTTP_{name.upper()}_"
+    overrides = {}
+    if os.getenv(prefix + 'MAX_CONNECTIONS'):
+        overrides['max_connections'] = int(os.getenv(prefix + 'MAX_CONNECTIONS'))
+    if os.getenv(prefix + 'MAX_CONCURRENCY'):
+        overrides['max_concurrency'] = int(os.getenv(prefix + 'MAX_CONCURRENCY'))
+    if os.getenv(prefix + 'TIMEOUT_SECONDS'):
+        overrides['timeout'] = float(os.getenv(prefix + 'TIMEOUT_SECONDS'))
+    return Upstream(**{**upstream.__dict__, **overrides}) if overrides else upstream
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401 - installed by httpx[http2] (a postgrest dependency)
+        return True
+    except ImportError:
+        return False
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that gives its concurrency slot back when closed"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class _LimitedTransport(httpx.AsyncBaseTransport):
+    """
+    Caps the requests in flight to one upstream. A slot is held until the
+    response body is closed, so streamed downloads count for their whole
+    duration. HTTP/2 multiplexes streams over few connections, so the pool
+    size alone doesn't bound concurrency.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_concurrency: int):
+        self._transport = transport
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self.stats = {"requests": 0, "errors": 0, "in_flight": 0, "waited": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+    def _release(self):
+        self.stats["in_flight"] -= 1
+        self._semaphore.release()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._semaphore.locked():
+            started = time.monotonic()
+            await self._semaphore.acquire()
+            wait_ms = (time.monotonic() - started) * 1000
+            self.stats["waited"] += 1
+            self.stats["wait_ms_total"] += wait_ms
+            self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], wait_ms)
+        else:
+            await self._semaphore.acquire()
+        self.stats["requests"] += 1
+        self.stats["in_flight"] += 1
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self.stats["errors"] += 1
+            self._release()
+            raise
+        if response.is_closed:
+            # Body already read by the transport
+            self._release()
+        else:
+            response.stream = _ReleasingStream(response.stream, self._release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class HTTPClientRegistry:
+    """Lazily created httpx.AsyncClient per upstream name"""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, _LimitedTransport] = {}
+        self._http2: Dict[str, bool] = {}
+
+    def get(self, name: str = 'default') -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is not None and not client.is_closed:
+            return client
+
+        settings = _settings(name)
+        http2 = settings.http2 and HTTP_CLIENT_HTTP2 and _http2_available()
+        if settings.http2 and HTTP_CLIENT_HTTP2 and not http2:
+            logger.warning(f"h2 is not installed, HTTP client '{name}' falls back to HTTP/1.1")
+        transport = _LimitedTransport(
+            httpx.AsyncHTTPTransport(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=settings.max_connections,
+                    max_keepalive_connections=settings.max_keepalive_connections,
+                    keepalive_expiry=settings.keepalive_expiry
+                )
+            ),
+            settings.max_concurrency
+        )
+        client = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(settings.timeout, connect=settings.connect_timeout),
+            follow_redirects=settings.follow_redirects
+        )
+        self._clients[name] = client
+        self._transports[name] = transport
+        self._http2[name] = http2
+        logger.info(f"HTTP client '{name}' ready (http2={http2}, max_connections={settings.max_connections}, max_concurrency={settings.max_concurrency})")
+        return client
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        self._transports, self._http2 = {}, {}
+        for name, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing HTTP client '{name}': {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                **transport.stats,
+                "wait_ms_total": round(transport.stats["wait_ms_total"], 1),
+                "wait_ms_max": round(transport.stats["wait_ms_max"], 1),
+                "http2": self._http2[name]
+            }
+            for name, transport in self._transports.items()
+        }
+
+
+_registry = HTTPClientRegistry()
+
+def get_http_client(name: str = 'default') -> httpx.AsyncClient:
+    """Shared client for an upstream (see UPSTREAMS); do not close it"""
+    return _registry.get(name)
+
+async def close_http_clients():
+    """Close every pooled client (worker shutdown)"""
+    await _registry.close()
+
+def get_stats() -> Dict[str, Any]:
+    return _registry.get_stats()
@@ -0,0 +1,503 @@
+"""
+Job Queue
+Durable background jobs (file ingestion) backed by the Neon background_jobs
+table, claimed with FOR UPDATE SKIP LOCKED under time-limited leases.
+A local in-process backend covers development without Neon.
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Callable, Awaitable, Tuple
+
+import database
+
+logger = logging.getLogger(__name__)
+
+# 'postgres' (default when Neon is configured) or 'local' (in-process, not durable)
+JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', '').lower()
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '120'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', '15'))
+JOB_RETRY_MAX_SECONDS = float(os.getenv('JOB_RETRY_MAX_SECONDS', '900'))
+# Jobs one user may have running at once, across all workers (0 = no cap)
+JOB_PER_USER_CONCURRENCY = int(os.getenv('JOB_PER_USER_CONCURRENCY', '2'))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv('JOB_POLL_INTERVAL_SECONDS', '2'))
+# Finished jobs are kept this long for inspection, then pruned
+JOB_RETENTION_DAYS = int(os.getenv('JOB_RETENTION_DAYS', '7'))
+MAINTENANCE_INTERVAL_SECONDS = 60
+
+# Serializes claims so the per-user cap holds across workers; a claim is a
+# single short statement, so this costs milliseconds
+CLAIM_LOCK_KEY = 7_246_012
+
+JobHandler = Callable[[Dict[str, Any], 'Job'], Awaitable[None]]
+_handlers: Dict[str, JobHandler] = {}
+
+
+def register_handler(kind: str, handler: JobHandler):
+    """Register the coroutine that runs jobs of ``kind``: handler(payload, job)"""
+    _handlers[kind] = handler
+
+
+def get_handler(kind: str) -> Optional[JobHandler]:
+    return _handlers.get(kind)
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given (1-based) attempt"""
+    delay = min(JOB_RETRY_BASE_SECONDS * (2 ** (attempt - 1)), JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    user_id: Optional[str] = None
+    priority: int = 0
+    attempts: int = 0
+    max_attempts: int = JOB_MAX_ATTEMPTS
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+    @property
+    def is_final_attempt(self) -> bool:
+        return self.attempts >= self.max_attempts
+
+
+class PostgresJobQueue:
+    """background_jobs table in Neon (see migrations/add_background_jobs.sql)"""
+
+    backend = 'postgres'
+
+    async def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        user_id: Optional[str] = None,
+        priority: int = 0,
+        max_attempts: int = JOB_MAX_ATTEMPTS
+    ) -> str:
+        async with database.acquire() as conn:
+            job_id = await conn.fetchval(
+                """
+                INSERT INTO background_jobs (kind, payload, user_id, priority, max_attempts)
+                VALUES ($1, $2::jsonb, $3, $4, $5)
+                RETURNING id
+                """,
+                kind, json.dumps(payload), user_id, priority, max_attempts
+            )
+        return str(job_id)
+
+    async def claim(self, worker_id: str, kinds: List[str], lease_seconds: float) -> Optional[Job]:
+        """
+        Lease the highest-priority runnable job. Runnable = queued and due, or
+        running with an expired lease (its worker died). Users already at the
+        per-user cap are skipped.
+        """
+        async with database.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", CLAIM_LOCK_KEY)
+                row = await conn.fetchrow(
+                    """
+                    WITH running AS (
+                        SELECT user_id, COUNT(*) AS n
+                        FROM background_jobs
+                        WHERE status = 'running' AND lease_expires_at > NOW() AND user_id IS NOT NULL
+                        GROUP BY user_id
+                    ),
+                    candidate AS (
+                        SELECT j.id
+                        FROM background_jobs j
+                        LEFT JOIN running r ON r.user_id = j.user_id
+                        WHERE j.kind = ANY($1::text[])
+                          AND (
+                              (j.status = 'queued' AND j.run_at <= NOW())
+                              OR (j.status = 'running' AND j.lease_expires_at <= NOW() AND j.attempts < j.max_attempts)
+                          )
+                          AND ($2 <= 0 OR COALESCE(r.n, 0) < $2)
+                        ORDER BY j.priority DESC, j.run_at, j.created_at
+                        LIMIT 1
+                        FOR UPDATE OF j SKIP LOCKED
+                    )
+                    UPDATE background_jobs j
+                    SET status = 'running',
+                        attempts = j.attempts + 1,
+                        locked_by = $3,
+                        lease_expires_at = NOW() + make_interval(secs => $4),
+                        started_at = NOW(),
+                        updated_at = NOW()
+                    FROM candidate
+                    WHERE j.id = candidate.id
+                    RETURNING j.id, j.kind, j.payload::text AS payload, j.user_id, j.priority,
+                              j.attempts, j.max_attempts, j.created_at
+                    """,
+                    kinds, JOB_PER_USER_CONCURRENCY, worker_id, lease_seconds
+                )
+        if not row:
+            return None
+        return Job(
+            id=str(row['id']),
+            kind=row['kind'],
+            payload=json.loads(row['payload']),
+            user_id=row['user_id'],
+            priority=row['priority'],
+            attempts=row['attempts'],
+            max_attempts=row['max_attempts'],
+            created_at=row['created_at']
+        )
+
+    async def heartbeat(self, job: Job, worker_id: str, lease_seconds: float) -> bool:
+        """Extend the lease; False if the job was taken over by another worker"""
+        async with database.acquire() as conn:
+            result = await conn.execute(
+                """
+                UPDATE background_jobs
+                SET lease_expires_at = NOW() + make_interval(secs => $3), updated_at = NOW()
+                WHERE id = $1 AND locked_by = $2 AND status = 'running'
+                """,
+                uuid.UUID(job.id), worker_id, lease_seconds
+            )
+        return result.endswith(' 1')
+
+    async def complete(self, job: Job, worker_id: str) -> bool:
+        """Mark succeeded; False if worker_id no longer holds the job"""
+        async with database.acquire() as conn:
+            result = await conn.execute(
+                """
+                UPDATE background_jobs
+                SET status = 'succeeded', finished_at = NOW(), lease_expires_at = NULL, updated_at = NOW()
+                WHERE id = $1 AND locked_by = $2 AND status = 'running'
+                """,
+                uuid.UUID(job.id), worker_id
+            )
+        return result.endswith(' 1')
+
+    async def fail(self, job: Job, worker_id: str, error: str) -> bool:
+        """Requeue with backoff, or mark dead once attempts are used up; False if not held"""
+        dead = job.is_final_attempt
+        async with database.acquire() as conn:
+            result = await conn.execute(
+                """
+                UPDATE background_jobs
+                SET status = $3,
+                    last_error = $4,
+                    run_at = NOW() + make_interval(secs => $5),
+                    finished_at = CASE WHEN $3 = 'dead' THEN NOW() END,
+                    lease_expires_at = NULL,
+                    updated_at = NOW()
+                WHERE id = $1 AND locked_by = $2 AND status = 'running'
+                """,
+                uuid.UUID(job.id), worker_id, 'dead' if dead else 'queued', error[:2000],
+                0.0 if dead else retry_delay(job.attempts)
+            )
+        return result.endswith(' 1')
+
+    async def release(self, job: Job, worker_id: str):
+        """Hand a job back untouched (worker shutting down) without using up an attempt"""
+        async with database.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE background_jobs
+                SET status = 'queued', attempts = GREATEST(attempts - 1, 0), run_at = NOW(),
+                    lease_expires_at = NULL, updated_at = NOW()
+                WHERE id = $1 AND locked_by = $2 AND status = 'running'
+                """,
+                uuid.UUID(job.id), worker_id
+            )
+
+    async def maintain(self):
+        """Bury jobs whose last lease expired with no attempts left; prune old finished jobs"""
+        async with database.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE background_jobs
+                SET status = 'dead', finished_at = NOW(), updated_at = NOW(),
+                    last_error = COALESCE(last_error, 'lease expired on final attempt')
+                WHERE status = 'running' AND lease_expires_at <= NOW() AND attempts >= max_attempts
+                """
+            )
+            await conn.execute(
+                """
+                DELETE FROM background_jobs
+                WHERE status IN ('succeeded', 'dead')
+                  AND finished_at < NOW() - make_interval(days => $1)
+                """,
+                JOB_RETENTION_DAYS
+            )
+
+    async def get_stats(self) -> Dict[str, Any]:
+        async with database.acquire() as conn:
+            rows = await conn.fetch("SELECT status, COUNT(*) AS n FROM background_jobs GROUP BY status")
+        return {"backend": self.backend, "jobs": {row['status']: row['n'] for row in rows}}
+
+
+class LocalJobQueue:
+    """
+    In-process queue with the same semantics (priority, retries, leases,
+    per-user cap) for development without Neon. Jobs are lost on restart.
+    """
+
+    backend = 'local'
+
+    def __init__(self):
+        self._heap = []
+        self._jobs: Dict[str, Job] = {}
+        # job id -> (worker id, lease expiry on the monotonic clock)
+        self._running: Dict[str, Tuple[str, float]] = {}
+        self._counter = 0
+        self.stats = {"queued": 0, "running": 0, "succeeded": 0, "dead": 0}
+
+    def _push(self, job: Job, run_at: float):
+        self._counter += 1
+        heapq.heappush(self._heap, (run_at, -job.priority, self._counter, job.id))
+
+    async def enqueue(self, kind, payload, user_id=None, priority=0, max_attempts=JOB_MAX_ATTEMPTS) -> str:
+        job = Job(id=str(uuid.uuid4()), kind=kind, payload=payload, user_id=user_id,
+                  priority=priority, max_attempts=max_attempts)
+        self._jobs[job.id] = job
+        self._push(job, time.monotonic())
+        self.stats["queued"] += 1
+        return job.id
+
+    async def claim(self, worker_id, kinds, lease_seconds) -> Optional[Job]:
+        now = time.monotonic()
+        # A job whose lease expired (its worker died) is runnable again while it has attempts left
+        for job_id, (_, lease_expires_at) in list(self._running.items()):
+            job = self._jobs[job_id]
+            if lease_expires_at <= now and job.attempts < job.max_attempts:
+                del self._running[job_id]
+                self.stats["running"] -= 1
+                self.stats["queued"] += 1
+                self._push(job, lease_expires_at)
+
+        running_per_user: Dict[str, int] = {}
+        for job_id, (_, lease_expires_at) in self._running.items():
+            if lease_expires_at > now:
+                user_id = self._jobs[job_id].user_id
+                running_per_user[user_id] = running_per_user.get(user_id, 0) + 1
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+        # Highest priority first among due jobs, then oldest
+        due.sort(key=lambda entry: (entry[1], entry[0], entry[2]))
+
+        claimed = None
+        for entry in due:
+            job = self._jobs[entry[3]]
+            capped = (
+                JOB_PER_USER_CONCURRENCY > 0 and job.user_id is not None
+                and running_per_user.get(job.user_id, 0) >= JOB_PER_USER_CONCURRENCY
+            )
+            if claimed is None and job.kind in kinds and not capped:
+                claimed = job
+            else:
+                heapq.heappush(self._heap, entry)
+
+        if claimed:
+            claimed.attempts += 1
+            self._running[claimed.id] = (worker_id, now + lease_seconds)
+            self.stats["queued"] -= 1
+            self.stats["running"] += 1
+        return claimed
+
+    def _holds_lease(self, job: Job, worker_id: str) -> bool:
+        entry = self._running.get(job.id)
+        return entry is not None and entry[0] == worker_id
+
+    async def heartbeat(self, job, worker_id, lease_seconds) -> bool:
+        if not self._holds_lease(job, worker_id):
+            return False
+        self._running[job.id] = (worker_id, time.monotonic() + lease_seconds)
+        return True
+
+    def _finish(self, job: Job, worker_id: str) -> bool:
+        """Drop the lease; False if worker_id no longer holds it (job taken over)"""
+        if not self._holds_lease(job, worker_id):
+            return False
+        del self._running[job.id]
+        self.stats["running"] -= 1
+        return True
+
+    async def complete(self, job, worker_id) -> bool:
+        if not self._finish(job, worker_id):
+            return False
+        self._jobs.pop(job.id, None)
+        self.stats["succeeded"] += 1
+        return True
+
+    async def fail(self, job, worker_id, error) -> bool:
+        if not self._finish(job, worker_id):
+            return False
+        if job.is_final_attempt:
+            self._jobs.pop(job.id, None)
+            self.stats["dead"] += 1
+        else:
+            self._push(job, time.monotonic() + retry_delay(job.attempts))
+            self.stats["queued"] += 1
+        return True
+
+    async def release(self, job, worker_id):
+        if self._finish(job, worker_id):
+            job.attempts = max(job.attempts - 1, 0)
+            self._push(job, time.monotonic())
+            self.stats["queued"] += 1
+
+    async def maintain(self):
+        """Bury jobs whose last lease expired with no attempts left"""
+        now = time.monotonic()
+        for job_id, (_, lease_expires_at) in list(self._running.items()):
+            job = self._jobs[job_id]
+            if lease_expires_at <= now and job.attempts >= job.max_attempts:
+                del self._running[job_id]
+                self._jobs.pop(job_id, None)
+                self.stats["running"] -= 1
+                self.stats["dead"] += 1
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "jobs": dict(self.stats)}
+
+
+class JobWorker:
+    """
+    Claims and runs jobs with up to ``concurrency`` in flight. Runs either
+    embedded in a web worker (lifespan) or standalone (job_worker.py).
+    """
+
+    def __init__(self, queue, concurrency: int = 1, kinds: Optional[List[str]] = None,
+                 lease_seconds: float = JOB_LEASE_SECONDS):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.kinds = kinds
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        self._last_maintenance = 0.0
+        self.stats = {"claimed": 0, "succeeded": 0, "failed": 0, "released": 0, "lost": 0}
+
+    async def _heartbeat(self, job: Job):
+        """Extend the lease until it is lost; returns when it is (or can't be confirmed for a lease period)"""
+        last_extended = time.monotonic()
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await self.queue.heartbeat(job, self.worker_id, self.lease_seconds):
+                    logger.warning(f"Lost lease on job {job.id}")
+                    return
+                last_extended = time.monotonic()
+            except Exception as e:
+                logger.warning(f"Heartbeat failed for job {job.id}: {e}")
+                if time.monotonic() - last_extended > self.lease_seconds:
+                    logger.warning(f"No heartbeat for job {job.id} in {self.lease_seconds:.0f}s, assuming the lease expired")
+                    return
+
+    async def _run_job(self, job: Job):
+        handler = get_handler(job.kind)
+        if not handler:
+            logger.error(f"No handler registered for job kind '{job.kind}'")
+            if await self.queue.fail(job, self.worker_id, f"No handler registered for job kind '{job.kind}'"):
+                self.stats["failed"] += 1
+            return
+
+        logger.info(f"Running job {job.id} ({job.kind}), attempt {job.attempts}/{job.max_attempts}")
+        # The handler runs in its own task so it can be stopped when the lease
+        # is lost - another worker may already be retrying the job
+        work = asyncio.create_task(handler(job.payload, job))
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await asyncio.wait({work, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            # Shutting down (e.g. gunicorn max_requests recycle): stop the handler and give the job back
+            heartbeat.cancel()
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+            await asyncio.shield(self.queue.release(job, self.worker_id))
+            self.stats["released"] += 1
+            raise
+
+        if not work.done():
+            # Lease lost: the job is no longer ours to finish
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+            self.stats["lost"] += 1
+            logger.warning(f"Stopped job {job.id} ({job.kind}) after losing its lease")
+            return
+
+        heartbeat.cancel()
+        error = work.exception() if not work.cancelled() else asyncio.CancelledError("handler cancelled")
+        if error is None:
+            if await self.queue.complete(job, self.worker_id):
+                self.stats["succeeded"] += 1
+            else:
+                self.stats["lost"] += 1
+                logger.warning(f"Job {job.id} ({job.kind}) finished after its lease moved to another worker")
+        else:
+            logger.error(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}/{job.max_attempts}: {error}")
+            if await self.queue.fail(job, self.worker_id, str(error)):
+                self.stats["failed"] += 1
+            else:
+                self.stats["lost"] += 1
+
+    async def _loop(self, slot: int):
+        kinds = self.kinds or list(_handlers)
+        idle = JOB_POLL_INTERVAL_SECONDS
+        while not self._stopping:
+            try:
+                if slot == 0 and time.monotonic() - self._last_maintenance > MAINTENANCE_INTERVAL_SECONDS:
+                    self._last_maintenance = time.monotonic()
+                    await self.queue.maintain()
+                job = await self.queue.claim(self.worker_id, kinds, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Job claim failed: {e}")
+                job = None
+
+            if not job:
+                # Back off while idle, up to a few poll intervals
+                await asyncio.sleep(idle * random.uniform(0.5, 1.0))
+                idle = min(idle * 2, JOB_POLL_INTERVAL_SECONDS * 4)
+                continue
+
+            idle = JOB_POLL_INTERVAL_SECONDS
+            self.stats["claimed"] += 1
+            await self._run_job(job)
+
+    def start(self):
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._loop(slot)) for slot in range(self.concurrency)]
+        logger.info(f"Job worker {self.worker_id} started ({self.concurrency} slots, {self.queue.backend} backend)")
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self):
+        self.start()
+        await asyncio.gather(*self._tasks)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "worker_id": self.worker_id, "concurrency": self.concurrency}
+
+
+_job_queue = None
+
+def get_job_queue():
+    """Process-wide queue (Postgres when Neon is configured, else local)"""
+    global _job_queue
+    if _job_queue is None:
+        backend = JOB_QUEUE_BACKEND or ('postgres' if database.is_configured() else 'local')
+        _job_queue = PostgresJobQueue() if backend == 'postgres' else LocalJobQueue()
+    return _job_queue
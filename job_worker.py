@@ -0,0 +1,58 @@
+"""
+Job Worker
+Standalone process that runs queued background jobs (file ingestion) so
+ingestion scales separately from HTTP serving.
+
+Procfile:  worker: python job_worker.py
+Set JOB_WORKER_EMBEDDED=false on the web dyno once this is scaled up.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+
+import database
+from file_status_bus import get_file_status_bus
+from job_queue import JobWorker, get_job_queue
+from supabase_async import close_async_supabase
+from http_clients import close_http_clients
+
+# Importing the app registers the job handlers and initializes the shared
+# services they use (Supabase client, background text processor)
+import main  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKER_PROCESS_CONCURRENCY = int(os.getenv('JOB_WORKER_PROCESS_CONCURRENCY', '2'))
+
+
+async def run():
+    queue = get_job_queue()
+    if queue.backend != 'postgres':
+        raise SystemExit("job_worker.py needs the Postgres job queue (configure NEON_DB_* or DATABASE_URL)")
+
+    await database.init_pool()
+    # Publish-only: SSE streams are served (and listen) on the web dynos
+    get_file_status_bus().start(listen=False)
+    worker = JobWorker(queue, concurrency=JOB_WORKER_PROCESS_CONCURRENCY)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker.start()
+    await stop.wait()
+
+    # Heroku sends SIGTERM and allows 30s: running jobs go back to the queue
+    logger.info("Shutting down job worker...")
+    await worker.stop()
+    await get_file_status_bus().stop()
+    await close_async_supabase()
+    await close_http_clients()
+    await database.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
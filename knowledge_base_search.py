@@ -0,0 +1,576 @@
+"""
+Knowledge Base Search
+pgvector query building, HNSW index management and EXPLAIN self-checks
+for semantic search over user_vector_knowledge_base
+"""
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
+
+import database
+
+logger = logging.getLogger(__name__)
+
+HNSW_INDEX_NAME = 'idx_uvkb_embedding_hnsw'
+# Partial index: only rows that have an embedding are searchable, and the
+# search query always filters on embedding IS NOT NULL so the planner can use it
+HNSW_INDEX_SQL = f"""
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS {HNSW_INDEX_NAME}
+    ON user_vector_knowledge_base USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64)
+    WHERE embedding IS NOT NULL
+"""
+# Only one worker builds the index; the others see it on their next check
+HNSW_BUILD_LOCK_KEY = 7_246_001
+
+HNSW_AUTO_CREATE = os.getenv('KB_HNSW_AUTO_CREATE', 'true').lower() in ('true', '1', 'yes')
+# The pool's command_timeout is far too short for an index build
+HNSW_BUILD_TIMEOUT = float(os.getenv('KB_HNSW_BUILD_TIMEOUT', '3600'))
+DEFAULT_EF_SEARCH = int(os.getenv('KB_HNSW_EF_SEARCH', '40'))
+MIN_EF_SEARCH = 1
+MAX_EF_SEARCH = 1000
+
+# Hybrid (lexical + vector) search. 'simple' keeps product codes, names and
+# numbers as-is instead of stemming them; must match the GIN index expression
+TEXT_SEARCH_CONFIG = 'simple'
+LEXICAL_INDEX_NAME = 'idx_uvkb_document_fts'
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv('KB_HYBRID_CANDIDATE_MULTIPLIER', '4'))
+HYBRID_MIN_CANDIDATES = 20
+# Reciprocal rank fusion constant: score = sum(weight / (RRF_K + rank))
+RRF_K = int(os.getenv('KB_HYBRID_RRF_K', '60'))
+
+# Adaptive over-fetch when a filtered HNSW scan returns fewer than k rows
+SEARCH_OVERFETCH_FACTOR = int(os.getenv('KB_SEARCH_OVERFETCH_FACTOR', '4'))
+SEARCH_MAX_ROUNDS = int(os.getenv('KB_SEARCH_MAX_ROUNDS', '3'))
+# Embedded-row counts per tenant, to tell a dry index from a small KB
+TENANT_ROW_COUNT_TTL_SECONDS = float(os.getenv('KB_SEARCH_ROW_COUNT_TTL_SECONDS', '300'))
+TENANT_ROW_COUNT_MAX_ENTRIES = 5000
+
+# Last result of ensure_vector_index(), reported by the index-check endpoint
+_index_status: Dict[str, Any] = {"checked": False}
+# (user_id, agent_id) -> (expires_at, embedded row count)
+_tenant_row_counts: "OrderedDict[Tuple[str, Optional[str]], Tuple[float, int]]" = OrderedDict()
+
+
+def _parse_version(version: Optional[str]) -> Tuple[int, ...]:
+    try:
+        return tuple(int(part) for part in (version or '').split('.')[:3])
+    except ValueError:
+        return ()
+
+
+def supports_iterative_scan() -> bool:
+    """pgvector >= 0.8 can keep scanning the HNSW graph when filters drop candidates"""
+    return _parse_version(_index_status.get("pgvector_version")) >= (0, 8, 0)
+
+
+async def get_index_state(conn) -> Dict[str, Any]:
+    """Inspect pgvector, the embedding column and the HNSW index"""
+    pgvector_version = await conn.fetchval("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    embedding_type = await conn.fetchval(
+        """
+        SELECT format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = 'user_vector_knowledge_base'::regclass
+          AND attname = 'embedding'
+          AND NOT attisdropped
+        """
+    )
+    index_row = await conn.fetchrow(
+        """
+        SELECT i.indisvalid, i.indisready, pg_get_indexdef(i.indexrelid) AS definition,
+               pg_relation_size(i.indexrelid) AS size_bytes
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = $1
+        """,
+        HNSW_INDEX_NAME
+    )
+    return {
+        "pgvector_version": pgvector_version,
+        "embedding_type": embedding_type,
+        # HNSW needs a fixed dimension, e.g. vector(1536)
+        "embedding_has_dimensions": bool(embedding_type and '(' in embedding_type),
+        "index_name": HNSW_INDEX_NAME,
+        "index_exists": index_row is not None,
+        "index_valid": bool(index_row and index_row['indisvalid'] and index_row['indisready']),
+        "index_definition": index_row['definition'] if index_row else None,
+        "index_size_bytes": index_row['size_bytes'] if index_row else None,
+        "lexical_index_exists": bool(await conn.fetchval(
+            "SELECT 1 FROM pg_class WHERE relname = $1", LEXICAL_INDEX_NAME
+        )),
+    }
+
+
+async def ensure_vector_index(create_if_missing: bool = HNSW_AUTO_CREATE) -> Dict[str, Any]:
+    """
+    Startup check: make sure the HNSW index exists and is valid.
+
+    A failed CREATE INDEX CONCURRENTLY leaves an invalid index behind, which
+    the planner ignores - those are dropped and rebuilt. Building runs
+    CONCURRENTLY so ingestion keeps writing while it happens.
+    """
+    global _index_status
+    try:
+        async with database.acquire() as conn:
+            state = await get_index_state(conn)
+
+        if not state["pgvector_version"]:
+            state["action"] = "skipped: pgvector extension not installed"
+        elif not state["embedding_has_dimensions"]:
+            state["action"] = "skipped: embedding column has no fixed dimension (run migrations/add_hnsw_index_to_knowledge_base.sql)"
+        elif state["index_valid"]:
+            state["action"] = "none"
+        elif not create_if_missing:
+            state["action"] = "skipped: KB_HNSW_AUTO_CREATE disabled"
+        else:
+            # The advisory lock is session-level (unreliable through the PgBouncer
+            # pooler) and the build can run for a long time, so neither goes
+            # through the pool
+            conn = await database.connect_direct()
+            try:
+                if await conn.fetchval("SELECT pg_try_advisory_lock($1)", HNSW_BUILD_LOCK_KEY):
+                    try:
+                        if state["index_exists"]:
+                            logger.warning(f"Dropping invalid vector index {HNSW_INDEX_NAME} before rebuild")
+                            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {HNSW_INDEX_NAME}")
+                        logger.info(f"Building vector index {HNSW_INDEX_NAME} (CONCURRENTLY)...")
+                        await conn.execute(HNSW_INDEX_SQL, timeout=HNSW_BUILD_TIMEOUT)
+                    finally:
+                        await conn.execute("SELECT pg_advisory_unlock($1)", HNSW_BUILD_LOCK_KEY)
+                    state = await get_index_state(conn)
+                    state["action"] = "created" if state["index_valid"] else "create attempted, index still invalid"
+                else:
+                    state["action"] = "skipped: another worker is building the index"
+            finally:
+                await conn.close()
+
+        state["checked"] = True
+        _index_status = state
+        log = logger.info if state["index_valid"] else logger.warning
+        log(f"Vector index check: valid={state['index_valid']}, action={state['action']}")
+        return state
+
+    except Exception as e:
+        logger.error(f"Vector index check failed: {e}")
+        _index_status = {"checked": True, "error": str(e)}
+        return _index_status
+
+
+def get_index_status() -> Dict[str, Any]:
+    return dict(_index_status)
+
+
+def clamp_ef_search(ef_search: Optional[int]) -> int:
+    if ef_search is None:
+        return DEFAULT_EF_SEARCH
+    return max(MIN_EF_SEARCH, min(MAX_EF_SEARCH, int(ef_search)))
+
+
+async def apply_search_settings(conn, ef_search: Optional[int] = None) -> int:
+    """
+    Set HNSW recall knobs for the current transaction only (SET LOCAL
+    semantics via set_config(..., true)), so pooled connections don't leak
+    one request's settings into the next.
+    """
+    ef = clamp_ef_search(ef_search)
+    await conn.execute("SELECT set_config('hnsw.ef_search', $1, true)", str(ef))
+    if supports_iterative_scan():
+        await conn.execute("SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true)")
+    return ef
+
+
+def build_search_query(
+    vector_str: str,
+    user_id: str,
+    agent_id: Optional[str],
+    limit: int
+) -> Tuple[str, List[Any]]:
+    """
+    Build the top-k vector similarity query and its parameters.
+
+    The WHERE clause only holds the tenant filters, so ORDER BY distance
+    LIMIT k can be served by the HNSW index. Similarity thresholds are
+    applied to the returned candidates (see search_knowledge_base), never
+    in SQL - every value is a bind parameter, so there are only two
+    statement shapes (with/without agent_id) for the statement cache.
+    """
+    # Using cosine distance: 1 - (a <=> b) gives similarity score (1 = identical, 0 = orthogonal)
+    where_clauses = ["embedding IS NOT NULL"]
+    params: List[Any] = [vector_str]
+    param_idx = 2
+
+    # Add user_id filter
+    where_clauses.append(f"user_id = ${param_idx}")
+    params.append(user_id)
+    param_idx += 1
+
+    # Add optional agent_id filter
+    if agent_id:
+        where_clauses.append(f"agent_id = ${param_idx}")
+        params.append(agent_id)
+        param_idx += 1
+
+    where_clause = " AND ".join(where_clauses)
+
+    # Add limit as the last parameter
+    params.append(limit)
+
+    query = f"""
+        SELECT
+            id,
+            user_id,
+            agent_id,
+            category,
+            file_name,
+            document,
+            created_at,
+            1 - (embedding <=> $1::vector) as similarity
+        FROM user_vector_knowledge_base
+        WHERE {where_clause}
+        ORDER BY embedding <=> $1::vector
+        LIMIT ${param_idx}
+    """
+    return query, params
+
+
+async def count_tenant_rows(conn, user_id: str, agent_id: Optional[str]) -> int:
+    """Embedded rows a search for this user/agent can return (cached briefly)"""
+    key = (user_id, agent_id)
+    cached = _tenant_row_counts.get(key)
+    if cached and cached[0] > time.monotonic():
+        _tenant_row_counts.move_to_end(key)
+        return cached[1]
+
+    query = "SELECT count(*) FROM user_vector_knowledge_base WHERE embedding IS NOT NULL AND user_id = $1"
+    params: List[Any] = [user_id]
+    if agent_id:
+        query += " AND agent_id = $2"
+        params.append(agent_id)
+    count = await conn.fetchval(query, *params)
+
+    _tenant_row_counts[key] = (time.monotonic() + TENANT_ROW_COUNT_TTL_SECONDS, count)
+    _tenant_row_counts.move_to_end(key)
+    while len(_tenant_row_counts) > TENANT_ROW_COUNT_MAX_ENTRIES:
+        _tenant_row_counts.popitem(last=False)
+    return count
+
+
+async def search_knowledge_base(
+    conn,
+    vector_str: str,
+    user_id: str,
+    agent_id: Optional[str],
+    limit: int,
+    similarity_threshold: float = 0.0,
+    ef_search: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Top-k search first, threshold second.
+
+    Candidates come back in distance order, so once one falls below the
+    threshold every later row would too and the search is done. The case
+    worth retrying is the index running dry: without iterative scan an HNSW
+    scan yields at most ef_search rows *before* the user/agent filter, so a
+    tenant with a small share of the table can get fewer than k rows back.
+    When that happens, nothing was cut by the threshold and the tenant has
+    more embedded rows than came back (a KB smaller than k is not a dry
+    index), over-fetch with a larger ef_search and k.
+
+    Returns:
+        Rows as dicts (similarity descending), at most ``limit`` of them
+    """
+    fetch_k = limit
+    ef = clamp_ef_search(ef_search)
+    hits: List[Dict[str, Any]] = []
+
+    for round_number in range(1, SEARCH_MAX_ROUNDS + 1):
+        query, params = build_search_query(vector_str, user_id, agent_id, fetch_k)
+
+        # ef_search is scoped to this transaction so the pooled connection comes back clean.
+        # HNSW never returns more than ef_search rows, so it must cover k.
+        async with conn.transaction():
+            ef = await apply_search_settings(conn, max(ef, fetch_k))
+            rows = await conn.fetch(query, *params)
+
+        candidates = [dict(row) for row in rows]
+        hits = [row for row in candidates if row['similarity'] >= similarity_threshold]
+
+        cut_by_threshold = len(hits) < len(candidates)
+        index_ran_dry = len(candidates) < fetch_k
+        if (
+            len(hits) >= limit
+            or cut_by_threshold
+            or not index_ran_dry
+            or supports_iterative_scan()
+            or ef >= MAX_EF_SEARCH
+            or await count_tenant_rows(conn, user_id, agent_id) <= len(candidates)
+        ):
+            break
+
+        logger.info(
+            f"Search round {round_number}: {len(candidates)}/{fetch_k} candidates at ef_search={ef}, over-fetching"
+        )
+        fetch_k = min(fetch_k * SEARCH_OVERFETCH_FACTOR, MAX_EF_SEARCH)
+        ef = ef * SEARCH_OVERFETCH_FACTOR
+
+    # relaxed_order iterative scans can return rows slightly out of order
+    hits.sort(key=lambda row: row['similarity'], reverse=True)
+    return hits[:limit]
+
+
+def build_batch_search_query(
+    user_id: str,
+    agent_id: Optional[str],
+    limit: int
+) -> Tuple[str, List[Any]]:
+    """
+    Top-k for several query vectors in one statement.
+
+    $1 is an array of pgvector strings; each one drives a LATERAL top-k
+    subquery (same shape as build_search_query, so each probe can use the
+    HNSW index). Rows come back tagged with the 1-based query_index.
+    """
+    params: List[Any] = [user_id]
+    tenant_filter = "user_id = $2"
+    if agent_id:
+        params.append(agent_id)
+        tenant_filter += " AND agent_id = $3"
+    params.append(limit)
+    limit_idx = len(params) + 1
+
+    query = f"""
+        SELECT
+            q.query_index,
+            r.id,
+            r.user_id,
+            r.agent_id,
+            r.category,
+            r.file_name,
+            r.document,
+            r.created_at,
+            r.similarity
+        FROM unnest($1::text[]) WITH ORDINALITY AS q(query_vector, query_index)
+        CROSS JOIN LATERAL (
+            SELECT
+                id,
+                user_id,
+                agent_id,
+                category,
+                file_name,
+                document,
+                created_at,
+                1 - (embedding <=> q.query_vector::vector) as similarity
+            FROM user_vector_knowledge_base
+            WHERE embedding IS NOT NULL AND {tenant_filter}
+            ORDER BY embedding <=> q.query_vector::vector
+            LIMIT ${limit_idx}
+        ) r
+        ORDER BY q.query_index, r.similarity DESC
+    """
+    return query, params
+
+
+async def batch_search_knowledge_base(
+    conn,
+    vector_strs: List[str],
+    user_id: str,
+    agent_id: Optional[str],
+    limit: int,
+    similarity_threshold: float = 0.0,
+    ef_search: Optional[int] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    Run several top-k searches in one round trip.
+
+    Returns:
+        One list of rows per input vector, in input order, each filtered by
+        the similarity threshold
+    """
+    if not vector_strs:
+        return []
+
+    query, params = build_batch_search_query(user_id, agent_id, limit)
+
+    async with conn.transaction():
+        await apply_search_settings(conn, max(clamp_ef_search(ef_search), limit))
+        rows = await conn.fetch(query, vector_strs, *params)
+
+    grouped: List[List[Dict[str, Any]]] = [[] for _ in vector_strs]
+    for row in rows:
+        hit = dict(row)
+        if hit['similarity'] >= similarity_threshold:
+            grouped[hit.pop('query_index') - 1].append(hit)
+    return grouped
+
+
+def build_hybrid_search_query(
+    vector_str: str,
+    query_text: str,
+    user_id: str,
+    agent_id: Optional[str],
+    limit: int,
+    candidate_k: int,
+    similarity_threshold: float = 0.0,
+    vector_weight: float = 1.0,
+    lexical_weight: float = 1.0
+) -> Tuple[str, List[Any]]:
+    """
+    Build a single-statement hybrid search.
+
+    Two candidate sets are ranked independently - top ``candidate_k`` by
+    vector distance (HNSW) and top ``candidate_k`` by ts_rank_cd over the
+    full-text GIN index - then fused with reciprocal rank fusion. Rows only
+    found lexically still get a vector similarity so callers see both scores.
+    The similarity threshold applies to vector-only matches; an exact term
+    hit is kept regardless.
+    """
+    tsvector_expr = f"to_tsvector('{TEXT_SEARCH_CONFIG}', document)"
+    params: List[Any] = [vector_str, query_text, user_id]
+    tenant_filter = "user_id = $3"
+    if agent_id:
+        params.append(agent_id)
+        tenant_filter += f" AND agent_id = ${len(params)}"
+
+    params.extend([candidate_k, RRF_K, vector_weight, lexical_weight, similarity_threshold, limit])
+    k_idx, rrf_idx, vw_idx, lw_idx, threshold_idx, limit_idx = range(len(params) - 5, len(params) + 1)
+
+    query = f"""
+        WITH vector_candidates AS (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY distance) AS rank
+            FROM (
+                SELECT id, embedding <=> $1::vector AS distance
+                FROM user_vector_knowledge_base
+                WHERE embedding IS NOT NULL AND {tenant_filter}
+                ORDER BY embedding <=> $1::vector
+                LIMIT ${k_idx}
+            ) v
+        ),
+        lexical_candidates AS (
+            SELECT id, score, ROW_NUMBER() OVER (ORDER BY score DESC) AS rank
+            FROM (
+                SELECT id, ts_rank_cd({tsvector_expr}, q) AS score
+                FROM user_vector_knowledge_base,
+                     websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', $2) q
+                WHERE {tsvector_expr} @@ q AND {tenant_filter}
+                ORDER BY score DESC
+                LIMIT ${k_idx}
+            ) l
+        ),
+        fused AS (
+            SELECT
+                COALESCE(v.id, l.id) AS id,
+                v.rank AS vector_rank,
+                l.rank AS lexical_rank,
+                l.score AS lexical_score,
+                COALESCE(${vw_idx}::float8 / (${rrf_idx} + v.rank), 0)
+                    + COALESCE(${lw_idx}::float8 / (${rrf_idx} + l.rank), 0) AS hybrid_score
+            FROM vector_candidates v
+            FULL OUTER JOIN lexical_candidates l ON l.id = v.id
+        )
+        SELECT
+            kb.id,
+            kb.user_id,
+            kb.agent_id,
+            kb.category,
+            kb.file_name,
+            kb.document,
+            kb.created_at,
+            1 - (kb.embedding <=> $1::vector) AS similarity,
+            f.vector_rank,
+            f.lexical_rank,
+            f.lexical_score,
+            f.hybrid_score
+        FROM fused f
+        JOIN user_vector_knowledge_base kb ON kb.id = f.id
+        WHERE f.lexical_rank IS NOT NULL
+           OR 1 - (kb.embedding <=> $1::vector) >= ${threshold_idx}
+        ORDER BY f.hybrid_score DESC
+        LIMIT ${limit_idx}
+    """
+    return query, params
+
+
+async def hybrid_search_knowledge_base(
+    conn,
+    vector_str: str,
+    query_text: str,
+    user_id: str,
+    agent_id: Optional[str],
+    limit: int,
+    similarity_threshold: float = 0.0,
+    ef_search: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Lexical + vector search fused with RRF in one round trip.
+
+    Returns:
+        Rows as dicts (hybrid_score descending) with similarity, vector_rank,
+        lexical_rank and lexical_score per row
+    """
+    candidate_k = min(max(limit * HYBRID_CANDIDATE_MULTIPLIER, HYBRID_MIN_CANDIDATES), MAX_EF_SEARCH)
+    query, params = build_hybrid_search_query(
+        vector_str, query_text, user_id, agent_id, limit, candidate_k, similarity_threshold
+    )
+
+    async with conn.transaction():
+        await apply_search_settings(conn, max(clamp_ef_search(ef_search), candidate_k))
+        rows = await conn.fetch(query, *params)
+
+    return [dict(row) for row in rows]
+
+
+def _collect_plan_nodes(node: Dict[str, Any], nodes: List[Dict[str, Any]]):
+    nodes.append({
+        "node_type": node.get("Node Type"),
+        "index_name": node.get("Index Name"),
+        "relation": node.get("Relation Name"),
+        "actual_rows": node.get("Actual Rows"),
+        "actual_total_time_ms": node.get("Actual Total Time"),
+    })
+    for child in node.get("Plans", []) or []:
+        _collect_plan_nodes(child, nodes)
+
+
+async def explain_search(
+    conn,
+    user_id: str,
+    agent_id: Optional[str] = None,
+    limit: int = 5,
+    ef_search: Optional[int] = None,
+    analyze: bool = False
+) -> Dict[str, Any]:
+    """
+    EXPLAIN the semantic search query for a user and report whether the
+    HNSW index is used. Probes with an existing embedding from the table.
+    """
+    probe = await conn.fetchval(
+        "SELECT embedding::text FROM user_vector_knowledge_base WHERE embedding IS NOT NULL LIMIT 1"
+    )
+    if not probe:
+        return {"index_used": False, "reason": "no embedded rows to probe with", "plan": []}
+
+    query, params = build_search_query(probe, user_id, agent_id, limit)
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+
+    async with conn.transaction():
+        ef = await apply_search_settings(conn, ef_search)
+        raw_plan = await conn.fetchval(f"EXPLAIN ({options}) {query}", *params)
+
+    plan = json.loads(raw_plan) if isinstance(raw_plan, str) else raw_plan
+    root = plan[0]
+    nodes: List[Dict[str, Any]] = []
+    _collect_plan_nodes(root["Plan"], nodes)
+
+    return {
+        "index_used": any(n["index_name"] == HNSW_INDEX_NAME for n in nodes),
+        "ef_search": ef,
+        "iterative_scan": supports_iterative_scan(),
+        "planning_time_ms": root.get("Planning Time"),
+        "execution_time_ms": root.get("Execution Time"),
+        "plan": nodes,
+    }
@@ -0,0 +1,122 @@
+"""
+Knowledge Base Store
+Bulk write helpers for the Neon user_vector_knowledge_base table
+"""
+
+import logging
+from datetime import datetime
+from typing import Optional, List
+
+logger = logging.getLogger(__name__)
+
+# Postgres caps a statement at 32767 bind parameters; each chunk adds two
+INSERT_BATCH_ROWS = 1000
+
+
+def build_bulk_insert_query(row_count: int) -> str:
+    """
+    Multi-row INSERT for ``row_count`` chunks.
+
+    Columns shared by every chunk are bound once ($1-$7); each row adds its
+    document and embedding. Rows sit directly in INSERT ... VALUES so Postgres
+    infers every parameter type from the target column, and RETURNING yields
+    ids in VALUES order. Chunks without an embedding bind NULL, which removes
+    the need for a second "no embedding" variant of the query.
+    """
+    rows = []
+    for i in range(row_count):
+        document_param = 8 + i * 2
+        embedding_param = document_param + 1
+        rows.append(f"($1, $2, ${document_param}, ${embedding_param}::vector, $3, $4, $5, $6, $7, $7)")
+
+    return f"""
+        INSERT INTO user_vector_knowledge_base
+        (user_id, agent_id, document, embedding, category, source, file_name, file_url, created_at, updated_at)
+        VALUES {', '.join(rows)}
+        RETURNING id
+    """
+
+
+async def insert_chunks(
+    conn,
+    user_id: str,
+    agent_id: str,
+    documents: List[str],
+    embeddings: List[Optional[str]],
+    source: str,
+    file_name: Optional[str],
+    file_url: Optional[str],
+    category: str = 'documents',
+    created_at: Optional[datetime] = None
+) -> List[str]:
+    """
+    Insert all chunks of a document with multi-row INSERTs inside one transaction.
+
+    Args:
+        conn: asyncpg connection (borrowed from the shared pool)
+        user_id: User ID (firm_user_id)
+        agent_id: Agent ID
+        documents: Formatted chunk documents, in chunk order
+        embeddings: pgvector strings aligned with documents (None = no embedding)
+        source: Source identifier (e.g. 'agent_settings', 'website_analysis')
+        file_name: Display name for the content
+        file_url: URL or identifier for the content
+        category: Row category (default 'documents')
+        created_at: Timestamp shared by every chunk (default now)
+
+    Returns:
+        Inserted row ids as strings, in chunk order. Either every chunk is
+        written or none are.
+    """
+    if len(documents) != len(embeddings):
+        raise ValueError(f"Got {len(documents)} documents but {len(embeddings)} embeddings")
+    if not documents:
+        return []
+
+    created_at = created_at or datetime.utcnow()
+    rows = []
+
+    async with conn.transaction():
+        for start in range(0, len(documents), INSERT_BATCH_ROWS):
+            batch_documents = documents[start:start + INSERT_BATCH_ROWS]
+            batch_embeddings = embeddings[start:start + INSERT_BATCH_ROWS]
+
+            params = [user_id, agent_id, category, source, file_name, file_url, created_at]
+            for document, embedding in zip(batch_documents, batch_embeddings):
+                params.extend([document, embedding])
+
+            rows.extend(await conn.fetch(build_bulk_insert_query(len(batch_documents)), *params))
+
+    if len(rows) != len(documents):
+        # Can't happen inside a committed transaction, but never hand back
+        # ids that don't line up with the chunks
+        raise RuntimeError(f"Inserted {len(rows)} rows for {len(documents)} chunks")
+
+    logger.info(f"Bulk inserted {len(rows)} chunks for {file_name}")
+    return [str(row['id']) for row in rows]
+
+
+async def delete_chunks(conn, record_ids: List[str]) -> None:
+    """Remove rows written by insert_chunks (used to roll back a failed ingestion)"""
+    if not record_ids:
+        return
+    await conn.execute(
+        "DELETE FROM user_vector_knowledge_base WHERE id = ANY($1::uuid[])",
+        record_ids
+    )
+
+
+async def delete_chunks_for_file(conn, user_id: str, file_url: str, created_since: datetime) -> int:
+    """
+    Remove chunks of one file written since ``created_since`` (left behind by
+    an ingestion attempt that died before it could clean up). Returns the
+    number of rows removed.
+    """
+    result = await conn.execute(
+        """
+        DELETE FROM user_vector_knowledge_base
+        WHERE user_id = $1 AND file_url = $2 AND created_at >= $3
+        """,
+        user_id, file_url, created_since
+    )
+    return int(result.split()[-1])
@@ -3,6 +3,7 @@
 
 # Standard library imports
 import asyncio
+import base64
 import json
 import logging
 import os
@@ -10,6 +11,7 @@ import time
 import uuid
 import tempfile
 from collections import deque
+from contextlib import aclosing, asynccontextmanager
 from datetime import datetime, timedelta, timezone
 from enum import Enum
 from typing import Dict, Any, Optional, List, Set
@@ -18,7 +20,6 @@ from typing import Dict, Any, Optional, List, Set
 import httpx
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks, UploadFile, File, Form, Request, Header, Response
-from starlette.websockets import WebSocketState
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, HTMLResponse
 from twilio.twiml.messaging_response import MessagingResponse as TwilioMessagingResponse
@@ -29,11 +30,30 @@ from supabase import create_client, Client
 from PIL import Image
 
 # Local imports
-from Website.web_scrape import capture_website_screenshot, get_website_favicon_async
-from Website.web_analysis import analyze_website as analyze_website_local, extract_colors_from_website
+import database
+from Website.web_scrape import capture_website_screenshot, get_website_favicon_async, capture_website, upload_capture_assets
+from Website.web_analysis import analyze_website as analyze_website_local, format_scrape_as_text, extract_colors_from_website
+from Website.crawler import WebCrawler
 from invitation_handler import InvitationHandler
 from file_processing_service import FileProcessingService
-from background_text_processor import get_background_processor, initialize_background_processor
+from background_text_processor import get_background_processor, initialize_background_processor, IncrementalChunker
+from extraction_pool import get_extraction_pool
+from job_queue import Job, JobWorker, get_job_queue, register_handler
+from file_status_bus import get_file_status_bus, TERMINAL_STATUSES
+from connection_manager import get_connection_manager
+from ws_broadcast import get_ws_broadcaster
+from pg_listener import get_pg_listener
+from ghl_cache import get_ghl_cache
+from webhook_ingest import get_notification_ingester, initialize_notification_ingester, GHL_WEBHOOK_ASYNC_INGEST
+import supabase_async
+from supabase_async import get_async_supabase, close_async_supabase
+import http_clients
+from http_clients import get_http_client, close_http_clients
+from browser_pool import get_browser_pool
+from page_cache import get_page_cache
+from embedding_service import get_batch_embedder, get_embedding_cache, get_query_embedding_cache, format_vector
+import knowledge_base_search
+import knowledge_base_store
 from web_analysis_client import WebAnalysisClient
 
 # Handler classes
@@ -42,8 +62,60 @@ from web_analysis_client import WebAnalysisClient
 # ConversationalHandler class removed - frontend handles chat directly with n8n
 
 load_dotenv()
+
+# Embedded job worker slots per web worker (set JOB_WORKER_EMBEDDED=false when
+# the worker dyno from the Procfile runs ingestion instead)
+JOB_WORKER_EMBEDDED = os.getenv('JOB_WORKER_EMBEDDED', 'true').lower() in ('true', '1', 'yes')
+JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', '1'))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup/shutdown. Runs after gunicorn forks, so every worker gets its own pools."""
+    index_check = None
+    job_worker = None
+    if database.is_configured():
+        try:
+            await database.init_pool()
+            health = await database.health_check()
+            logger.info(f"Neon pool ready: {health}")
+        except Exception as e:
+            # Don't block startup - the pool is created lazily on first acquire
+            logger.error(f"Neon pool initialization failed: {e}")
+        # Validate (and if needed build) the HNSW index without holding up startup
+        index_check = asyncio.create_task(knowledge_base_search.ensure_vector_index())
+    # File status updates from any worker reach SSE streams on this one
+    get_file_status_bus().start()
+    # Notifications for users connected to this worker, from whichever worker got the webhook
+    get_ws_broadcaster().start()
+    # ghl_subaccounts invalidations from other workers
+    get_ghl_cache().start()
+    # GHL webhooks are acknowledged immediately and saved/pushed in micro-batches
+    if GHL_WEBHOOK_ASYNC_INGEST:
+        get_notification_ingester().start()
+    # Run queued file ingestion in this worker too, unless a dedicated worker dyno handles it
+    if JOB_WORKER_EMBEDDED:
+        job_worker = JobWorker(get_job_queue(), concurrency=JOB_WORKER_CONCURRENCY)
+        job_worker.start()
+    yield
+    if job_worker:
+        # Jobs still running are handed back to the queue for another worker
+        await job_worker.stop()
+    # Save queued webhooks before the broadcaster and pool go away
+    await get_notification_ingester().stop()
+    await get_file_status_bus().stop()
+    await get_ws_broadcaster().stop()
+    await get_ghl_cache().stop()
+    await get_browser_pool().close()
+    await close_async_supabase()
+    await close_http_clients()
+    if index_check and not index_check.done():
+        index_check.cancel()
+    await database.close_pool()
+
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure logging
 logging.basicConfig(
@@ -54,27 +126,15 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-import threading
-
-# Thread-safe global variables with locks
-active_connections: Dict[str, WebSocket] = {}
-_connections_lock = threading.Lock()
-
-# File processing status store for SSE streaming
-# Key: file_id, Value: {status, message, progress, updated_at}
-file_processing_status: Dict[str, Dict[str, Any]] = {}
-_file_status_lock = threading.Lock()
-
 def update_file_status(file_id: str, status: str, message: str, progress: int = 0):
-    """Update file processing status for SSE streaming"""
-    with _file_status_lock:
-        file_processing_status[file_id] = {
-            "status": status,
-            "message": message,
-            "progress": progress,
-            "updated_at": datetime.utcnow().isoformat()
-        }
-        logger.info(f"File {file_id} status: {status} - {message} ({progress}%)")
+    """Publish file processing status to SSE subscribers on every worker"""
+    get_file_status_bus().publish(file_id, {
+        "status": status,
+        "message": message,
+        "progress": progress,
+        "updated_at": datetime.utcnow().isoformat()
+    })
+    logger.info(f"File {file_id} status: {status} - {message} ({progress}%)")
 
 # Environment variables
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -102,6 +162,7 @@ supabase = create_supabase_client()
 # agent_matcher, conversational_handler, client_kb_manager, dynamic_agent_kb_handler removed
 # Frontend handles chat directly with n8n
 file_processing_service = FileProcessingService(supabase_client=supabase)
+initialize_notification_ingester()
 background_processor = initialize_background_processor(supabase_client=supabase)
 
 print("Application initialized")
@@ -252,9 +313,37 @@ async def health_check():
 async def health_check_detailed():
     return {
         "status": "healthy",
-        "active_connections": len(active_connections)
+        "active_connections": len(get_connection_manager()),
+        "websockets": get_connection_manager().get_stats(),
+        "ws_broadcast": get_ws_broadcaster().get_stats(),
+        "pg_listener": get_pg_listener().get_stats(),
+        "ghl_webhook_ingest": get_notification_ingester().get_stats(),
+        "neon_pool": database.get_pool_stats(),
+        "embedding_cache": get_embedding_cache().get_stats(),
+        "query_embedding_cache": get_query_embedding_cache().get_stats(),
+        "vector_index": knowledge_base_search.get_index_status(),
+        "extraction_pool": get_extraction_pool().get_stats(),
+        "file_status_bus": get_file_status_bus().get_stats(),
+        "async_supabase": supabase_async.get_stats(),
+        "http_clients": http_clients.get_stats(),
+        "browser_pool": get_browser_pool().get_stats(),
+        "page_cache": get_page_cache().get_stats()
     }
 
+@app.get("/health/db")
+async def health_check_database():
+    """Round trip through the shared Neon pool"""
+    result = await database.health_check()
+    return {**result, "pool": database.get_pool_stats()}
+
+@app.get("/health/jobs")
+async def health_check_jobs():
+    """Background job queue counts by status"""
+    try:
+        return {"status": "healthy", **(await get_job_queue().get_stats())}
+    except Exception as e:
+        return {"status": "unhealthy", "error": str(e)}
+
 # Email validation endpoint removed - email_validation dependency removed
 
 
@@ -312,75 +401,21 @@ async def receive_ghl_message(
             }
         }
         
-        # Insert into notifications table
-        result = supabase.table("notifications").insert(notification_data).execute()
+        # Acknowledge GHL right away: the row is saved (in a micro-batch) and
+        # pushed to the user's WebSockets by the ingester in the background
+        ingester = get_notification_ingester()
+        if GHL_WEBHOOK_ASYNC_INGEST and ingester.submit(notification_data):
+            return NotificationResponse(
+                success=True,
+                notification_id=notification_id,
+                message="Notification received and queued"
+            )
+        
+        # Synchronous path (async ingest disabled, or the queue is full)
+        inserted = await ingester.process_batch([notification_data])
         
-        if result.data:
+        if inserted:
             logger.info(f"Notification saved successfully: {notification_id}")
-            
-            # Get the inserted notification with auto-generated fields
-            inserted_notification = result.data[0] if result.data else {}
-            conversation_id = inserted_notification.get("conversation_id", "")
-            
-            # Find the user associated with this GHL location
-            # Query ghl_subaccounts table to find the user
-            user_result = supabase.table("ghl_subaccounts").select("firm_user_id").eq("ghl_location_id", webhook_data.ghl_location_id).execute()
-            
-            if user_result.data and len(user_result.data) > 0:
-                user_id = user_result.data[0]["firm_user_id"]
-                logger.info(f"Found user {user_id} for location {webhook_data.ghl_location_id}")
-                
-                # Log active connections for debugging
-                logger.info(f"Active WebSocket connections: {list(active_connections.keys())}")
-                
-                # Send real-time notification via WebSocket if user is connected
-                connections_found = 0
-                failed_connections = []
-                
-                for connection_id, websocket in active_connections.items():
-                    if connection_id.startswith(f"{user_id}_"):
-                        try:
-                            # Check if WebSocket is still alive before sending
-                            if websocket.client_state == WebSocketState.CONNECTED:
-                                await websocket.send_json({
-                                    "type": "notification",
-                                    "notification_id": notification_id,
-                                    "ghl_location_id": webhook_data.ghl_location_id,
-                                    "ghl_contact_id": webhook_data.ghl_contact_id,
-                                    "message": webhook_data.user_message,
-                                    "sender_name": webhook_data.contact_name,
-                                    "sender_phone": webhook_data.contact_phone,  # Add phone for frontend
-                                    "sender_email": webhook_data.contact_email,  # Add email for frontend
-                                    "message_type": webhook_data.social_media,
-                                    "conversation_id": conversation_id,
-                                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                                    "metadata": {
-                                        "contact_type": webhook_data.contact_type,
-                                        "user_message_attachment": webhook_data.user_message_attachment,
-                                        "tag": webhook_data.tag,
-                                        "agent_message": webhook_data.agent_message
-                                    }
-                                })
-                                connections_found += 1
-                                logger.info(f"Real-time notification sent to user {user_id} via connection {connection_id}")
-                            else:
-                                logger.warning(f"WebSocket connection {connection_id} is not active, marking for cleanup")
-                                failed_connections.append(connection_id)
-                        except Exception as ws_error:
-                            logger.error(f"Error sending WebSocket notification to {connection_id}: {ws_error}")
-                            failed_connections.append(connection_id)
-                
-                # Clean up failed connections
-                for failed_connection_id in failed_connections:
-                    if failed_connection_id in active_connections:
-                        logger.info(f"Removing failed WebSocket connection: {failed_connection_id}")
-                        del active_connections[failed_connection_id]
-                
-                if connections_found == 0:
-                    logger.warning(f"No active WebSocket connections found for user {user_id}")
-            else:
-                logger.warning(f"No user mapping found for location {webhook_data.ghl_location_id}")
-            
             return NotificationResponse(
                 success=True,
                 notification_id=notification_id,
@@ -400,50 +435,72 @@ async def receive_ghl_message(
             error=str(e)
         )
 
+def encode_notifications_cursor(notification: Dict[str, Any]) -> str:
+    """Opaque keyset cursor for the page after this notification"""
+    raw = json.dumps({"created_at": notification["created_at"], "id": notification["id"]})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_notifications_cursor(cursor: str) -> Dict[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+        # Reject tampered positions here rather than letting the RPC fail on them
+        datetime.fromisoformat(position["created_at"])
+        uuid.UUID(position["id"])
+        return {"created_at": position["created_at"], "id": position["id"]}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 # API endpoint to fetch notifications for a user
 @app.get("/api/notifications/{user_id}")
 async def get_user_notifications(
     user_id: str,
     limit: Optional[int] = 50,
     offset: Optional[int] = 0,
-    unread_only: Optional[bool] = False
+    unread_only: Optional[bool] = False,
+    cursor: Optional[str] = None
 ):
-    """Get notifications for a specific user based on their GHL locations"""
+    """
+    Get notifications for a specific user based on their GHL locations.
+    Pass next_cursor from the previous response as cursor for the next page
+    (offset still works, but gets slower the deeper it goes).
+    """
     try:
         # First, get all GHL locations for this user
-        locations_result = supabase.table("ghl_subaccounts").select("ghl_location_id").eq("firm_user_id", user_id).execute()
+        location_ids = await get_ghl_cache().get_user_locations(user_id)
         
-        if not locations_result.data:
+        if not location_ids:
             return {"notifications": [], "total": 0, "unread_count": 0}
         
-        location_ids = [loc["ghl_location_id"] for loc in locations_result.data]
-        
-        # Build query for notifications
-        query = supabase.table("notifications").select("*").in_("ghl_location_id", location_ids)
-        
-        if unread_only:
-            query = query.eq("read_status", False)
-        
-        # Get total count
-        count_query = supabase.table("notifications").select("*", count="exact").in_("ghl_location_id", location_ids)
-        if unread_only:
-            count_query = count_query.eq("read_status", False)
-        count_result = count_query.execute()
-        
-        # Get unread count
-        unread_count_result = supabase.table("notifications").select("*", count="exact").in_("ghl_location_id", location_ids).eq("read_status", False).execute()
+        position = decode_notifications_cursor(cursor) if cursor else None
         
-        # Get notifications with pagination
-        notifications_result = query.order("created_at", desc=True).limit(limit).offset(offset).execute()
+        # Page, total and unread count in one call (migrations/add_notifications_page_function.sql)
+        result = await get_async_supabase().rpc(
+            'get_notifications_page',
+            {
+                'p_location_ids': location_ids,
+                'p_limit': limit,
+                'p_unread_only': unread_only,
+                'p_cursor_created_at': position["created_at"] if position else None,
+                'p_cursor_id': position["id"] if position else None,
+                'p_offset': 0 if position else offset
+            }
+        ).execute()
+        page = result.data or {}
+        notifications = page.get("notifications") or []
         
         return {
-            "notifications": notifications_result.data,
-            "total": count_result.count if hasattr(count_result, 'count') else len(count_result.data),
-            "unread_count": unread_count_result.count if hasattr(unread_count_result, 'count') else len(unread_count_result.data),
+            "notifications": notifications,
+            "total": page.get("total", 0),
+            "unread_count": page.get("unread_count", 0),
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "has_more": page.get("has_more", False),
+            "next_cursor": encode_notifications_cursor(notifications[-1]) if page.get("has_more") and notifications else None
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching notifications: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -453,7 +510,7 @@ async def get_user_notifications(
 async def mark_notification_read(notification_id: str):
     """Mark a notification as read"""
     try:
-        result = supabase.table("notifications").update({"read_status": True}).eq("id", notification_id).execute()
+        result = await get_async_supabase().table("notifications").update({"read_status": True}).eq("id", notification_id).execute()
         
         if result.data:
             return {"success": True, "message": "Notification marked as read"}
@@ -470,15 +527,13 @@ async def mark_all_notifications_read(user_id: str):
     """Mark all notifications as read for a user"""
     try:
         # Get user's GHL locations
-        locations_result = supabase.table("ghl_subaccounts").select("ghl_location_id").eq("firm_user_id", user_id).execute()
+        location_ids = await get_ghl_cache().get_user_locations(user_id)
         
-        if not locations_result.data:
+        if not location_ids:
             return {"success": True, "message": "No notifications to update"}
         
-        location_ids = [loc["ghl_location_id"] for loc in locations_result.data]
-        
         # Update all unread notifications
-        result = supabase.table("notifications").update({"read_status": True}).in_("ghl_location_id", location_ids).eq("read_status", False).execute()
+        result = await get_async_supabase().table("notifications").update({"read_status": True}).in_("ghl_location_id", location_ids).eq("read_status", False).execute()
         
         return {
             "success": True,
@@ -743,18 +798,18 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str, session_id: str
     
     # Email verification removed - email_validation dependency removed
     
-    active_connections[connection_id] = websocket
+    connection_manager = get_connection_manager()
+    connection = connection_manager.connect(user_id, session_id, websocket)
     
     async def send_ping():
         """Send periodic ping to keep connection alive"""
-        while connection_id in active_connections:
+        while True:
             try:
                 await asyncio.sleep(30)  # Ping every 30 seconds
-                if connection_id in active_connections:
-                    await websocket.send_json({
-                        "type": "ping",
-                        "timestamp": int(time.time() * 1000)
-                    })
+                await connection.send_json({
+                    "type": "ping",
+                    "timestamp": int(time.time() * 1000)
+                })
             except Exception:
                 break
     
@@ -763,7 +818,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str, session_id: str
     
     try:
         # Send initial connection status
-        await websocket.send_json({
+        await connection.send_json({
             "type": "connection_status",
             "status": "connected",
             "message": "WebSocket connection established",
@@ -782,7 +837,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str, session_id: str
                 
                 # Handle ping/pong and skip processing for empty messages  
                 if message_data.get("type") == "ping":
-                    await websocket.send_json({
+                    await connection.send_json({
                         "type": "pong",
                         "timestamp": int(time.time() * 1000)
                     })
@@ -802,7 +857,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str, session_id: str
                 try:
                     # Chat processing removed - frontend handles chat directly with n8n
                     # WebSocket is now only used for real-time notifications
-                    await websocket.send_json({
+                    await connection.send_json({
                         "type": "ack",
                         "requestId": request_id,
                         "message": "Message received",
@@ -815,7 +870,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str, session_id: str
             except asyncio.TimeoutError:
                 # Timeout is normal - just send a ping to verify connection is alive
                 try:
-                    await websocket.send_json({
+                    await connection.send_json({
                         "type": "ping",
                         "timestamp": int(time.time() * 1000)
                     })
@@ -839,8 +894,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str, session_id: str
         # Cancel ping task
         ping_task.cancel()
         # Remove connection from active connections
-        if connection_id in active_connections:
-            del active_connections[connection_id]
+        connection_manager.disconnect(connection)
         logger.debug(f"WebSocket connection closed and cleaned up: {connection_id}")
 
 
@@ -1685,257 +1739,82 @@ async def website_analysis_endpoint(request: WebsiteAnalysisRequest):
 # WEBSITE ANALYSIS COMPLETE ENDPOINT (with background screenshot/favicon)
 # =============================================================================
 
-async def capture_screenshot_independent(
-    url: str,
-    firm_user_id: str,
-    agent_id: str,
-    firm_id: str
-):
-    """
-    INDEPENDENT task to capture ONLY screenshot - runs completely async.
-    Updates website_analysis table with screenshot_url.
-    Fire-and-forget - doesn't block the API response.
-    """
-    try:
-        # Wait 2 seconds to ensure the API response is sent to user first
-        await asyncio.sleep(2)
-
-        logger.info(f"[ASYNC SCREENSHOT] Starting independent screenshot capture for {url}")
-
-        # Capture screenshot
-        screenshot_result = await capture_website_screenshot(url, firm_user_id)
-
-        # Update database if successful
-        if isinstance(screenshot_result, dict) and screenshot_result.get('status') == 'success':
-            screenshot_url = screenshot_result.get('public_url')
-            normalized_url = normalize_url(url)
-
-            # Update the website_analysis record
-            supabase.table('website_analysis')\
-                .update({
-                    'screenshot_url': screenshot_url,
-                    'last_updated_timestamp': datetime.now(timezone.utc).isoformat()
-                })\
-                .eq('firm_user_id', firm_user_id)\
-                .eq('agent_id', agent_id)\
-                .eq('firm_id', firm_id)\
-                .execute()
-
-            logger.info(f"[ASYNC SCREENSHOT] ✓ Screenshot saved: {screenshot_url}")
-        else:
-            logger.warning(f"[ASYNC SCREENSHOT] ✗ Screenshot capture failed: {screenshot_result}")
-
-    except Exception as e:
-        logger.error(f"[ASYNC SCREENSHOT] Error: {str(e)}")
-
-
-async def capture_favicon_independent(
-    url: str,
-    firm_user_id: str,
-    agent_id: str,
-    firm_id: str
-):
-    """
-    INDEPENDENT task to capture ONLY favicon - runs completely async.
-    Updates website_analysis table with favicon_url.
-    Fire-and-forget - doesn't block the API response.
-    """
-    try:
-        # Wait 3 seconds (slightly offset from screenshot to avoid resource contention)
-        await asyncio.sleep(3)
-
-        logger.info(f"[ASYNC FAVICON] Starting independent favicon capture for {url}")
+# Navigation timeout for the website capture, and how long the analysis waits
+# for the page text before falling back to OpenRouter web search
+WEBSITE_CAPTURE_TIMEOUT_MS = int(os.getenv('WEBSITE_CAPTURE_TIMEOUT_MS', '15000'))
+# (covers waiting for a browser page and the 2s settle; the fallback and the
+# AI analysis still have to fit in the 29s gunicorn timeout after it)
+WEBSITE_TEXT_TIMEOUT_SECONDS = float(os.getenv('WEBSITE_TEXT_TIMEOUT_SECONDS', '12'))
+# The analysis record is inserted after the AI analysis; assets wait for it this long
+WEBSITE_CAPTURE_RECORD_WAIT_SECONDS = 60
 
-        # Capture favicon
-        favicon_result = await get_website_favicon_async(url, firm_user_id)
-
-        # Update database if successful
-        if isinstance(favicon_result, dict) and favicon_result.get('status') == 'success':
-            favicon_url = favicon_result.get('public_url')
-            normalized_url = normalize_url(url)
-
-            # Update the website_analysis record
-            supabase.table('website_analysis')\
-                .update({
-                    'favicon_url': favicon_url,
-                    'last_updated_timestamp': datetime.now(timezone.utc).isoformat()
-                })\
-                .eq('firm_user_id', firm_user_id)\
-                .eq('agent_id', agent_id)\
-                .eq('firm_id', firm_id)\
-                .execute()
-
-            logger.info(f"[ASYNC FAVICON] ✓ Favicon saved: {favicon_url}")
-        else:
-            logger.warning(f"[ASYNC FAVICON] ✗ Favicon capture failed: {favicon_result}")
-
-    except Exception as e:
-        logger.error(f"[ASYNC FAVICON] Error: {str(e)}")
-
-
-async def capture_brand_colors_independent(
+async def capture_website_assets_independent(
     url: str,
     firm_user_id: str,
     agent_id: str,
-    firm_id: str
+    firm_id: str,
+    dom_text: asyncio.Future = None,
+    record_saved: asyncio.Event = None,
+    brand_colors_only: bool = False
 ):
     """
-    INDEPENDENT task to extract brand colors - runs completely async.
-    Updates website_analysis table with brand_colors.
+    INDEPENDENT task that loads the website ONCE and stores its screenshot,
+    favicon and brand colors on the website_analysis record.
     Fire-and-forget - doesn't block the API response.
-    """
-    try:
-        # Wait 1 second before starting (less than screenshot/favicon as it's lighter)
-        await asyncio.sleep(1)
-
-        logger.info(f"[ASYNC COLORS] Starting independent brand color extraction for {url}")
-
-        # Extract colors in thread pool to avoid blocking event loop
-        loop = asyncio.get_event_loop()
-        brand_colors = await loop.run_in_executor(None, extract_colors_from_website, url)
-
-        # Update database if we got colors
-        if brand_colors and len(brand_colors) > 0:
-            normalized_url = normalize_url(url)
 
-            # Update the website_analysis record
-            supabase.table('website_analysis')\
-                .update({
-                    'brand_colors': brand_colors,
-                    'last_updated_timestamp': datetime.now(timezone.utc).isoformat()
-                })\
-                .eq('firm_user_id', firm_user_id)\
-                .eq('agent_id', agent_id)\
-                .eq('firm_id', firm_id)\
-                .execute()
-
-            logger.info(f"[ASYNC COLORS] ✓ Extracted and saved {len(brand_colors)} brand colors")
-        else:
-            logger.warning(f"[ASYNC COLORS] ✗ No brand colors extracted from {url}")
-
-    except Exception as e:
-        logger.error(f"[ASYNC COLORS] Error: {str(e)}")
-
-
-async def capture_screenshot_and_favicon_independent(
-    url: str,
-    firm_user_id: str,
-    agent_id: str,
-    firm_id: str
-):
-    """
-    DEPRECATED: Use capture_screenshot_independent() and capture_favicon_independent() separately.
-
-    INDEPENDENT task to capture screenshot and favicon - runs completely async.
-    This is fire-and-forget - doesn't block the API response.
-    Waits 2 seconds before starting to ensure response is sent first.
+    dom_text receives (http_status, text) as soon as the page is read, so the
+    analysis uses the same page load instead of fetching the site again.
+    The record is updated once record_saved is set (the analysis has
+    inserted it). brand_colors_only skips the browser and reads the colors
+    from the (cached) page and stylesheets.
     """
     try:
-        # Wait 2 seconds to ensure the API response is sent to user first
-        await asyncio.sleep(2)
-
-        logger.info(f"[ASYNC CAPTURE] Starting independent capture for {url}")
+        logger.info(f"[ASYNC CAPTURE] Starting single-load capture for {url}")
 
-        # Run screenshot and favicon capture in parallel
-        screenshot_task = capture_website_screenshot(url, firm_user_id)
-        favicon_task = get_website_favicon_async(url, firm_user_id)
-
-        screenshot_result, favicon_result = await asyncio.gather(
-            screenshot_task,
-            favicon_task,
-            return_exceptions=True
-        )
-
-        # Prepare update data
-        update_data = {
-            'last_updated_timestamp': datetime.now(timezone.utc).isoformat()
-        }
-
-        # Add screenshot URL if successful
-        if isinstance(screenshot_result, dict) and screenshot_result.get('status') == 'success':
-            update_data['screenshot_url'] = screenshot_result.get('public_url')
-            logger.info(f"[ASYNC CAPTURE] Screenshot captured: {update_data['screenshot_url']}")
-        else:
-            logger.warning(f"[ASYNC CAPTURE] Screenshot capture failed: {screenshot_result}")
-
-        # Add favicon URL if successful
-        if isinstance(favicon_result, dict) and favicon_result.get('status') == 'success':
-            update_data['favicon_url'] = favicon_result.get('public_url')
-            logger.info(f"[ASYNC CAPTURE] Favicon captured: {update_data['favicon_url']}")
+        if brand_colors_only:
+            # Colors alone don't need a browser: the page and its stylesheets come from the page cache
+            capture = {'status': 'success', 'brand_colors': await extract_colors_from_website(url)}
         else:
-            logger.warning(f"[ASYNC CAPTURE] Favicon capture failed: {favicon_result}")
-
-        # Update the website_analysis record
-        if 'screenshot_url' in update_data or 'favicon_url' in update_data:
-            normalized_url = normalize_url(url)
-            supabase.table('website_analysis')\
-                .update(update_data)\
-                .eq('firm_user_id', firm_user_id)\
-                .eq('agent_id', agent_id)\
-                .eq('firm_id', firm_id)\
-                .execute()
-            logger.info(f"[ASYNC CAPTURE] Completed and database updated for {url}")
-
-    except Exception as e:
-        logger.error(f"[ASYNC CAPTURE] Error in independent capture: {str(e)}")
-
-
-async def capture_screenshot_and_favicon_background(
-    url: str,
-    firm_user_id: str,
-    agent_id: str,
-    firm_id: str
-):
-    """
-    DEPRECATED: Use capture_screenshot_and_favicon_independent() instead.
-    Background task to capture screenshot and favicon, then update website_analysis table.
-    Runs after analysis response is returned to user.
-    """
-    try:
-        logger.info(f"Starting background capture for {url} (firm_user_id: {firm_user_id})")
+            capture = await capture_website(
+                url,
+                timeout_ms=WEBSITE_CAPTURE_TIMEOUT_MS,
+                dom_text=dom_text
+            )
+        if capture.get('status') != 'success':
+            logger.warning(f"[ASYNC CAPTURE] ✗ Capture failed for {url}: {capture.get('errors')}")
+            return
+        if capture.get('errors'):
+            logger.warning(f"[ASYNC CAPTURE] Partial capture for {url}: {capture['errors']}")
 
-        # Run screenshot and favicon capture in parallel
-        screenshot_task = capture_website_screenshot(url, firm_user_id)
-        favicon_task = get_website_favicon_async(url, firm_user_id)
+        update_data = {}
+        if capture.get('brand_colors'):
+            update_data['brand_colors'] = capture['brand_colors']
+        asset_urls = await upload_capture_assets(capture, firm_user_id)
+        update_data.update({k: v for k, v in asset_urls.items() if v})
 
-        screenshot_result, favicon_result = await asyncio.gather(
-            screenshot_task,
-            favicon_task,
-            return_exceptions=True
-        )
+        if not update_data:
+            logger.warning(f"[ASYNC CAPTURE] ✗ Nothing captured from {url}")
+            return
 
-        # Prepare update data
-        update_data = {
-            'last_updated_timestamp': datetime.now(timezone.utc).isoformat()
-        }
+        if record_saved is not None:
+            try:
+                await asyncio.wait_for(record_saved.wait(), WEBSITE_CAPTURE_RECORD_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning(f"[ASYNC CAPTURE] Analysis record for {url} not saved yet, updating anyway")
 
-        # Add screenshot URL if successful
-        if isinstance(screenshot_result, dict) and screenshot_result.get('status') == 'success':
-            update_data['screenshot_url'] = screenshot_result.get('public_url')
-            logger.info(f"Screenshot captured: {update_data['screenshot_url']}")
-        else:
-            logger.warning(f"Screenshot capture failed: {screenshot_result}")
+        update_data['last_updated_timestamp'] = datetime.now(timezone.utc).isoformat()
+        await get_async_supabase().table('website_analysis')\
+            .update(update_data)\
+            .eq('firm_user_id', firm_user_id)\
+            .eq('agent_id', agent_id)\
+            .eq('firm_id', firm_id)\
+            .eq('website_url', normalize_url(url))\
+            .execute()
 
-        # Add favicon URL if successful
-        if isinstance(favicon_result, dict) and favicon_result.get('status') == 'success':
-            update_data['favicon_url'] = favicon_result.get('public_url')
-            logger.info(f"Favicon captured: {update_data['favicon_url']}")
-        else:
-            logger.warning(f"Favicon capture failed: {favicon_result}")
-
-        # Update the website_analysis record
-        if 'screenshot_url' in update_data or 'favicon_url' in update_data:
-            normalized_url = normalize_url(url)
-            supabase.table('website_analysis')\
-                .update(update_data)\
-                .eq('firm_user_id', firm_user_id)\
-                .eq('agent_id', agent_id)\
-                .eq('firm_id', firm_id)\
-                .execute()
-            logger.info(f"Background capture completed and database updated for {url}")
+        logger.info(f"[ASYNC CAPTURE] ✓ Saved {', '.join(k for k in update_data if k != 'last_updated_timestamp')} for {url}")
 
     except Exception as e:
-        logger.error(f"Error in background screenshot/favicon capture: {str(e)}")
+        logger.error(f"[ASYNC CAPTURE] Error: {str(e)}")
 
 
 async def analyze_website_content_with_ai(scraped_content: str, url: str) -> dict:
@@ -2135,6 +2014,8 @@ async def website_analysis_complete_endpoint(
     1. Check if record exists for firm_user_id + website_url (normalized)
     2. If exists with data -> return cached values
     3. If not -> run analysis, return response, then capture screenshot/favicon in background
+       and save the analysis to the knowledge base as a queued job (kb_status / kb_record_id;
+       progress on /api/file/status-stream/{kb_record_id})
     """
     try:
         # Normalize the URL for consistent comparison
@@ -2185,11 +2066,12 @@ async def website_analysis_complete_endpoint(
             if not brand_colors or len(brand_colors) == 0:
                 logger.info(f"No cached brand colors - firing async extraction")
                 asyncio.create_task(
-                    capture_brand_colors_independent(
+                    capture_website_assets_independent(
                         request.url,
                         request.firm_user_id,
                         request.agent_id,
-                        firm_id
+                        firm_id,
+                        brand_colors_only=True
                     )
                 )
 
@@ -2215,52 +2097,51 @@ async def website_analysis_complete_endpoint(
         logger.info(f"🔍 CASE 2: Running fresh analysis for {normalized_url}")
         print(f"\n🔍 CASE 2: Running fresh analysis for {normalized_url}", flush=True)
 
-        # ========== TRY 1: Direct web scraping with httpx + BeautifulSoup (fast, accurate) ==========
-        # Try to scrape the website directly first - more accurate than web search
-        # Falls back to OpenRouter web search if: 403 error, timeout, or insufficient content
+        # ========== TRY 1: Read the website in the browser (one page load for everything) ==========
+        # The capture task loads the page once: its DOM text feeds the analysis below,
+        # and the same page load gives the screenshot, favicon and brand colors
+        # (saved to the record in the background).
+        # Falls back to OpenRouter web search if: 4xx/5xx, timeout, or insufficient content
         use_fallback = False
         ai_extracted = None
         response_text = None
 
-        try:
-            logger.info(f"📡 Attempting direct web scraping for {request.url}")
-            print(f"📡 Attempting direct web scraping for {request.url}", flush=True)
+        # With every browser page busy the text would only arrive after the queue drains
+        browser_free = get_browser_pool().has_free_page()
+        dom_text = asyncio.get_running_loop().create_future()
+        record_saved = asyncio.Event()
+        asyncio.create_task(
+            capture_website_assets_independent(
+                request.url,
+                request.firm_user_id,
+                request.agent_id,
+                firm_id,
+                dom_text=dom_text,
+                record_saved=record_saved
+            )
+        )
 
-            from bs4 import BeautifulSoup
+        try:
+            logger.info(f"📡 Reading website content for {request.url}")
+            print(f"📡 Reading website content for {request.url}", flush=True)
 
-            # Fetch website with httpx (timeout: 15s)
-            async with httpx.AsyncClient(follow_redirects=True, timeout=15.0) as http_client:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.5',
-                }
-                fetch_response = await http_client.get(request.url, headers=headers)
+            if not browser_free:
+                logger.warning(f"⚠️ No browser page free - falling back to web search")
+                print(f"⚠️ No browser page free - falling back to web search", flush=True)
+                use_fallback = True
+            else:
+                http_status, cleaned_content = await asyncio.wait_for(asyncio.shield(dom_text), WEBSITE_TEXT_TIMEOUT_SECONDS)
 
                 # Check for error status codes
-                if fetch_response.status_code == 403:
+                if http_status == 403:
                     logger.warning(f"⚠️ 403 Forbidden - falling back to web search")
                     print(f"⚠️ 403 Forbidden - falling back to web search", flush=True)
                     use_fallback = True
-                elif fetch_response.status_code >= 400:
-                    logger.warning(f"⚠️ HTTP {fetch_response.status_code} - falling back to web search")
-                    print(f"⚠️ HTTP {fetch_response.status_code} - falling back to web search", flush=True)
+                elif http_status and http_status >= 400:
+                    logger.warning(f"⚠️ HTTP {http_status} - falling back to web search")
+                    print(f"⚠️ HTTP {http_status} - falling back to web search", flush=True)
                     use_fallback = True
                 else:
-                    # Parse HTML content
-                    soup = BeautifulSoup(fetch_response.text, 'html.parser')
-
-                    # Remove unwanted elements
-                    for element in soup(['script', 'style', 'nav', 'footer', 'header', 'aside']):
-                        element.decompose()
-
-                    # Extract text content
-                    text_content = soup.get_text(separator='\n', strip=True)
-
-                    # Clean up whitespace
-                    lines = [line.strip() for line in text_content.split('\n') if line.strip()]
-                    cleaned_content = '\n'.join(lines)
-
                     content_length = len(cleaned_content)
                     logger.info(f"✓ Scraped {content_length} characters of text")
                     print(f"✓ Scraped {content_length} characters of text", flush=True)
@@ -2285,7 +2166,7 @@ async def website_analysis_complete_endpoint(
                         logger.info(f"✓ AI analysis completed from scraped content")
                         print(f"✓ AI analysis completed from scraped content", flush=True)
 
-        except httpx.TimeoutException:
+        except asyncio.TimeoutError:
             logger.warning(f"⚠️ Scraping timeout - falling back to web search")
             print(f"⚠️ Scraping timeout - falling back to web search", flush=True)
             use_fallback = True
@@ -2333,30 +2214,30 @@ Provide ONLY valid JSON, no additional text."""
                 # PAID model: deepseek/deepseek-chat - Only $0.14/1M tokens (basically free)
                 # Completes in ~13 seconds (well under Heroku's 30s timeout)
                 # See: https://openrouter.ai/docs/guides/features/plugins/web-search
-                async with httpx.AsyncClient() as http_client:
-                    response = await http_client.post(
-                        "https://openrouter.ai/api/v1/chat/completions",
-                        headers={
-                            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                            "Content-Type": "application/json",
-                            "HTTP-Referer": "https://app.squidgy.ai",
-                            "X-Title": "Squidgy AI Website Analyzer"
-                        },
-                        json={
-                            "model": "deepseek/deepseek-chat",  # PAID but cheap ($0.14/1M tokens), fast & reliable
-                            "plugins": [{"id": "web", "engine": "native", "max_results": 5}],
-                            "messages": [{
-                                "role": "user",
-                                "content": analysis_prompt
-                            }],
-                            "temperature": 0.3,
-                            "max_tokens": 1500
-                        },
-                        timeout=20.0  # Reduced to 20s to allow time for fallback before Heroku's 30s timeout
-                    )
+                http_client = get_http_client('openrouter')
+                response = await http_client.post(
+                    "https://openrouter.ai/api/v1/chat/completions",
+                    headers={
+                        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+                        "Content-Type": "application/json",
+                        "HTTP-Referer": "https://app.squidgy.ai",
+                        "X-Title": "Squidgy AI Website Analyzer"
+                    },
+                    json={
+                        "model": "deepseek/deepseek-chat",  # PAID but cheap ($0.14/1M tokens), fast & reliable
+                        "plugins": [{"id": "web", "engine": "native", "max_results": 5}],
+                        "messages": [{
+                            "role": "user",
+                            "content": analysis_prompt
+                        }],
+                        "temperature": 0.3,
+                        "max_tokens": 1500
+                    },
+                    timeout=20.0  # Reduced to 20s to allow time for fallback before Heroku's 30s timeout
+                )
 
-                    response.raise_for_status()
-                    data = response.json()
+                response.raise_for_status()
+                data = response.json()
 
                 logger.info(f"✓ OpenRouter API returned 200 OK")
                 print(f"✓ OpenRouter API returned 200 OK", flush=True)
@@ -2411,30 +2292,30 @@ Provide ONLY valid JSON, no additional text."""
                     print(f"🔄 Retrying with fresh connection (deepseek/deepseek-chat)", flush=True)
 
                     # Call OpenRouter API with PAID model using httpx
-                    async with httpx.AsyncClient() as http_client:
-                        fallback_response = await http_client.post(
-                            "https://openrouter.ai/api/v1/chat/completions",
-                            headers={
-                                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                                "Content-Type": "application/json",
-                                "HTTP-Referer": "https://app.squidgy.ai",
-                                "X-Title": "Squidgy AI Website Analyzer"
-                            },
-                            json={
-                                "model": "deepseek/deepseek-chat",  # Paid but cheap ($0.14/1M tokens)
-                                "plugins": [{"id": "web", "engine": "native", "max_results": 5}],
-                                "messages": [{
-                                    "role": "user",
-                                    "content": analysis_prompt
-                                }],
-                                "temperature": 0.3,
-                                "max_tokens": 1500
-                            },
-                            timeout=20.0
-                        )
+                    http_client = get_http_client('openrouter')
+                    fallback_response = await http_client.post(
+                        "https://openrouter.ai/api/v1/chat/completions",
+                        headers={
+                            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+                            "Content-Type": "application/json",
+                            "HTTP-Referer": "https://app.squidgy.ai",
+                            "X-Title": "Squidgy AI Website Analyzer"
+                        },
+                        json={
+                            "model": "deepseek/deepseek-chat",  # Paid but cheap ($0.14/1M tokens)
+                            "plugins": [{"id": "web", "engine": "native", "max_results": 5}],
+                            "messages": [{
+                                "role": "user",
+                                "content": analysis_prompt
+                            }],
+                            "temperature": 0.3,
+                            "max_tokens": 1500
+                        },
+                        timeout=20.0
+                    )
 
-                        fallback_response.raise_for_status()
-                        fallback_data = fallback_response.json()
+                    fallback_response.raise_for_status()
+                    fallback_data = fallback_response.json()
 
                     logger.info(f"✓ Fallback API returned 200 OK")
                     print(f"✓ Fallback API returned 200 OK", flush=True)
@@ -2565,6 +2446,7 @@ Provide ONLY valid JSON, no additional text."""
             .insert(upsert_data)\
             .execute()
         logger.info(f"Inserted new record for firm_user_id: {request.firm_user_id}, agent_id: {request.agent_id}, url: {normalized_url}")
+        record_saved.set()
 
         # Fetch the latest record by timestamp to return
         latest_record = supabase.table('website_analysis')\
@@ -2579,7 +2461,6 @@ Provide ONLY valid JSON, no additional text."""
         logger.info(f"Analysis saved to database for {normalized_url}")
 
         # ========== SAVE EXTRACTED CONTENT TO KNOWLEDGE BASE ==========
-        # Use shared save_content_to_knowledge_base function (same as file upload)
         kb_document = f"""Website Analysis: {normalized_url}
 
 Company Name: {company_name or 'Unknown'}
@@ -2597,53 +2478,22 @@ Business Domain: {business_domain or 'Not specified'}
 Tags: {', '.join(tags) if tags else 'None'}
 """
         
-        kb_saved = await save_content_to_knowledge_base(
-            user_id=request.firm_user_id,
-            agent_id=request.agent_id,
-            content=kb_document,
-            source='website_analysis',
-            file_name=f"Website: {company_name or business_domain}",
-            file_url=normalized_url,
-            agent_name=request.agent_id
-        )
-        # ========== END KNOWLEDGE BASE SAVE ==========
-
-        # Fire THREE COMPLETELY SEPARATE independent async tasks
-        # They run independently from each other - one failure won't affect the other
-        # Uses asyncio.create_task() to run without blocking response
-        # Colors start after 1s, screenshot after 2s, favicon after 3s (slightly offset)
-
-        # Task 1: Brand color extraction
-        asyncio.create_task(
-            capture_brand_colors_independent(
-                request.url,
-                request.firm_user_id,
-                request.agent_id,
-                firm_id
-            )
-        )
-
-        # Task 2: Screenshot capture
-        asyncio.create_task(
-            capture_screenshot_independent(
-                request.url,
-                request.firm_user_id,
-                request.agent_id,
-                firm_id
-            )
-        )
-
-        # Task 3: Favicon capture
-        asyncio.create_task(
-            capture_favicon_independent(
-                request.url,
-                request.firm_user_id,
-                request.agent_id,
-                firm_id
+        # Embedding + insert run as a job; the client follows kb_record_id on the file status endpoints
+        try:
+            kb_record_id = await enqueue_website_analysis_ingestion(
+                background_tasks,
+                content=kb_document,
+                file_name=f"Website: {company_name or business_domain}",
+                file_url=normalized_url,
+                user_id=request.firm_user_id,
+                agent_id=request.agent_id,
+                agent_name=request.agent_id
             )
-        )
-
-        logger.info(f"Screenshot, favicon, and brand colors fired as 3 independent tasks - not blocking response")
+        except Exception as kb_error:
+            logger.error(f"Could not queue website analysis KB save: {kb_error}")
+            kb_record_id = None
+        kb_status = "queued" if kb_record_id else "failed"
+        # ========== END KNOWLEDGE BASE SAVE ==========
 
         # Return the latest record data (assets are being processed in background)
         if latest_record.data and len(latest_record.data) > 0:
@@ -2664,7 +2514,8 @@ Tags: {', '.join(tags) if tags else 'None'}
                     "brand_colors": []  # Will be populated by background task
                 },
                 "processing_assets": True,
-                "saved_to_kb": kb_saved,
+                "kb_status": kb_status,
+                "kb_record_id": kb_record_id,
                 "message": "Analysis completed. Screenshot, favicon, and brand colors are being captured in background."
             }
         else:
@@ -2682,7 +2533,8 @@ Tags: {', '.join(tags) if tags else 'None'}
                     "brand_colors": []  # Will be populated by background task
                 },
                 "processing_assets": True,
-                "saved_to_kb": kb_saved,
+                "kb_status": kb_status,
+                "kb_record_id": kb_record_id,
                 "message": "Analysis completed. Screenshot, favicon, and brand colors are being captured in background."
             }
 
@@ -2916,15 +2768,16 @@ async def create_ghl_subaccount(request: SecureGHLSubAccountRequest):
         logger.debug(f"Creating GHL sub-account: {subaccount_name}")
         
         # Make the API call
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                "https://services.leadconnectorhq.com/locations/",
-                headers=headers,
-                json=payload
-            )
+        client = get_http_client('ghl')
+        response = await client.post(
+            "https://services.leadconnectorhq.com/locations/",
+            headers=headers,
+            json=payload,
+            timeout=60.0
+        )
 
-            # Log response status only
-            response_json = response.json() if response.status_code == 201 else None
+        # Log response status only
+        response_json = response.json() if response.status_code == 201 else None
         
         if response.status_code in [200, 201]:
             data = response.json()
@@ -3059,12 +2912,13 @@ async def create_ghl_user(request: GHLUserCreationRequest):
         
     
         # Make the API call
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                "https://services.leadconnectorhq.com/users/",
-                headers=headers,
-                json=payload
-            )
+        client = get_http_client('ghl')
+        response = await client.post(
+            "https://services.leadconnectorhq.com/users/",
+            headers=headers,
+            json=payload,
+            timeout=60.0
+        )
         
         if response.status_code in [200, 201]:
             data = response.json()
@@ -3144,35 +2998,35 @@ async def create_agency_user(
         logger.debug("Creating GHL user via agency API", extra={"location_id": payload.get("locationIds", [None])[0]})
         logger.debug(f"Using agency token prefix: {agency_token[:8]}***")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://services.leadconnectorhq.com/users/",
-                json=payload,
-                headers=headers,
-                timeout=30.0
-            )
+        client = get_http_client('ghl')
+        response = await client.post(
+            "https://services.leadconnectorhq.com/users/",
+            json=payload,
+            headers=headers,
+            timeout=30.0
+        )
             
-            if response.status_code == 201:
-                user_data = response.json()
-                return {
-                    "status": "success",
-                    "message": "User created successfully via agency API",
-                    "user_id": user_data.get("id"),
-                    "details": {
-                        "name": f"{first_name} {last_name}",
-                        "email": email,
-                        "role": role,
-                        "location_ids": [location_id]
-                    },
-                    "raw_response": user_data
-                }
-            else:
-                error_text = response.text
-                logger.error(f"Failed to create user via agency API: {response.status_code} - {error_text}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to create user: {response.status_code} - {error_text}"
-                )
+        if response.status_code == 201:
+            user_data = response.json()
+            return {
+                "status": "success",
+                "message": "User created successfully via agency API",
+                "user_id": user_data.get("id"),
+                "details": {
+                    "name": f"{first_name} {last_name}",
+                    "email": email,
+                    "role": role,
+                    "location_ids": [location_id]
+                },
+                "raw_response": user_data
+            }
+        else:
+            error_text = response.text
+            logger.error(f"Failed to create user via agency API: {response.status_code} - {error_text}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to create user: {response.status_code} - {error_text}"
+            )
                 
     except Exception as e:
         logger.error(f"Exception in agency user creation: {str(e)}")
@@ -3191,25 +3045,26 @@ async def wait_for_location_availability(location_id: str, agency_token: str, ma
         try:
             logger.info(f"Checking location availability: attempt {attempt + 1}/{max_retries}")
             
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    "https://services.leadconnectorhq.com/locations/search",
-                    headers=headers
-                )
+            client = get_http_client('ghl')
+            response = await client.get(
+                "https://services.leadconnectorhq.com/locations/search",
+                headers=headers,
+                timeout=10.0
+            )
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    locations = data.get('locations', [])
+            if response.status_code == 200:
+                data = response.json()
+                locations = data.get('locations', [])
                     
-                    # Check if our location_id is in the list
-                    for location in locations:
-                        if location.get('id') == location_id:
-                            logger.info(f"✅ Location {location_id} is now available!")
-                            return True
+                # Check if our location_id is in the list
+                for location in locations:
+                    if location.get('id') == location_id:
+                        logger.info(f"✅ Location {location_id} is now available!")
+                        return True
                     
-                    logger.info(f"Location {location_id} not yet available (attempt {attempt + 1})")
-                else:
-                    logger.warning(f"Failed to check locations: {response.status_code}")
+                logger.info(f"Location {location_id} not yet available (attempt {attempt + 1})")
+            else:
+                logger.warning(f"Failed to check locations: {response.status_code}")
                     
         except Exception as e:
             logger.error(f"Error checking location availability: {e}")
@@ -3283,13 +3138,11 @@ async def process_website_extraction(website_url: str, user_id: str):
 async def extract_business_info_from_website(website_url: str) -> dict:
     """Use LLM to extract business information from website"""
     try:
-        import httpx
         import json
         
-        # Fetch website content
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(website_url)
-            website_content = response.text[:5000]  # Limit content size
+        # Fetch website content (page cache: unchanged sites only cost a revalidation)
+        page = await get_page_cache().fetch(website_url, timeout=30.0)
+        website_content = page.text[:5000]  # Limit content size
         
         # Prepare prompt for LLM
         prompt = f"""
@@ -3893,6 +3746,7 @@ async def run_ghl_creation_background(
             'creation_status': 'subaccount_created',
             'updated_at': datetime.now().isoformat()
         }).eq('id', ghl_record_id).execute()
+        get_ghl_cache().invalidate_user(user_id, location_id)
         
         # Step 2: Create Soma user
         logger.debug("[GHL BACKGROUND] Creating Soma user")
@@ -4096,28 +3950,28 @@ async def run_ghl_creation_background(
         try:
             automation_service_url = os.getenv('AUTOMATION_USER1_SERVICE_URL', 'https://backgroundautomationuser1-1644057ede7b.herokuapp.com')
 
-            async with httpx.AsyncClient(timeout=300.0) as client:
-                automation_response = await client.post(
-                    f"{automation_service_url}/ghl/complete-automation",
-                    json={
-                        "location_id": location_id,
-                        "email": soma_unique_email,
-                        "password": "Dummy@123",
-                        "firm_user_id": user_id,
-                        "ghl_user_id": soma_user_id
-                    }
-                )
+            client = get_http_client('automation')
+            automation_response = await client.post(
+                f"{automation_service_url}/ghl/complete-automation",
+                json={
+                    "location_id": location_id,
+                    "email": soma_unique_email,
+                    "password": "Dummy@123",
+                    "firm_user_id": user_id,
+                    "ghl_user_id": soma_user_id
+                }
+            )
 
-                if automation_response.status_code == 200:
-                    logger.info("[GHL BACKGROUND] Browser automation triggered successfully")
-                else:
-                    logger.warning("[GHL BACKGROUND] Browser automation trigger failed", extra={"status_code": automation_response.status_code})
-                    # Set status to show manual token refresh needed
-                    supabase.table('ghl_subaccounts').update({
-                        'automation_status': 'token_capture_failed',
-                        'automation_error': f"Browser automation failed: {automation_response.text}",
-                        'updated_at': datetime.now().isoformat()
-                    }).eq('id', ghl_record_id).execute()
+            if automation_response.status_code == 200:
+                logger.info("[GHL BACKGROUND] Browser automation triggered successfully")
+            else:
+                logger.warning("[GHL BACKGROUND] Browser automation trigger failed", extra={"status_code": automation_response.status_code})
+                # Set status to show manual token refresh needed
+                supabase.table('ghl_subaccounts').update({
+                    'automation_status': 'token_capture_failed',
+                    'automation_error': f"Browser automation failed: {automation_response.text}",
+                    'updated_at': datetime.now().isoformat()
+                }).eq('id', ghl_record_id).execute()
 
         except Exception as automation_error:
             logger.warning("[GHL BACKGROUND] Could not trigger browser automation", exc_info=automation_error)
@@ -4199,34 +4053,37 @@ async def run_pit_token_automation(
         
         print(f"[PIT AUTOMATION] 📞 Calling BackgroundAutomationUser1 service at: {automation_service_url}")
         
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{automation_service_url}/ghl/complete-automation",
-                json={
-                    "location_id": location_id,
-                    "firm_user_id": firm_user_id,
-                    "email": email,
-                    "password": password,
-                    "ghl_user_id": ghl_user_id
-                }
-            )
+        client = get_http_client('automation')
+        response = await client.post(
+            f"{automation_service_url}/ghl/complete-automation",
+            json={
+                "location_id": location_id,
+                "firm_user_id": firm_user_id,
+                "email": email,
+                "password": password,
+                "ghl_user_id": ghl_user_id
+            }
+        )
             
-            if response.status_code == 200:
-                result = response.json()
-                print(f"[PIT AUTOMATION] ✅ Automation service responded: {result.get('message')}")
-                print(f"[PIT AUTOMATION] 🎯 Task ID: {result.get('task_id')}")
-                print(f"[PIT AUTOMATION] 🚀 Automation is running on remote service")
-                print(f"[PIT AUTOMATION] 💾 Database will be updated automatically by the service")
-            else:
-                error_msg = f"Service returned {response.status_code}: {response.text}"
-                print(f"[PIT AUTOMATION] ❌ Automation service error: {error_msg}")
+        # The service writes the new tokens to ghl_subaccounts itself
+        get_ghl_cache().invalidate_user(firm_user_id)
+            
+        if response.status_code == 200:
+            result = response.json()
+            print(f"[PIT AUTOMATION] ✅ Automation service responded: {result.get('message')}")
+            print(f"[PIT AUTOMATION] 🎯 Task ID: {result.get('task_id')}")
+            print(f"[PIT AUTOMATION] 🚀 Automation is running on remote service")
+            print(f"[PIT AUTOMATION] 💾 Database will be updated automatically by the service")
+        else:
+            error_msg = f"Service returned {response.status_code}: {response.text}"
+            print(f"[PIT AUTOMATION] ❌ Automation service error: {error_msg}")
                 
-                # Update status to failed
-                supabase.table('ghl_subaccounts').update({
-                    'automation_status': 'pit_failed',
-                    'automation_error': error_msg,
-                    'updated_at': datetime.now().isoformat()
-                }).eq('id', ghl_record_id).execute()
+            # Update status to failed
+            supabase.table('ghl_subaccounts').update({
+                'automation_status': 'pit_failed',
+                'automation_error': error_msg,
+                'updated_at': datetime.now().isoformat()
+            }).eq('id', ghl_record_id).execute()
             
     except Exception as e:
         error_msg = f"PIT automation task failed: {str(e)}"
@@ -4344,6 +4201,7 @@ async def create_subaccount_and_user_registration(request: GHLRegistrationReques
             'creation_status': 'pending',
             'automation_status': 'not_started'
         }).execute()
+        get_ghl_cache().invalidate_user(user_id)
         
         end_db_insert = time.time()
         logger.info("GHL record created", extra={"ghl_record_id": ghl_record_id})
@@ -4596,44 +4454,46 @@ async def retry_ghl_automation(request: dict):
             'automation_error': None,
             'updated_at': datetime.now().isoformat()
         }).eq('id', ghl_record_id).execute()
+        get_ghl_cache().invalidate_user(firm_user_id)
         
         try:
             # Call automation service with timeout
-            async with httpx.AsyncClient(timeout=30.0) as client:  # 30 second timeout for API call
-                response = await client.post(
-                    f"{automation_service_url}/ghl/complete-automation",
-                    json={
-                        "location_id": location_id,
-                        "firm_user_id": firm_user_id,
-                        "ghl_user_id": soma_user_id
-                    }
-                )
+            client = get_http_client('automation')
+            response = await client.post(
+                f"{automation_service_url}/ghl/complete-automation",
+                json={
+                    "location_id": location_id,
+                    "firm_user_id": firm_user_id,
+                    "ghl_user_id": soma_user_id
+                },
+                timeout=30.0  # 30 second timeout for API call
+            )
                 
-                if response.status_code == 200:
-                    result = response.json()
+            if response.status_code == 200:
+                result = response.json()
                     
-                    # Automation service accepted the task and will update DB when complete
-                    # The background task in automation service will update automation_status to 'completed' or 'failed'
-                    return {
-                        "success": True,
-                        "message": "GHL automation retry started - background task will update status when complete",
-                        "firm_user_id": firm_user_id,
-                        "location_id": location_id,
-                        "soma_user_id": soma_user_id,
-                        "status": "running",
-                        "task_id": result.get('task_id'),
-                        "note": "Check automation_status in ghl_subaccounts table for completion"
-                    }
-                else:
-                    error_msg = f"Automation service returned error: {response.status_code} - {response.text}"
+                # Automation service accepted the task and will update DB when complete
+                # The background task in automation service will update automation_status to 'completed' or 'failed'
+                return {
+                    "success": True,
+                    "message": "GHL automation retry started - background task will update status when complete",
+                    "firm_user_id": firm_user_id,
+                    "location_id": location_id,
+                    "soma_user_id": soma_user_id,
+                    "status": "running",
+                    "task_id": result.get('task_id'),
+                    "note": "Check automation_status in ghl_subaccounts table for completion"
+                }
+            else:
+                error_msg = f"Automation service returned error: {response.status_code} - {response.text}"
                     
-                    supabase.table('ghl_subaccounts').update({
-                        'automation_status': 'failed',
-                        'automation_error': error_msg,
-                        'updated_at': datetime.now().isoformat()
-                    }).eq('id', ghl_record_id).execute()
+                supabase.table('ghl_subaccounts').update({
+                    'automation_status': 'failed',
+                    'automation_error': error_msg,
+                    'updated_at': datetime.now().isoformat()
+                }).eq('id', ghl_record_id).execute()
                     
-                    raise HTTPException(status_code=500, detail=error_msg)
+                raise HTTPException(status_code=500, detail=error_msg)
                     
         except httpx.TimeoutException:
             error_msg = "Automation service request timed out (30s) - service may be down or overloaded"
@@ -4721,6 +4581,22 @@ async def cleanup_stuck_automations():
         print(f"[CLEANUP] ❌ Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/ghl/cache/invalidate/{firm_user_id}")
+async def invalidate_ghl_cache(firm_user_id: str):
+    """
+    Drop cached ghl_subaccounts data (location ids, pit_token) for a user on all workers.
+    Called by BackgroundAutomationUser1 after it writes captured tokens.
+    """
+    get_ghl_cache().invalidate_user(firm_user_id)
+    return {"success": True, "firm_user_id": firm_user_id}
+
+
+@app.get("/health/ghl-cache")
+async def health_check_ghl_cache():
+    """ghl_subaccounts cache hit ratio and sizes"""
+    return get_ghl_cache().get_stats()
+
+
 @app.post("/api/ghl/refresh-tokens/{firm_user_id}")
 async def refresh_ghl_tokens(firm_user_id: str, agent_id: str = "SOL"):
     """
@@ -4753,27 +4629,32 @@ async def refresh_ghl_tokens(firm_user_id: str, agent_id: str = "SOL"):
             'automation_status': 'token_refresh_running',
             'updated_at': datetime.now().isoformat()
         }).eq('firm_user_id', firm_user_id).eq('agent_id', agent_id).execute()
+        # Tokens are about to be replaced
+        get_ghl_cache().invalidate_user(firm_user_id)
 
         # Call BackgroundAutomationUser1 service to capture tokens
         print(f"[TOKEN REFRESH] 📞 Calling BackgroundAutomationUser1 service...")
 
         automation_service_url = os.getenv('AUTOMATION_USER1_SERVICE_URL', 'https://backgroundautomationuser1-1644057ede7b.herokuapp.com')
 
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            automation_response = await client.post(
-                f"{automation_service_url}/ghl/complete-automation",
-                json={
-                    "location_id": location_id,
-                    "firm_user_id": firm_user_id,
-                    "ghl_user_id": soma_user_id
-                }
-            )
+        client = get_http_client('automation')
+        automation_response = await client.post(
+            f"{automation_service_url}/ghl/complete-automation",
+            json={
+                "location_id": location_id,
+                "firm_user_id": firm_user_id,
+                "ghl_user_id": soma_user_id
+            }
+        )
 
-            if automation_response.status_code != 200:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Automation service error: {automation_response.text}"
-                )
+        # The service writes the new pit_token itself; drop anything cached during the call
+        get_ghl_cache().invalidate_user(firm_user_id)
+
+        if automation_response.status_code != 200:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Automation service error: {automation_response.text}"
+            )
 
         print(f"[TOKEN REFRESH] ✅ Token refresh started successfully")
 
@@ -4797,7 +4678,7 @@ async def get_user_ghl_integrations(user_id: str):
         print(f"[GHL INTEGRATIONS] 📊 Fetching integrations for user: {user_id}")
 
         # Get all GHL subaccounts for this user using firm_user_id
-        ghl_result = supabase.table('ghl_subaccounts')\
+        ghl_result = await get_async_supabase().table('ghl_subaccounts')\
             .select('*')\
             .eq('firm_user_id', user_id)\
             .execute()
@@ -4821,7 +4702,7 @@ async def get_ghl_status(ghl_record_id: str):
         print(f"[GHL STATUS] 📊 Checking status for record: {ghl_record_id}")
         
         # Get GHL subaccount status
-        ghl_result = supabase.table('ghl_subaccounts')\
+        ghl_result = await get_async_supabase().table('ghl_subaccounts')\
             .select('*')\
             .eq('id', ghl_record_id)\
             .single()\
@@ -4833,7 +4714,7 @@ async def get_ghl_status(ghl_record_id: str):
         ghl_data = ghl_result.data
         
         # Get Facebook integration status if available
-        facebook_result = supabase.table('facebook_integrations')\
+        facebook_result = await get_async_supabase().table('facebook_integrations')\
             .select('*')\
             .eq('ghl_subaccount_id', ghl_record_id)\
             .execute()
@@ -4911,69 +4792,68 @@ class FacebookOAuthExtractor:
         try:
             ghl_url = f"https://services.leadconnectorhq.com/social-media-posting/oauth/facebook/start?locationId={location_id}&userId={user_id}"
             
-            async with httpx.AsyncClient(follow_redirects=False) as client:
-                response = await client.get(ghl_url)
-                
-                if response.status_code not in [301, 302]:
-                    raise ValueError(f"Expected redirect from GHL service, got {response.status_code}")
+            client = get_http_client('ghl')
+            response = await client.get(ghl_url)
+            if response.status_code not in [301, 302]:
+                raise ValueError(f"Expected redirect from GHL service, got {response.status_code}")
                 
-                redirect_url = response.headers.get('location', '')
-                if not redirect_url or 'facebook.com' not in redirect_url:
-                    raise ValueError(f"Invalid redirect URL: {redirect_url}")
+            redirect_url = response.headers.get('location', '')
+            if not redirect_url or 'facebook.com' not in redirect_url:
+                raise ValueError(f"Invalid redirect URL: {redirect_url}")
                 
-                params = {}
+            params = {}
                 
-                if 'facebook.com/privacy/consent/gdp' in redirect_url:
-                    # Extract from GDPR consent page (URL encoded)
-                    import re
-                    import urllib.parse
-                    patterns = {
-                        'app_id': r'params%5Bapp_id%5D=(\d+)',
-                        'redirect_uri': r'params%5Bredirect_uri%5D=%22([^%]+(?:%[^%]+)*)',
-                        'scope': r'params%5Bscope%5D=(%5B[^%]+(?:%[^%]+)*%5D)',
-                        'state': r'params%5Bstate%5D=%22([^%]+(?:%[^%]+)*)',
-                        'logger_id': r'params%5Blogger_id%5D=%22([^%]+)'
-                    }
+            if 'facebook.com/privacy/consent/gdp' in redirect_url:
+                # Extract from GDPR consent page (URL encoded)
+                import re
+                import urllib.parse
+                patterns = {
+                    'app_id': r'params%5Bapp_id%5D=(\d+)',
+                    'redirect_uri': r'params%5Bredirect_uri%5D=%22([^%]+(?:%[^%]+)*)',
+                    'scope': r'params%5Bscope%5D=(%5B[^%]+(?:%[^%]+)*%5D)',
+                    'state': r'params%5Bstate%5D=%22([^%]+(?:%[^%]+)*)',
+                    'logger_id': r'params%5Blogger_id%5D=%22([^%]+)'
+                }
                     
-                    for param, pattern in patterns.items():
-                        match = re.search(pattern, redirect_url)
-                        if match:
-                            value = match.group(1)
+                for param, pattern in patterns.items():
+                    match = re.search(pattern, redirect_url)
+                    if match:
+                        value = match.group(1)
                             
-                            if param == 'app_id':
-                                params['app_id'] = value
-                                params['client_id'] = value
-                            elif param == 'redirect_uri':
-                                params['redirect_uri'] = urllib.parse.unquote(value.replace('\\%2F', '/').replace('\\', ''))
-                            elif param == 'scope':
-                                try:
-                                    scope_str = urllib.parse.unquote(value)
-                                    scope_array = json.loads(scope_str.replace('\\', ''))
-                                    params['scope'] = ','.join(scope_array)
-                                except:
-                                    params['scope'] = 'email,pages_show_list,pages_read_engagement'
-                            elif param == 'state':
-                                params['state'] = urllib.parse.unquote(value.replace('\\', ''))
-                            elif param == 'logger_id':
-                                params['logger_id'] = value
+                        if param == 'app_id':
+                            params['app_id'] = value
+                            params['client_id'] = value
+                        elif param == 'redirect_uri':
+                            params['redirect_uri'] = urllib.parse.unquote(value.replace('\\%2F', '/').replace('\\', ''))
+                        elif param == 'scope':
+                            try:
+                                scope_str = urllib.parse.unquote(value)
+                                scope_array = json.loads(scope_str.replace('\\', ''))
+                                params['scope'] = ','.join(scope_array)
+                            except:
+                                params['scope'] = 'email,pages_show_list,pages_read_engagement'
+                        elif param == 'state':
+                            params['state'] = urllib.parse.unquote(value.replace('\\', ''))
+                        elif param == 'logger_id':
+                            params['logger_id'] = value
                     
-                    params['response_type'] = 'code'
+                params['response_type'] = 'code'
                     
-                elif 'facebook.com/dialog/oauth' in redirect_url:
-                    # Extract from direct OAuth URL
-                    from urllib.parse import urlparse, parse_qs
-                    parsed = urlparse(redirect_url)
-                    query_params = parse_qs(parsed.query)
+            elif 'facebook.com/dialog/oauth' in redirect_url:
+                # Extract from direct OAuth URL
+                from urllib.parse import urlparse, parse_qs
+                parsed = urlparse(redirect_url)
+                query_params = parse_qs(parsed.query)
                     
-                    for key, value in query_params.items():
-                        params[key] = value[0] if value else None
+                for key, value in query_params.items():
+                    params[key] = value[0] if value else None
                 
-                return {
-                    'success': True,
-                    'params': params,
-                    'redirect_url': redirect_url,
-                    'extracted_at': datetime.now().isoformat()
-                }
+            return {
+                'success': True,
+                'params': params,
+                'redirect_url': redirect_url,
+                'extracted_at': datetime.now().isoformat()
+            }
                 
         except Exception as e:
             logger.error(f"Facebook OAuth extraction error: {str(e)}")
@@ -5401,56 +5281,55 @@ async def check_facebook_accounts_after_oauth(request: dict):
         print(f"📱 [OAUTH CHECK] Checking for new Facebook accounts with PIT token...")
         
         # Check for Facebook accounts using PIT token
-        import httpx
         headers = {
             "Authorization": f"Bearer {pit_token}",
             "Version": "2021-07-28",
             "Accept": "application/json"
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            accounts_url = f"https://services.leadconnectorhq.com/social-media-posting/{target_location_id}/accounts"
-            response = await client.get(accounts_url, headers=headers)
+        client = get_http_client('ghl')
+        accounts_url = f"https://services.leadconnectorhq.com/social-media-posting/{target_location_id}/accounts"
+        response = await client.get(accounts_url, headers=headers)
             
-            if response.status_code == 200:
-                accounts_data = response.json()
-                facebook_accounts = []
+        if response.status_code == 200:
+            accounts_data = response.json()
+            facebook_accounts = []
                 
-                if 'results' in accounts_data and 'accounts' in accounts_data['results']:
-                    facebook_accounts = [acc for acc in accounts_data['results']['accounts'] if acc.get('platform') == 'facebook']
+            if 'results' in accounts_data and 'accounts' in accounts_data['results']:
+                facebook_accounts = [acc for acc in accounts_data['results']['accounts'] if acc.get('platform') == 'facebook']
                 
-                if facebook_accounts:
-                    # Found Facebook account(s)! Store the first one
-                    facebook_account_id = facebook_accounts[0].get('_id') or facebook_accounts[0].get('id')
+            if facebook_accounts:
+                # Found Facebook account(s)! Store the first one
+                facebook_account_id = facebook_accounts[0].get('_id') or facebook_accounts[0].get('id')
                     
-                    print(f"📱 [OAUTH CHECK] ✅ Found new Facebook account: {facebook_account_id}")
+                print(f"📱 [OAUTH CHECK] ✅ Found new Facebook account: {facebook_account_id}")
                     
-                    # Store the account ID in database
-                    supabase.table('squidgy_agent_business_setup').update({
-                        'facebook_account_id': facebook_account_id,
-                        'updated_at': 'now()'
-                    }).eq('firm_user_id', firm_user_uuid).eq('agent_id', 'SOLAgent').eq('setup_type', 'GHLSetup').execute()
+                # Store the account ID in database
+                supabase.table('squidgy_agent_business_setup').update({
+                    'facebook_account_id': facebook_account_id,
+                    'updated_at': 'now()'
+                }).eq('firm_user_id', firm_user_uuid).eq('agent_id', 'SOLAgent').eq('setup_type', 'GHLSetup').execute()
                     
-                    return {
-                        "success": True,
-                        "message": f"Facebook account registered successfully",
-                        "facebook_account_id": facebook_account_id,
-                        "total_accounts": len(facebook_accounts)
-                    }
-                else:
-                    print(f"📱 [OAUTH CHECK] No Facebook accounts found yet")
-                    return {
-                        "success": False,
-                        "message": "No Facebook accounts found. OAuth may still be processing.",
-                        "facebook_account_id": None
-                    }
+                return {
+                    "success": True,
+                    "message": f"Facebook account registered successfully",
+                    "facebook_account_id": facebook_account_id,
+                    "total_accounts": len(facebook_accounts)
+                }
             else:
-                print(f"📱 [OAUTH CHECK] ❌ API error: {response.status_code} - {response.text}")
+                print(f"📱 [OAUTH CHECK] No Facebook accounts found yet")
                 return {
                     "success": False,
-                    "message": f"API error: {response.status_code}",
+                    "message": "No Facebook accounts found. OAuth may still be processing.",
                     "facebook_account_id": None
                 }
+        else:
+            print(f"📱 [OAUTH CHECK] ❌ API error: {response.status_code} - {response.text}")
+            return {
+                "success": False,
+                "message": f"API error: {response.status_code}",
+                "facebook_account_id": None
+            }
                 
     except Exception as e:
         print(f"📱 [OAUTH CHECK] ❌ Error: {str(e)}")
@@ -5642,9 +5521,9 @@ async def save_selected_facebook_pages(request: dict):
                             "Content-Type": "application/json"
                         }
                         
-                        async with httpx.AsyncClient(timeout=30.0) as client:
-                            response = await client.post(ghl_api_url, headers=headers, json={})
-                            print(f"[FB SAVE] Connected page {page_id} in GHL: {response.status_code}")
+                        client = get_http_client('ghl')
+                        response = await client.post(ghl_api_url, headers=headers, json={})
+                        print(f"[FB SAVE] Connected page {page_id} in GHL: {response.status_code}")
                     except Exception as e:
                         print(f"[FB SAVE] Error connecting page {page_id} in GHL: {e}")
         
@@ -5754,28 +5633,28 @@ async def get_pages_from_integration(request: dict):
             "Accept": "application/json"
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(ghl_backend_url, headers=headers, params={"limit": 100})
+        client = get_http_client('ghl')
+        response = await client.get(ghl_backend_url, headers=headers, params={"limit": 100})
             
-            if response.status_code == 200:
-                ghl_pages_data = response.json()
-                print(f"[FB PAGES] GHL Backend API Response: {ghl_pages_data}")
+        if response.status_code == 200:
+            ghl_pages_data = response.json()
+            print(f"[FB PAGES] GHL Backend API Response: {ghl_pages_data}")
                 
-                facebook_pages = ghl_pages_data.get('pages', [])
+            facebook_pages = ghl_pages_data.get('pages', [])
                 
-                if not facebook_pages:
-                    return {
-                        "success": False,
-                        "message": "No Facebook pages found. Please connect your Facebook pages in GoHighLevel first.",
-                        "pages": [],
-                        "source": "ghl_backend_empty"
-                    }
+            if not facebook_pages:
+                return {
+                    "success": False,
+                    "message": "No Facebook pages found. Please connect your Facebook pages in GoHighLevel first.",
+                    "pages": [],
+                    "source": "ghl_backend_empty"
+                }
                 
-                facebook_accounts_data = facebook_pages
-            else:
-                error_data = response.json() if response.text else {}
-                error_msg = error_data.get('error', {}).get('message', response.text)
-                raise HTTPException(status_code=response.status_code, detail=f"GHL Backend API error: {error_msg}")
+            facebook_accounts_data = facebook_pages
+        else:
+            error_data = response.json() if response.text else {}
+            error_msg = error_data.get('error', {}).get('message', response.text)
+            raise HTTPException(status_code=response.status_code, detail=f"GHL Backend API error: {error_msg}")
         
         # Transform to our expected format for UI consistency
         transformed_pages = []
@@ -5920,17 +5799,17 @@ async def connect_selected_pages(request: dict):
                 print(f"[FB CONNECT] API URL: {ghl_api_url}")
                 print(f"[FB CONNECT] Payload: {pages_payload}")
                 
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(ghl_api_url, headers=headers, json=pages_payload)
+                client = get_http_client('ghl')
+                response = await client.post(ghl_api_url, headers=headers, json=pages_payload)
                     
-                    if response.status_code in [200, 201]:
-                        connected_pages = selected_page_ids
-                        print(f"[FB CONNECT] Successfully connected {len(selected_page_ids)} pages")
-                        print(f"[FB CONNECT] GHL Response: {response.json()}")
-                    else:
-                        failed_pages = selected_page_ids
-                        print(f"[FB CONNECT] Failed to connect pages: {response.status_code}")
-                        print(f"[FB CONNECT] Error: {response.text}")
+                if response.status_code in [200, 201]:
+                    connected_pages = selected_page_ids
+                    print(f"[FB CONNECT] Successfully connected {len(selected_page_ids)} pages")
+                    print(f"[FB CONNECT] GHL Response: {response.json()}")
+                else:
+                    failed_pages = selected_page_ids
+                    print(f"[FB CONNECT] Failed to connect pages: {response.status_code}")
+                    print(f"[FB CONNECT] Error: {response.text}")
                         
             except Exception as e:
                 failed_pages = selected_page_ids
@@ -5961,7 +5840,7 @@ async def get_facebook_connection_status(firm_user_id: str):
             raise HTTPException(status_code=400, detail="firm_user_id is required")
         
         # Check if user has connected pages
-        integration_result = supabase.table('facebook_integrations').select(
+        integration_result = await get_async_supabase().table('facebook_integrations').select(
             'connected_pages, automation_status, automation_completed_at'
         ).eq('firm_user_id', firm_user_id).execute()
         
@@ -6202,7 +6081,7 @@ async def get_business_profile(firm_user_id: str):
     Get business profile by user ID
     """
     try:
-        result = supabase.table('business_profiles')\
+        result = await get_async_supabase().table('business_profiles')\
             .select('*')\
             .eq('firm_user_id', firm_user_id)\
             .single()\
@@ -6402,34 +6281,34 @@ async def run_facebook_retry_automation(firm_user_id: str, location_id: str):
 
         print(f"[RETRY AUTOMATION] Calling BackgroundAutomationUser1 service at: {automation_service_url}")
 
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{automation_service_url}/ghl/retry-automation",
-                json={
-                    "location_id": location_id,
-                    "firm_user_id": firm_user_id
-                }
-            )
+        client = get_http_client('automation')
+        response = await client.post(
+            f"{automation_service_url}/ghl/retry-automation",
+            json={
+                "location_id": location_id,
+                "firm_user_id": firm_user_id
+            }
+        )
 
-            if response.status_code == 200:
-                result = response.json()
-                print(f"[RETRY AUTOMATION] ✅ Automation service responded: {result.get('message')}")
-                print(f"[RETRY AUTOMATION] 🎯 Task ID: {result.get('task_id')}")
-                print(f"[RETRY AUTOMATION] 🚀 Automation is running on remote service")
-                print(f"[RETRY AUTOMATION] 💾 Database will be updated automatically by the service")
+        if response.status_code == 200:
+            result = response.json()
+            print(f"[RETRY AUTOMATION] ✅ Automation service responded: {result.get('message')}")
+            print(f"[RETRY AUTOMATION] 🎯 Task ID: {result.get('task_id')}")
+            print(f"[RETRY AUTOMATION] 🚀 Automation is running on remote service")
+            print(f"[RETRY AUTOMATION] 💾 Database will be updated automatically by the service")
 
-                # Note: Don't update database here - BackgroundAutomationUser1 service handles it
-            else:
-                error_msg = f"Service returned {response.status_code}: {response.text}"
-                print(f"[RETRY AUTOMATION] ❌ Automation service error: {error_msg}")
+            # Note: Don't update database here - BackgroundAutomationUser1 service handles it
+        else:
+            error_msg = f"Service returned {response.status_code}: {response.text}"
+            print(f"[RETRY AUTOMATION] ❌ Automation service error: {error_msg}")
 
-                # Update status to failed
-                supabase.table('facebook_integrations').update({
-                    'automation_status': 'retry_failed',
-                    'automation_step': 'service_error',
-                    'automation_error': error_msg,
-                    'updated_at': datetime.now().isoformat()
-                }).eq('firm_user_id', firm_user_id).execute()
+            # Update status to failed
+            supabase.table('facebook_integrations').update({
+                'automation_status': 'retry_failed',
+                'automation_step': 'service_error',
+                'automation_error': error_msg,
+                'updated_at': datetime.now().isoformat()
+            }).eq('firm_user_id', firm_user_id).execute()
 
     except Exception as e:
         error_msg = f"Exception calling automation service: {e}"
@@ -6473,32 +6352,32 @@ async def run_complete_automation(request: dict, background_tasks: BackgroundTas
         
         print(f"[COMPLETE AUTOMATION] Calling BackgroundAutomationUser1 service at: {automation_service_url}")
         
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{automation_service_url}/ghl/complete-automation",
-                json={
-                    "location_id": location_id,
-                    "firm_user_id": firm_user_id
-                }
-            )
+        client = get_http_client('automation')
+        response = await client.post(
+            f"{automation_service_url}/ghl/complete-automation",
+            json={
+                "location_id": location_id,
+                "firm_user_id": firm_user_id
+            }
+        )
             
-            if response.status_code == 200:
-                result = response.json()
-                print(f"[COMPLETE AUTOMATION] Service responded: {result.get('message')}")
-                print(f"[COMPLETE AUTOMATION] Task ID: {result.get('task_id')}")
+        if response.status_code == 200:
+            result = response.json()
+            print(f"[COMPLETE AUTOMATION] Service responded: {result.get('message')}")
+            print(f"[COMPLETE AUTOMATION] Task ID: {result.get('task_id')}")
                 
-                return {
-                    "success": True,
-                    "message": "Complete automation started in background",
-                    "task_id": result.get('task_id'),
-                    "status": "running"
-                }
-            else:
-                print(f"[COMPLETE AUTOMATION] Service error: {response.status_code} - {response.text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Automation service error: {response.text}"
-                )
+            return {
+                "success": True,
+                "message": "Complete automation started in background",
+                "task_id": result.get('task_id'),
+                "status": "running"
+            }
+        else:
+            print(f"[COMPLETE AUTOMATION] Service error: {response.status_code} - {response.text}")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Automation service error: {response.text}"
+            )
                 
     except HTTPException:
         raise
@@ -6596,34 +6475,40 @@ async def run_firebase_token_refresh(firm_user_id: str, location_id: str, email:
             'automation_status': 'token_refresh_running',
             'updated_at': datetime.now().isoformat()
         }).eq('firm_user_id', firm_user_id).execute()
+        # Tokens are about to be replaced
+        get_ghl_cache().invalidate_user(firm_user_id)
         
         # Call BackgroundAutomationUser1 service
         automation_service_url = os.getenv('AUTOMATION_USER1_SERVICE_URL', 'https://backgroundautomationuser1-1644057ede7b.herokuapp.com')
         
         print(f"[TOKEN REFRESH] Calling BackgroundAutomationUser1 service at: {automation_service_url}")
         
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{automation_service_url}/ghl/retry-automation",
-                json={
-                    "location_id": location_id,
-                    "firm_user_id": firm_user_id
-                }
-            )
+        client = get_http_client('automation')
+        response = await client.post(
+            f"{automation_service_url}/ghl/retry-automation",
+            json={
+                "location_id": location_id,
+                "firm_user_id": firm_user_id
+            }
+        )
+
+        # The service writes the new tokens itself; drop anything cached during the call
+        get_ghl_cache().invalidate_user(firm_user_id)
             
-            if response.status_code == 200:
-                result = response.json()
-                print(f"[TOKEN REFRESH] Automation service responded: {result.get('message')}")
-                print(f"[TOKEN REFRESH] Task ID: {result.get('task_id')}")
-                print(f"[TOKEN REFRESH] Automation is running on remote service, database will be updated automatically")
-            else:
-                print(f"[TOKEN REFRESH] Automation service error: {response.status_code} - {response.text}")
-                # Clear running status
-                supabase.table('ghl_subaccounts').update({
-                    'automation_status': 'token_refresh_failed',
-                    'automation_error': f"Service returned {response.status_code}",
-                    'updated_at': datetime.now().isoformat()
-                }).eq('firm_user_id', firm_user_id).execute()
+        if response.status_code == 200:
+            result = response.json()
+            print(f"[TOKEN REFRESH] Automation service responded: {result.get('message')}")
+            print(f"[TOKEN REFRESH] Task ID: {result.get('task_id')}")
+            print(f"[TOKEN REFRESH] Automation is running on remote service, database will be updated automatically")
+        else:
+            print(f"[TOKEN REFRESH] Automation service error: {response.status_code} - {response.text}")
+            # Clear running status
+            supabase.table('ghl_subaccounts').update({
+                'automation_status': 'token_refresh_failed',
+                'automation_error': f"Service returned {response.status_code}",
+                'updated_at': datetime.now().isoformat()
+            }).eq('firm_user_id', firm_user_id).execute()
+            get_ghl_cache().invalidate_user(firm_user_id)
             
     except Exception as e:
         print(f"[TOKEN REFRESH] Exception calling automation service: {e}")
@@ -6634,6 +6519,7 @@ async def run_firebase_token_refresh(firm_user_id: str, location_id: str, email:
                 'automation_error': str(e),
                 'updated_at': datetime.now().isoformat()
             }).eq('firm_user_id', firm_user_id).execute()
+            get_ghl_cache().invalidate_user(firm_user_id)
         except:
             pass
 
@@ -6694,10 +6580,10 @@ async def process_file_from_url(
         record_id = result["id"]
         logger.info(f"Created processing record: {record_id}")
         
-        # Start background text extraction using the same function as agent settings
+        # Queue text extraction using the same function as agent settings
         # This ensures consistent embedding and storage behavior
-        background_tasks.add_task(
-            extract_and_update_neon_record_v2,
+        await enqueue_file_ingestion(
+            background_tasks,
             record_id,
             file_url,
             file_name,
@@ -6764,8 +6650,6 @@ async def extract_text_from_file(request: FileExtractionRequest):
     - chunks: Text split into embedding-safe chunks
     - kb_saved: Whether content was saved to knowledge base (if save_to_kb=true)
     """
-    import asyncpg
-    
     file_url = request.file_url
     file_name = request.file_name
     user_id = request.user_id
@@ -6844,9 +6728,7 @@ async def get_file_processing_status(file_id: str):
         data = result["data"]
         
         # Check SSE status first for real-time progress
-        sse_status = None
-        with _file_status_lock:
-            sse_status = file_processing_status.get(file_id)
+        sse_status = await get_file_status_bus().get(file_id)
         
         # Derive status from neon_record_ids (processing_status column was removed)
         neon_ids = data.get("neon_record_ids", []) or []
@@ -6910,22 +6792,7 @@ async def get_file_extracted_content(file_id: str):
             }
         
         # Fetch the extracted text from Neon
-        import asyncpg
-        
-        NEON_DB_HOST = os.getenv('NEON_DB_HOST')
-        NEON_DB_USER = os.getenv('NEON_DB_USER')
-        NEON_DB_PASSWORD = os.getenv('NEON_DB_PASSWORD')
-        NEON_DB_NAME = os.getenv('NEON_DB_NAME', 'neondb')
-        
-        conn = await asyncpg.connect(
-            host=NEON_DB_HOST,
-            user=NEON_DB_USER,
-            password=NEON_DB_PASSWORD,
-            database=NEON_DB_NAME,
-            ssl="require"
-        )
-        
-        try:
+        async with database.acquire() as conn:
             # Check if IDs are integers or UUIDs
             # Old records may have UUID-style IDs, new records have integer IDs stored as strings
             file_name = data["file_name"]
@@ -6957,8 +6824,6 @@ async def get_file_extracted_content(file_id: str):
                     "chunk_count": len(rows)
                 }
             }
-        finally:
-            await conn.close()
             
     except HTTPException:
         raise
@@ -6988,8 +6853,6 @@ async def get_unified_user_files(firm_user_id: str, agent_id: str):
     Get all files for a user from BOTH Supabase (firm_users_knowledge_base) 
     and Neon (user_vector_knowledge_base) - unified view for Agent Settings
     """
-    import asyncpg
-    
     try:
         all_files = []
         
@@ -7032,23 +6895,8 @@ async def get_unified_user_files(firm_user_id: str, agent_id: str):
         
         # 2. Get files from Neon user_vector_knowledge_base (Agent Settings uploads)
         try:
-            NEON_DB_HOST = os.getenv('NEON_DB_HOST')
-            NEON_DB_PORT = os.getenv('NEON_DB_PORT', '5432')
-            NEON_DB_USER = os.getenv('NEON_DB_USER')
-            NEON_DB_PASSWORD = os.getenv('NEON_DB_PASSWORD')
-            NEON_DB_NAME = os.getenv('NEON_DB_NAME', 'neondb')
-            
-            if all([NEON_DB_HOST, NEON_DB_USER, NEON_DB_PASSWORD]):
-                conn = await asyncpg.connect(
-                    host=NEON_DB_HOST,
-                    port=int(NEON_DB_PORT),
-                    user=NEON_DB_USER,
-                    password=NEON_DB_PASSWORD,
-                    database=NEON_DB_NAME,
-                    ssl='require'
-                )
-                
-                try:
+            if database.is_configured():
+                async with database.acquire() as conn:
                     # Query for ALL user files - deduplicate by file_url
                     # No agent_id filter so users can see all their uploads
                     query = """
@@ -7090,8 +6938,6 @@ async def get_unified_user_files(firm_user_id: str, agent_id: str):
                                 'file_type': file_type,
                                 'has_neon_records': True  # Always true for Neon-sourced files
                             })
-                finally:
-                    await conn.close()
         except Exception as e:
             logger.warning(f"Error fetching from Neon: {str(e)}")
         
@@ -7214,16 +7060,6 @@ async def save_file_knowledge(
     Returns:
     - Immediate response with file_id for tracking
     """
-    import asyncpg
-    
-    # Neon database configuration
-    NEON_DB_HOST = os.getenv('NEON_DB_HOST')
-    NEON_DB_PORT = os.getenv('NEON_DB_PORT', '5432')
-    NEON_DB_USER = os.getenv('NEON_DB_USER')
-    NEON_DB_PASSWORD = os.getenv('NEON_DB_PASSWORD')
-    NEON_DB_NAME = os.getenv('NEON_DB_NAME', 'neondb')
-    
-    conn = None
     try:
         file_name = file.filename or f"file_{uuid.uuid4().hex[:8]}"
         logger.info(f"Uploading file for user {user_id}: {file_name}")
@@ -7303,9 +7139,9 @@ async def save_file_knowledge(
         record_id = tracking_result["id"]
         logger.info(f"Created/updated tracking record: {record_id}")
         
-        # Start background text extraction that will create Neon records
-        background_tasks.add_task(
-            extract_and_update_neon_record_v2,
+        # Queue text extraction that will create Neon records
+        await enqueue_file_ingestion(
+            background_tasks,
             record_id,
             file_url,
             file_name,
@@ -7329,9 +7165,6 @@ async def save_file_knowledge(
     except Exception as e:
         logger.error(f"Error saving file knowledge: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if conn:
-            await conn.close()
 
 
 @app.get("/api/file/status-stream/{file_id}")
@@ -7341,27 +7174,37 @@ async def stream_file_status(file_id: str):
     Frontend subscribes to this after uploading a file.
     """
     async def event_generator():
-        last_status = None
-        timeout_counter = 0
         max_timeout = 300  # 5 minutes max
-        
-        while timeout_counter < max_timeout:
-            with _file_status_lock:
-                current_status = file_processing_status.get(file_id)
-            
-            if current_status and current_status != last_status:
-                last_status = current_status
+        deadline = time.monotonic() + max_timeout
+        timed_out = True
+
+        # Pushed by the status bus: the last known state first, then each update
+        subscription = get_file_status_bus().subscribe(file_id)
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    current_status = await asyncio.wait_for(subscription.__anext__(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+                if current_status is None:
+                    yield ": keepalive\n\n"
+                    continue
+
                 yield f"data: {json.dumps(current_status)}\n\n"
-                
+
                 # If completed or failed, end the stream
-                if current_status.get("status") in ["completed", "failed"]:
+                if current_status.get("status") in TERMINAL_STATUSES:
+                    timed_out = False
                     break
-            
-            await asyncio.sleep(1)
-            timeout_counter += 1
-        
+        finally:
+            await subscription.aclose()
+
         # Send final timeout message if we hit the limit
-        if timeout_counter >= max_timeout:
+        if timed_out:
             yield f"data: {json.dumps({'status': 'timeout', 'message': 'Processing timeout', 'progress': 0})}\n\n"
     
     return StreamingResponse(
@@ -7379,6 +7222,14 @@ async def stream_file_status(file_id: str):
 # SHARED KB UTILITIES - Used by both file upload and website analysis
 # =============================================================================
 
+# Streaming file ingestion: chunks per embed+insert batch, and how many
+# batches may wait for the saver before extraction pauses
+KB_INGEST_BATCH_CHUNKS = int(os.getenv('KB_INGEST_BATCH_CHUNKS', '32'))
+KB_INGEST_MAX_PENDING_BATCHES = int(os.getenv('KB_INGEST_MAX_PENDING_BATCHES', '2'))
+
+KB_FILE_INGEST_JOB = "kb_file_ingest"
+KB_WEBSITE_INGEST_JOB = "kb_website_ingest"
+
 async def generate_embedding_for_kb(text: str) -> Optional[str]:
     """
     Generate embedding for text using OpenRouter API.
@@ -7386,47 +7237,79 @@ async def generate_embedding_for_kb(text: str) -> Optional[str]:
     
     Used by:
     - extract_and_update_neon_record (file uploads)
-    - save_content_to_knowledge_base (website analysis)
     """
-    OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-    
-    if not OPENROUTER_API_KEY:
-        logger.warning("OPENROUTER_API_KEY not set, skipping embedding generation")
-        return None
+    embeddings = await generate_embeddings_for_kb([text])
+    return embeddings[0]
+
+
+async def generate_embeddings_for_kb(texts: List[str], on_progress=None) -> List[Optional[str]]:
+    """
+    Generate embeddings for many chunks in batched OpenRouter requests.
+    Chunks already in the content-hash embedding cache are not re-embedded.
+    Returns PostgreSQL vector strings aligned with texts (None where embedding failed).
     
-    try:
-        logger.info(f"Generating embedding for text ({len(text)} chars)...")
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                'https://openrouter.ai/api/v1/embeddings',
-                headers={
-                    'Authorization': f'Bearer {OPENROUTER_API_KEY}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'openai/text-embedding-3-small',
-                    'input': text[:8000]  # Limit input size
-                },
-                timeout=60.0
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                embedding = result.get('data', [{}])[0].get('embedding', [])
-                if embedding and len(embedding) > 0:
-                    # Format as PostgreSQL vector string: [0.1, 0.2, ...]
-                    vector_str = '[' + ','.join(str(x) for x in embedding) + ']'
-                    logger.info(f"Generated embedding with {len(embedding)} dimensions")
-                    return vector_str
-                else:
-                    logger.error(f"OpenRouter returned empty embedding")
-                    return None
-            else:
-                logger.error(f"OpenRouter embedding failed ({response.status_code}): {response.text}")
-                return None
-    except Exception as e:
-        logger.error(f"Embedding generation error: {str(e)}")
-        return None
+    Used by:
+    - extract_and_update_neon_record_v2 (file uploads)
+    - store_content_chunks (website analysis, extract-text)
+    """
+    embeddings = await get_batch_embedder().embed(texts, on_progress=on_progress)
+    return [format_vector(embedding) if embedding else None for embedding in embeddings]
+
+
+async def store_content_chunks(
+    user_id: str,
+    agent_id: str,
+    content: str,
+    source: str,
+    file_name: str,
+    file_url: str,
+    chunk_size: int = 4000,
+    chunk_overlap: int = 400
+) -> List[str]:
+    """
+    Chunk content, embed the chunks and insert them into
+    user_vector_knowledge_base in one statement (all or nothing).
+    Returns the new record ids; errors propagate.
+    """
+    # Chunk the content using same logic as file upload
+    processor = get_background_processor()
+    if processor:
+        chunks = processor.chunk_text(content, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    else:
+        # Fallback: simple chunking if processor not available
+        chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size - chunk_overlap)]
+        if not chunks:
+            chunks = [content]
+    
+    logger.info(f"Chunked content into {len(chunks)} chunks for KB save")
+    
+    total_chunks = len(chunks)
+    
+    # Generate all embeddings up front in batched requests
+    embeddings = await generate_embeddings_for_kb(chunks)
+    
+    # Format document like file upload: "Source: {name} [Part X/Y]\n\n{chunk}"
+    documents = []
+    document_embeddings = []
+    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings), start=1):
+        if not chunk.strip():
+            continue
+        documents.append(f"{file_name} [Part {i}/{total_chunks}]\n\n{chunk}")
+        document_embeddings.append(embedding)
+    
+    async with database.acquire() as conn:
+        neon_record_ids = await knowledge_base_store.insert_chunks(
+            conn,
+            user_id=user_id,
+            agent_id=agent_id,
+            documents=documents,
+            embeddings=document_embeddings,
+            source=source,
+            file_name=file_name,
+            file_url=file_url
+        )
+    logger.info(f"Saved {len(neon_record_ids)}/{total_chunks} chunks to KB for {file_name}")
+    return neon_record_ids
 
 
 async def save_content_to_knowledge_base(
@@ -7445,8 +7328,7 @@ async def save_content_to_knowledge_base(
     Also creates a tracking record in firm_users_knowledge_base.
     
     Used by:
-    - Website analysis endpoint
-    - Agent Settings file uploads
+    - /api/file/extract-text (save_to_kb)
     - Can be reused for other content types
     
     Args:
@@ -7463,101 +7345,22 @@ async def save_content_to_knowledge_base(
     Returns:
         True if saved successfully, False otherwise
     """
-    import asyncpg
-    
-    NEON_DB_HOST = os.getenv('NEON_DB_HOST')
-    NEON_DB_PORT = os.getenv('NEON_DB_PORT', '5432')
-    NEON_DB_USER = os.getenv('NEON_DB_USER')
-    NEON_DB_PASSWORD = os.getenv('NEON_DB_PASSWORD')
-    NEON_DB_NAME = os.getenv('NEON_DB_NAME', 'neondb')
-    
-    if not all([NEON_DB_HOST, NEON_DB_USER, NEON_DB_PASSWORD]):
+    if not database.is_configured():
         logger.warning("Neon DB config missing - cannot save to KB")
         return False
     
-    conn = None
     try:
-        # Chunk the content using same logic as file upload
-        processor = get_background_processor()
-        if processor:
-            chunks = processor.chunk_text(content, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        else:
-            # Fallback: simple chunking if processor not available
-            chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size - chunk_overlap)]
-            if not chunks:
-                chunks = [content]
-        
-        logger.info(f"Chunked content into {len(chunks)} chunks for KB save")
-        
-        conn = await asyncpg.connect(
-            host=NEON_DB_HOST,
-            port=int(NEON_DB_PORT),
-            user=NEON_DB_USER,
-            password=NEON_DB_PASSWORD,
-            database=NEON_DB_NAME,
-            ssl='require'
+        neon_record_ids = await store_content_chunks(
+            user_id=user_id,
+            agent_id=agent_id,
+            content=content,
+            source=source,
+            file_name=file_name,
+            file_url=file_url,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
         )
         
-        total_chunks = len(chunks)
-        created_at = datetime.utcnow()
-        neon_record_ids = []
-        
-        for i, chunk in enumerate(chunks, start=1):
-            if not chunk.strip():
-                continue
-            
-            # Format document like file upload: "Source: {name} [Part X/Y]\n\n{chunk}"
-            formatted_doc = f"{file_name} [Part {i}/{total_chunks}]\n\n{chunk}"
-            
-            # Generate embedding
-            embedding = await generate_embedding_for_kb(chunk)
-            
-            if embedding:
-                insert_query = """
-                    INSERT INTO user_vector_knowledge_base
-                    (user_id, agent_id, document, embedding, category, source, file_name, file_url, created_at, updated_at)
-                    VALUES ($1, $2, $3, $4::vector, $5, $6, $7, $8, $9, $10)
-                    RETURNING id
-                """
-                result = await conn.fetchrow(
-                    insert_query,
-                    user_id,
-                    agent_id,
-                    formatted_doc,
-                    embedding,
-                    'documents',
-                    source,
-                    file_name,
-                    file_url,
-                    created_at,
-                    created_at
-                )
-                if result:
-                    neon_record_ids.append(str(result['id']))
-            else:
-                insert_query = """
-                    INSERT INTO user_vector_knowledge_base
-                    (user_id, agent_id, document, category, source, file_name, file_url, created_at, updated_at)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                    RETURNING id
-                """
-                result = await conn.fetchrow(
-                    insert_query,
-                    user_id,
-                    agent_id,
-                    formatted_doc,
-                    'documents',
-                    source,
-                    file_name,
-                    file_url,
-                    created_at,
-                    created_at
-                )
-                if result:
-                    neon_record_ids.append(str(result['id']))
-            
-            logger.info(f"Saved chunk {i}/{total_chunks} to KB for {file_name}")
-        
         # Create tracking record in firm_users_knowledge_base
         if neon_record_ids:
             try:
@@ -7579,15 +7382,12 @@ async def save_content_to_knowledge_base(
             except Exception as track_error:
                 logger.warning(f"Failed to create tracking record (non-critical): {str(track_error)}")
         
-        logger.info(f"✓ Successfully saved {total_chunks} chunks to KB for user {user_id}, agent {agent_id}")
+        logger.info(f"✓ Successfully saved {len(neon_record_ids)} chunks to KB for user {user_id}, agent {agent_id}")
         return True
         
     except Exception as e:
         logger.error(f"Failed to save content to KB: {str(e)}")
         return False
-    finally:
-        if conn:
-            await conn.close()
 
 
 async def extract_and_update_neon_record_v2(
@@ -7596,127 +7396,348 @@ async def extract_and_update_neon_record_v2(
     file_name: str,
     user_id: str,
     agent_id: str,
-    source: str = "agent_settings"
+    source: str = "agent_settings",
+    job: Optional[Job] = None
 ):
     """
-    Background task for file uploads to:
-    1. Extract text from file
-    2. Generate embeddings using OpenRouter API
-    3. Create new records in user_vector_knowledge_base in Neon
+    Background task for file uploads, run as a streaming pipeline:
+    1. Download the file to a temp file on disk
+    2. Extract text page by page and chunk it incrementally
+    3. Generate embeddings and create records in user_vector_knowledge_base
+       in batches while extraction continues (first chunks are searchable
+       long before the last page is parsed)
     4. Update tracking record in firm_users_knowledge_base with neon_record_ids
+
+    Only the current page, the chunker's tail and a couple of batches are in
+    memory at any time. If anything fails, chunks already written are removed.
+
+    When run from the job queue (``job`` set), failures are re-raised so the
+    queue can retry; the SSE status says "retrying" until the final attempt.
     """
-    import asyncpg
+    temp_path = None
+    saver = None
+    neon_record_ids: List[str] = []
     
-    NEON_DB_HOST = os.getenv('NEON_DB_HOST')
-    NEON_DB_PORT = os.getenv('NEON_DB_PORT', '5432')
-    NEON_DB_USER = os.getenv('NEON_DB_USER')
-    NEON_DB_PASSWORD = os.getenv('NEON_DB_PASSWORD')
-    NEON_DB_NAME = os.getenv('NEON_DB_NAME', 'neondb')
+    async def remove_partial_chunks():
+        if saver and not saver.done():
+            # Let an in-flight insert finish rolling back before cleaning up
+            saver.cancel()
+            await asyncio.gather(saver, return_exceptions=True)
+        if neon_record_ids:
+            try:
+                async with database.acquire() as conn:
+                    await knowledge_base_store.delete_chunks(conn, neon_record_ids)
+            except Exception as cleanup_error:
+                logger.error(f"Failed to remove partial chunks for {record_id}: {cleanup_error}")
     
-    conn = None
     try:
-        logger.info(f"Starting text extraction for record {record_id}: {file_name}")
-        update_file_status(record_id, "extracting", "Extracting text from file...", 20)
+        logger.info(f"Starting streaming ingestion for record {record_id}: {file_name}")
+        update_file_status(record_id, "downloading", "Downloading file...", 10)
         
-        # Step 1: Extract text
         processor = get_background_processor()
         if not processor:
             raise Exception("Background processor not initialized")
         
-        file_bytes = await processor.download_file(file_url)
-        if not file_bytes:
+        # A previous attempt that died mid-way (worker restart) may have left chunks behind
+        if job and job.attempts > 1:
+            since = job.created_at.replace(tzinfo=None) if job.created_at.tzinfo else job.created_at
+            async with database.acquire() as conn:
+                removed = await knowledge_base_store.delete_chunks_for_file(conn, user_id, file_url, since)
+            if removed:
+                logger.info(f"Removed {removed} chunks left by an earlier attempt for record {record_id}")
+        
+        # Step 1: Download to disk
+        temp_path = await processor.download_to_tempfile(file_url, suffix=os.path.splitext(file_name)[1].lower())
+        if os.path.getsize(temp_path) == 0:
             raise Exception("Empty file downloaded")
         
-        extracted_text = await processor.extract_text(file_bytes, file_name)
-        if not extracted_text or not extracted_text.strip():
-            raise Exception("No text content found in file")
+        update_file_status(record_id, "extracting", "Extracting text from file...", 20)
         
-        chunks = processor.chunk_text(extracted_text, chunk_size=4000, chunk_overlap=400)
-        logger.info(f"Extracted {len(extracted_text)} chars, {len(chunks)} chunks from {file_name}")
-        update_file_status(record_id, "extracted", f"Extracted {len(chunks)} chunks from file", 40)
-        
-        # Step 2: Connect to Neon and create records
-        conn = await asyncpg.connect(
-            host=NEON_DB_HOST,
-            port=int(NEON_DB_PORT),
-            user=NEON_DB_USER,
-            password=NEON_DB_PASSWORD,
-            database=NEON_DB_NAME,
-            ssl='require'
+        created_at = datetime.utcnow()
+        progress = {"units_done": 0, "units_total": 0, "chunks": 0}
+        batches: asyncio.Queue = asyncio.Queue(maxsize=KB_INGEST_MAX_PENDING_BATCHES)
+        
+        def current_progress() -> int:
+            # Extraction drives 20-85%; saving trails it batch by batch
+            if not progress["units_total"]:
+                return 20
+            return 20 + int(65 * progress["units_done"] / progress["units_total"])
+        
+        async def save_batches():
+            # Step 3: Embed + insert each batch while the next one is being extracted
+            while True:
+                batch = await batches.get()
+                if batch is None:
+                    return
+                embeddings = await generate_embeddings_for_kb([chunk for _, chunk in batch])
+                documents = [f"File: {file_name} [Part {part}]\n\n{chunk}" for part, chunk in batch]
+                async with database.acquire() as conn:
+                    neon_record_ids.extend(await knowledge_base_store.insert_chunks(
+                        conn,
+                        user_id=user_id,
+                        agent_id=agent_id,
+                        documents=documents,
+                        embeddings=embeddings,
+                        source=source,
+                        file_name=file_name,
+                        file_url=file_url,
+                        created_at=created_at
+                    ))
+                update_file_status(
+                    record_id, "saving",
+                    f"Saved {len(neon_record_ids)}/{progress['chunks']} chunks so far...",
+                    current_progress()
+                )
+        
+        saver = asyncio.create_task(save_batches())
+        
+        async def enqueue(batch):
+            # Surface a saver failure instead of blocking on a queue nobody drains
+            put = asyncio.ensure_future(batches.put(batch))
+            await asyncio.wait({put, saver}, return_when=asyncio.FIRST_COMPLETED)
+            if not put.done():
+                put.cancel()
+            if saver.done() and batch is not None:
+                saver.result()
+                raise Exception("Chunk saver stopped unexpectedly")
+        
+        # Step 2: Extract and chunk incrementally
+        chunker = IncrementalChunker(chunk_size=4000, chunk_overlap=400)
+        pending = []
+        # Closed right away on failure/cancellation so its extraction slot and child process are released
+        async with aclosing(processor.iter_text(temp_path, file_name)) as pages:
+            async for text, units_done, units_total in pages:
+                progress["units_done"], progress["units_total"] = units_done, units_total
+                for chunk in chunker.feed(text):
+                    progress["chunks"] += 1
+                    pending.append((progress["chunks"], chunk))
+                if len(pending) >= KB_INGEST_BATCH_CHUNKS:
+                    await enqueue(pending)
+                    pending = []
+                if units_total > 1:
+                    update_file_status(
+                        record_id, "extracting",
+                        f"Extracted page {units_done}/{units_total} ({progress['chunks']} chunks)",
+                        current_progress()
+                    )
+        
+        for chunk in chunker.finish():
+            progress["chunks"] += 1
+            pending.append((progress["chunks"], chunk))
+        if not progress["chunks"]:
+            raise Exception("No text content found in file")
+        if pending:
+            await enqueue(pending)
+        
+        update_file_status(record_id, "saving", f"Extraction complete, saving remaining chunks of {progress['chunks']}...", 85)
+        await enqueue(None)
+        await saver
+        logger.info(f"Streamed {progress['chunks']} chunks from {file_name} into {len(neon_record_ids)} records")
+        
+        # Step 4: Update tracking record with neon_record_ids. If the tracking
+        # row can't reference the chunks, remove them rather than leave orphans.
+        update_file_status(record_id, "finalizing", "Updating file record...", 90)
+        tracking_result = await file_processing_service.update_neon_record_ids(record_id, neon_record_ids)
+        if not tracking_result.get("success"):
+            raise Exception(f"Failed to update tracking record: {tracking_result.get('error')}")
+        logger.info(f"Updated tracking record {record_id} with {len(neon_record_ids)} neon IDs")
+        
+        logger.info(f"Successfully processed record {record_id}: {len(neon_record_ids)} chunks with embeddings")
+        update_file_status(record_id, "completed", f"Successfully processed {len(neon_record_ids)} chunks", 100)
+        
+    except asyncio.CancelledError:
+        # Worker shutting down - the job queue hands the job to another worker
+        await asyncio.shield(remove_partial_chunks())
+        raise
+    except Exception as e:
+        logger.error(f"Background extraction failed for {record_id}: {str(e)}")
+        await remove_partial_chunks()
+        if job and not job.is_final_attempt:
+            update_file_status(record_id, "retrying", f"Processing failed, retrying: {str(e)}", 10)
+        else:
+            update_file_status(record_id, "failed", f"Processing failed: {str(e)}", 0)
+        if job:
+            raise
+    finally:
+        if temp_path:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+
+async def run_kb_file_ingest_job(payload: Dict[str, Any], job: Job):
+    """Job queue handler for KB_FILE_INGEST_JOB"""
+    await extract_and_update_neon_record_v2(**payload, job=job)
+
+
+register_handler(KB_FILE_INGEST_JOB, run_kb_file_ingest_job)
+
+
+async def enqueue_file_ingestion(
+    background_tasks: BackgroundTasks,
+    record_id: str,
+    file_url: str,
+    file_name: str,
+    user_id: str,
+    agent_id: str,
+    source: str = "agent_settings"
+):
+    """
+    Queue a file for ingestion on the durable job queue. Chat uploads get
+    priority since someone is waiting on them mid-conversation. Falls back
+    to an in-process background task if the queue is unavailable.
+    """
+    payload = {
+        "record_id": record_id,
+        "file_url": file_url,
+        "file_name": file_name,
+        "user_id": user_id,
+        "agent_id": agent_id,
+        "source": source
+    }
+    try:
+        job_id = await get_job_queue().enqueue(
+            KB_FILE_INGEST_JOB,
+            payload,
+            user_id=user_id,
+            priority=10 if source == "chat" else 0
         )
+        logger.info(f"Queued ingestion job {job_id} for record {record_id}")
+    except Exception as e:
+        logger.error(f"Job queue unavailable ({e}), processing {record_id} in this worker")
+        background_tasks.add_task(extract_and_update_neon_record_v2, **payload)
+
+
+async def ingest_website_analysis(
+    record_id: str,
+    content: str,
+    file_name: str,
+    file_url: str,
+    user_id: str,
+    agent_id: str,
+    job: Optional[Job] = None
+):
+    """
+    Background KB stage of website analysis: embed the analysis document,
+    insert its chunks into user_vector_knowledge_base and attach them to the
+    firm_users_knowledge_base tracking record. Progress goes to the file
+    status bus under record_id, like a file upload.
+
+    When run from the job queue (``job`` set), failures are re-raised so the
+    queue can retry; the SSE status says "retrying" until the final attempt.
+    """
+    neon_record_ids: List[str] = []
+    
+    async def remove_saved_chunks():
+        if neon_record_ids:
+            try:
+                async with database.acquire() as conn:
+                    await knowledge_base_store.delete_chunks(conn, neon_record_ids)
+            except Exception as cleanup_error:
+                logger.error(f"Failed to remove chunks for {record_id}: {cleanup_error}")
+    
+    try:
+        update_file_status(record_id, "embedding", "Generating embeddings for website analysis...", 30)
         
-        total_chunks = len(chunks)
-        neon_record_ids = []
-        update_file_status(record_id, "embedding", f"Generating embeddings for {total_chunks} chunks...", 50)
+        # A previous attempt that died after inserting (worker restart) may have left chunks behind
+        if job and job.attempts > 1:
+            since = job.created_at.replace(tzinfo=None) if job.created_at.tzinfo else job.created_at
+            async with database.acquire() as conn:
+                removed = await knowledge_base_store.delete_chunks_for_file(conn, user_id, file_url, since)
+            if removed:
+                logger.info(f"Removed {removed} chunks left by an earlier attempt for record {record_id}")
         
-        for i, chunk in enumerate(chunks, start=1):
-            if not chunk.strip():
-                continue
-            
-            formatted_doc = f"File: {file_name} [Part {i}/{total_chunks}]\n\n{chunk}"
-            embedding = await generate_embedding_for_kb(chunk)
-            
-            if embedding:
-                insert_query = """
-                    INSERT INTO user_vector_knowledge_base
-                    (user_id, agent_id, document, embedding, category, source, file_name, file_url, created_at, updated_at)
-                    VALUES ($1, $2, $3, $4::vector, $5, $6, $7, $8, $9, $10)
-                    RETURNING id
-                """
-                result = await conn.fetchrow(
-                    insert_query,
-                    user_id,
-                    agent_id,
-                    formatted_doc,
-                    embedding,
-                    'documents',
-                    source,
-                    file_name,
-                    file_url,
-                    datetime.utcnow(),
-                    datetime.utcnow()
-                )
-            else:
-                insert_query = """
-                    INSERT INTO user_vector_knowledge_base
-                    (user_id, agent_id, document, category, source, file_name, file_url, created_at, updated_at)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                    RETURNING id
-                """
-                result = await conn.fetchrow(
-                    insert_query,
-                    user_id,
-                    agent_id,
-                    formatted_doc,
-                    'documents',
-                    source,
-                    file_name,
-                    file_url,
-                    datetime.utcnow(),
-                    datetime.utcnow()
-                )
-            
-            if result:
-                neon_record_ids.append(str(result['id']))
-            
-            logger.info(f"Inserted chunk {i}/{total_chunks} for record {record_id}")
-            progress = 50 + int((i / total_chunks) * 40)
-            update_file_status(record_id, "saving", f"Saving chunk {i}/{total_chunks}...", progress)
+        neon_record_ids = await store_content_chunks(
+            user_id=user_id,
+            agent_id=agent_id,
+            content=content,
+            source="website_analysis",
+            file_name=file_name,
+            file_url=file_url
+        )
+        if not neon_record_ids:
+            raise Exception("No chunks were saved")
         
-        # Step 3: Update tracking record with neon_record_ids
-        if neon_record_ids:
-            await file_processing_service.update_neon_record_ids(record_id, neon_record_ids)
-            logger.info(f"Updated tracking record {record_id} with {len(neon_record_ids)} neon IDs")
+        update_file_status(record_id, "finalizing", "Updating knowledge base record...", 90)
+        tracking_result = await file_processing_service.update_neon_record_ids(record_id, neon_record_ids)
+        if not tracking_result.get("success"):
+            raise Exception(f"Failed to update tracking record: {tracking_result.get('error')}")
         
-        logger.info(f"Successfully processed record {record_id}: {len(chunks)} chunks with embeddings")
-        update_file_status(record_id, "completed", f"Successfully processed {total_chunks} chunks", 100)
+        logger.info(f"Saved website analysis {file_url} to KB as record {record_id} ({len(neon_record_ids)} chunks)")
+        update_file_status(record_id, "completed", f"Saved {len(neon_record_ids)} chunks to knowledge base", 100)
         
+    except asyncio.CancelledError:
+        # Worker shutting down or lease lost - the re-run must not find these chunks
+        await asyncio.shield(remove_saved_chunks())
+        raise
     except Exception as e:
-        logger.error(f"Background extraction failed for {record_id}: {str(e)}")
-        update_file_status(record_id, "failed", f"Processing failed: {str(e)}", 0)
-    finally:
-        if conn:
-            await conn.close()
+        logger.error(f"Website analysis KB save failed for {record_id}: {str(e)}")
+        await remove_saved_chunks()
+        if job and not job.is_final_attempt:
+            update_file_status(record_id, "retrying", f"Knowledge base save failed, retrying: {str(e)}", 10)
+        else:
+            update_file_status(record_id, "failed", f"Knowledge base save failed: {str(e)}", 0)
+        if job:
+            raise
+
+
+async def run_kb_website_ingest_job(payload: Dict[str, Any], job: Job):
+    """Job queue handler for KB_WEBSITE_INGEST_JOB"""
+    await ingest_website_analysis(**payload, job=job)
+
+
+register_handler(KB_WEBSITE_INGEST_JOB, run_kb_website_ingest_job)
+
+
+async def enqueue_website_analysis_ingestion(
+    background_tasks: BackgroundTasks,
+    content: str,
+    file_name: str,
+    file_url: str,
+    user_id: str,
+    agent_id: str,
+    agent_name: str = None
+) -> Optional[str]:
+    """
+    Create the firm_users_knowledge_base tracking record for a website
+    analysis and queue its KB save. Returns the record id to follow on
+    /api/file/status(-stream)/{id}, or None if the record couldn't be created.
+    Falls back to an in-process background task if the queue is unavailable.
+    """
+    if not database.is_configured():
+        logger.warning("Neon DB config missing - website analysis not saved to KB")
+        return None
+    
+    tracking_result = await file_processing_service.create_processing_record(
+        firm_user_id=user_id,
+        file_name=file_name,
+        file_url=file_url,
+        agent_id=agent_id,
+        agent_name=agent_name or agent_id,
+        source="website_analysis"
+    )
+    if not tracking_result["success"]:
+        logger.error(f"Failed to create KB tracking record for {file_url}: {tracking_result.get('error')}")
+        return None
+    
+    record_id = tracking_result["id"]
+    payload = {
+        "record_id": record_id,
+        "content": content,
+        "file_name": file_name,
+        "file_url": file_url,
+        "user_id": user_id,
+        "agent_id": agent_id
+    }
+    update_file_status(record_id, "queued", "Waiting to save website analysis to knowledge base...", 5)
+    try:
+        job_id = await get_job_queue().enqueue(KB_WEBSITE_INGEST_JOB, payload, user_id=user_id)
+        logger.info(f"Queued website KB job {job_id} for record {record_id}")
+    except Exception as e:
+        logger.error(f"Job queue unavailable ({e}), saving website analysis {record_id} in this worker")
+        background_tasks.add_task(ingest_website_analysis, **payload)
+    return record_id
 
 
 async def extract_and_update_neon_record(
@@ -7734,16 +7755,6 @@ async def extract_and_update_neon_record(
     3. Save text and embeddings to user_vector_knowledge_base in Neon
     4. Update tracking record in firm_users_knowledge_base with neon_record_ids
     """
-    import asyncpg
-    import httpx
-    
-    NEON_DB_HOST = os.getenv('NEON_DB_HOST')
-    NEON_DB_PORT = os.getenv('NEON_DB_PORT', '5432')
-    NEON_DB_USER = os.getenv('NEON_DB_USER')
-    NEON_DB_PASSWORD = os.getenv('NEON_DB_PASSWORD')
-    NEON_DB_NAME = os.getenv('NEON_DB_NAME', 'neondb')
-    OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-    
     conn = None
     try:
         logger.info(f"Starting text extraction for file {file_id}: {file_name}")
@@ -7773,15 +7784,8 @@ async def extract_and_update_neon_record(
         logger.info(f"Extracted {len(extracted_text)} chars, {len(chunks)} chunks from {file_name}")
         update_file_status(file_id, "extracted", f"Extracted {len(chunks)} chunks from file", 40)
         
-        # Step 2: Connect to Neon database (using shared generate_embedding_for_kb function)
-        conn = await asyncpg.connect(
-            host=NEON_DB_HOST,
-            port=int(NEON_DB_PORT),
-            user=NEON_DB_USER,
-            password=NEON_DB_PASSWORD,
-            database=NEON_DB_NAME,
-            ssl='require'
-        )
+        # Step 2: Borrow a pooled Neon connection (using shared generate_embedding_for_kb function)
+        conn = await database.get_connection()
         
         # Step 4: Update original record with first chunk and embedding
         total_chunks = len(chunks)
@@ -7906,14 +7910,7 @@ async def extract_and_update_neon_record(
         # Try to update record with error message
         try:
             if not conn:
-                conn = await asyncpg.connect(
-                    host=NEON_DB_HOST,
-                    port=int(NEON_DB_PORT),
-                    user=NEON_DB_USER,
-                    password=NEON_DB_PASSWORD,
-                    database=NEON_DB_NAME,
-                    ssl='require'
-                )
+                conn = await database.get_connection()
             await conn.execute(
                 """UPDATE user_vector_knowledge_base SET document = $1, updated_at = $2 WHERE id = $3::uuid""",
                 f"[Extraction failed: {str(e)}]",
@@ -7924,18 +7921,18 @@ async def extract_and_update_neon_record(
             pass
     finally:
         if conn:
-            await conn.close()
+            await database.release_connection(conn)
 
 @app.get("/api/knowledge-base/{agent_id}")
 async def get_agent_knowledge(agent_id: str, firm_user_id: Optional[str] = None):
     """Get all knowledge base entries for an agent"""
     try:
-        query = supabase.table("firm_users_knowledge_base").select("*").eq("agent_id", agent_id)
+        query = get_async_supabase().table("firm_users_knowledge_base").select("*").eq("agent_id", agent_id)
         
         if firm_user_id:
             query = query.eq("firm_user_id", firm_user_id)
         
-        result = query.order("created_at", desc=True).execute()
+        result = await query.order("created_at", desc=True).execute()
         
         return {
             "success": True,
@@ -7955,188 +7952,11 @@ async def get_agent_knowledge(agent_id: str, firm_user_id: Optional[str] = None)
 # WEB SCRAPING ENDPOINTS
 # ============================================================================
 
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from pydantic import BaseModel
 import httpx
 import time
 import logging
 
-class WebScraper:
-    def __init__(self, max_depth=1, delay=0, max_pages=10):
-        self.max_depth = max_depth
-        self.delay = delay
-        self.max_pages = max_pages
-        self.visited = set()
-        self.session = httpx.Client(
-            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'},
-            timeout=10.0
-        )
-    
-    def is_valid_url(self, url, base_domain):
-        """Check if URL is valid and belongs to the same domain"""
-        try:
-            from urllib.parse import urlparse
-            parsed = urlparse(url)
-            base_parsed = urlparse(base_domain)
-            return (parsed.netloc == base_parsed.netloc and 
-                    parsed.scheme in ['http', 'https'])
-        except:
-            return False
-    
-    def extract_text_content(self, soup):
-        """Extract meaningful text content from HTML"""
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.decompose()
-        
-        text_parts = []
-        
-        title = soup.find('title')
-        if title:
-            text_parts.append(f"TITLE: {title.get_text().strip()}")
-        
-        main_content = soup.find('main') or soup.find('article') or soup.find('body')
-        if main_content:
-            headings = main_content.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-            for heading in headings:
-                text_parts.append(f"\n{heading.name.upper()}: {heading.get_text().strip()}")
-            
-            paragraphs = main_content.find_all('p')
-            for p in paragraphs:
-                text = p.get_text().strip()
-                if text:
-                    text_parts.append(text)
-            
-            lists = main_content.find_all(['ul', 'ol'])
-            for lst in lists:
-                items = lst.find_all('li')
-                for item in items:
-                    text = item.get_text().strip()
-                    if text:
-                        text_parts.append(f"• {text}")
-        
-        return '\n'.join(text_parts)
-    
-    def get_links(self, soup, base_url):
-        """Extract all valid links from the page"""
-        from urllib.parse import urljoin
-        links = set()
-        for link in soup.find_all('a', href=True):
-            url = urljoin(base_url, link['href'])
-            url = url.split('#')[0]
-            if self.is_valid_url(url, base_url):
-                links.add(url)
-        return links
-    
-    def fetch_page(self, url, depth):
-        """Fetch and parse a single page"""
-        start_time = time.time()
-        try:
-            if self.delay > 0:
-                time.sleep(self.delay)
-            
-            fetch_start = time.time()
-            response = self.session.get(url)
-            response.raise_for_status()
-            fetch_time = time.time() - fetch_start
-            
-            parse_start = time.time()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            text_content = self.extract_text_content(soup)
-            links = self.get_links(soup, url) if depth < self.max_depth else set()
-            parse_time = time.time() - parse_start
-            
-            total_time = time.time() - start_time
-            logger.info(f"Fetched {url} | Depth: {depth} | Fetch: {fetch_time:.2f}s | Parse: {parse_time:.2f}s | Total: {total_time:.2f}s | Links: {len(links)}")
-            
-            return {
-                'url': url,
-                'depth': depth,
-                'content': text_content,
-                'status': response.status_code,
-                'links': links
-            }
-        except Exception as e:
-            logger.error(f"Error fetching {url}: {str(e)}")
-            return {
-                'url': url,
-                'depth': depth,
-                'content': '',
-                'status': 'error',
-                'error': str(e),
-                'links': set()
-            }
-    
-    def scrape(self, start_url):
-        """Scrape website with concurrent requests up to max_depth"""
-        scrape_start = time.time()
-        logger.info(f"Starting scrape of {start_url} | Max depth: {self.max_depth} | Max pages: {self.max_pages}")
-        
-        results = {}
-        to_scrape = [(start_url, 0)]
-        self.visited.add(start_url)
-        
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            while to_scrape and len(results) < self.max_pages:
-                current_batch = to_scrape[:min(5, self.max_pages - len(results))]
-                to_scrape = to_scrape[len(current_batch):]
-                
-                futures = {executor.submit(self.fetch_page, url, depth): (url, depth) 
-                          for url, depth in current_batch}
-                
-                for future in as_completed(futures):
-                    result = future.result()
-                    url = result['url']
-                    depth = result['depth']
-                    
-                    results[url] = {
-                        'depth': depth,
-                        'content': result['content'],
-                        'status': result['status']
-                    }
-                    if result.get('error'):
-                        results[url]['error'] = result['error']
-                    
-                    if depth < self.max_depth and len(results) < self.max_pages:
-                        for link in result.get('links', []):
-                            if link not in self.visited and len(self.visited) < self.max_pages:
-                                self.visited.add(link)
-                                to_scrape.append((link, depth + 1))
-        
-        total_time = time.time() - scrape_start
-        logger.info(f"Scrape complete | Pages: {len(results)} | Total time: {total_time:.2f}s | Avg per page: {total_time/max(len(results), 1):.2f}s")
-        return results
-
-def format_scrape_as_text(results):
-    """Format scraping results as plain text for AI analysis"""
-    output = []
-    output.append("=" * 80)
-    output.append("WEBSITE SCRAPING RESULTS")
-    output.append("=" * 80)
-    output.append(f"\nTotal pages scraped: {len(results)}\n")
-    
-    for url, data in results.items():
-        output.append("\n" + "=" * 80)
-        output.append(f"URL: {url}")
-        output.append(f"Depth Level: {data['depth']}")
-        output.append(f"Status: {data['status']}")
-        output.append("-" * 80)
-        
-        if data.get('error'):
-            output.append(f"ERROR: {data['error']}")
-        elif data['content']:
-            output.append(data['content'])
-        else:
-            output.append("(No content extracted)")
-        
-        output.append("")
-    
-    output.append("\n" + "=" * 80)
-    output.append("END OF SCRAPING RESULTS")
-    output.append("=" * 80)
-    
-    return '\n'.join(output)
-
 class WebScrapeRequest(BaseModel):
     url: str
     max_depth: Optional[int] = 1
@@ -8167,8 +7987,7 @@ async def scrape_website_endpoint(request: WebScrapeRequest):
         raise HTTPException(status_code=400, detail="URL must start with http:// or https://")
     
     try:
-        scraper = WebScraper(max_depth=max_depth, max_pages=max_pages)
-        results = scraper.scrape(url)
+        results = await WebCrawler(max_depth=max_depth, max_pages=max_pages).crawl(url)
         
         request_time = time.time() - request_start
         logger.info(f"Request complete | Total time: {request_time:.2f}s | Pages: {len(results)}")
@@ -8514,36 +8333,35 @@ async def notify_agent_enablement(request: AgentEnablementNotification):
             # Broadcast refresh signal via Supabase Realtime
             # Frontend listens to channel: agent-refresh-{user_id}
             try:
-                import httpx
                 supabase_url = os.getenv('SUPABASE_URL') or os.getenv('VITE_SUPABASE_URL')
                 supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
                 
                 if supabase_url and supabase_key:
                     # Use Supabase Realtime broadcast via REST API
                     broadcast_url = f"{supabase_url}/realtime/v1/api/broadcast"
-                    async with httpx.AsyncClient() as client:
-                        broadcast_response = await client.post(
-                            broadcast_url,
-                            headers={
-                                'apikey': supabase_key,
-                                'Authorization': f'Bearer {supabase_key}',
-                                'Content-Type': 'application/json'
-                            },
-                            json={
-                                'messages': [{
-                                    'topic': f'agent-refresh-{user_id}',
-                                    'event': 'refresh_sidebar',
-                                    'payload': {
-                                        'user_id': user_id,
-                                        'agent_id': agent_id,
-                                        'action': action,
-                                        'timestamp': datetime.now(timezone.utc).isoformat()
-                                    }
-                                }]
-                            },
-                            timeout=10.0
-                        )
-                        logger.info(f"📡 Broadcast sent: status={broadcast_response.status_code}")
+                    client = get_http_client('supabase')
+                    broadcast_response = await client.post(
+                        broadcast_url,
+                        headers={
+                            'apikey': supabase_key,
+                            'Authorization': f'Bearer {supabase_key}',
+                            'Content-Type': 'application/json'
+                        },
+                        json={
+                            'messages': [{
+                                'topic': f'agent-refresh-{user_id}',
+                                'event': 'refresh_sidebar',
+                                'payload': {
+                                    'user_id': user_id,
+                                    'agent_id': agent_id,
+                                    'action': action,
+                                    'timestamp': datetime.now(timezone.utc).isoformat()
+                                }
+                            }]
+                        },
+                        timeout=10.0
+                    )
+                    logger.info(f"📡 Broadcast sent: status={broadcast_response.status_code}")
             except Exception as broadcast_error:
                 logger.warning(f"⚠️ Broadcast failed (non-critical): {broadcast_error}")
             
@@ -8615,37 +8433,36 @@ async def redirect_to_agent(request: AgentRedirectRequest):
         # Frontend listens to channel: agent-redirect-{user_id}
         broadcast_sent = False
         try:
-            import httpx
             supabase_url = os.getenv('SUPABASE_URL') or os.getenv('VITE_SUPABASE_URL')
             supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
             
             if supabase_url and supabase_key:
                 broadcast_url = f"{supabase_url}/realtime/v1/api/broadcast"
-                async with httpx.AsyncClient() as client:
-                    broadcast_response = await client.post(
-                        broadcast_url,
-                        headers={
-                            'apikey': supabase_key,
-                            'Authorization': f'Bearer {supabase_key}',
-                            'Content-Type': 'application/json'
-                        },
-                        json={
-                            'messages': [{
-                                'topic': f'agent-redirect-{user_id}',
-                                'event': 'redirect_to_agent',
-                                'payload': {
-                                    'user_id': user_id,
-                                    'agent_id': agent_id,
-                                    'redirect_url': redirect_url,
-                                    'message': message,
-                                    'timestamp': datetime.now(timezone.utc).isoformat()
-                                }
-                            }]
-                        },
-                        timeout=10.0
-                    )
-                    broadcast_sent = broadcast_response.status_code == 200
-                    logger.info(f"📡 Redirect broadcast sent: status={broadcast_response.status_code}")
+                client = get_http_client('supabase')
+                broadcast_response = await client.post(
+                    broadcast_url,
+                    headers={
+                        'apikey': supabase_key,
+                        'Authorization': f'Bearer {supabase_key}',
+                        'Content-Type': 'application/json'
+                    },
+                    json={
+                        'messages': [{
+                            'topic': f'agent-redirect-{user_id}',
+                            'event': 'redirect_to_agent',
+                            'payload': {
+                                'user_id': user_id,
+                                'agent_id': agent_id,
+                                'redirect_url': redirect_url,
+                                'message': message,
+                                'timestamp': datetime.now(timezone.utc).isoformat()
+                            }
+                        }]
+                    },
+                    timeout=10.0
+                )
+                broadcast_sent = broadcast_response.status_code == 200
+                logger.info(f"📡 Redirect broadcast sent: status={broadcast_response.status_code}")
         except Exception as broadcast_error:
             logger.warning(f"⚠️ Redirect broadcast failed: {broadcast_error}")
         
@@ -8698,36 +8515,35 @@ async def notify_content_refresh(request: ContentRefreshNotification):
         
         # Broadcast refresh signal via Supabase Realtime
         try:
-            import httpx
             supabase_url = os.getenv('SUPABASE_URL') or os.getenv('VITE_SUPABASE_URL')
             supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
             
             if supabase_url and supabase_key:
                 broadcast_url = f"{supabase_url}/realtime/v1/api/broadcast"
-                async with httpx.AsyncClient() as client:
-                    broadcast_response = await client.post(
-                        broadcast_url,
-                        headers={
-                            'apikey': supabase_key,
-                            'Authorization': f'Bearer {supabase_key}',
-                            'Content-Type': 'application/json'
-                        },
-                        json={
-                            'messages': [{
-                                'topic': f'content-refresh-{user_id}',
-                                'event': 'refresh_content',
-                                'payload': {
-                                    'user_id': user_id,
-                                    'agent_id': agent_id,
-                                    'content_type': content_type,
-                                    'action': action,
-                                    'timestamp': datetime.now(timezone.utc).isoformat()
-                                }
-                            }]
-                        },
-                        timeout=10.0
-                    )
-                    logger.info(f"📡 Content refresh broadcast sent: status={broadcast_response.status_code}")
+                client = get_http_client('supabase')
+                broadcast_response = await client.post(
+                    broadcast_url,
+                    headers={
+                        'apikey': supabase_key,
+                        'Authorization': f'Bearer {supabase_key}',
+                        'Content-Type': 'application/json'
+                    },
+                    json={
+                        'messages': [{
+                            'topic': f'content-refresh-{user_id}',
+                            'event': 'refresh_content',
+                            'payload': {
+                                'user_id': user_id,
+                                'agent_id': agent_id,
+                                'content_type': content_type,
+                                'action': action,
+                                'timestamp': datetime.now(timezone.utc).isoformat()
+                            }
+                        }]
+                    },
+                    timeout=10.0
+                )
+                logger.info(f"📡 Content refresh broadcast sent: status={broadcast_response.status_code}")
                     
                 return {
                     "success": True,
@@ -0,0 +1,66 @@
+-- ============================================================================
+-- Migration: Add background_jobs table (Neon)
+-- Date: 2026-10-16
+-- Description: Durable job queue for file ingestion (job_queue.py). Jobs
+--              survive web worker restarts and are claimed by web workers
+--              and/or the dedicated worker dyno (job_worker.py) with
+--              FOR UPDATE SKIP LOCKED under time-limited leases.
+--
+-- Lifecycle: queued -> running -> succeeded
+--                          |-> queued (retry with backoff) -> ... -> dead
+-- A running job whose lease expires (worker died) is claimed again.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS background_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    kind TEXT NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    user_id TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'dead')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_by TEXT,
+    lease_expires_at TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Claim path: runnable queued jobs in priority order
+CREATE INDEX IF NOT EXISTS idx_background_jobs_claim
+ON background_jobs USING BTREE (priority DESC, run_at, created_at)
+WHERE status = 'queued';
+
+-- Running jobs: per-user concurrency counts and expired-lease recovery
+CREATE INDEX IF NOT EXISTS idx_background_jobs_running
+ON background_jobs USING BTREE (lease_expires_at, user_id)
+WHERE status = 'running';
+
+-- Retention pruning of finished jobs
+CREATE INDEX IF NOT EXISTS idx_background_jobs_finished
+ON background_jobs USING BTREE (finished_at)
+WHERE status IN ('succeeded', 'dead');
+
+-- ============================================================================
+-- Inspection
+-- ============================================================================
+
+-- SELECT status, COUNT(*) FROM background_jobs GROUP BY status;
+-- SELECT id, kind, user_id, attempts, last_error FROM background_jobs WHERE status = 'dead' ORDER BY finished_at DESC LIMIT 20;
+-- Requeue a dead job:
+-- UPDATE background_jobs SET status = 'queued', attempts = 0, run_at = NOW(), finished_at = NULL WHERE id = '...';
+
+-- ============================================================================
+-- Rollback (if needed)
+-- ============================================================================
+
+-- DROP TABLE IF EXISTS background_jobs;
+
+-- ============================================================================
+-- END MIGRATION
+-- ============================================================================
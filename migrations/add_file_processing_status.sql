@@ -0,0 +1,39 @@
+-- ============================================================================
+-- Migration: Add file_processing_status table (Neon)
+-- Date: 2026-10-16
+-- Description: Last known processing state per uploaded file, shared by all
+--              web workers and the job worker dyno (file_status_bus.py).
+--              Each write is followed by NOTIFY on the 'file_status'
+--              channel, which web workers LISTEN on to push updates to
+--              SSE streams (/api/file/status-stream/{file_id}). The row is
+--              what a stream replays when it connects.
+--
+-- Rows older than FILE_STATUS_RETENTION_HOURS are pruned by the app.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS file_processing_status (
+    file_id TEXT PRIMARY KEY,
+    state JSONB NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Retention pruning
+CREATE INDEX IF NOT EXISTS idx_file_processing_status_updated_at
+ON file_processing_status USING BTREE (updated_at);
+
+-- ============================================================================
+-- Inspection
+-- ============================================================================
+
+-- SELECT file_id, state->>'status' AS status, state->>'progress' AS progress, updated_at
+-- FROM file_processing_status ORDER BY updated_at DESC LIMIT 20;
+
+-- ============================================================================
+-- Rollback (if needed)
+-- ============================================================================
+
+-- DROP TABLE IF EXISTS file_processing_status;
+
+-- ============================================================================
+-- END MIGRATION
+-- ============================================================================
@@ -0,0 +1,34 @@
+-- ============================================================================
+-- Migration: Add full-text GIN index to user_vector_knowledge_base (Neon)
+-- Date: 2026-10-16
+-- Description: Backs hybrid search (POST /api/knowledge-base/search with
+--              "mode": "hybrid"), which matches exact terms - product codes,
+--              names, phone numbers - that embeddings rank poorly.
+--
+-- Expression index rather than a stored tsvector column: no table rewrite and
+-- no extra write cost on ingestion. The expression must stay identical to the
+-- one in knowledge_base_search.build_hybrid_search_query ('simple' config, so
+-- tokens are not stemmed or dropped as stop words).
+-- ============================================================================
+
+-- Build without blocking ingestion (must run outside a transaction block)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_uvkb_document_fts
+ON user_vector_knowledge_base USING GIN (to_tsvector('simple', document));
+
+-- ============================================================================
+-- Verification
+-- ============================================================================
+
+-- EXPLAIN SELECT id FROM user_vector_knowledge_base
+-- WHERE to_tsvector('simple', document) @@ websearch_to_tsquery('simple', 'SKU-1234');
+-- (expect a Bitmap Index Scan on idx_uvkb_document_fts)
+
+-- ============================================================================
+-- Rollback (if needed)
+-- ============================================================================
+
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_uvkb_document_fts;
+
+-- ============================================================================
+-- END MIGRATION
+-- ============================================================================
@@ -0,0 +1,66 @@
+-- ============================================================================
+-- Migration: Add HNSW vector index to user_vector_knowledge_base (Neon)
+-- Date: 2026-10-16
+-- Description: Semantic search orders by embedding <=> query, which without an
+--              ANN index is a sequential scan over every tenant's chunks.
+--
+-- Strategy:
+--   * One global HNSW index (cosine ops), partial on embedding IS NOT NULL to
+--     match the search query's filter and skip custom_instructions rows.
+--   * user_id / agent_id filtering stays on the existing btree indexes
+--     (idx_uvkb_user_agent, idx_uvkb_user_agent_category from
+--     add_agent_id_to_knowledge_base.sql). For small tenants the planner picks
+--     those and sorts the few rows exactly; for large ones it walks the HNSW
+--     graph and filters as it goes.
+--   * On pgvector >= 0.8 the app enables hnsw.iterative_scan per search so a
+--     selective user_id filter can't starve the result set.
+--   * Per-tenant partial indexes don't scale with user count, so none are made.
+--
+-- The app runs the same check at startup (knowledge_base_search.py) and
+-- rebuilds the index if a previous CONCURRENTLY build left it invalid.
+-- Verify with GET /api/knowledge-base/search/index-check?user_id=...
+-- ============================================================================
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- HNSW requires a fixed dimension. Older tables declared the column as plain
+-- "vector"; pin it to 1536 (openai/text-embedding-3-small) if so.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = 'user_vector_knowledge_base'::regclass
+          AND attname = 'embedding'
+          AND atttypmod = -1
+    ) THEN
+        ALTER TABLE user_vector_knowledge_base
+        ALTER COLUMN embedding TYPE vector(1536);
+    END IF;
+END $$;
+
+-- Build without blocking ingestion (must run outside a transaction block)
+-- m / ef_construction are pgvector defaults; raise ef_construction for better
+-- recall at the cost of a slower build
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_uvkb_embedding_hnsw
+ON user_vector_knowledge_base USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64)
+WHERE embedding IS NOT NULL;
+
+-- ============================================================================
+-- Verification
+-- ============================================================================
+
+-- A failed concurrent build leaves indisvalid = false; drop and re-run if so
+-- SELECT c.relname, i.indisvalid, pg_size_pretty(pg_relation_size(i.indexrelid))
+-- FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+-- WHERE c.relname = 'idx_uvkb_embedding_hnsw';
+
+-- ============================================================================
+-- Rollback (if needed)
+-- ============================================================================
+
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_uvkb_embedding_hnsw;
+
+-- ============================================================================
+-- END MIGRATION
+-- ============================================================================
@@ -0,0 +1,36 @@
+-- ============================================================================
+-- Migration: Add kb_embedding_cache table (Neon)
+-- Date: 2026-10-16
+-- Description: Content-addressed embedding cache so re-uploaded files and
+--              repeated website analysis saves only embed chunks that changed.
+--              Keyed by SHA-256 of the exact chunk text sent to the API + model.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS kb_embedding_cache (
+    content_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    embedding vector(1536) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_used_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (content_hash, model)
+);
+
+-- Supports pruning entries that haven't been used recently
+CREATE INDEX IF NOT EXISTS idx_kb_embedding_cache_last_used
+ON kb_embedding_cache USING BTREE (last_used_at);
+
+-- ============================================================================
+-- Maintenance (run periodically if the table grows too large)
+-- ============================================================================
+
+-- DELETE FROM kb_embedding_cache WHERE last_used_at < NOW() - INTERVAL '90 days';
+
+-- ============================================================================
+-- Rollback (if needed)
+-- ============================================================================
+
+-- DROP TABLE IF EXISTS kb_embedding_cache;
+
+-- ============================================================================
+-- END MIGRATION
+-- ============================================================================
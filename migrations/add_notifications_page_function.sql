@@ -0,0 +1,85 @@
+-- ============================================================================
+-- Migration: Add get_notifications_page function (Supabase)
+-- Date: 2026-10-16
+-- Description: One round trip for GET /api/notifications/{user_id}: the page,
+--              the total and the unread count together. Pages are keyed on
+--              (created_at, id) so deep pages cost the same as the first one;
+--              p_offset is kept for clients that still send offset.
+--
+-- Each location is read through idx_notifications_location_created_id and
+-- stops after the page size, then the per-location pages are merged.
+-- ============================================================================
+
+-- Page scans, newest first, per location
+CREATE INDEX IF NOT EXISTS idx_notifications_location_created_id
+ON public.notifications USING btree (ghl_location_id, created_at DESC, id DESC) TABLESPACE pg_default;
+
+-- Same for unread_only pages
+CREATE INDEX IF NOT EXISTS idx_notifications_location_unread_created_id
+ON public.notifications USING btree (ghl_location_id, created_at DESC, id DESC) TABLESPACE pg_default
+WHERE (read_status = FALSE);
+
+CREATE OR REPLACE FUNCTION public.get_notifications_page(
+    p_location_ids TEXT[],
+    p_limit INTEGER DEFAULT 50,
+    p_unread_only BOOLEAN DEFAULT FALSE,
+    p_cursor_created_at TIMESTAMPTZ DEFAULT NULL,
+    p_cursor_id UUID DEFAULT NULL,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH page AS (
+        SELECT n.*
+        FROM (SELECT DISTINCT unnest(p_location_ids) AS location_id) AS loc
+        CROSS JOIN LATERAL (
+            SELECT *
+            FROM public.notifications
+            WHERE ghl_location_id = loc.location_id
+              AND (NOT p_unread_only OR read_status = FALSE)
+              AND (p_cursor_created_at IS NULL OR (created_at, id) < (p_cursor_created_at, p_cursor_id))
+            ORDER BY created_at DESC, id DESC
+            LIMIT p_offset + p_limit + 1
+        ) AS n
+        ORDER BY n.created_at DESC, n.id DESC
+        OFFSET p_offset
+        LIMIT p_limit + 1
+    ),
+    counts AS (
+        SELECT
+            COUNT(*) FILTER (WHERE NOT p_unread_only OR read_status = FALSE) AS total,
+            COUNT(*) FILTER (WHERE read_status = FALSE) AS unread_count
+        FROM public.notifications
+        WHERE ghl_location_id = ANY(p_location_ids)
+    )
+    SELECT jsonb_build_object(
+        'notifications', COALESCE((
+            SELECT jsonb_agg(to_jsonb(p) ORDER BY p.created_at DESC, p.id DESC)
+            FROM (SELECT * FROM page ORDER BY created_at DESC, id DESC LIMIT p_limit) AS p
+        ), '[]'::jsonb),
+        'has_more', (SELECT COUNT(*) > p_limit FROM page),
+        'total', counts.total,
+        'unread_count', counts.unread_count
+    )
+    FROM counts;
+$$;
+
+COMMENT ON FUNCTION public.get_notifications_page IS 'Notifications page (keyset on created_at, id) with total and unread counts for a set of GHL locations';
+
+-- Example usage:
+-- First page:  SELECT get_notifications_page(ARRAY['loc_1'], 50);
+-- Next page:   SELECT get_notifications_page(ARRAY['loc_1'], 50, FALSE, '2026-10-16T10:00:00Z', '00000000-0000-0000-0000-000000000000');
+
+-- ============================================================================
+-- Rollback (if needed)
+-- ============================================================================
+
+-- DROP FUNCTION IF EXISTS public.get_notifications_page(TEXT[], INTEGER, BOOLEAN, TIMESTAMPTZ, UUID, INTEGER);
+-- DROP INDEX IF EXISTS idx_notifications_location_unread_created_id;
+-- DROP INDEX IF EXISTS idx_notifications_location_created_id;
+
+-- ============================================================================
+-- END MIGRATION
+-- ============================================================================
@@ -0,0 +1,382 @@
+"""
+Page Cache
+HTTP response cache for website fetching (crawler, brand colors, business
+info), keyed by canonical URL. Bodies live on disk in a size-bounded LRU
+directory; each entry keeps its ETag / Last-Modified and is served without
+a request while fresh, then revalidated with a conditional GET, so a page
+that hasn't changed costs a 304 instead of a full download.
+
+    from page_cache import get_page_cache
+
+    page = await get_page_cache().fetch(url)
+    html = page.text
+
+Freshness: Cache-Control max-age (capped at PAGE_CACHE_MAX_TTL_SECONDS),
+otherwise PAGE_CACHE_TTL_SECONDS. no-store responses are not cached and
+no-cache responses are revalidated on every use. Only complete 200
+responses are stored.
+
+The directory is shared by the workers on a dyno (writes are atomic
+renames); each worker enforces the size limit over the entries it knows.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+import httpx
+
+from http_clients import get_http_client
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_DIR = os.getenv('PAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'squidgy_page_cache'))
+PAGE_CACHE_MAX_MB = float(os.getenv('PAGE_CACHE_MAX_MB', '200'))
+# Fresh window when the server doesn't send max-age
+PAGE_CACHE_TTL_SECONDS = float(os.getenv('PAGE_CACHE_TTL_SECONDS', '3600'))
+PAGE_CACHE_MAX_TTL_SECONDS = float(os.getenv('PAGE_CACHE_MAX_TTL_SECONDS', '86400'))
+# Bigger responses are returned but not stored
+PAGE_CACHE_MAX_ENTRY_BYTES = int(os.getenv('PAGE_CACHE_MAX_ENTRY_BYTES', str(2 * 1024 * 1024)))
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+# Response headers kept with an entry
+STORED_HEADERS = ('content-type', 'etag', 'last-modified', 'cache-control')
+# Query parameters that don't change the page
+TRACKING_PARAMS = ('utm_', 'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga', '_hs')
+
+
+def canonicalize_url(url: str, base: str = None) -> Optional[str]:
+    """
+    Absolute, comparable form of url (resolved against base): lowercase
+    scheme and host, no default port, fragment or tracking parameters,
+    sorted query, no trailing slash. None for anything that isn't http(s).
+    """
+    try:
+        parts = urlsplit(urljoin(base, url.strip()) if base else url.strip())
+        scheme = parts.scheme.lower()
+        host = parts.hostname
+        port = parts.port
+    except ValueError:
+        return None
+    if scheme not in ('http', 'https') or not host:
+        return None
+
+    if ':' in host:
+        host = f"[{host}]"
+    if port is not None and (scheme, port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{port}"
+
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+@dataclass
+class CachedPage:
+    """A fetched page, from the cache or the network"""
+    url: str
+    status_code: int
+    headers: Dict[str, str]
+    content: bytes
+    # 'fresh' (no request), 'revalidated' (304), 'miss' (downloaded) or 'skipped' (body not read)
+    cache_status: str = 'miss'
+    truncated: bool = False
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get('content-type', '').split(';')[0].strip().lower()
+
+    @property
+    def text(self) -> str:
+        match = re.search(r'charset=([\w-]+)', self.headers.get('content-type', ''), re.IGNORECASE)
+        try:
+            return self.content.decode(match.group(1) if match else 'utf-8', errors='replace')
+        except LookupError:
+            return self.content.decode('utf-8', errors='replace')
+
+
+@dataclass
+class _Entry:
+    meta: Dict[str, Any]
+    content: bytes = field(repr=False)
+
+
+def _freshness(headers: Dict[str, str]) -> Optional[float]:
+    """Seconds the response may be served without revalidation; None = don't store"""
+    cache_control = headers.get('cache-control', '').lower()
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return 0.0
+    match = re.search(r'(?:s-)?max-age=(\d+)', cache_control)
+    if match:
+        return min(float(match.group(1)), PAGE_CACHE_MAX_TTL_SECONDS)
+    return PAGE_CACHE_TTL_SECONDS
+
+
+class PageCache:
+    """
+    On-disk LRU of page bodies with conditional revalidation.
+
+    One file per URL (<sha256>.page: a JSON metadata line, then the body).
+    The in-memory index holds sizes in LRU order and is rebuilt from the
+    directory (by mtime) on first use.
+    """
+
+    def __init__(self, directory: str = PAGE_CACHE_DIR, max_mb: float = PAGE_CACHE_MAX_MB):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        self._disabled = False
+        self.stats = {
+            "requests": 0, "fresh_hits": 0, "revalidated": 0, "misses": 0, "stored": 0,
+            "evictions": 0, "errors": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Disk
+    # ------------------------------------------------------------------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load_index(self):
+        """Index files already on disk, oldest first (runs in a thread)"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.page'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+        except OSError as e:
+            logger.warning(f"Page cache disabled, {self.directory} is not usable: {e}")
+            self._disabled = True
+            return
+        for _, name, size in sorted(files):
+            self._index[name] = size
+            self._bytes += size
+        self._loaded = True
+        logger.info(f"Page cache ready ({len(self._index)} entries, {self._bytes / (1024 * 1024):.1f}MB in {self.directory})")
+
+    def _read(self, name: str) -> Optional[_Entry]:
+        try:
+            with open(self._path(name), 'rb') as f:
+                meta = json.loads(f.readline())
+                content = f.read()
+            os.utime(self._path(name))
+            return _Entry(meta, content)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.debug(f"Unreadable page cache entry {name}: {e}")
+            return None
+
+    def _write(self, name: str, meta: Dict[str, Any], content: bytes) -> int:
+        # Unique temp file: two fetches of the same URL may be writing at once
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f"{name}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json.dumps(meta).encode() + b'\n')
+                f.write(content)
+            os.replace(tmp_path, self._path(name))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return os.path.getsize(self._path(name))
+
+    def _remove(self, name: str):
+        try:
+            os.unlink(self._path(name))
+        except OSError:
+            pass
+
+    async def _ensure_loaded(self) -> bool:
+        if not self._loaded and not self._disabled:
+            await asyncio.to_thread(self._load_index)
+        return not self._disabled
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def _track(self, name: str, size: int):
+        self._bytes += size - self._index.pop(name, 0)
+        self._index[name] = size
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            oldest, oldest_size = self._index.popitem(last=False)
+            self._bytes -= oldest_size
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _forget(self, name: str):
+        self._bytes -= self._index.pop(name, 0)
+
+    async def _get(self, name: str) -> Optional[_Entry]:
+        if not await self._ensure_loaded():
+            return None
+        entry = await asyncio.to_thread(self._read, name)
+        if entry is None:
+            self._forget(name)
+        elif name in self._index:
+            self._index.move_to_end(name)
+        else:
+            # Written by another worker
+            self._track(name, len(entry.content))
+        return entry
+
+    async def _put(self, name: str, meta: Dict[str, Any], content: bytes):
+        if not await self._ensure_loaded():
+            return
+        try:
+            size = await asyncio.to_thread(self._write, name, meta, content)
+        except OSError as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Could not store page cache entry for {meta.get('url')}: {e}")
+            return
+        self._track(name, size)
+        self.stats["stored"] += 1
+
+    # ------------------------------------------------------------------
+    # Fetching
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _name(url: str) -> Tuple[str, str]:
+        key = canonicalize_url(url) or url
+        return key, hashlib.sha256(key.encode()).hexdigest() + '.page'
+
+    @staticmethod
+    def _page(entry: _Entry, cache_status: str) -> CachedPage:
+        return CachedPage(
+            url=entry.meta['final_url'],
+            status_code=entry.meta['status_code'],
+            headers=entry.meta['headers'],
+            content=entry.content,
+            cache_status=cache_status
+        )
+
+    async def get_fresh(self, url: str) -> Optional[CachedPage]:
+        """The cached page if it can be used without a request, else None"""
+        _, name = self._name(url)
+        entry = await self._get(name)
+        if entry is not None and time.time() < entry.meta['expires_at']:
+            self.stats["requests"] += 1
+            self.stats["fresh_hits"] += 1
+            return self._page(entry, 'fresh')
+        return None
+
+    async def fetch(
+        self,
+        url: str,
+        *,
+        client: httpx.AsyncClient = None,
+        headers: Dict[str, str] = None,
+        timeout: float = None,
+        max_bytes: int = PAGE_CACHE_MAX_ENTRY_BYTES,
+        content_types: Tuple[str, ...] = None
+    ) -> CachedPage:
+        """
+        GET url through the cache. Redirects are followed; non-2xx responses
+        are returned but not cached. With content_types, a response of another
+        type comes back with cache_status 'skipped' and no body. Bodies over
+        max_bytes are truncated and not cached. httpx errors propagate.
+        """
+        key, name = self._name(url)
+        entry = await self._get(name)
+        self.stats["requests"] += 1
+        if entry is not None and time.time() < entry.meta['expires_at']:
+            self.stats["fresh_hits"] += 1
+            return self._page(entry, 'fresh')
+
+        request_headers = {'User-Agent': USER_AGENT, **(headers or {})}
+        if entry is not None:
+            if entry.meta['headers'].get('etag'):
+                request_headers['If-None-Match'] = entry.meta['headers']['etag']
+            if entry.meta['headers'].get('last-modified'):
+                request_headers['If-Modified-Since'] = entry.meta['headers']['last-modified']
+
+        async with (client or get_http_client('crawler')).stream(
+            'GET', url, headers=request_headers,
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        ) as response:
+            response_headers = {h: response.headers[h] for h in STORED_HEADERS if h in response.headers}
+
+            if response.status_code == 304 and entry is not None:
+                self.stats["revalidated"] += 1
+                ttl = _freshness({**entry.meta['headers'], **response_headers})
+                entry.meta['headers'].update(response_headers)
+                entry.meta['expires_at'] = time.time() + (ttl or 0.0)
+                await self._put(name, entry.meta, entry.content)
+                return self._page(entry, 'revalidated')
+
+            page = CachedPage(
+                url=str(response.url),
+                status_code=response.status_code,
+                headers=response_headers,
+                content=b''
+            )
+            if content_types and page.content_type and page.content_type not in content_types:
+                page.cache_status = 'skipped'
+                return page
+
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) > max_bytes:
+                    page.truncated = True
+                    break
+            page.content = bytes(body[:max_bytes])
+
+        self.stats["misses"] += 1
+        ttl = _freshness(response_headers)
+        if page.status_code == 200 and not page.truncated and ttl is not None:
+            await self._put(name, {
+                'url': key,
+                'final_url': page.url,
+                'status_code': page.status_code,
+                'headers': page.headers,
+                'expires_at': time.time() + ttl,
+            }, page.content)
+        return page
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self.stats["requests"]
+        return {
+            **self.stats,
+            "hit_ratio": round((self.stats["fresh_hits"] + self.stats["revalidated"]) / requests, 3) if requests else 0.0,
+            "entries": len(self._index),
+            "mb": round(self._bytes / (1024 * 1024), 1),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+            "enabled": not self._disabled,
+        }
+
+
+_page_cache = None
+
+def get_page_cache() -> PageCache:
+    """Process-wide page cache"""
+    global _page_cache
+    if _page_cache is None:
+        _page_cache = PageCache()
+    return _page_cache
@@ -0,0 +1,130 @@
+"""
+Postgres Listener
+One dedicated LISTEN connection per worker, shared by everything that
+fans out through NOTIFY (file status bus, WebSocket notifications).
+"""
+
+import asyncio
+import logging
+import random
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+import database
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL_SECONDS = 30
+MAX_BACKOFF_SECONDS = 60
+
+
+class PgListener:
+    """
+    LISTEN on the direct (non-pooler) endpoint, reconnecting with backoff.
+
+    Callbacks run on the event loop with the raw payload and must not block.
+    NOTIFYs sent while the connection was down are lost, so each channel can
+    register an ``on_reconnect`` coroutine to catch up from its table.
+    """
+
+    def __init__(self):
+        self._callbacks: Dict[str, Callable[[str], None]] = {}
+        self._on_reconnect: Dict[str, Callable[[], Awaitable[None]]] = {}
+        self._conn = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"connected": False, "reconnects": 0, "notifications": 0}
+
+    def listen(self, channel: str, callback: Callable[[str], None],
+               on_reconnect: Optional[Callable[[], Awaitable[None]]] = None):
+        """Subscribe callback(payload) to channel; starts the connection on first use"""
+        self._callbacks[channel] = callback
+        if on_reconnect:
+            self._on_reconnect[channel] = on_reconnect
+        if self._conn is not None and not self._conn.is_closed():
+            asyncio.create_task(self._conn.add_listener(channel, self._dispatch))
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def unlisten(self, channel: str):
+        """Drop a channel; the connection closes when none are left"""
+        self._callbacks.pop(channel, None)
+        self._on_reconnect.pop(channel, None)
+        if self._callbacks:
+            if self._conn is not None and not self._conn.is_closed():
+                try:
+                    await self._conn.remove_listener(channel, self._dispatch)
+                except Exception:
+                    pass
+            return
+        await self.stop()
+
+    def _dispatch(self, conn, pid, channel, payload):
+        callback = self._callbacks.get(channel)
+        if callback is None:
+            return
+        self.stats["notifications"] += 1
+        try:
+            callback(payload)
+        except Exception as e:
+            logger.error(f"Error handling notification on '{channel}': {e}")
+
+    async def _run(self):
+        backoff = 1.0
+        first = True
+        while True:
+            try:
+                self._conn = await database.connect_direct()
+                for channel in list(self._callbacks):
+                    await self._conn.add_listener(channel, self._dispatch)
+                self.stats["connected"] = True
+                logger.info(f"Listening on {', '.join(self._callbacks)}")
+                if not first:
+                    self.stats["reconnects"] += 1
+                    for on_reconnect in list(self._on_reconnect.values()):
+                        try:
+                            await on_reconnect()
+                        except Exception as e:
+                            logger.warning(f"Catch-up after LISTEN reconnect failed: {e}")
+                first = False
+                backoff = 1.0
+
+                # Notifications arrive via _dispatch; this only detects a dead connection
+                while True:
+                    await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+                    await self._conn.fetchval("SELECT 1", timeout=10)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["connected"] = False
+                logger.warning(f"LISTEN connection lost, retrying in {backoff:.0f}s: {e}")
+                await self._close()
+                await asyncio.sleep(backoff * random.uniform(0.8, 1.2))
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+
+    async def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close(timeout=5)
+            except Exception:
+                conn.terminate()
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self._close()
+        self.stats["connected"] = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "channels": list(self._callbacks)}
+
+
+_pg_listener = None
+
+def get_pg_listener() -> PgListener:
+    """Process-wide LISTEN connection"""
+    global _pg_listener
+    if _pg_listener is None:
+        _pg_listener = PgListener()
+    return _pg_listener
@@ -2,20 +2,14 @@
 
 import os
 import logging
-import asyncpg
 from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
 from typing import Optional
 from supabase import create_client, Client
 
-logger = logging.getLogger(__name__)
+import database
 
-# Neon database configuration
-NEON_DB_HOST = os.getenv('NEON_DB_HOST')
-NEON_DB_PORT = os.getenv('NEON_DB_PORT', '5432')
-NEON_DB_USER = os.getenv('NEON_DB_USER')
-NEON_DB_PASSWORD = os.getenv('NEON_DB_PASSWORD')
-NEON_DB_NAME = os.getenv('NEON_DB_NAME', 'neondb')
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -220,24 +214,14 @@ async def delete_user(request: DeleteUserRequest):
         
         # 9. Delete from Neon database (user_vector_knowledge_base table)
         try:
-            if all([NEON_DB_HOST, NEON_DB_USER, NEON_DB_PASSWORD]):
-                conn = await asyncpg.connect(
-                    host=NEON_DB_HOST,
-                    port=int(NEON_DB_PORT),
-                    user=NEON_DB_USER,
-                    password=NEON_DB_PASSWORD,
-                    database=NEON_DB_NAME,
-                    ssl='require'
-                )
-                try:
+            if database.is_configured():
+                async with database.acquire() as conn:
                     # Delete all knowledge base entries for this user
                     await conn.execute(
                         "DELETE FROM user_vector_knowledge_base WHERE user_id = $1",
                         user_id
                     )
                     deleted_items.append('neon_knowledge_base')
-                finally:
-                    await conn.close()
             else:
                 errors.append("neon: Database configuration missing")
         except Exception as e:
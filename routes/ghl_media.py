@@ -3,24 +3,18 @@ GHL Media API Routes
 Handles fetching and uploading media files to HighLevel accounts
 """
 
-import os
 import logging
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
 from pydantic import BaseModel
-import httpx
-from supabase import create_client, Client
+
+from ghl_cache import get_ghl_cache
+from http_clients import get_http_client
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/ghl", tags=["ghl_media"])
 
-# Initialize Supabase client
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-
 class MediaResponse(BaseModel):
     success: bool
     data: Optional[dict] = None
@@ -29,22 +23,16 @@ class MediaResponse(BaseModel):
 
 async def get_ghl_credentials(user_id: str, agent_id: str = 'social_media_scheduler'):
     """
-    Fetch GHL location_id and PIT_Token from ghl_subaccounts table
+    Fetch GHL location_id and PIT_Token from ghl_subaccounts table (cached, see ghl_cache.py)
     """
     try:
-        result = supabase.table('ghl_subaccounts')\
-            .select('ghl_location_id, pit_token')\
-            .eq('firm_user_id', user_id)\
-            .eq('agent_id', agent_id)\
-            .single()\
-            .execute()
-
-        if not result.data:
+        credentials = await get_ghl_cache().get_credentials(user_id, agent_id)
+        if not credentials:
             return None
 
         return {
-            'location_id': result.data.get('ghl_location_id'),
-            'bearer_token': result.data.get('pit_token')
+            'location_id': credentials['location_id'],
+            'bearer_token': credentials['pit_token']
         }
     except Exception as e:
         logger.error(f"Error fetching GHL credentials: {e}")
@@ -83,52 +71,52 @@ async def get_user_media(user_id: str, agent_id: str = 'social_media_scheduler')
             )
         
         # Fetch media from GHL API
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "https://services.leadconnectorhq.com/medias/files",
-                params={
-                    "altId": location_id,
-                    "altType": "location",
-                    "sortBy": "createdAt",
-                    "sortOrder": "desc",
-                    "type": "file"
-                },
-                headers={
-                    "Accept": "application/json",
-                    "Version": "2021-07-28",
-                    "Authorization": f"Bearer {bearer_token}"
-                },
-                timeout=30.0
-            )
+        client = get_http_client('ghl')
+        response = await client.get(
+            "https://services.leadconnectorhq.com/medias/files",
+            params={
+                "altId": location_id,
+                "altType": "location",
+                "sortBy": "createdAt",
+                "sortOrder": "desc",
+                "type": "file"
+            },
+            headers={
+                "Accept": "application/json",
+                "Version": "2021-07-28",
+                "Authorization": f"Bearer {bearer_token}"
+            },
+            timeout=30.0
+        )
             
-            if response.status_code != 200:
-                logger.error(f"GHL API error: {response.status_code} - {response.text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Failed to fetch media from HighLevel: {response.text}"
-                )
+        if response.status_code != 200:
+            logger.error(f"GHL API error: {response.status_code} - {response.text}")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Failed to fetch media from HighLevel: {response.text}"
+            )
             
-            data = response.json()
+        data = response.json()
             
-            # Transform the response to match our MediaLibrary component format
-            media_items = []
-            if 'files' in data:
-                for file in data['files']:
-                    media_items.append({
-                        'id': file.get('id', ''),
-                        'url': file.get('url', ''),
-                        'name': file.get('name', 'Untitled'),
-                        'thumbnail': file.get('thumbnailUrl'),
-                        'createdAt': file.get('createdAt')
-                    })
+        # Transform the response to match our MediaLibrary component format
+        media_items = []
+        if 'files' in data:
+            for file in data['files']:
+                media_items.append({
+                    'id': file.get('id', ''),
+                    'url': file.get('url', ''),
+                    'name': file.get('name', 'Untitled'),
+                    'thumbnail': file.get('thumbnailUrl'),
+                    'createdAt': file.get('createdAt')
+                })
             
-            return MediaResponse(
-                success=True,
-                data={
-                    'media': media_items,
-                    'total': len(media_items)
-                }
-            )
+        return MediaResponse(
+            success=True,
+            data={
+                'media': media_items,
+                'total': len(media_items)
+            }
+        )
             
     except HTTPException:
         raise
@@ -193,52 +181,52 @@ async def upload_media(
             )
         
         # Upload file to GHL API
-        async with httpx.AsyncClient() as client:
-            # Prepare multipart form data
-            files = {
-                'file': (file.filename, file_content, file.content_type)
-            }
-            data = {
-                'locationId': location_id
-            }
+        client = get_http_client('ghl')
+        # Prepare multipart form data
+        files = {
+            'file': (file.filename, file_content, file.content_type)
+        }
+        data = {
+            'locationId': location_id
+        }
+            
+        response = await client.post(
+            "https://services.leadconnectorhq.com/medias/upload-file",
+            files=files,
+            data=data,
+            headers={
+                "Accept": "application/json",
+                "Version": "2021-07-28",
+                "Authorization": f"Bearer {bearer_token}"
+            },
+            timeout=60.0  # Longer timeout for file uploads
+        )
             
-            response = await client.post(
-                "https://services.leadconnectorhq.com/medias/upload-file",
-                files=files,
-                data=data,
-                headers={
-                    "Accept": "application/json",
-                    "Version": "2021-07-28",
-                    "Authorization": f"Bearer {bearer_token}"
-                },
-                timeout=60.0  # Longer timeout for file uploads
+        if response.status_code != 200:
+            logger.error(f"GHL upload error: {response.status_code} - {response.text}")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Failed to upload file to HighLevel: {response.text}"
             )
             
-            if response.status_code != 200:
-                logger.error(f"GHL upload error: {response.status_code} - {response.text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Failed to upload file to HighLevel: {response.text}"
-                )
+        result = response.json()
             
-            result = response.json()
+        # Transform the response
+        uploaded_file = {
+            'id': result.get('id', ''),
+            'url': result.get('url', ''),
+            'name': result.get('name', file.filename),
+            'thumbnail': result.get('thumbnailUrl'),
+            'createdAt': result.get('createdAt')
+        }
             
-            # Transform the response
-            uploaded_file = {
-                'id': result.get('id', ''),
-                'url': result.get('url', ''),
-                'name': result.get('name', file.filename),
-                'thumbnail': result.get('thumbnailUrl'),
-                'createdAt': result.get('createdAt')
+        return MediaResponse(
+            success=True,
+            data={
+                'file': uploaded_file,
+                'message': 'File uploaded successfully'
             }
-            
-            return MediaResponse(
-                success=True,
-                data={
-                    'file': uploaded_file,
-                    'message': 'File uploaded successfully'
-                }
-            )
+        )
             
     except HTTPException:
         raise
@@ -6,13 +6,16 @@ Handles CRUD operations for user knowledge base in Neon database (user_vector_kn
 import os
 import logging
 from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, HTTPException, Body, UploadFile, File, Form
-from pydantic import BaseModel
-import asyncpg
+from fastapi import APIRouter, HTTPException, Body, UploadFile, File, Form, Query
+from pydantic import BaseModel, Field
 from datetime import datetime
 from supabase import create_client, Client
 import uuid as uuid_lib
-import httpx
+
+import database
+import knowledge_base_search
+import knowledge_base_store
+from embedding_service import get_query_embedding_cache, format_vector
 
 logger = logging.getLogger(__name__)
 
@@ -88,8 +91,12 @@ class SemanticSearchRequest(BaseModel):
     query: str
     user_id: str
     agent_id: Optional[str] = None
-    limit: Optional[int] = 5
+    limit: int = Field(5, ge=1, le=knowledge_base_search.MAX_EF_SEARCH)
     similarity_threshold: Optional[float] = 0.0
+    # HNSW candidate list size; higher = better recall, slower (default KB_HNSW_EF_SEARCH)
+    ef_search: Optional[int] = Field(default=None, ge=1, le=1000)
+    # "vector" (default) or "hybrid" (full-text + vector, fused with reciprocal rank fusion)
+    mode: Optional[str] = "vector"
 
 
 class SearchResult(BaseModel):
@@ -98,6 +105,11 @@ class SearchResult(BaseModel):
     document: str
     similarity: float
     created_at: datetime
+    # Per-source scores, only set in hybrid mode
+    hybrid_score: Optional[float] = None
+    vector_rank: Optional[int] = None
+    lexical_rank: Optional[int] = None
+    lexical_score: Optional[float] = None
 
 
 class SemanticSearchResponse(BaseModel):
@@ -107,30 +119,36 @@ class SemanticSearchResponse(BaseModel):
     count: int
 
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=10)
+    user_id: str
+    agent_id: Optional[str] = None
+    limit: int = Field(5, ge=1, le=knowledge_base_search.MAX_EF_SEARCH)
+    similarity_threshold: Optional[float] = 0.0
+    ef_search: Optional[int] = Field(default=None, ge=1, le=1000)
+
+
+class BatchSearchResponse(BaseModel):
+    success: bool
+    searches: List[SemanticSearchResponse]
+    count: int
+
+
 # ============================================================================
 # Database Connection
 # ============================================================================
 
 async def get_db_connection(max_retries: int = 3, retry_delay: float = 1.0):
-    """Create and return a connection to the Neon database with retry logic"""
+    """Borrow a connection from the shared Neon pool with retry logic"""
     import asyncio
     
-    if not all([NEON_DB_HOST, NEON_DB_USER, NEON_DB_PASSWORD]):
+    if not database.is_configured():
         raise HTTPException(status_code=500, detail="Database configuration missing")
 
     last_error = None
     for attempt in range(max_retries):
         try:
-            conn = await asyncpg.connect(
-                host=NEON_DB_HOST,
-                port=int(NEON_DB_PORT),
-                user=NEON_DB_USER,
-                password=NEON_DB_PASSWORD,
-                database=NEON_DB_NAME,
-                ssl='require',
-                timeout=30
-            )
-            return conn
+            return await database.get_connection()
         except Exception as e:
             last_error = e
             logger.warning(f"Database connection attempt {attempt + 1}/{max_retries} failed: {str(e)}")
@@ -141,6 +159,11 @@ async def get_db_connection(max_retries: int = 3, retry_delay: float = 1.0):
     raise HTTPException(status_code=500, detail=f"Database connection failed: {str(last_error)}")
 
 
+async def release_db_connection(conn):
+    """Return a connection obtained from get_db_connection to the pool"""
+    await database.release_connection(conn)
+
+
 # ============================================================================
 # Debug Endpoint
 # ============================================================================
@@ -155,7 +178,8 @@ async def debug_config():
         "neon_db_user_set": bool(NEON_DB_USER),
         "neon_db_password_set": bool(NEON_DB_PASSWORD),
         "neon_db_name": NEON_DB_NAME,
-        "neon_db_port": NEON_DB_PORT
+        "neon_db_port": NEON_DB_PORT,
+        "neon_pool": database.get_pool_stats()
     }
 
 
@@ -220,7 +244,7 @@ async def get_user_files(user_id: str, agent_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to fetch files: {str(e)}")
     finally:
         if conn:
-            await conn.close()
+            await release_db_connection(conn)
 
 
 # ============================================================================
@@ -289,7 +313,7 @@ async def get_user_instructions(user_id: str, agent_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to fetch instructions: {str(e)}")
     finally:
         if conn:
-            await conn.close()
+            await release_db_connection(conn)
 
 
 # ============================================================================
@@ -316,34 +340,21 @@ async def create_instructions(request: SaveInstructionsRequest = Body(...)):
         chunk_size = 1536
         chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] if len(text) > chunk_size else [text]
 
-        created_at = datetime.utcnow()
-        file_id = None
-
-        # Insert all chunks with same timestamp
-        for chunk in chunks:
-            query = """
-                INSERT INTO user_vector_knowledge_base
-                (user_id, agent_id, document, category, source, file_name, file_url, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                RETURNING id
-            """
-
-            result = await conn.fetchrow(
-                query,
-                request.user_id,
-                request.agent_id,
-                chunk,
-                'custom_instructions',
-                'agent_settings',
-                'User Input',
-                None,  # No file URL for text
-                created_at,
-                created_at
-            )
+        # Insert all chunks with same timestamp in one statement
+        record_ids = await knowledge_base_store.insert_chunks(
+            conn,
+            user_id=request.user_id,
+            agent_id=request.agent_id,
+            documents=chunks,
+            embeddings=[None] * len(chunks),
+            source='agent_settings',
+            file_name='User Input',
+            file_url=None,  # No file URL for text
+            category='custom_instructions'
+        )
 
-            # Use first chunk's ID as file_id
-            if file_id is None:
-                file_id = str(result['id'])
+        # Use first chunk's ID as file_id
+        file_id = record_ids[0] if record_ids else None
 
         logger.info(f"Created custom instructions for user {request.user_id}, agent {request.agent_id} (file_id: {file_id})")
 
@@ -358,7 +369,7 @@ async def create_instructions(request: SaveInstructionsRequest = Body(...)):
         raise HTTPException(status_code=500, detail=f"Failed to save instructions: {str(e)}")
     finally:
         if conn:
-            await conn.close()
+            await release_db_connection(conn)
 
 
 # ============================================================================
@@ -397,48 +408,38 @@ async def update_instructions(file_id: str, request: UpdateInstructionsRequest =
 
         old_timestamp = timestamp_result['created_at']
 
-        # Delete all chunks with the same timestamp (all parts of old instructions)
-        delete_query = """
-            DELETE FROM user_vector_knowledge_base
-            WHERE user_id = $1
-              AND agent_id = $2
-              AND category = 'custom_instructions'
-              AND created_at = $3
-        """
-
-        await conn.execute(delete_query, request.user_id, request.agent_id, old_timestamp)
-
-        # Insert new chunks
         text = request.instructions.strip()
         chunk_size = 1536
         chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] if len(text) > chunk_size else [text]
 
-        created_at = datetime.utcnow()
-        new_file_id = None
-
-        for chunk in chunks:
-            query = """
-                INSERT INTO user_vector_knowledge_base
-                (user_id, agent_id, document, category, source, file_name, file_url, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                RETURNING id
+        # Swap old chunks for new ones atomically so a failed insert never
+        # leaves the agent without instructions
+        async with conn.transaction():
+            # Delete all chunks with the same timestamp (all parts of old instructions)
+            delete_query = """
+                DELETE FROM user_vector_knowledge_base
+                WHERE user_id = $1
+                  AND agent_id = $2
+                  AND category = 'custom_instructions'
+                  AND created_at = $3
             """
 
-            result = await conn.fetchrow(
-                query,
-                request.user_id,
-                request.agent_id,
-                chunk,
-                'custom_instructions',
-                'agent_settings',
-                'User Input',
-                None,
-                created_at,
-                created_at
+            await conn.execute(delete_query, request.user_id, request.agent_id, old_timestamp)
+
+            # Insert new chunks
+            record_ids = await knowledge_base_store.insert_chunks(
+                conn,
+                user_id=request.user_id,
+                agent_id=request.agent_id,
+                documents=chunks,
+                embeddings=[None] * len(chunks),
+                source='agent_settings',
+                file_name='User Input',
+                file_url=None,
+                category='custom_instructions'
             )
 
-            if new_file_id is None:
-                new_file_id = str(result['id'])
+        new_file_id = record_ids[0] if record_ids else None
 
         logger.info(f"Updated custom instructions for user {request.user_id}, agent {request.agent_id} (new file_id: {new_file_id})")
 
@@ -455,7 +456,7 @@ async def update_instructions(file_id: str, request: UpdateInstructionsRequest =
         raise HTTPException(status_code=500, detail=f"Failed to update instructions: {str(e)}")
     finally:
         if conn:
-            await conn.close()
+            await release_db_connection(conn)
 
 
 # ============================================================================
@@ -560,7 +561,7 @@ async def upload_file(
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
     finally:
         if conn:
-            await conn.close()
+            await release_db_connection(conn)
 
 
 # ============================================================================
@@ -696,7 +697,7 @@ async def delete_file(file_id: str, file_url: Optional[str] = None):
             logger.warning(f"Error deleting from Neon: {e}")
         finally:
             if conn:
-                await conn.close()
+                await release_db_connection(conn)
                 conn = None
         
         # 3. Delete from Supabase storage
@@ -763,7 +764,7 @@ async def delete_file(file_id: str, file_url: Optional[str] = None):
         raise HTTPException(status_code=500, detail=f"Failed to delete file: {str(e)}")
     finally:
         if conn:
-            await conn.close()
+            await release_db_connection(conn)
 
 
 # ============================================================================
@@ -775,43 +776,76 @@ async def generate_query_embedding(text: str) -> Optional[list]:
     Generate embedding for search query using OpenRouter API.
     Uses openai/text-embedding-3-small model (1536 dimensions).
     Returns list of floats (embedding vector).
+
+    Served from a TTL+LRU cache keyed by normalized query text; concurrent
+    identical queries share one upstream request.
     """
-    OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-    
-    if not OPENROUTER_API_KEY:
-        logger.warning("OPENROUTER_API_KEY not set, cannot generate embedding")
-        return None
+    embedding = await get_query_embedding_cache().get(text)
+    if embedding:
+        logger.info(f"Query embedding ready ({len(embedding)} dimensions)")
+    return embedding
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                'https://openrouter.ai/api/v1/embeddings',
-                headers={
-                    'Authorization': f'Bearer {OPENROUTER_API_KEY}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'openai/text-embedding-3-small',
-                    'input': text[:8000]  # Limit input size
-                },
-                timeout=60.0
-            )
 
-            if response.status_code == 200:
-                result = response.json()
-                embedding = result.get('data', [{}])[0].get('embedding', [])
-                if embedding and len(embedding) > 0:
-                    logger.info(f"Generated query embedding ({len(embedding)} dimensions)")
-                    return embedding
-                else:
-                    logger.error("OpenRouter returned empty embedding")
-                    return None
-            else:
-                logger.error(f"OpenRouter embedding failed ({response.status_code}): {response.text}")
-                return None
+@router.get("/search/cache-stats")
+async def search_cache_stats():
+    """Hit/miss/coalesce counters for the query-embedding cache"""
+    return {
+        "success": True,
+        "query_embedding_cache": get_query_embedding_cache().get_stats()
+    }
+
+
+def to_search_result(row: Dict[str, Any]) -> SearchResult:
+    return SearchResult(
+        category=row['category'],
+        file_name=row['file_name'],
+        document=row['document'],
+        # Lexical-only hits on rows without an embedding have no similarity
+        similarity=float(row['similarity'] or 0.0),
+        created_at=row['created_at'],
+        hybrid_score=row.get('hybrid_score'),
+        vector_rank=row.get('vector_rank'),
+        lexical_rank=row.get('lexical_rank'),
+        lexical_score=row.get('lexical_score')
+    )
+
+
+@router.get("/search/index-check")
+async def search_index_check(
+    user_id: str,
+    agent_id: Optional[str] = None,
+    ef_search: Optional[int] = Query(default=None, ge=1, le=1000),
+    analyze: bool = False
+):
+    """
+    Self-check for the HNSW vector index.
+
+    Re-reads index state (exists / valid / pgvector version) and runs EXPLAIN
+    on the same query /search executes for this user, reporting whether the
+    planner picks the HNSW index or falls back to a sequential scan.
+    Set analyze=true to execute the query and include actual timings.
+    """
+    conn = None
+    try:
+        conn = await get_db_connection()
+        index_state = await knowledge_base_search.get_index_state(conn)
+        explain = await knowledge_base_search.explain_search(
+            conn, user_id, agent_id, ef_search=ef_search, analyze=analyze
+        )
+        return {
+            "success": True,
+            "index": index_state,
+            "startup_check": knowledge_base_search.get_index_status(),
+            "explain": explain
+        }
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Embedding generation error: {str(e)}")
-        return None
+        logger.error(f"Index check failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Index check failed: {str(e)}")
+    finally:
+        if conn:
+            await release_db_connection(conn)
 
 
 @router.post("/search", response_model=SemanticSearchResponse)
@@ -824,7 +858,9 @@ async def semantic_search(request: SemanticSearchRequest = Body(...)):
     Process:
     1. Generates embedding for the query text using OpenRouter API
     2. Finds most similar documents using pgvector cosine distance
-    3. Returns ranked results with similarity scores
+       (mode="hybrid" also matches exact terms via Postgres full-text search
+       and merges both rankings with reciprocal rank fusion)
+    3. Returns ranked results with similarity scores (plus per-source ranks/scores in hybrid mode)
     
     Args:
         request: SemanticSearchRequest with query, user_id, optional agent_id, limit, and similarity_threshold
@@ -839,12 +875,17 @@ async def semantic_search(request: SemanticSearchRequest = Body(...)):
             "user_id": "user-123",
             "agent_id": "personal_assistant",
             "limit": 5,
-            "similarity_threshold": 0.7
+            "similarity_threshold": 0.7,
+            "ef_search": 100,
+            "mode": "hybrid"
         }
     """
     conn = None
     try:
-        logger.info(f"Semantic search: query='{request.query}', user_id={request.user_id}, agent_id={request.agent_id}")
+        logger.info(f"Semantic search: query='{request.query}', user_id={request.user_id}, agent_id={request.agent_id}, mode={request.mode}")
+
+        if request.mode not in ["vector", "hybrid"]:
+            raise HTTPException(status_code=400, detail=f"Invalid search mode '{request.mode}' (expected 'vector' or 'hybrid')")
         
         # Step 1: Generate embedding for query
         query_embedding = await generate_query_embedding(request.query)
@@ -855,66 +896,32 @@ async def semantic_search(request: SemanticSearchRequest = Body(...)):
         # Step 2: Connect to database
         conn = await get_db_connection()
 
-        # Step 3: Build query with optional filters
-        # Using cosine distance: 1 - (a <=> b) gives similarity score (1 = identical, 0 = orthogonal)
-        where_clauses = ["embedding IS NOT NULL"]
-        params = []
-        param_idx = 1
-
-        # Format embedding as PostgreSQL vector string
-        vector_str = '[' + ','.join(str(x) for x in query_embedding) + ']'
-        params.append(vector_str)
-        param_idx += 1
-
-        # Add user_id filter
-        where_clauses.append(f"user_id = ${param_idx}")
-        params.append(request.user_id)
-        param_idx += 1
-
-        # Add optional agent_id filter
-        if request.agent_id:
-            where_clauses.append(f"agent_id = ${param_idx}")
-            params.append(request.agent_id)
-            param_idx += 1
-
-        # Add similarity threshold filter
-        if request.similarity_threshold > 0:
-            where_clauses.append(f"(1 - (embedding <=> $1::vector)) >= {request.similarity_threshold}")
-
-        where_clause = " AND ".join(where_clauses)
-        
-        # Add limit as the last parameter
-        params.append(request.limit)
-
-        query = f"""
-            SELECT 
-                id,
-                user_id,
-                agent_id,
-                category,
-                file_name,
-                document,
-                created_at,
-                1 - (embedding <=> $1::vector) as similarity
-            FROM user_vector_knowledge_base
-            WHERE {where_clause}
-            ORDER BY embedding <=> $1::vector
-            LIMIT ${param_idx}
-        """
-
-        logger.info(f"Executing semantic search with {len(params)} parameters")
-        rows = await conn.fetch(query, *params)
+        # Step 3: Top-k by distance via the HNSW index, then apply the threshold
+        # (hybrid mode also ranks full-text matches and fuses both lists in the same statement)
+        if request.mode == "hybrid":
+            rows = await knowledge_base_search.hybrid_search_knowledge_base(
+                conn,
+                format_vector(query_embedding),
+                request.query,
+                request.user_id,
+                request.agent_id,
+                request.limit,
+                similarity_threshold=request.similarity_threshold or 0.0,
+                ef_search=request.ef_search
+            )
+        else:
+            rows = await knowledge_base_search.search_knowledge_base(
+                conn,
+                format_vector(query_embedding),
+                request.user_id,
+                request.agent_id,
+                request.limit,
+                similarity_threshold=request.similarity_threshold or 0.0,
+                ef_search=request.ef_search
+            )
 
         # Step 4: Format results
-        results = []
-        for row in rows:
-            results.append(SearchResult(
-                category=row['category'],
-                file_name=row['file_name'],
-                document=row['document'],
-                similarity=float(row['similarity']),
-                created_at=row['created_at']
-            ))
+        results = [to_search_result(row) for row in rows]
 
         logger.info(f"Semantic search found {len(results)} results for user {request.user_id}")
 
@@ -934,4 +941,77 @@ async def semantic_search(request: SemanticSearchRequest = Body(...)):
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
     finally:
         if conn:
-            await conn.close()
+            await release_db_connection(conn)
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def batch_semantic_search(request: BatchSearchRequest = Body(...)):
+    """
+    Run several semantic searches for one user in a single call.
+
+    All query embeddings come from one upstream /embeddings request (cache
+    hits skip it entirely) and every search runs in one SQL statement, so
+    a multi-query agent turn costs about as much as a single search.
+
+    Example:
+        POST /api/knowledge-base/search/batch
+        {
+            "queries": ["opening hours", "refund policy", "pricing for SKU-1234"],
+            "user_id": "user-123",
+            "agent_id": "personal_assistant",
+            "limit": 5
+        }
+
+    Returns:
+        BatchSearchResponse with one SemanticSearchResponse per query, in
+        request order. A query whose embedding failed gets success=false.
+    """
+    conn = None
+    try:
+        logger.info(f"Batch semantic search: {len(request.queries)} queries, user_id={request.user_id}, agent_id={request.agent_id}")
+
+        # Step 1: Embed every query in one upstream request
+        query_embeddings = await get_query_embedding_cache().get_many(request.queries)
+        embedded = [i for i, embedding in enumerate(query_embeddings) if embedding]
+
+        if not embedded:
+            raise HTTPException(status_code=500, detail="Failed to generate embeddings for queries")
+
+        # Step 2: One statement for all searches
+        conn = await get_db_connection()
+        grouped = await knowledge_base_search.batch_search_knowledge_base(
+            conn,
+            [format_vector(query_embeddings[i]) for i in embedded],
+            request.user_id,
+            request.agent_id,
+            request.limit,
+            similarity_threshold=request.similarity_threshold or 0.0,
+            ef_search=request.ef_search
+        )
+        rows_by_query = dict(zip(embedded, grouped))
+
+        # Step 3: Group results per query
+        searches = []
+        for i, query_text in enumerate(request.queries):
+            results = [to_search_result(row) for row in rows_by_query.get(i, [])]
+            searches.append(SemanticSearchResponse(
+                success=i in rows_by_query,
+                query=query_text,
+                results=results,
+                count=len(results)
+            ))
+
+        logger.info(f"Batch semantic search found {sum(x.count for x in searches)} results for user {request.user_id}")
+
+        return BatchSearchResponse(success=True, searches=searches, count=len(searches))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch semantic search failed: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+    finally:
+        if conn:
+            await release_db_connection(conn)
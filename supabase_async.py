@@ -0,0 +1,52 @@
+"""
+Async Supabase
+One supabase-py AsyncClient per worker for code running on the event loop.
+Same table()/rpc()/storage query builders as the sync client, but
+``await ....execute()`` instead of blocking the loop on a synchronous HTTP
+call, and every request goes over the pooled 'supabase' client from
+http_clients.py instead of a new connection per client.
+
+    from supabase_async import get_async_supabase
+
+    result = await get_async_supabase().table("notifications").select("*").eq("id", notification_id).execute()
+
+The sync client in main.py stays for code that runs in threads (Playwright
+automations, background processors).
+"""
+
+import logging
+import os
+from typing import Optional, Dict, Any
+
+from supabase import AsyncClient, AsyncClientOptions
+
+from http_clients import get_http_client
+
+logger = logging.getLogger(__name__)
+
+
+_async_supabase: Optional[AsyncClient] = None
+
+def get_async_supabase() -> AsyncClient:
+    """Process-wide async Supabase client (service role), created on first use"""
+    global _async_supabase
+    if _async_supabase is None:
+        _async_supabase = AsyncClient(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_SERVICE_KEY"),
+            AsyncClientOptions(
+                httpx_client=get_http_client('supabase'),
+                auto_refresh_token=False,
+                persist_session=False
+            )
+        )
+        logger.info("Async Supabase client ready")
+    return _async_supabase
+
+async def close_async_supabase():
+    """Drop the client at worker shutdown (its connections belong to http_clients.py)"""
+    global _async_supabase
+    _async_supabase = None
+
+def get_stats() -> Dict[str, Any]:
+    return {"initialized": _async_supabase is not None}
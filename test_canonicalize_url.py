@@ -0,0 +1,60 @@
+"""
+Test script for canonicalize_url (page cache keys and crawler dedupe)
+
+Run: python test_canonicalize_url.py  (or pytest test_canonicalize_url.py)
+"""
+
+from page_cache import canonicalize_url
+
+
+def test_normalizes_equivalent_urls():
+    canonical = "https://example.com/about"
+    for url in (
+        "https://example.com/about",
+        "HTTPS://Example.COM/about",
+        "https://example.com:443/about",
+        "https://example.com/about/",
+        "https://example.com/about#team",
+        "https://example.com/about?utm_source=x&utm_medium=y",
+        "https://example.com/about?gclid=1&fbclid=2",
+        "  https://example.com/about  ",
+    ):
+        assert canonicalize_url(url) == canonical, url
+
+
+def test_root_and_ports():
+    assert canonicalize_url("https://example.com") == "https://example.com/"
+    assert canonicalize_url("https://example.com/") == "https://example.com/"
+    assert canonicalize_url("http://example.com:80/x") == "http://example.com/x"
+    assert canonicalize_url("http://example.com:8080/x") == "http://example.com:8080/x"
+    assert canonicalize_url("https://example.com:80/x") == "https://example.com:80/x", "default port of the other scheme is kept"
+    assert canonicalize_url("http://[::1]:8000/x") == "http://[::1]:8000/x"
+
+
+def test_query_is_sorted_and_kept():
+    assert canonicalize_url("https://example.com/p?b=2&a=1") == "https://example.com/p?a=1&b=2"
+    assert canonicalize_url("https://example.com/p?a=1&utm_campaign=z&b=") == "https://example.com/p?a=1&b="
+    assert canonicalize_url("https://example.com/p?page=2") != canonicalize_url("https://example.com/p?page=3")
+    assert canonicalize_url("https://example.com/Path") != canonicalize_url("https://example.com/path"), "paths are case-sensitive"
+
+
+def test_relative_links():
+    base = "https://example.com/blog/post"
+    assert canonicalize_url("/contact", base) == "https://example.com/contact"
+    assert canonicalize_url("other", base) == "https://example.com/blog/other"
+    assert canonicalize_url("../pricing/", base) == "https://example.com/pricing"
+    assert canonicalize_url("#section", base) == "https://example.com/blog/post"
+    assert canonicalize_url("//cdn.example.com/x", base) == "https://cdn.example.com/x"
+
+
+def test_rejects_non_http():
+    for url in ("mailto:hi@example.com", "tel:+123", "javascript:void(0)", "ftp://example.com/f", "example.com", "", "http://"):
+        assert canonicalize_url(url) is None, url
+    assert canonicalize_url("http://example.com:99999/") is None, "invalid port"
+
+
+if __name__ == "__main__":
+    for test in (test_normalizes_equivalent_urls, test_root_and_ports, test_query_is_sorted_and_kept,
+                 test_relative_links, test_rejects_non_http):
+        test()
+        print(f"✅ {test.__name__}")
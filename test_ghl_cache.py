@@ -0,0 +1,178 @@
+"""
+Test script for the ghl_subaccounts cache: _TTLMap expiry / LRU and
+GHLSubaccountCache invalidation, with the Supabase query replaced by an
+in-memory table.
+
+Run: python test_ghl_cache.py  (or pytest test_ghl_cache.py)
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+
+import ghl_cache
+from ghl_cache import GHLSubaccountCache, _TTLMap
+
+
+class FakeQuery:
+    """Just enough of the supabase query builder for ghl_cache's lookups"""
+
+    def __init__(self, table):
+        self.table = table
+        self.filters = []
+
+    def select(self, *_):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def limit(self, _):
+        return self
+
+    async def execute(self):
+        self.table.queries += 1
+        if self.table.on_query:
+            await self.table.on_query()
+
+        class Result:
+            data = [dict(row) for row in self.table.rows if all(f(row) for f in self.filters)]
+        return Result()
+
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+        self.on_query = None
+
+    def table(self, _name):
+        return FakeQuery(self)
+
+
+@contextmanager
+def with_rows(rows):
+    """Serve ghl_cache's queries from rows for the duration of the block"""
+    fake = FakeSupabase(rows)
+    original = ghl_cache.get_async_supabase
+    ghl_cache.get_async_supabase = lambda: fake
+    try:
+        yield fake
+    finally:
+        ghl_cache.get_async_supabase = original
+
+
+def test_ttl_map_expiry():
+    entries = _TTLMap(max_entries=10)
+    entries.put("short", 1, ttl=0.05)
+    entries.put("long", 2, ttl=60)
+    assert entries.get("short") == (True, 1)
+    time.sleep(0.1)
+    assert entries.get("short") == (False, None), "expired entries are gone"
+    assert entries.get("long") == (True, 2)
+    assert len(entries) == 1
+
+    entries.put("none", None, ttl=60)
+    assert entries.get("none") == (True, None), "a cached miss is still a hit"
+
+
+def test_ttl_map_lru():
+    entries = _TTLMap(max_entries=2)
+    entries.put("a", 1, ttl=60)
+    entries.put("b", 2, ttl=60)
+    entries.get("a")
+    entries.put("c", 3, ttl=60)
+    assert entries.get("b") == (False, None), "least recently used entry is evicted"
+    assert entries.get("a") == (True, 1) and entries.get("c") == (True, 3)
+
+    entries.pop_where(lambda key, value: value == 1)
+    assert entries.get("a") == (False, None)
+
+
+def test_invalidate_user():
+    async def scenario():
+        rows = [
+            {"firm_user_id": "u1", "agent_id": "SOL", "ghl_location_id": "loc1", "pit_token": "old", "automation_status": "completed"},
+            {"firm_user_id": "u2", "agent_id": "SOL", "ghl_location_id": "loc2", "pit_token": "t2", "automation_status": "completed"},
+        ]
+        with with_rows(rows) as fake:
+            cache = GHLSubaccountCache(ttl_seconds=60, negative_ttl_seconds=60)
+            assert (await cache.get_credentials("u1", "SOL"))["pit_token"] == "old"
+            assert await cache.get_user_locations("u1") == ["loc1"]
+            assert await cache.get_users_for_locations(["loc1", "loc2"]) == {"loc1": "u1", "loc2": "u2"}
+            queries = fake.queries
+
+            await cache.get_credentials("u1", "SOL")
+            await cache.get_user_for_location("loc1")
+            assert fake.queries == queries, "served from cache"
+
+            fake.rows[0]["pit_token"] = "new"
+            cache.invalidate_user("u1")
+            assert (await cache.get_credentials("u1", "SOL"))["pit_token"] == "new"
+            assert await cache.get_user_for_location("loc1") == "u1"
+            queries = fake.queries
+            assert await cache.get_user_for_location("loc2") == "u2"
+            assert fake.queries == queries, "other users' entries survive"
+
+            # A location moving to another user is dropped with location_id
+            fake.rows[1]["firm_user_id"] = "u3"
+            cache.invalidate_user("u3", "loc2")
+            assert await cache.get_user_for_location("loc2") == "u3"
+    asyncio.run(scenario())
+
+
+def test_running_automation_uses_negative_ttl():
+    async def scenario():
+        rows = [
+            {"firm_user_id": "u1", "agent_id": "SOL", "ghl_location_id": "loc1", "pit_token": "old", "automation_status": "token_refresh_running"},
+        ]
+        with with_rows(rows) as fake:
+            cache = GHLSubaccountCache(ttl_seconds=60, negative_ttl_seconds=0.05)
+            assert (await cache.get_credentials("u1", "SOL"))["pit_token"] == "old"
+
+            fake.rows[0].update(pit_token="new", automation_status="completed")
+            await asyncio.sleep(0.1)
+            assert (await cache.get_credentials("u1", "SOL"))["pit_token"] == "new", "token mid-refresh isn't kept for the full TTL"
+    asyncio.run(scenario())
+
+
+def test_invalidation_during_query_is_not_overwritten():
+    async def scenario():
+        rows = [
+            {"firm_user_id": "u1", "agent_id": "SOL", "ghl_location_id": "loc1", "pit_token": "old", "automation_status": "completed"},
+        ]
+        with with_rows(rows) as fake:
+            cache = GHLSubaccountCache(ttl_seconds=60, negative_ttl_seconds=60)
+
+            async def token_refreshed_meanwhile():
+                # The refresh writes ghl_subaccounts and invalidates while the read is in flight
+                fake.on_query = None
+                cache.invalidate_user("u1")
+
+            fake.on_query = token_refreshed_meanwhile
+            assert (await cache.get_credentials("u1", "SOL"))["pit_token"] == "old"
+            fake.rows[0]["pit_token"] = "new"
+            assert (await cache.get_credentials("u1", "SOL"))["pit_token"] == "new", "stale row wasn't cached"
+
+            queries = fake.queries
+            await cache.get_credentials("u1", "SOL")
+            assert fake.queries == queries, "without an invalidation in flight the row is cached"
+
+            fake.on_query = token_refreshed_meanwhile
+            await cache.get_user_locations("u1")
+            queries = fake.queries
+            await cache.get_user_locations("u1")
+            assert fake.queries == queries + 1, "location list read during an invalidation isn't cached"
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    for test in (test_ttl_map_expiry, test_ttl_map_lru, test_invalidate_user, test_running_automation_uses_negative_ttl,
+                 test_invalidation_during_query_is_not_overwritten):
+        test()
+        print(f"✅ {test.__name__}")
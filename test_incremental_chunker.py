@@ -0,0 +1,150 @@
+"""
+Test script for IncrementalChunker (streaming file ingestion)
+Feeding text piece by piece must give exactly the chunks chunk_text
+produces for the whole text, however the text is split, and chunk_text
+must still give the chunks of the original whole-text algorithm.
+
+Run: python test_incremental_chunker.py  (or pytest test_incremental_chunker.py)
+"""
+
+import random
+import re
+
+from background_text_processor import BackgroundTextProcessor, IncrementalChunker
+
+
+def sample_texts():
+    """Texts exercising each break rule: paragraphs, lines, sentences, spaces, hard cuts"""
+    rng = random.Random(42)
+    words = ["solar", "panel", "roof", "quote", "install", "battery", "grid", "kWh", "inverter", "warranty"]
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(4, 14))).capitalize() + rng.choice([". ", "! ", "? "])
+
+    paragraphs = "\n\n".join("".join(sentence() for _ in range(rng.randint(3, 12))) for _ in range(60))
+    lines = "\n".join("".join(sentence() for _ in range(rng.randint(1, 4))) for _ in range(200))
+    sentences = "".join(sentence() for _ in range(400))
+    spaces = " ".join(rng.choice(words) for _ in range(3000))
+    no_breaks = "x" * 20000
+    pages = "".join(f"{'' if i == 1 else chr(10)}[Page {i}]\n{paragraphs[i * 300:i * 300 + 900]}" for i in range(1, 40))
+    return {
+        "paragraphs": paragraphs,
+        "lines": lines,
+        "sentences": sentences,
+        "spaces": spaces,
+        "no_breaks": no_breaks,
+        "pages": pages,
+        "short": "Just one short page.",
+        "empty": "",
+    }
+
+
+def baseline_chunk_text(text: str, chunk_size: int = 4000, chunk_overlap: int = 400):
+    """Copy of chunk_text from before streaming ingestion; the reference for chunk boundaries"""
+    if not text or not text.strip():
+        return []
+
+    if len(text) <= chunk_size:
+        return [text.strip()]
+
+    chunks = []
+    start = 0
+
+    while start < len(text):
+        end = start + chunk_size
+
+        if end >= len(text):
+            chunk = text[start:].strip()
+            if chunk:
+                chunks.append(chunk)
+            break
+
+        segment = text[start:end]
+        break_pos = segment.rfind('\n\n')
+
+        if break_pos == -1 or break_pos < chunk_size * 0.3:
+            break_pos = segment.rfind('\n')
+
+        if break_pos == -1 or break_pos < chunk_size * 0.3:
+            sentence_match = None
+            for m in re.finditer(r'[.!?]\s', segment):
+                if m.start() >= chunk_size * 0.3:
+                    sentence_match = m
+            if sentence_match:
+                break_pos = sentence_match.end()
+
+        if break_pos == -1 or break_pos < chunk_size * 0.3:
+            break_pos = segment.rfind(' ')
+
+        if break_pos == -1 or break_pos < chunk_size * 0.3:
+            break_pos = chunk_size
+
+        chunk = text[start:start + break_pos].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        start = start + break_pos - chunk_overlap
+        if start < 0:
+            start = 0
+
+    return chunks
+
+
+def split_randomly(text: str, rng: random.Random, max_piece: int):
+    pieces = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(0, max_piece)
+        pieces.append(text[position:position + size])
+        position += size
+    return pieces
+
+
+def chunk_incrementally(pieces, chunk_size: int, chunk_overlap: int):
+    chunker = IncrementalChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = []
+    for piece in pieces:
+        chunks.extend(chunker.feed(piece))
+    chunks.extend(chunker.finish())
+    return chunks
+
+
+def test_matches_chunk_text():
+    """Random splits (including empty pieces) give the same chunks as the whole text"""
+    rng = random.Random(7)
+    for chunk_size, chunk_overlap in [(4000, 400), (1000, 100), (300, 50), (120, 0)]:
+        for name, text in sample_texts().items():
+            expected = BackgroundTextProcessor.chunk_text(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+            for max_piece in (1, 37, chunk_size, chunk_size * 3):
+                pieces = split_randomly(text, rng, max_piece)
+                actual = chunk_incrementally(pieces, chunk_size, chunk_overlap)
+                assert actual == expected, f"{name} chunk_size={chunk_size} max_piece={max_piece}"
+
+
+def test_matches_baseline_chunk_text():
+    """chunk_text still cuts exactly where the original algorithm did"""
+    for chunk_size, chunk_overlap in [(4000, 400), (1000, 100), (300, 50), (120, 0)]:
+        for name, text in sample_texts().items():
+            expected = baseline_chunk_text(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+            actual = BackgroundTextProcessor.chunk_text(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+            assert actual == expected, f"{name} chunk_size={chunk_size}"
+
+
+def test_whole_text_at_once():
+    for name, text in sample_texts().items():
+        expected = BackgroundTextProcessor.chunk_text(text, chunk_size=4000, chunk_overlap=400)
+        assert chunk_incrementally([text], 4000, 400) == expected, name
+
+
+def test_buffer_stays_bounded():
+    """Only the unfinished tail is kept, never the whole document"""
+    chunker = IncrementalChunker(chunk_size=1000, chunk_overlap=100)
+    for piece in split_randomly(sample_texts()["paragraphs"], random.Random(3), 500):
+        chunker.feed(piece)
+        assert len(chunker.buffer) <= 1000 + 500
+
+
+if __name__ == "__main__":
+    for test in (test_matches_chunk_text, test_matches_baseline_chunk_text, test_whole_text_at_once, test_buffer_stays_bounded):
+        test()
+        print(f"✅ {test.__name__}")
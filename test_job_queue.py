@@ -0,0 +1,164 @@
+"""
+Test script for the job queue's claim / retry / lease rules, using the
+in-process LocalJobQueue (same semantics as the background_jobs table).
+
+Run: python test_job_queue.py  (or pytest test_job_queue.py)
+"""
+
+import asyncio
+
+import job_queue
+from job_queue import JobWorker, LocalJobQueue
+
+KIND = "test_job"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def due_now(queue: LocalJobQueue):
+    """Make every queued job runnable immediately (skips retry backoff)"""
+    queue._heap = [(0.0, *entry[1:]) for entry in queue._heap]
+
+
+def test_claim_order_and_kinds():
+    async def scenario():
+        queue = LocalJobQueue()
+        low = await queue.enqueue(KIND, {"n": 1}, user_id="a")
+        high = await queue.enqueue(KIND, {"n": 2}, user_id="b", priority=10)
+        other = await queue.enqueue("other_kind", {}, user_id="c", priority=99)
+
+        first = await queue.claim("w1", [KIND], lease_seconds=60)
+        second = await queue.claim("w1", [KIND], lease_seconds=60)
+        assert (first.id, second.id) == (high, low), "higher priority first, then oldest"
+        assert first.attempts == 1
+        assert await queue.claim("w1", [KIND], lease_seconds=60) is None, "other kinds are not claimed"
+        assert (await queue.claim("w1", ["other_kind"], lease_seconds=60)).id == other
+    run(scenario())
+
+
+def test_per_user_cap():
+    async def scenario():
+        queue = LocalJobQueue()
+        for _ in range(job_queue.JOB_PER_USER_CONCURRENCY + 1):
+            await queue.enqueue(KIND, {}, user_id="busy")
+        waiting = await queue.enqueue(KIND, {}, user_id="idle")
+
+        claimed = [await queue.claim("w1", [KIND], 60) for _ in range(job_queue.JOB_PER_USER_CONCURRENCY)]
+        assert all(job.user_id == "busy" for job in claimed)
+        assert (await queue.claim("w1", [KIND], 60)).id == waiting, "capped user is skipped"
+        assert await queue.claim("w1", [KIND], 60) is None
+
+        await queue.complete(claimed[0], "w1")
+        assert (await queue.claim("w1", [KIND], 60)).user_id == "busy", "a finished job frees a slot"
+    run(scenario())
+
+
+def test_retry_then_dead():
+    async def scenario():
+        queue = LocalJobQueue()
+        job_id = await queue.enqueue(KIND, {}, max_attempts=2)
+
+        job = await queue.claim("w1", [KIND], 60)
+        assert not job.is_final_attempt
+        await queue.fail(job, "w1", "boom")
+        assert await queue.claim("w1", [KIND], 60) is None, "retry waits for its backoff"
+
+        due_now(queue)
+        job = await queue.claim("w1", [KIND], 60)
+        assert job.id == job_id and job.attempts == 2 and job.is_final_attempt
+        await queue.fail(job, "w1", "boom again")
+        due_now(queue)
+        assert await queue.claim("w1", [KIND], 60) is None
+        assert queue.stats["dead"] == 1 and queue.stats["queued"] == 0 and queue.stats["running"] == 0
+    run(scenario())
+
+
+def test_release_keeps_attempt():
+    async def scenario():
+        queue = LocalJobQueue()
+        await queue.enqueue(KIND, {})
+        job = await queue.claim("w1", [KIND], 60)
+        await queue.release(job, "w1")
+        job = await queue.claim("w2", [KIND], 60)
+        assert job.attempts == 1, "a job handed back at shutdown doesn't use up an attempt"
+    run(scenario())
+
+
+def test_lease_expiry():
+    async def scenario():
+        queue = LocalJobQueue()
+        job_id = await queue.enqueue(KIND, {}, user_id="a", max_attempts=2)
+
+        job = await queue.claim("dead-worker", [KIND], lease_seconds=0.05)
+        assert await queue.heartbeat(job, "dead-worker", 0.05)
+        assert await queue.claim("w2", [KIND], 60) is None, "leased job isn't claimed twice"
+
+        await asyncio.sleep(0.1)
+        taken = await queue.claim("w2", [KIND], lease_seconds=0.05)
+        assert taken is not None and taken.id == job_id and taken.attempts == 2
+        assert not await queue.heartbeat(job, "dead-worker", 60), "old worker lost its lease"
+
+        # The old worker finishing late doesn't touch the new attempt
+        await queue.complete(job, "dead-worker")
+        assert queue.stats["succeeded"] == 0 and queue.stats["running"] == 1
+
+        # Final attempt's lease expires too: not reclaimed, buried by maintenance
+        await asyncio.sleep(0.1)
+        assert await queue.claim("w3", [KIND], 60) is None
+        await queue.maintain()
+        assert queue.stats["dead"] == 1 and queue.stats["running"] == 0
+    run(scenario())
+
+
+def test_worker_stops_handler_when_lease_is_lost():
+    async def scenario():
+        queue = LocalJobQueue()
+        stopped = asyncio.Event()
+
+        async def handler(payload, job):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+        job_queue.register_handler("test_slow_job", handler)
+        await queue.enqueue("test_slow_job", {})
+        worker = JobWorker(queue, kinds=["test_slow_job"], lease_seconds=0.06)
+        job = await queue.claim(worker.worker_id, ["test_slow_job"], worker.lease_seconds)
+
+        try:
+            run_job = asyncio.create_task(worker._run_job(job))
+            await asyncio.sleep(0.01)
+            # Another worker takes the job over
+            queue._running[job.id] = ("other-worker", queue._running[job.id][1] + 60)
+            await asyncio.wait_for(run_job, 1)
+        finally:
+            job_queue._handlers.pop("test_slow_job", None)
+
+        assert stopped.is_set(), "handler is cancelled once the lease is gone"
+        assert worker.stats["lost"] == 1 and worker.stats["succeeded"] == 0 and worker.stats["failed"] == 0
+        assert queue.stats["running"] == 1, "the new owner's lease is untouched"
+    run(scenario())
+
+
+def test_late_finish_is_not_counted():
+    async def scenario():
+        queue = LocalJobQueue()
+        await queue.enqueue(KIND, {})
+        job = await queue.claim("w1", [KIND], 60)
+        queue._running[job.id] = ("w2", queue._running[job.id][1])
+        assert not await queue.complete(job, "w1")
+        assert not await queue.fail(job, "w1", "boom")
+        assert queue.stats["succeeded"] == 0 and queue.stats["running"] == 1
+    run(scenario())
+
+
+if __name__ == "__main__":
+    for test in (test_claim_order_and_kinds, test_per_user_cap, test_retry_then_dead,
+                 test_release_keeps_attempt, test_lease_expiry,
+                 test_worker_stops_handler_when_lease_is_lost, test_late_finish_is_not_counted):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,214 @@
+"""
+Webhook Ingest
+Takes GHL message webhooks off the request path: the endpoint validates and
+queues the notification row, answers GHL straight away, and a background
+task inserts queued rows into notifications in micro-batches and pushes
+them to the users' WebSockets.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
+
+from ghl_cache import get_ghl_cache
+from supabase_async import get_async_supabase
+from ws_broadcast import get_ws_broadcaster
+
+logger = logging.getLogger(__name__)
+
+# Set false to insert and notify inside the webhook request, as before
+GHL_WEBHOOK_ASYNC_INGEST = os.getenv('GHL_WEBHOOK_ASYNC_INGEST', 'true').lower() in ('true', '1', 'yes')
+# A batch is flushed when it reaches BATCH_SIZE rows or BATCH_WAIT_MS after its first row
+GHL_WEBHOOK_BATCH_SIZE = int(os.getenv('GHL_WEBHOOK_BATCH_SIZE', '50'))
+GHL_WEBHOOK_BATCH_WAIT_MS = float(os.getenv('GHL_WEBHOOK_BATCH_WAIT_MS', '200'))
+# Beyond this many queued rows, webhooks are processed inline (backpressure)
+GHL_WEBHOOK_QUEUE_MAX = int(os.getenv('GHL_WEBHOOK_QUEUE_MAX', '1000'))
+# Heroku allows 30s between SIGTERM and SIGKILL
+SHUTDOWN_TIMEOUT_SECONDS = 20
+
+
+def notification_ws_message(row: Dict[str, Any]) -> Dict[str, Any]:
+    """WebSocket payload for a stored notifications row"""
+    return {
+        "type": "notification",
+        "notification_id": row.get("id"),
+        "ghl_location_id": row.get("ghl_location_id"),
+        "ghl_contact_id": row.get("ghl_contact_id"),
+        "message": row.get("message_content"),
+        "sender_name": row.get("sender_name"),
+        "sender_phone": row.get("sender_phone"),
+        "sender_email": row.get("sender_email"),
+        "message_type": row.get("message_type"),
+        "conversation_id": row.get("conversation_id") or "",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "metadata": {
+            "contact_type": row.get("contact_type"),
+            "user_message_attachment": row.get("message_attachment"),
+            "tag": row.get("tag"),
+            "agent_message": row.get("agent_message")
+        }
+    }
+
+
+class NotificationIngester:
+    """
+    Bounded in-process queue + micro-batching writer for GHL notifications.
+
+    One Supabase insert per batch (a bad row only costs its batch a retry
+    row by row), one ghl_subaccounts lookup per batch for locations not in
+    the shared location -> firm_user_id cache (ghl_cache.py), and concurrent
+    WebSocket fan-out.
+    Rows still queued at shutdown are flushed before the worker exits.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = GHL_WEBHOOK_BATCH_SIZE,
+        batch_wait_ms: float = GHL_WEBHOOK_BATCH_WAIT_MS,
+        max_queue: int = GHL_WEBHOOK_QUEUE_MAX
+    ):
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "queued": 0, "rejected": 0, "batches": 0, "inserted": 0, "insert_failures": 0,
+            "notified": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Request path
+    # ------------------------------------------------------------------
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """Queue a notifications row. False if the ingester isn't running or is full."""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    # ------------------------------------------------------------------
+    # Persistence and fan-out
+    # ------------------------------------------------------------------
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert rows, returning them as stored (with trigger-generated fields)"""
+        try:
+            result = await get_async_supabase().table("notifications").insert(rows).execute()
+            self.stats["inserted"] += len(result.data or [])
+            return result.data or []
+        except Exception as e:
+            if len(rows) == 1:
+                self.stats["insert_failures"] += 1
+                logger.error(f"Failed to save notification {rows[0].get('id')}: {e}")
+                return []
+            logger.warning(f"Batch insert of {len(rows)} notifications failed, retrying row by row: {e}")
+
+        inserted = []
+        for row in rows:
+            inserted.extend(await self._insert([row]))
+        return inserted
+
+    async def _notify(self, rows: List[Dict[str, Any]]):
+        try:
+            users = await get_ghl_cache().get_users_for_locations([row["ghl_location_id"] for row in rows])
+        except Exception as e:
+            logger.error(f"Could not look up users for {len(rows)} notifications: {e}")
+            return
+
+        sends = []
+        for row in rows:
+            user_id = users.get(row["ghl_location_id"])
+            if not user_id:
+                logger.warning(f"No user mapping found for location {row['ghl_location_id']}")
+                continue
+            sends.append(get_ws_broadcaster().send_to_user(user_id, notification_ws_message(row)))
+        if sends:
+            results = await asyncio.gather(*sends, return_exceptions=True)
+            self.stats["notified"] += sum(1 for r in results if not isinstance(r, Exception))
+
+    async def process_batch(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Store rows and push them to their users. Returns the stored rows."""
+        self.stats["batches"] += 1
+        inserted = await self._insert(rows)
+        if inserted:
+            await self._notify(inserted)
+        return inserted
+
+    async def _run(self, queue: asyncio.Queue):
+        # None in the queue means stop, after everything queued before it
+        stopping = False
+        while not stopping:
+            row = await queue.get()
+            if row is None:
+                break
+            rows = [row]
+            deadline = time.monotonic() + self.batch_wait
+            while len(rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                rows.append(row)
+            try:
+                await self.process_batch(rows)
+            except Exception as e:
+                logger.error(f"Error processing {len(rows)} GHL notifications: {e}")
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(self._queue))
+        logger.info(f"GHL webhook ingester started (batch={self.batch_size}, wait={self.batch_wait * 1000:.0f}ms)")
+
+    async def stop(self, timeout: float = SHUTDOWN_TIMEOUT_SECONDS):
+        """Stop accepting webhooks and flush whatever is still queued"""
+        task, queue = self._task, self._queue
+        self._task, self._queue = None, None
+        if task is None:
+            return
+        await queue.put(None)
+        try:
+            await asyncio.wait_for(task, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"GHL webhook ingester did not drain within {timeout}s, {queue.qsize()} notifications not saved")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "running": self._task is not None,
+            "pending": self._queue.qsize() if self._queue else 0,
+        }
+
+
+_notification_ingester = None
+
+def get_notification_ingester() -> Optional[NotificationIngester]:
+    """Get the global notification ingester instance"""
+    return _notification_ingester
+
+def initialize_notification_ingester() -> NotificationIngester:
+    """Initialize the global notification ingester"""
+    global _notification_ingester
+    _notification_ingester = NotificationIngester()
+    return _notification_ingester
@@ -0,0 +1,147 @@
+"""
+WebSocket Broadcast
+Delivers WebSocket notifications to a user's sockets on every worker and
+dyno, not just the one that handled the webhook. Other workers are reached
+through Postgres NOTIFY on the 'ws_notify' channel; a local in-process
+backend covers a single worker (and development without Neon).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Optional, Dict, Any, Set
+
+import database
+from connection_manager import ConnectionManager, get_connection_manager
+from pg_listener import get_pg_listener
+
+logger = logging.getLogger(__name__)
+
+# 'postgres' (default when Neon is configured) or 'local' (this worker only)
+WS_BROADCAST_BACKEND = os.getenv('WS_BROADCAST_BACKEND', '').lower()
+WS_BROADCAST_CHANNEL = 'ws_notify'
+# NOTIFY payloads are capped at 8000 bytes; leave room for the envelope
+MAX_PAYLOAD_BYTES = 7500
+TRUNCATED_MESSAGE_LENGTH = 1000
+
+
+class WebSocketBroadcaster:
+    """
+    Sends to local sockets directly and NOTIFYs the other workers, which
+    deliver to their own sockets. A worker ignores its own NOTIFYs.
+
+    Delivery is at-most-once: a worker that is reconnecting its LISTEN
+    connection misses notifications, which are still in the notifications
+    table for the client to load.
+    """
+
+    def __init__(self, backend: str = 'local', manager: Optional[ConnectionManager] = None):
+        self.backend = backend
+        self.manager = manager if manager is not None else get_connection_manager()
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._listening = False
+        self._deliveries: Set[asyncio.Task] = set()
+        self.stats = {"published": 0, "publish_errors": 0, "truncated": 0, "received": 0, "delivered_remote": 0}
+
+    async def send_to_user(self, user_id: str, message: Dict[str, Any]) -> int:
+        """Deliver to the user's sockets on all workers. Returns the local delivery count."""
+        return await self._send('user', user_id, message)
+
+    async def send_to_session(self, session_id: str, message: Dict[str, Any]) -> int:
+        """Deliver to the session's sockets on all workers. Returns the local delivery count."""
+        return await self._send('session', session_id, message)
+
+    async def _send(self, target_type: str, target: str, message: Dict[str, Any]) -> int:
+        if self.backend != 'postgres':
+            return await self._deliver(target_type, target, message)
+        delivered, _ = await asyncio.gather(
+            self._deliver(target_type, target, message),
+            self._publish(target_type, target, message)
+        )
+        return delivered
+
+    async def _deliver(self, target_type: str, target: str, message: Dict[str, Any]) -> int:
+        if target_type == 'session':
+            return await self.manager.send_to_session(target, message)
+        return await self.manager.send_to_user(target, message)
+
+    def _encode(self, target_type: str, target: str, message: Dict[str, Any]) -> Optional[str]:
+        envelope = {"origin": self.origin, "type": target_type, "target": target, "message": message}
+        payload = json.dumps(envelope)
+        if len(payload.encode('utf-8')) <= MAX_PAYLOAD_BYTES:
+            return payload
+
+        # Long message bodies: send a preview, the full text is in the notifications table
+        body = message.get("message")
+        if isinstance(body, str):
+            envelope["message"] = {**message, "message": body[:TRUNCATED_MESSAGE_LENGTH], "truncated": True}
+            payload = json.dumps(envelope)
+            if len(payload.encode('utf-8')) <= MAX_PAYLOAD_BYTES:
+                self.stats["truncated"] += 1
+                return payload
+        return None
+
+    async def _publish(self, target_type: str, target: str, message: Dict[str, Any]):
+        payload = self._encode(target_type, target, message)
+        if payload is None:
+            self.stats["publish_errors"] += 1
+            logger.warning(f"WebSocket notification for {target_type} {target} is too large to broadcast, delivered locally only")
+            return
+        try:
+            async with database.acquire() as conn:
+                await conn.execute("SELECT pg_notify($1, $2)", WS_BROADCAST_CHANNEL, payload)
+            self.stats["published"] += 1
+        except Exception as e:
+            self.stats["publish_errors"] += 1
+            logger.warning(f"WebSocket broadcast for {target_type} {target} failed, delivered locally only: {e}")
+
+    def _on_notification(self, payload: str):
+        try:
+            envelope = json.loads(payload)
+        except ValueError:
+            return
+        if envelope.get("origin") == self.origin:
+            return
+        self.stats["received"] += 1
+        task = asyncio.create_task(self._deliver_remote(envelope))
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver_remote(self, envelope: Dict[str, Any]):
+        try:
+            delivered = await self._deliver(envelope["type"], envelope["target"], envelope["message"])
+            self.stats["delivered_remote"] += delivered
+        except Exception as e:
+            logger.error(f"Error delivering broadcast WebSocket notification: {e}")
+
+    def start(self):
+        if self.backend != 'postgres' or self._listening:
+            return
+        get_pg_listener().listen(WS_BROADCAST_CHANNEL, self._on_notification)
+        self._listening = True
+        logger.info(f"WebSocket broadcast started ({self.backend} backend)")
+
+    async def stop(self):
+        if self._listening:
+            self._listening = False
+            await get_pg_listener().unlisten(WS_BROADCAST_CHANNEL)
+        for task in list(self._deliveries):
+            task.cancel()
+        await asyncio.gather(*self._deliveries, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "backend": self.backend, "listening": self._listening}
+
+
+_ws_broadcaster = None
+
+def get_ws_broadcaster() -> WebSocketBroadcaster:
+    """Process-wide broadcaster (Postgres fan-out when Neon is configured, else local)"""
+    global _ws_broadcaster
+    if _ws_broadcaster is None:
+        backend = WS_BROADCAST_BACKEND or ('postgres' if database.is_configured() else 'local')
+        _ws_broadcaster = WebSocketBroadcaster(backend)
+    return _ws_broadcaster